@@ -251,7 +251,7 @@ require([
             url: localePrefix + '/splunkd/__raw/services/search/jobs',
             type: 'POST',
             data: {
-                search: '| inputlookup governance_audit_log.csv | sort - timestamp | head 1 | eval display = strftime(timestamp, "%Y-%m-%d %H:%M:%S") . " - " . action . " by " . performed_by | table display',
+                search: '| governanceaudit earliest=0 limit=1 | eval display = strftime(timestamp, "%Y-%m-%d %H:%M:%S") . " - " . action . " by " . performed_by | table display',
                 exec_mode: 'oneshot',
                 output_mode: 'json'
             },
@@ -561,6 +561,120 @@ require([
         }, 5000);
     }
 
+    // Precomputed dashboard summary (tile counts + popup lists) from the
+    // /governance/summary endpoint, revalidated with its ETag
+    var governanceSummaryCache = { etag: null, data: null };
+
+    function fetchGovernanceSummary(callback) {
+        var localePrefix = window.location.pathname.match(/^\/([a-z]{2}-[A-Z]{2})\//);
+        localePrefix = localePrefix ? '/' + localePrefix[1] : '';
+
+        var headers = {};
+        if (governanceSummaryCache.etag) {
+            headers['If-None-Match'] = governanceSummaryCache.etag;
+        }
+
+        $.ajax({
+            url: localePrefix + '/splunkd/__raw/services/governance/summary',
+            type: 'GET',
+            headers: headers,
+            dataType: 'json',
+            timeout: 5000,
+            success: function(data, textStatus, xhr) {
+                if (xhr.status === 304) {
+                    callback(null, governanceSummaryCache.data);
+                    return;
+                }
+                governanceSummaryCache.etag = xhr.getResponseHeader('ETag');
+                governanceSummaryCache.data = data;
+                callback(null, data);
+            },
+            error: function(xhr) {
+                console.log("Governance summary unavailable (HTTP " + xhr.status + "), using searches");
+                callback(xhr.status || 'error', null);
+            }
+        });
+    }
+
+    window.fetchGovernanceSummary = fetchGovernanceSummary;
+
+    // The metric tiles post-process the "metric_counts" base search. Its query carries the
+    // summary counts, so refreshing the tiles dispatches one makeresults rather than a
+    // lookup scan per tile; without the endpoint every count comes from one pass instead
+    var METRIC_COUNT_FIELDS = ['total', 'suspicious', 'flagged', 'pending_review', 'expiring', 'disabled'];
+
+    var METRIC_COUNTS_FALLBACK_QUERY = '| inputlookup flagged_searches_lookup' +
+        ' | dedup search_name' +
+        ' | eval days_remaining = round((remediation_deadline - now()) / 86400, 1), active = if(status="pending" OR status="notified", 1, 0)' +
+        ' | stats sum(active) as flagged, count(eval(status="review")) as pending_review,' +
+        ' count(eval(active=1 AND days_remaining>=0 AND days_remaining<=3)) as expiring,' +
+        ' count(eval(status="disabled" AND (now() - flagged_time) / 86400 <= 7)) as disabled' +
+        ' | appendcols [| inputlookup governance_search_cache.csv | search disabled=0' +
+        ' | lookup flagged_searches_lookup search_name as title OUTPUT status as flag_status' +
+        ' | lookup ok_searches_lookup search_name as title OUTPUT approved_time as ok_approved' +
+        ' | stats count as total, count(eval(is_suspicious=1 AND (isnull(flag_status) OR flag_status="") AND isnull(ok_approved))) as suspicious]' +
+        ' | fillnull value=0 ' + METRIC_COUNT_FIELDS.join(' ');
+
+    function updateMetricTiles() {
+        if (!mvc.Components.get('metric_counts')) {
+            return;
+        }
+        fetchGovernanceSummary(function(err, summary) {
+            var query = METRIC_COUNTS_FALLBACK_QUERY;
+            if (!err && summary && summary.counts) {
+                query = '| makeresults | eval ' + METRIC_COUNT_FIELDS.map(function(field) {
+                    return field + '=' + (parseInt(summary.counts[field], 10) || 0);
+                }).join(', ') + ' | fields - _time';
+            }
+            setToken('metric_counts_query', query);
+        });
+    }
+
+    // What-if estimate of disabling a set of searches, from the /governance/whatif
+    // endpoint (baseline/proposed/delta monthly SVC, cost and peak concurrency)
+    var whatIfTimer = null;
+    var whatIfRequest = null;
+
+    function simulateDisableSavings(searchNames, callback) {
+        clearTimeout(whatIfTimer);
+        if (whatIfRequest) {
+            whatIfRequest.abort();
+            whatIfRequest = null;
+        }
+        if (!searchNames.length) {
+            callback(null, null);
+            return;
+        }
+
+        var localePrefix = window.location.pathname.match(/^\/([a-z]{2}-[A-Z]{2})\//);
+        localePrefix = localePrefix ? '/' + localePrefix[1] : '';
+
+        // Debounce so rapid checkbox toggles send one request
+        whatIfTimer = setTimeout(function() {
+            whatIfRequest = $.ajax({
+                url: localePrefix + '/splunkd/__raw/services/governance/whatif',
+                type: 'GET',
+                traditional: true,
+                data: { disable: searchNames },
+                dataType: 'json',
+                timeout: 5000,
+                success: function(data) {
+                    whatIfRequest = null;
+                    callback(null, data);
+                },
+                error: function(xhr, status) {
+                    whatIfRequest = null;
+                    if (status !== 'abort') {
+                        console.log("What-if simulation unavailable (HTTP " + xhr.status + ")");
+                        callback(xhr.status || 'error', null);
+                    }
+                }
+            });
+        }, 250);
+    }
+
+    window.simulateDisableSavings = simulateDisableSavings;
+
     // ============================================================================
     // EVENT-SOURCING: Write state change events via saved search dispatch
     // This bypasses the outputlookup permission issue by dispatching a saved search
@@ -597,7 +711,7 @@ require([
 
         // Call the REST endpoint
         $.ajax({
-            url: '/en-US/splunkd/__raw/servicesNS/nobody/SA-cost-governance/admin/update_lookup/' + encodeURIComponent(eventData.search_name) + '?output_mode=json',
+            url: '/en-US/splunkd/__raw/servicesNS/nobody/SA-cost-governance/data/governance/update_lookup/' + encodeURIComponent(eventData.search_name) + '?output_mode=json',
             type: 'POST',
             data: postData,
             dataType: 'json',
@@ -975,9 +1089,15 @@ require([
     // Refresh dashboard panels
     function refreshDashboard() {
         setTimeout(function() {
+            // Tile counts follow the summary endpoint; a changed count re-dispatches their base search
+            updateMetricTiles();
+
             var managers = mvc.Components.getInstances();
             for (var i = 0; i < managers.length; i++) {
                 var manager = managers[i];
+                if (manager && manager.id === 'metric_counts') {
+                    continue;
+                }
                 if (manager && typeof manager.startSearch === 'function') {
                     try {
                         manager.startSearch();
@@ -1441,11 +1561,6 @@ require([
         showToast(actionVerb + " deadline...");
         $('#extendModalOverlay').removeClass('active');
 
-        // Use REST API to update each search's deadline
-        var successCount = 0;
-        var failCount = 0;
-        var totalCount = searches.length;
-
         // Get locale prefix for REST calls
         var localePrefix = window.location.pathname.match(/^\/([a-z]{2}-[A-Z]{2})\//);
         localePrefix = localePrefix ? '/' + localePrefix[1] : '';
@@ -1461,16 +1576,97 @@ require([
             }
         }
 
+        var searchNames = searches.map(function(s) { return s.searchName; }).filter(function(name) { return !!name; });
+        var missingCount = searches.length - searchNames.length;
+        if (missingCount > 0) {
+            console.error("performExtendDeadline: " + missingCount + " search(es) missing searchName");
+        }
+
+        // One request for the whole selection - the handler rewrites the lookup once
+        // and writes a single batched audit record
+        $.ajax({
+            url: localePrefix + '/splunkd/__raw/servicesNS/nobody/SA-cost-governance/data/governance/extend_deadline/_bulk?output_mode=json',
+            type: 'POST',
+            traditional: true,
+            headers: {
+                'X-Splunk-Form-Key': csrfToken,
+                'X-Requested-With': 'XMLHttpRequest'
+            },
+            data: {
+                search_name: searchNames,
+                days: extensionDays.toString(),
+                performed_by: currentUser
+            },
+            dataType: 'json',
+            success: function(response) {
+                var summary = {};
+                var updated = 0;
+                var failed = missingCount;
+                (response.entry || []).forEach(function(entry) {
+                    var content = entry.content || {};
+                    var status = [].concat(content.status)[0];
+                    if (entry.name === 'result') {
+                        summary = content;
+                    } else if (status === 'updated') {
+                        updated++;
+                    } else {
+                        failed++;
+                        console.warn("performExtendDeadline: not updated:", [].concat(content.search_name)[0], status);
+                    }
+                });
+                console.log("performExtendDeadline: bulk update complete", summary);
+                // A request-level error (no per-search results) means the handler could not run
+                if ([].concat(summary.status)[0] === 'error' && updated + failed === missingCount) {
+                    console.error("performExtendDeadline: bulk update error:", summary.message);
+                    extendDeadlineViaSavedSearch(searches, extensionDays, csrfToken, localePrefix, finish);
+                    return;
+                }
+                finish(updated, failed);
+            },
+            error: function(xhr, status, error) {
+                if (xhr.status === 400) {
+                    // The request itself was invalid; the saved search fallback would fail the same way
+                    var entry = ((xhr.responseJSON || {}).entry || [])[0] || {};
+                    var message = [].concat((entry.content || {}).message)[0] || error;
+                    console.error("performExtendDeadline: rejected:", message);
+                    showToast("⚠ Deadline not changed: " + message);
+                    return;
+                }
+                console.error("performExtendDeadline: bulk endpoint error", xhr.status, error, "- falling back to saved search");
+                extendDeadlineViaSavedSearch(searches, extensionDays, csrfToken, localePrefix, finish);
+            }
+        });
+
+        function finish(successCount, failCount) {
+            if (failCount > 0) {
+                showToast("⚠ " + successCount + " updated, " + failCount + " failed");
+            } else {
+                var msg = searches.length === 1
+                    ? "Deadline for '" + searches[0].searchName + "' " + (isReducing ? "reduced" : "extended") + " by " + Math.abs(extensionDays) + " days."
+                    : "Deadlines for " + searches.length + " searches " + (isReducing ? "reduced" : "extended") + " by " + Math.abs(extensionDays) + " days.";
+                showToast("✓ " + msg);
+            }
+            refreshDashboard();
+        }
+    }
+
+    // Fallback: extend each search by dispatching the Extend Deadline saved search
+    function extendDeadlineViaSavedSearch(searches, extensionDays, csrfToken, localePrefix, callback) {
+        var isReducing = extensionDays < 0;
+        var successCount = 0;
+        var failCount = 0;
+        var totalCount = searches.length;
+
         searches.forEach(function(s, idx) {
             var searchName = s.searchName;
             if (!searchName) {
-                console.error("performExtendDeadline: searchName is missing!", s);
+                console.error("extendDeadlineViaSavedSearch: searchName is missing!", s);
                 failCount++;
                 checkComplete();
                 return;
             }
 
-            console.log("performExtendDeadline: extending deadline for:", searchName, "by", extensionDays, "days");
+            console.log("extendDeadlineViaSavedSearch: extending deadline for:", searchName, "by", extensionDays, "days");
 
             // Dispatch saved search with run_as_owner=1 to bypass outputlookup permission issues
             var savedSearchName = encodeURIComponent('Governance - Extend Deadline');
@@ -1488,7 +1684,7 @@ require([
                     'args.extension_days': extensionDays.toString()
                 },
                 success: function(response) {
-                    console.log("performExtendDeadline: saved search dispatch success for", searchName, response);
+                    console.log("extendDeadlineViaSavedSearch: dispatch success for", searchName, response);
                     successCount++;
 
                     var logMsg = isReducing
@@ -1499,7 +1695,7 @@ require([
                     checkComplete();
                 },
                 error: function(xhr, status, error) {
-                    console.error("performExtendDeadline: saved search dispatch error for", searchName, xhr.status, xhr.responseText, error);
+                    console.error("extendDeadlineViaSavedSearch: dispatch error for", searchName, xhr.status, xhr.responseText, error);
                     failCount++;
                     checkComplete();
                 }
@@ -1508,15 +1704,7 @@ require([
 
         function checkComplete() {
             if (successCount + failCount === totalCount) {
-                if (failCount > 0) {
-                    showToast("⚠ " + successCount + " updated, " + failCount + " failed");
-                } else {
-                    var msg = searches.length === 1
-                        ? "Deadline for '" + searches[0].searchName + "' " + (isReducing ? "reduced" : "extended") + " by " + Math.abs(extensionDays) + " days."
-                        : "Deadlines for " + searches.length + " searches " + (isReducing ? "reduced" : "extended") + " by " + Math.abs(extensionDays) + " days.";
-                    showToast("✓ " + msg);
-                }
-                refreshDashboard();
+                callback(successCount, failCount);
             }
         }
     }
@@ -1578,9 +1766,9 @@ require([
             return 'search_name="' + escapeString(s.searchName) + '"';
         }).join(' OR ');
 
-        var checkQuery = '| inputlookup flagged_searches_lookup | search ' + conditions +
+        // Overdue searches come from the deadline index rather than a scan of the lookup
+        var checkQuery = '| governancedeadlines mode=expired | search ' + conditions +
             ' | eval days_remaining = round((remediation_deadline - now()) / 86400, 2)' +
-            ' | where days_remaining <= 0 AND status!="disabled"' +
             ' | table search_name, search_owner, search_app, days_remaining';
 
         runSearch(checkQuery, function(err, results) {
@@ -4988,117 +5176,130 @@ require([
                 return;
         }
 
-        var popupSearch = new SearchManager({
-            id: 'metric_popup_search_' + Date.now(),
-            search: searchQuery,
-            earliest_time: '-24h',
-            latest_time: 'now',
-            autostart: true
-        });
-
-        popupSearch.on('search:done', function() {
-            var results = popupSearch.data('results');
-            if (results) {
-                results.on('data', function() {
-                    var rows = results.data().rows;
-                    var fields = results.data().fields;
+        // Render result rows - positional, in the column order of the queries above
+        function renderMetricRows(rows) {
+            var colCount = (metricType === 'flagged' || metricType === 'expiring') ? 7 : 6;
+            if (!rows || rows.length === 0) {
+                var funnyMessage = getZeroItemMessage();
+                $('#metricPopupTableBody').html('<tr><td colspan="' + colCount + '" style="text-align: center; color: #5cc05c; padding: 30px; font-size: 14px;"><div style="font-size: 36px; margin-bottom: 10px;">🎉</div>' + funnyMessage + '</td></tr>');
+                return;
+            }
 
-                    var colCount = (metricType === 'flagged' || metricType === 'expiring') ? 7 : 6;
-                    if (!rows || rows.length === 0) {
-                        var funnyMessage = getZeroItemMessage();
-                        $('#metricPopupTableBody').html('<tr><td colspan="' + colCount + '" style="text-align: center; color: #5cc05c; padding: 30px; font-size: 14px;"><div style="font-size: 36px; margin-bottom: 10px;">🎉</div>' + funnyMessage + '</td></tr>');
-                        return;
-                    }
+            currentMetricSearches = [];
+            var html = '';
+            var hasFlaggedCountdown = (metricType === 'flagged' || metricType === 'expiring');
+
+            for (var i = 0; i < rows.length; i++) {
+                var row = rows[i];
+                var name = row[0] || '-';
+                var owner = row[1] || '-';
+                var app = row[2] || '-';
+                var statusDisplay = row[3] || 'active';
+                var detail = row[4] || '-';
+                var extra = row[5] || '';
+                var deadlineEpoch = (hasFlaggedCountdown && row[6]) ? parseFloat(row[6]) : null;
+                var daysRemaining = (hasFlaggedCountdown && row[7]) ? parseFloat(row[7]) : null;
+
+                currentMetricSearches.push({
+                    name: name,
+                    owner: owner,
+                    app: app,
+                    status: statusDisplay,
+                    deadlineEpoch: deadlineEpoch,
+                    daysRemaining: daysRemaining
+                });
 
-                    currentMetricSearches = [];
-                    var html = '';
-                    var hasFlaggedCountdown = (metricType === 'flagged' || metricType === 'expiring');
+                // Create status badge(s) - make clickable for status change
+                var statusBadge = getStatusBadges(statusDisplay);
+                var clickableStatus = '<div class="status-dropdown-wrapper" data-search="' + escapeHtml(name) + '" data-owner="' + escapeHtml(owner) + '" data-app="' + escapeHtml(app) + '" data-current-status="' + escapeHtml(statusDisplay) + '" style="cursor: pointer; position: relative;" title="Click to change status">' +
+                    statusBadge +
+                    '<span style="margin-left: 4px; font-size: 10px; opacity: 0.7;">▼</span>' +
+                    '</div>';
+
+                html += '<tr class="metric-popup-row" data-index="' + i + '" data-search-name="' + escapeHtml(name) + '" style="cursor: pointer;">' +
+                    '<td style="padding: 8px; width: 40px; text-align: center; color: rgba(255,255,255,0.4); font-size: 11px;">' + (i + 1) + '</td>' +
+                    '<td style="padding: 8px; max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="' + escapeHtml(name) + '">' + escapeHtml(name) + '</td>' +
+                    '<td style="padding: 8px;" class="status-cell">' + clickableStatus + '</td>';
+
+                // Add countdown timer column for flagged/expiring metrics
+                if (hasFlaggedCountdown) {
+                    html += '<td style="padding: 8px;" class="countdown-cell" data-deadline="' + (deadlineEpoch || '') + '" data-index="' + i + '">' +
+                        formatCountdownTimer(deadlineEpoch, statusDisplay) + '</td>';
+                }
 
-                    for (var i = 0; i < rows.length; i++) {
-                        var row = rows[i];
-                        var name = row[0] || '-';
-                        var owner = row[1] || '-';
-                        var app = row[2] || '-';
-                        var statusDisplay = row[3] || 'active';
-                        var detail = row[4] || '-';
-                        var extra = row[5] || '';
-                        var deadlineEpoch = (hasFlaggedCountdown && row[6]) ? parseFloat(row[6]) : null;
-                        var daysRemaining = (hasFlaggedCountdown && row[7]) ? parseFloat(row[7]) : null;
-
-                        currentMetricSearches.push({
-                            name: name,
-                            owner: owner,
-                            app: app,
-                            status: statusDisplay,
-                            deadlineEpoch: deadlineEpoch,
-                            daysRemaining: daysRemaining
-                        });
+                html += '<td style="padding: 8px;">' + escapeHtml(owner) + '</td>' +
+                    '<td style="padding: 8px;">' + escapeHtml(app) + '</td>';
+
+                // For suspicious searches, show the reason prominently with highlighting
+                if (metricType === 'suspicious' && detail && detail !== '-') {
+                    html += '<td style="padding: 8px; background: rgba(248, 190, 52, 0.15); border-left: 3px solid #f8be34; color: #f8be34; font-weight: 500;">' +
+                        '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
+                } else if ((metricType === 'flagged' || metricType === 'expiring') && detail && detail !== '-') {
+                    // For flagged/expiring searches, show reason with orange/red theme
+                    html += '<td style="padding: 8px; background: rgba(241, 129, 63, 0.15); border-left: 3px solid #f1813f; color: #f1813f; font-weight: 500;">' +
+                        '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
+                } else if (metricType === 'pending_review' && detail && detail !== '-') {
+                    // For pending review, show notes with purple theme
+                    html += '<td style="padding: 8px; background: rgba(111, 66, 193, 0.15); border-left: 3px solid #6f42c1; color: #6f42c1; font-weight: 500;">' +
+                        '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
+                } else if (metricType === 'disabled' && detail && detail !== '-') {
+                    // For disabled searches, show reason with red/gray theme
+                    html += '<td style="padding: 8px; background: rgba(220, 78, 65, 0.15); border-left: 3px solid #dc4e41; color: #dc4e41; font-weight: 500;">' +
+                        '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
+                } else {
+                    html += '<td style="padding: 8px; color: rgba(255,255,255,0.6);">' + escapeHtml(detail || '-') + '</td>';
+                }
 
-                        // Create status badge(s) - make clickable for status change
-                        var statusBadge = getStatusBadges(statusDisplay);
-                        var clickableStatus = '<div class="status-dropdown-wrapper" data-search="' + escapeHtml(name) + '" data-owner="' + escapeHtml(owner) + '" data-app="' + escapeHtml(app) + '" data-current-status="' + escapeHtml(statusDisplay) + '" style="cursor: pointer; position: relative;" title="Click to change status">' +
-                            statusBadge +
-                            '<span style="margin-left: 4px; font-size: 10px; opacity: 0.7;">▼</span>' +
-                            '</div>';
+                html += '</tr>';
+            }
+            $('#metricPopupTableBody').html(html);
 
-                        html += '<tr class="metric-popup-row" data-index="' + i + '" data-search-name="' + escapeHtml(name) + '" style="cursor: pointer;">' +
-                            '<td style="padding: 8px; width: 40px; text-align: center; color: rgba(255,255,255,0.4); font-size: 11px;">' + (i + 1) + '</td>' +
-                            '<td style="padding: 8px; max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="' + escapeHtml(name) + '">' + escapeHtml(name) + '</td>' +
-                            '<td style="padding: 8px;" class="status-cell">' + clickableStatus + '</td>';
+            // Start countdown timer if this is a flagged/expiring metric
+            if (hasFlaggedCountdown) {
+                startCountdownTimer();
 
-                        // Add countdown timer column for flagged/expiring metrics
-                        if (hasFlaggedCountdown) {
-                            html += '<td style="padding: 8px;" class="countdown-cell" data-deadline="' + (deadlineEpoch || '') + '" data-index="' + i + '">' +
-                                formatCountdownTimer(deadlineEpoch, statusDisplay) + '</td>';
-                        }
+                // Check for overdue searches and prompt for auto-disable
+                checkAndPromptOverdueSearches();
+            }
 
-                        html += '<td style="padding: 8px;">' + escapeHtml(owner) + '</td>' +
-                            '<td style="padding: 8px;">' + escapeHtml(app) + '</td>';
-
-                        // For suspicious searches, show the reason prominently with highlighting
-                        if (metricType === 'suspicious' && detail && detail !== '-') {
-                            html += '<td style="padding: 8px; background: rgba(248, 190, 52, 0.15); border-left: 3px solid #f8be34; color: #f8be34; font-weight: 500;">' +
-                                '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
-                        } else if ((metricType === 'flagged' || metricType === 'expiring') && detail && detail !== '-') {
-                            // For flagged/expiring searches, show reason with orange/red theme
-                            html += '<td style="padding: 8px; background: rgba(241, 129, 63, 0.15); border-left: 3px solid #f1813f; color: #f1813f; font-weight: 500;">' +
-                                '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
-                        } else if (metricType === 'pending_review' && detail && detail !== '-') {
-                            // For pending review, show notes with purple theme
-                            html += '<td style="padding: 8px; background: rgba(111, 66, 193, 0.15); border-left: 3px solid #6f42c1; color: #6f42c1; font-weight: 500;">' +
-                                '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
-                        } else if (metricType === 'disabled' && detail && detail !== '-') {
-                            // For disabled searches, show reason with red/gray theme
-                            html += '<td style="padding: 8px; background: rgba(220, 78, 65, 0.15); border-left: 3px solid #dc4e41; color: #dc4e41; font-weight: 500;">' +
-                                '<span title="' + escapeHtml(detail) + '">' + escapeHtml(detail) + '</span></td>';
-                        } else {
-                            html += '<td style="padding: 8px; color: rgba(255,255,255,0.6);">' + escapeHtml(detail || '-') + '</td>';
-                        }
+            // Show/hide buttons based on search statuses
+            updateReviewButtonsVisibility();
 
-                        html += '</tr>';
-                    }
-                    $('#metricPopupTableBody').html(html);
+            // Show/hide buttons based on metric type
+            updateMetricTypeButtons(metricType);
+        }
 
-                    // Start countdown timer if this is a flagged/expiring metric
-                    if (hasFlaggedCountdown) {
-                        startCountdownTimer();
+        function runMetricSearch() {
+            var popupSearch = new SearchManager({
+                id: 'metric_popup_search_' + Date.now(),
+                search: searchQuery,
+                earliest_time: '-24h',
+                latest_time: 'now',
+                autostart: true
+            });
 
-                        // Check for overdue searches and prompt for auto-disable
-                        checkAndPromptOverdueSearches();
-                    }
+            popupSearch.on('search:done', function() {
+                var results = popupSearch.data('results');
+                if (results) {
+                    results.on('data', function() {
+                        renderMetricRows(results.data().rows);
+                    });
+                }
+            });
 
-                    // Show/hide buttons based on search statuses
-                    updateReviewButtonsVisibility();
+            popupSearch.on('search:error', function(err) {
+                $('#metricPopupTableBody').html('<tr><td colspan="5" style="text-align: center; color: #dc4e41; padding: 20px;">Error loading data</td></tr>');
+            });
+        }
 
-                    // Show/hide buttons based on metric type
-                    updateMetricTypeButtons(metricType);
-                });
+        // Serve the popup from the precomputed summary, falling back to a search
+        fetchGovernanceSummary(function(err, summary) {
+            if (!err && summary && summary.lists && summary.lists[metricType]) {
+                renderMetricRows(summary.lists[metricType]);
+            } else {
+                runMetricSearch();
             }
         });
-
-        popupSearch.on('search:error', function(err) {
-            $('#metricPopupTableBody').html('<tr><td colspan="5" style="text-align: center; color: #dc4e41; padding: 20px;">Error loading data</td></tr>');
-        });
     }
 
     window.openMetricPopup = openMetricPopup;
@@ -5653,10 +5854,22 @@ require([
         }
 
         if (count > 0) {
-            $badge.text(count + " search" + (count > 1 ? "es" : "") + " selected").addClass('show');
+            var label = count + " search" + (count > 1 ? "es" : "") + " selected";
+            $badge.text(label).addClass('show');
         } else {
             $badge.removeClass('show');
         }
+
+        // Estimated savings if the selection were disabled
+        simulateDisableSavings(selectedSearches.map(function(s) { return s.searchName; }), function(err, result) {
+            if (err || !result || selectedSearches.length !== count) return;
+            var delta = result.delta || {};
+            if (delta.monthly_svc < 0) {
+                $badge.text(label + " · disabling saves $" + Math.round(-delta.monthly_cost).toLocaleString() +
+                    "/mo (" + Math.round(-delta.monthly_svc).toLocaleString() + " SVC), peak concurrency " +
+                    result.baseline.peak_concurrency + " → " + result.proposed.peak_concurrency);
+            }
+        });
     }
 
     // Get selected searches for actions
@@ -6190,28 +6403,19 @@ require([
                     };
                 });
 
-                console.log("Auto-disable check: Disabling searches via REST API...");
+                console.log("Auto-disable check: Running server-side disable scheduler...");
 
-                // Disable via REST API
-                disableSearchesViaREST(searchesToDisable);
-
-                // Update the lookup to mark as disabled
-                var updateQuery = '| inputlookup flagged_searches_lookup ' +
-                    '| eval status = if(status IN ("pending", "notified") AND remediation_deadline > 0 AND remediation_deadline < ' + now + ', "disabled", status) ' +
-                    '| eval notes = if(status="disabled" AND NOT match(notes, "AUTO-DISABLED"), notes + " | AUTO-DISABLED: Deadline exceeded on " + strftime(now(), "%Y-%m-%d %H:%M"), notes) ' +
-                    '| outputlookup flagged_searches_lookup';
-
-                runSearch(updateQuery, function(updateErr) {
-                    if (!updateErr) {
-                        console.log("Auto-disable check: Updated lookup for " + rows.length + " search(es)");
-                        // Log the actions
-                        searchesToDisable.forEach(function(s) {
-                            logAction('auto-disabled', s.name, 'Deadline exceeded - auto-disabled');
-                        });
-                        // Refresh dashboard to show updated statuses
-                        if (typeof refreshDashboard === 'function') {
-                            refreshDashboard();
-                        }
+                // The scheduler disables the most expensive searches first with a capped number of
+                // concurrent REST calls, updates the lookup and writes the audit records itself
+                runSearch('| governancedisable max_concurrency=4 max_per_minute=60 time_budget=240', function(err) {
+                    if (err) {
+                        console.error("Auto-disable check: scheduler failed, disabling from the browser:", err);
+                        disableOverdueInBrowser(searchesToDisable, now);
+                        return;
+                    }
+                    console.log("Auto-disable check: Scheduler run complete for " + rows.length + " overdue search(es)");
+                    if (typeof refreshDashboard === 'function') {
+                        refreshDashboard();
                     }
                 });
             });
@@ -6222,6 +6426,119 @@ require([
         });
     }
 
+    // Fallback when the governancedisable command is unavailable: disable from the browser
+    // and mark the overdue rows disabled in the lookup
+    function disableOverdueInBrowser(searchesToDisable, now) {
+        disableSearchesViaREST(searchesToDisable);
+
+        var updateQuery = '| inputlookup flagged_searches_lookup ' +
+            '| eval status = if(status IN ("pending", "notified") AND remediation_deadline > 0 AND remediation_deadline < ' + now + ', "disabled", status) ' +
+            '| eval notes = if(status="disabled" AND NOT match(notes, "AUTO-DISABLED"), notes + " | AUTO-DISABLED: Deadline exceeded on " + strftime(now(), "%Y-%m-%d %H:%M"), notes) ' +
+            '| outputlookup flagged_searches_lookup';
+
+        runSearch(updateQuery, function(updateErr) {
+            if (!updateErr) {
+                console.log("Auto-disable check: Updated lookup for " + searchesToDisable.length + " search(es)");
+                // Log the actions
+                searchesToDisable.forEach(function(s) {
+                    logAction('auto-disabled', s.name, 'Deadline exceeded - auto-disabled');
+                });
+                // Refresh dashboard to show updated statuses
+                if (typeof refreshDashboard === 'function') {
+                    refreshDashboard();
+                }
+            }
+        });
+    }
+
+    // ============================================
+    // CHANGE FEED (long-poll instead of re-dispatching searches)
+    // ============================================
+
+    var changeFeedCursor = null;
+    var deadlineCheckTimer = null;
+    var scheduledDeadline = 0;
+    var changeFeedFallbackInterval = null;
+
+    // Flatten the admin handler response into { cursor, reset, nextDeadline, events }
+    function parseChangeFeed(response) {
+        var feed = { cursor: 0, reset: false, nextDeadline: 0, events: [] };
+        ((response && response.entry) || []).forEach(function(entry) {
+            var content = entry.content || {};
+            if (entry.name === 'feed') {
+                feed.cursor = parseInt(content.cursor, 10) || 0;
+                feed.reset = content.reset === '1';
+                feed.nextDeadline = parseInt(content.next_deadline, 10) || 0;
+            } else if (entry.name.indexOf('event_') === 0) {
+                feed.events.push(content);
+            }
+        });
+        return feed;
+    }
+
+    // Run the auto-disable check exactly when the next deadline passes
+    function scheduleDeadlineCheck(nextDeadline) {
+        if (window.location.pathname.indexOf('scheduled_search_governance') === -1) {
+            return;
+        }
+        // Every poll reports the next deadline; keep the timer already set for it
+        if (nextDeadline === scheduledDeadline && deadlineCheckTimer) {
+            return;
+        }
+        clearTimeout(deadlineCheckTimer);
+        deadlineCheckTimer = null;
+        scheduledDeadline = nextDeadline;
+        // A deadline that has already passed is left to the server-side scheduler
+        if (!nextDeadline || nextDeadline * 1000 <= Date.now()) {
+            return;
+        }
+        // setTimeout overflows past ~24.8 days; the feed reschedules long before then
+        var delayMs = Math.min(nextDeadline * 1000 - Date.now() + 1000, 86400000);
+        deadlineCheckTimer = setTimeout(function() {
+            deadlineCheckTimer = null;
+            checkAutoDisable();
+        }, delayMs);
+    }
+
+    function watchGovernanceChanges() {
+        var localePrefix = window.location.pathname.match(/^\/([a-z]{2}-[A-Z]{2})\//);
+        localePrefix = localePrefix ? '/' + localePrefix[1] : '';
+        var isFirstPoll = changeFeedCursor === null;
+
+        $.ajax({
+            url: localePrefix + '/splunkd/__raw/servicesNS/-/SA-cost-governance/data/governance/changes',
+            type: 'GET',
+            data: {
+                cursor: changeFeedCursor || 0,
+                timeout: isFirstPoll ? 0 : 20,
+                output_mode: 'json'
+            },
+            timeout: 30000,
+            success: function(response) {
+                var feed = parseChangeFeed(response);
+                changeFeedCursor = feed.cursor;
+
+                if (changeFeedFallbackInterval) {
+                    clearInterval(changeFeedFallbackInterval);
+                    changeFeedFallbackInterval = null;
+                }
+                if (!isFirstPoll && (feed.reset || feed.events.length > 0)) {
+                    console.log("Change feed: " + feed.events.length + " change(s), refreshing dashboard");
+                    refreshDashboard();
+                }
+                scheduleDeadlineCheck(feed.nextDeadline);
+                watchGovernanceChanges();
+            },
+            error: function(xhr) {
+                console.log("Change feed unavailable (HTTP " + xhr.status + "), falling back to polling");
+                if (!changeFeedFallbackInterval && window.location.pathname.indexOf('scheduled_search_governance') !== -1) {
+                    changeFeedFallbackInterval = setInterval(checkAutoDisable, 30000);
+                }
+                setTimeout(watchGovernanceChanges, 30000);
+            }
+        });
+    }
+
     // ============================================
     // INITIALIZATION
     // ============================================
@@ -6534,12 +6851,18 @@ require([
         });
 
         // Check for deadline-based auto-disable - only on scheduled_search_governance page
+        // Later checks are scheduled from the change feed at the next deadline
         if (window.location.pathname.indexOf('scheduled_search_governance') !== -1) {
             console.log("Auto-disable check enabled for scheduled_search_governance page");
             setTimeout(checkAutoDisable, 5000);
-            setInterval(checkAutoDisable, 30000); // Every 30 seconds for testing
         }
 
+        // Metric tiles from the precomputed summary
+        updateMetricTiles();
+
+        // Refresh panels only when the change feed reports flag/status/deadline events
+        watchGovernanceChanges();
+
         console.log("SA-cost-governance: Initialization complete");
     });
 
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+audit_store.py - Day-partitioned governance audit log
+
+Audit records are stored as one CSV segment per UTC day under
+lookups/audit_log/, described by a small manifest (row count and min/max
+timestamp per segment). Closed days are gzip-compressed.
+
+- Appends only touch the segment for the record's day.
+- Time-range queries read only the segments whose day overlaps the range.
+- Retention deletes whole segments instead of rewriting the log.
+
+Records appended to the legacy governance_audit_log.csv (outputlookup
+append=true from dashboards and macros) are folded in by migrate_legacy().
+"""
+
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+STORE_DIR = os.path.join(LOOKUPS_DIR, 'audit_log')
+LEGACY_LOOKUP = os.path.join(LOOKUPS_DIR, 'governance_audit_log.csv')
+
+MANIFEST = 'manifest.json'
+
+AUDIT_FIELDS = ['timestamp', 'action', 'search_name', 'search_owner', 'search_app', 'performed_by',
+                'session_user', 'old_status', 'new_status', 'old_deadline', 'new_deadline',
+                'extension_days', 'reason', 'notes', 'details', 'source_url']
+
+DEFAULT_RETENTION_DAYS = 365
+
+
+def _day(ts):
+    return datetime.fromtimestamp(int(float(ts)), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def _day_start(day):
+    return int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+def _row_key(row):
+    """Comparable form of a record as append() stores it."""
+    return tuple(str(int(float(row[k]))) if k == 'timestamp' else (row.get(k) or '') for k in AUDIT_FIELDS)
+
+
+class AuditStore(object):
+    """Day-partitioned audit log rooted at a directory."""
+
+    def __init__(self, root=STORE_DIR, compress=True):
+        self.root = root
+        self.compress = compress
+        self.manifest_path = os.path.join(root, MANIFEST)
+
+    # -- manifest -----------------------------------------------------------
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'partitions': {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def partitions(self):
+        """Return the manifest entries ordered by day."""
+        parts = self._load_manifest()['partitions']
+        return [dict(parts[day], day=day) for day in sorted(parts)]
+
+    # -- segment io ---------------------------------------------------------
+
+    def _open(self, filename, mode):
+        path = os.path.join(self.root, filename)
+        if filename.endswith('.gz'):
+            return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+        return open(path, mode, newline='', encoding='utf-8')
+
+    def _read_segment(self, filename):
+        with self._open(filename, 'r') as f:
+            return list(csv.DictReader(f))
+
+    # -- writes -------------------------------------------------------------
+
+    def append(self, records, today=None):
+        """
+        Append audit records, each to the segment for its own day.
+
+        Args:
+            records: Iterable of dicts; timestamp defaults to now
+            today: Current day (YYYY-MM-DD) - segments before it are closed
+
+        Returns:
+            int: Number of records written
+        """
+        now = int(time.time())
+        by_day = {}
+        for record in records:
+            row = dict((k, record.get(k, '')) for k in AUDIT_FIELDS)
+            row['timestamp'] = str(int(float(record.get('timestamp') or now)))
+            by_day.setdefault(_day(row['timestamp']), []).append(row)
+        if not by_day:
+            return 0
+
+        os.makedirs(self.root, exist_ok=True)
+        today = today or _day(now)
+        written = 0
+        with FileLock(self.manifest_path):
+            manifest = self._load_manifest()
+            parts = manifest['partitions']
+            for day, rows in sorted(by_day.items()):
+                part = parts.get(day)
+                if part is None:
+                    filename = day + ('.csv.gz' if self.compress and day < today else '.csv')
+                    part = {'file': filename, 'rows': 0, 'min_ts': int(rows[0]['timestamp']),
+                            'max_ts': int(rows[0]['timestamp'])}
+                    parts[day] = part
+                is_new = part['rows'] == 0
+                # gzip members concatenate, so closed segments can be appended to as well
+                with self._open(part['file'], 'w' if is_new else 'a') as f:
+                    writer = csv.DictWriter(f, fieldnames=AUDIT_FIELDS, extrasaction='ignore')
+                    if is_new:
+                        writer.writeheader()
+                    writer.writerows(rows)
+                timestamps = [int(r['timestamp']) for r in rows]
+                part['rows'] += len(rows)
+                part['min_ts'] = min([part['min_ts']] + timestamps)
+                part['max_ts'] = max([part['max_ts']] + timestamps)
+                written += len(rows)
+            self._save_manifest(manifest)
+        return written
+
+    def compress_closed(self, today=None):
+        """Gzip every plain segment older than today. Returns days compressed."""
+        if not self.compress:
+            return []
+        today = today or _day(time.time())
+        done = []
+        with FileLock(self.manifest_path):
+            manifest = self._load_manifest()
+            for day, part in sorted(manifest['partitions'].items()):
+                if day >= today or part['file'].endswith('.gz'):
+                    continue
+                src = os.path.join(self.root, part['file'])
+                with open(src, 'rb') as f_in, gzip.open(src + '.gz', 'wb') as f_out:
+                    f_out.write(f_in.read())
+                part['file'] += '.gz'
+                os.remove(src)
+                done.append(day)
+            self._save_manifest(manifest)
+        return done
+
+    def apply_retention(self, days=DEFAULT_RETENTION_DAYS, now=None):
+        """
+        Delete whole segments older than the retention window.
+
+        Returns:
+            list: Days whose segments were removed
+        """
+        now = int(time.time()) if now is None else now
+        cutoff = _day(now - days * 86400)
+        removed = []
+        with FileLock(self.manifest_path):
+            manifest = self._load_manifest()
+            for day in sorted(manifest['partitions']):
+                if day >= cutoff:
+                    break
+                part = manifest['partitions'].pop(day)
+                path = os.path.join(self.root, part['file'])
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append(day)
+            self._save_manifest(manifest)
+        return removed
+
+    def migrate_legacy(self, legacy_path=LEGACY_LOOKUP):
+        """
+        Move rows from the flat governance_audit_log.csv into partitions.
+
+        The flat file is claimed by renaming it aside and a header-only file
+        takes its place, so outputlookup append=true writers keep working
+        and a row appended while the claimed rows are migrated lands in the
+        new file for the next run instead of being truncated away. Rows
+        already in their day's segment are skipped, so a run interrupted
+        after the append (the claimed file is migrated first next time) or
+        a writer re-writing rows it read before the claim does not
+        duplicate them.
+
+        Returns:
+            int: Number of rows migrated
+        """
+        claimed_path = legacy_path + '.migrating'
+        with FileLock(legacy_path):
+            if not os.path.exists(claimed_path):
+                if not os.path.exists(legacy_path):
+                    return 0
+                with open(legacy_path, 'r', newline='', encoding='utf-8') as f:
+                    fieldnames = csv.DictReader(f).fieldnames
+                os.replace(legacy_path, claimed_path)
+                self._create_header_only(legacy_path, fieldnames or ['timestamp', 'action', 'search_name',
+                                                                     'performed_by', 'details'])
+
+            with open(claimed_path, 'r', newline='', encoding='utf-8') as f:
+                rows = [r for r in csv.DictReader(f) if r.get('timestamp')]
+            existing = self._row_keys(set(_day(r['timestamp']) for r in rows))
+            rows = [r for r in rows if _row_key(r) not in existing]
+            migrated = self.append(rows)
+            os.remove(claimed_path)
+        return migrated
+
+    @staticmethod
+    def _create_header_only(path, fieldnames):
+        """Write a header-only file unless a writer has already recreated it."""
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=fieldnames).writeheader()
+
+    def _row_keys(self, days):
+        """Keys of the rows already stored in the segments of the given days."""
+        parts = self._load_manifest()['partitions']
+        keys = set()
+        for day in days:
+            if day in parts:
+                keys.update(_row_key(r) for r in self._read_segment(parts[day]['file']))
+        return keys
+
+    # -- reads --------------------------------------------------------------
+
+    def query(self, earliest=0, latest=None, filters=None, limit=None, legacy_path=LEGACY_LOOKUP):
+        """
+        Return records with earliest <= timestamp < latest, newest first.
+
+        Only segments whose day range overlaps [earliest, latest) are read,
+        newest day first, stopping once limit records have been collected.
+        Rows still waiting in the legacy flat file are included as well.
+
+        Args:
+            earliest: Start epoch (inclusive)
+            latest: End epoch (exclusive), defaults to now + 1
+            filters: Optional dict of field -> required value
+            limit: Optional maximum number of records
+            legacy_path: Flat governance_audit_log.csv not yet migrated
+
+        Returns:
+            list: Matching records
+        """
+        latest = int(time.time()) + 1 if latest is None else latest
+        filters = dict((k, v) for k, v in (filters or {}).items() if v not in (None, '', '*'))
+
+        def matches(row):
+            ts = int(float(row.get('timestamp') or 0))
+            return earliest <= ts < latest and all(row.get(k) == v for k, v in filters.items())
+
+        results = []
+        if legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path, 'r', newline='', encoding='utf-8') as f:
+                results.extend(r for r in csv.DictReader(f) if r.get('timestamp') and matches(r))
+
+        for part in reversed(self.partitions()):
+            if limit and len(results) >= limit:
+                break
+            day_start = _day_start(part['day'])
+            if day_start + 86400 <= earliest or day_start >= latest:
+                continue
+            if part['max_ts'] < earliest or part['min_ts'] >= latest:
+                continue
+            results.extend(r for r in self._read_segment(part['file']) if matches(r))
+
+        results.sort(key=lambda r: -int(float(r['timestamp'])))
+        return results[:limit] if limit else results
+
+
+def log_action(action, search_name, performed_by='system', details='', **fields):
+    """Append a single audit record to the default store."""
+    record = dict(fields, action=action, search_name=search_name,
+                  performed_by=performed_by, details=details, timestamp=int(time.time()))
+    return AuditStore().append([record])
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+budget_rollup.py - Incremental per-user / per-index budget burn-down
+
+Scheduled searches aggregate license_usage and scheduler data per hour and
+fold it into per-entity daily rollups:
+
+    lookups/budget_rollups/YYYY-MM.csv   day, entity_type, entity, gb, svc, cost
+
+One file per month, one row per (day, entity). Folding is additive, so the
+hour buckets folded per source are recorded: rows for an hour that was
+already folded are dropped, and a run's search starts at the oldest hour
+not yet folded (backfill_start, at most MAX_BACKFILL_HOURS back), so a
+skipped or failed run is caught up by the next one instead of leaving a
+gap. Index rows are also rolled up to their cost center from
+index_cost_allocation.csv.
+
+A month-to-date budget query reads the current month's file only. Burn rate
+is the average daily spend over the trailing BURN_RATE_DAYS; it gives the
+projected month-end spend and the date the budget would be exhausted.
+Entities crossing their alert threshold are reported once per month.
+
+Budgets (all converted to dollars on the same basis as the spend):
+    user         user_cost_budget.csv monthly_budget_svc x svc_unit_cost / 12,
+                 threshold alert_threshold_percent (user spend is the SVC
+                 of their scheduled searches, so a GB budget is not
+                 comparable and monthly_budget_gb is not used)
+    index        index_cost_allocation.csv budget_allocation
+    cost_center  sum of its indexes' budget_allocation
+Index and cost center thresholds use warning_threshold_percent from
+cost_governance_settings.csv.
+"""
+
+import calendar
+import csv
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+ROLLUP_DIR = os.path.join(LOOKUPS_DIR, 'budget_rollups')
+
+USER_BUDGETS = os.path.join(LOOKUPS_DIR, 'user_cost_budget.csv')
+INDEX_ALLOCATION = os.path.join(LOOKUPS_DIR, 'index_cost_allocation.csv')
+COST_SETTINGS = os.path.join(LOOKUPS_DIR, 'cost_governance_settings.csv')
+GOVERNANCE_SETTINGS = os.path.join(LOOKUPS_DIR, 'governance_settings.csv')
+
+ROLLUP_FIELDS = ['day', 'entity_type', 'entity', 'gb', 'svc', 'cost']
+ENTITY_TYPES = ('user', 'index', 'cost_center')
+
+BURN_RATE_DAYS = 7
+HOUR = 3600
+MAX_BACKFILL_HOURS = 7 * 24
+RETENTION_MONTHS = 13
+DEFAULT_COST_PER_GB = 100.0
+DEFAULT_SVC_UNIT_COST = 1600.0
+DEFAULT_THRESHOLD_PERCENT = 80.0
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _utc_day(ts):
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def _hour(ts):
+    return int(ts) // HOUR * HOUR
+
+
+def load_rates():
+    """Return (cost_per_gb, svc_unit_cost, default_threshold_percent)."""
+    settings = (_read_csv(COST_SETTINGS) or [{}])[0]
+    svc_unit_cost = DEFAULT_SVC_UNIT_COST
+    for row in _read_csv(GOVERNANCE_SETTINGS):
+        if row.get('setting_name') == 'svc_unit_cost':
+            svc_unit_cost = _to_float(row.get('setting_value'), DEFAULT_SVC_UNIT_COST)
+    return (_to_float(settings.get('cost_per_gb'), DEFAULT_COST_PER_GB),
+            svc_unit_cost,
+            _to_float(settings.get('warning_threshold_percent'), DEFAULT_THRESHOLD_PERCENT))
+
+
+class BudgetRollups(object):
+    """Monthly-partitioned daily rollups with a fold checkpoint."""
+
+    def __init__(self, root=ROLLUP_DIR):
+        self.root = root
+        self.state_path = os.path.join(root, 'state.json')
+
+    # -- state --------------------------------------------------------------
+
+    def _load_state(self):
+        """
+        Fold and alert state.
+
+        folded maps a source to the epoch before which every hour counts as
+        folded; hours maps it to the folded hour starts after that.
+        """
+        if not os.path.exists(self.state_path):
+            return {'folded': {}, 'hours': {}, 'alerted': {}}
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        state.setdefault('hours', {})
+        return state
+
+    @staticmethod
+    def _folded_hours(state, source):
+        return state['folded'].get(source, 0), set(state['hours'].get(source, []))
+
+    def backfill_start(self, source, now=None, max_hours=MAX_BACKFILL_HOURS):
+        """Start of the oldest hour not yet folded for a source, at most max_hours before the current hour."""
+        current = _hour(time.time() if now is None else now)
+        floor, hours = self._folded_hours(self._load_state(), source)
+        for hour in range(max(current - max_hours * HOUR, _hour(floor + HOUR - 1)), current, HOUR):
+            if hour not in hours:
+                return hour
+        return current
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    # -- month files --------------------------------------------------------
+
+    def _month_path(self, month):
+        return os.path.join(self.root, month + '.csv')
+
+    def read_month(self, month):
+        """Return {(day, entity_type, entity): row} for a YYYY-MM month."""
+        rollup = {}
+        for row in _read_csv(self._month_path(month)):
+            rollup[(row['day'], row['entity_type'], row['entity'])] = row
+        return rollup
+
+    def _write_month(self, month, rollup):
+        path = self._month_path(month)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=ROLLUP_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for key in sorted(rollup):
+                writer.writerow(rollup[key])
+        os.replace(tmp_path, path)
+
+    # -- fold ---------------------------------------------------------------
+
+    def fold(self, rows, source, window=None, now=None):
+        """
+        Add pre-aggregated rows into the daily rollups.
+
+        Args:
+            rows: Dicts with day (YYYY-MM-DD), hour (epoch start of the
+                hour bucket), entity_type, entity and any of gb, svc, cost.
+                Missing cost is derived from gb/svc.
+            source: Feed name ('license', 'scheduler') for the checkpoint
+            window: Optional (earliest, latest) epoch window the rows cover;
+                its complete hours are recorded as folded
+            now: Epoch seconds used to age out old hour records
+
+        Returns:
+            dict: rows_folded, rows_skipped (rows of hours already folded or
+            outside the window's complete hours), skipped (True when every
+            row was dropped) and checkpoint (the next hour to fold)
+        """
+        cost_per_gb, svc_unit_cost, _ = load_rates()
+        cost_centers = dict((r.get('index_name', ''), r.get('cost_center', ''))
+                            for r in _read_csv(INDEX_ALLOCATION) if r.get('cost_center'))
+
+        os.makedirs(self.root, exist_ok=True)
+        with FileLock(self.state_path):
+            state = self._load_state()
+            floor, hours = self._folded_hours(state, source)
+            window_hours = set()
+            if window and window[0] is not None and window[1]:
+                window_hours = set(range(_hour(int(window[0]) + HOUR - 1), _hour(window[1]), HOUR))
+
+            def foldable(hour):
+                if hour < floor or hour in hours:
+                    return False
+                return not window or hour in window_hours
+
+            by_month = {}
+            skipped = 0
+            legacy_window_folded = window_hours and any(not foldable(h) for h in window_hours)
+            for row in rows:
+                day = str(row.get('day', ''))[:10]
+                entity_type = row.get('entity_type', '')
+                entity = row.get('entity', '')
+                if not day or entity_type not in ENTITY_TYPES or not entity:
+                    continue
+                hour = _to_float(row.get('hour'), None)
+                # Rows without an hour are a whole window: fold only if none of it was folded
+                if (not foldable(_hour(hour))) if hour is not None else legacy_window_folded:
+                    skipped += 1
+                    continue
+                gb = _to_float(row.get('gb'))
+                svc = _to_float(row.get('svc'))
+                cost = _to_float(row.get('cost'), None)
+                if cost is None:
+                    cost = gb * cost_per_gb + svc * svc_unit_cost / 12.0
+                deltas = by_month.setdefault(day[:7], [])
+                deltas.append((day, entity_type, entity, gb, svc, cost))
+                if entity_type == 'index' and cost_centers.get(entity):
+                    deltas.append((day, 'cost_center', cost_centers[entity], gb, svc, cost))
+
+            folded = 0
+            for month, deltas in sorted(by_month.items()):
+                rollup = self.read_month(month)
+                for day, entity_type, entity, gb, svc, cost in deltas:
+                    key = (day, entity_type, entity)
+                    row = rollup.setdefault(key, {'day': day, 'entity_type': entity_type, 'entity': entity,
+                                                  'gb': 0, 'svc': 0, 'cost': 0})
+                    row['gb'] = round(_to_float(row['gb']) + gb, 4)
+                    row['svc'] = round(_to_float(row['svc']) + svc, 2)
+                    row['cost'] = round(_to_float(row['cost']) + cost, 2)
+                    folded += 1
+                self._write_month(month, rollup)
+
+            # Hours older than the backfill reach are never folded again: fold them into the floor
+            cutoff = _hour(time.time() if now is None else now) - (MAX_BACKFILL_HOURS + 24) * HOUR
+            hours = set(h for h in hours | window_hours if h >= cutoff)
+            state['folded'][source] = max(floor, cutoff)
+            state['hours'][source] = sorted(hours)
+            self._save_state(state)
+            self._apply_retention(now=now)
+        return {'rows_folded': folded, 'rows_skipped': skipped, 'skipped': bool(skipped) and not folded,
+                'checkpoint': self.backfill_start(source, now)}
+
+    def _apply_retention(self, months=RETENTION_MONTHS, now=None):
+        now = datetime.fromtimestamp(now or time.time(), tz=timezone.utc)
+        total = now.year * 12 + (now.month - 1) - months
+        cutoff = '%04d-%02d' % (total // 12, total % 12 + 1)
+        for filename in os.listdir(self.root):
+            if filename.endswith('.csv') and filename[:7] < cutoff:
+                os.remove(os.path.join(self.root, filename))
+
+    # -- burn-down ----------------------------------------------------------
+
+    def month_to_date(self, now=None):
+        """Return {(entity_type, entity): {'spend': ..., 'daily': {day: cost}}} for the current month."""
+        now = int(time.time()) if now is None else int(now)
+        today = _utc_day(now)
+        totals = {}
+        for (day, entity_type, entity), row in self.read_month(today[:7]).items():
+            if day > today:
+                continue
+            entry = totals.setdefault((entity_type, entity), {'spend': 0.0, 'gb': 0.0, 'daily': {}})
+            cost = _to_float(row.get('cost'))
+            entry['spend'] += cost
+            entry['gb'] += _to_float(row.get('gb'))
+            entry['daily'][day] = entry['daily'].get(day, 0.0) + cost
+        return totals
+
+    def burn_down(self, now=None, mark_alerts=True):
+        """
+        Month-to-date spend, burn rate and projected exhaustion per entity.
+
+        Args:
+            now: Epoch seconds (defaults to now)
+            mark_alerts: Record newly alerted entities so they are reported
+                once per month
+
+        Returns:
+            list: One dict per budgeted or spending entity
+        """
+        now = int(time.time()) if now is None else int(now)
+        today = datetime.fromtimestamp(now, tz=timezone.utc)
+        month = today.strftime('%Y-%m')
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        elapsed_days = today.day
+        remaining_days = days_in_month - elapsed_days
+
+        budgets = load_budgets()
+        totals = self.month_to_date(now)
+
+        os.makedirs(self.root, exist_ok=True)
+        with FileLock(self.state_path):
+            state = self._load_state()
+            alerted = state.setdefault('alerted', {})
+
+            results = []
+            for key in sorted(set(budgets) | set(totals)):
+                entity_type, entity = key
+                budget = budgets.get(key, {})
+                entry = totals.get(key, {'spend': 0.0, 'gb': 0.0, 'daily': {}})
+                spend = entry['spend']
+
+                window_start = (today - timedelta(days=min(BURN_RATE_DAYS, elapsed_days) - 1)).strftime('%Y-%m-%d')
+                recent = sum(c for d, c in entry['daily'].items() if d >= window_start)
+                burn_rate = recent / float(min(BURN_RATE_DAYS, elapsed_days))
+                projected = spend + burn_rate * remaining_days
+
+                limit = budget.get('budget', 0.0)
+                threshold = budget.get('threshold_percent', DEFAULT_THRESHOLD_PERCENT)
+                percent_used = spend / limit * 100 if limit else 0.0
+                exhaustion = ''
+                if limit and burn_rate > 0:
+                    days_left = (limit - spend) / burn_rate
+                    if days_left <= remaining_days:
+                        exhaustion = (today + timedelta(days=max(0.0, days_left))).strftime('%Y-%m-%d')
+
+                alert_key = '%s|%s|%s' % (month, entity_type, entity)
+                is_alert = bool(limit) and percent_used >= threshold
+                newly_alerted = is_alert and alert_key not in alerted
+                if newly_alerted and mark_alerts:
+                    alerted[alert_key] = now
+
+                results.append({
+                    'entity_type': entity_type,
+                    'entity': entity,
+                    'month': month,
+                    'spend_mtd': round(spend, 2),
+                    'gb_mtd': round(entry['gb'], 4),
+                    'budget': round(limit, 2),
+                    'percent_used': round(percent_used, 1),
+                    'burn_rate_per_day': round(burn_rate, 2),
+                    'projected_month_end': round(projected, 2),
+                    'projected_exhaustion_date': exhaustion,
+                    'alert_threshold_percent': threshold,
+                    'alert': 1 if is_alert else 0,
+                    'newly_alerted': 1 if newly_alerted else 0,
+                    'notify_email': budget.get('notify_email', ''),
+                })
+
+            if mark_alerts:
+                # Drop alert markers from previous months
+                state['alerted'] = dict((k, v) for k, v in alerted.items() if k.startswith(month))
+                self._save_state(state)
+        return results
+
+
+def load_budgets():
+    """Return {(entity_type, entity): {'budget', 'threshold_percent', 'notify_email'}} in dollars."""
+    _, svc_unit_cost, default_threshold = load_rates()
+    budgets = {}
+    for row in _read_csv(USER_BUDGETS):
+        if row.get('username'):
+            # User spend is scheduler SVC, so the budget is costed the same way
+            budgets[('user', row['username'])] = {
+                'budget': _to_float(row.get('monthly_budget_svc')) * svc_unit_cost / 12.0,
+                'threshold_percent': _to_float(row.get('alert_threshold_percent'), default_threshold),
+                'notify_email': row.get('manager_email', ''),
+            }
+    for row in _read_csv(INDEX_ALLOCATION):
+        if not row.get('index_name'):
+            continue
+        allocation = _to_float(row.get('budget_allocation'))
+        budgets[('index', row['index_name'])] = {
+            'budget': allocation,
+            'threshold_percent': default_threshold,
+            'notify_email': '',
+        }
+        if row.get('cost_center'):
+            center = budgets.setdefault(('cost_center', row['cost_center']),
+                                        {'budget': 0.0, 'threshold_percent': default_threshold, 'notify_email': ''})
+            center['budget'] += allocation
+    return budgets
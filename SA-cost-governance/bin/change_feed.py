@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+change_feed.py - Append-only feed of governance state changes
+
+Every flag, status change and deadline change made through the REST handlers
+is appended to a JSON-lines file with a monotonically increasing sequence
+number. Dashboards read the feed from a cursor (the last sequence they saw)
+instead of re-running searches to find out whether anything changed.
+
+Saved searches and the dashboard's JavaScript fallback rewrite
+flagged_searches.csv with outputlookup, bypassing the handlers. The feed
+remembers the (mtime_ns, size) signature of the watched lookups as of the
+last handler write; a lookup whose signature has changed since is reported
+as one 'refresh' event, so dashboards see those writes too.
+
+The file is compacted to the newest MAX_EVENTS entries once it grows past
+twice that size. A client whose cursor is older than the oldest retained
+event is told to do a full refresh.
+"""
+
+import json
+import os
+import time
+
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+FEED_PATH = os.path.join(LOOKUPS_DIR, 'governance_changes.jsonl')
+FLAGGED_LOOKUP = os.path.join(LOOKUPS_DIR, 'flagged_searches.csv')
+
+# Lookups whose out-of-band rewrites are reported as refresh events
+WATCHED_LOOKUPS = (FLAGGED_LOOKUP,)
+
+MAX_EVENTS = 5000
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _state_path(path):
+    return path + '.lookups'
+
+
+def _load_state(path):
+    """Lookup signatures as of the last write the feed knows about: basename -> [mtime_ns, size]."""
+    try:
+        with open(_state_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    tmp_path = _state_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _state_path(path))
+
+
+def _read_events(path):
+    if not os.path.exists(path):
+        return []
+    events = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def _first_seq(path):
+    """Return the sequence number of the oldest retained event (0 if empty)."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'r') as f:
+        first_line = f.readline().strip()
+    try:
+        return int(json.loads(first_line).get('seq', 0)) if first_line else 0
+    except ValueError:
+        return 0
+
+
+def _last_seq(path):
+    """Return the sequence number of the last event in the feed (0 if empty)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        # Walk back to the start of the last non-empty line
+        chunk = b''
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + chunk
+            if chunk.rstrip(b'\n').count(b'\n') >= 1:
+                break
+    last_line = chunk.rstrip(b'\n').split(b'\n')[-1]
+    try:
+        return int(json.loads(last_line.decode('utf-8')).get('seq', 0))
+    except ValueError:
+        return len(_read_events(path))
+
+
+def append_events(events, path=FEED_PATH, lookups=()):
+    """
+    Append change events to the feed, assigning sequence numbers.
+
+    Args:
+        events: List of dicts with type, search_name and old/new values
+        path: Feed file path
+        lookups: Lookup paths the caller just wrote; their new signatures
+            are recorded so sync_lookups() does not report the write again
+
+    Returns:
+        int: Sequence number of the last appended event
+    """
+    if not events and not lookups:
+        return _last_seq(path)
+
+    with FileLock(path):
+        seq = _write_events(events, path)
+        if lookups:
+            state = _load_state(path)
+            for lookup in lookups:
+                state[os.path.basename(lookup)] = _signature(lookup)
+            _save_state(path, state)
+    return seq
+
+
+def sync_lookups(lookups=WATCHED_LOOKUPS, path=FEED_PATH):
+    """
+    Append a refresh event for each watched lookup rewritten outside the handlers.
+
+    The first time a lookup is seen its signature is only recorded.
+
+    Returns:
+        int: Sequence number of the last event in the feed
+    """
+    state = _load_state(path)
+    if all(state.get(os.path.basename(lookup)) == _signature(lookup) for lookup in lookups):
+        return _last_seq(path)
+
+    with FileLock(path):
+        state = _load_state(path)
+        events = []
+        for lookup in lookups:
+            name = os.path.basename(lookup)
+            signature = _signature(lookup)
+            if state.get(name) == signature:
+                continue
+            if name in state:
+                events.append({'type': 'refresh', 'lookup': name})
+            state[name] = signature
+        seq = _write_events(events, path)
+        _save_state(path, state)
+    return seq
+
+
+def _write_events(events, path):
+    """Append events with the next sequence numbers; the caller holds the feed's lock."""
+    seq = _last_seq(path)
+    if events:
+        now = int(time.time())
+        with open(path, 'a') as f:
+            for event in events:
+                seq += 1
+                record = {'seq': seq, 'time': now}
+                record.update(event)
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+
+    # Compact once the feed is twice the retention size
+    if seq - _first_seq(path) >= 2 * MAX_EVENTS:
+        retained = _read_events(path)[-MAX_EVENTS:]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for record in retained:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+        os.replace(tmp_path, path)
+    return seq
+
+
+def diff_rows(old_row, new_row):
+    """
+    Build change events by comparing a flagged search row before and after.
+
+    Args:
+        old_row: Row before the change, or None if it was just added
+        new_row: Row after the change, or None if it was deleted
+
+    Returns:
+        list: Zero or more events of type flag, status, deadline or delete
+    """
+    row = new_row or old_row or {}
+    base = {
+        'search_name': row.get('search_name', ''),
+        'search_owner': row.get('search_owner', ''),
+        'search_app': row.get('search_app', ''),
+    }
+
+    if new_row is None:
+        event = dict(base, type='delete', old_status=old_row.get('status', ''))
+        return [event]
+
+    if old_row is None:
+        event = dict(base, type='flag', new_status=new_row.get('status', ''),
+                     new_deadline=new_row.get('remediation_deadline', ''))
+        return [event]
+
+    events = []
+    if old_row.get('status') != new_row.get('status'):
+        events.append(dict(base, type='status', old_status=old_row.get('status', ''),
+                           new_status=new_row.get('status', '')))
+    if str(old_row.get('remediation_deadline', '')) != str(new_row.get('remediation_deadline', '')):
+        events.append(dict(base, type='deadline', old_deadline=old_row.get('remediation_deadline', ''),
+                           new_deadline=new_row.get('remediation_deadline', '')))
+    return events
+
+
+def record_row_change(old_row, new_row, path=FEED_PATH, lookup_path=None):
+    """Diff a flagged search row and append any resulting events."""
+    return append_events(diff_rows(old_row, new_row), path, lookups=[lookup_path] if lookup_path else ())
+
+
+def read_since(cursor, limit=500, path=FEED_PATH):
+    """
+    Return events with seq > cursor.
+
+    Args:
+        cursor: Last sequence number the client has seen
+        limit: Maximum number of events to return
+        path: Feed file path
+
+    Returns:
+        dict: events, cursor (to send next time) and reset (True when the
+        cursor fell off the retained window and the client must reload)
+    """
+    events = _read_events(path)
+    reset = bool(events) and cursor > 0 and events[0]['seq'] > cursor + 1
+    pending = [e for e in events if e['seq'] > cursor][:limit]
+    next_cursor = pending[-1]['seq'] if pending else max(cursor, events[-1]['seq'] if events else 0)
+    return {'events': pending, 'cursor': next_cursor, 'reset': reset}
+
+
+def wait_for_changes(cursor, timeout=20, poll_interval=0.5, limit=500, path=FEED_PATH, lookups=WATCHED_LOOKUPS):
+    """
+    Long-poll the feed: block until an event newer than cursor exists.
+
+    Only the file size and the watched lookups' signatures are checked
+    while waiting, so idle clients cost a few stat calls per poll interval
+    rather than a search.
+
+    Args:
+        cursor: Last sequence number the client has seen
+        timeout: Maximum seconds to wait
+        poll_interval: Seconds between checks
+        limit: Maximum number of events to return
+        lookups: Lookups whose out-of-band rewrites count as events
+
+    Returns:
+        dict: Same shape as read_since()
+    """
+    deadline = time.time() + timeout
+    last_size = -1
+    last_lookups = None
+    while True:
+        signatures = [_signature(lookup) for lookup in lookups]
+        if signatures != last_lookups:
+            last_lookups = signatures
+            sync_lookups(lookups, path)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size != last_size:
+            last_size = size
+            if _last_seq(path) > cursor:
+                return read_since(cursor, limit=limit, path=path)
+        if time.time() >= deadline:
+            return read_since(cursor, limit=limit, path=path)
+        time.sleep(poll_interval)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+REST handler serving the governance change feed.
+
+GET /data/governance/changes?cursor=<seq>&timeout=<seconds>
+
+Long-polls until a flag/status/deadline event newer than the cursor exists
+(or the timeout expires) and returns the new events, the cursor to send on
+the next request and the next future remediation deadline from the deadline
+index. Open dashboards use this instead of periodically re-dispatching
+searches. A rewrite of flagged_searches.csv by a saved search or the
+JavaScript fallback is returned as a 'refresh' event.
+
+Runs as a persistent handler: a waiting request holds a persistent process,
+not an admin_external interpreter against splunkd's handler timeout.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import change_feed
+import deadline_index
+from persistent_handler import PersistentAdminHandler, RequestError
+
+# The dashboard's request times out after 30s; answer comfortably before it
+MAX_TIMEOUT = 25
+
+
+class ChangeFeedHandler(PersistentAdminHandler):
+    """REST handler returning governance change events since a cursor."""
+
+    def handle_request(self, method, resource_id, args, user):
+        """GET returns events newer than cursor, waiting up to timeout seconds for one."""
+        def arg(name, default):
+            return args.get(name, [default])[0] or default
+
+        try:
+            cursor = int(arg('cursor', '0'))
+            timeout = min(float(arg('timeout', '0')), MAX_TIMEOUT)
+            limit = int(arg('limit', '500'))
+        except ValueError:
+            raise RequestError('cursor, timeout and limit must be numbers')
+
+        if timeout > 0:
+            feed = change_feed.wait_for_changes(cursor, timeout=timeout, limit=limit)
+        else:
+            change_feed.sync_lookups()
+            feed = change_feed.read_since(cursor, limit=limit)
+
+        # Only a deadline still ahead is worth a timer; overdue searches are the scheduler's
+        next_entry = deadline_index.DeadlineIndex.current().next_deadline(after=int(time.time()))
+
+        summary = {
+            'status': 'success',
+            'cursor': feed['cursor'],
+            'reset': '1' if feed['reset'] else '0',
+            'event_count': len(feed['events']),
+        }
+        if next_entry:
+            summary['next_deadline'] = next_entry['remediation_deadline']
+            summary['next_deadline_search'] = next_entry['search_name']
+
+        sections = [('feed', summary)]
+        for event in feed['events']:
+            sections.append(('event_%d' % event['seq'], event))
+        return sections
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+chargeback_export.py - Streaming monthly chargeback export
+
+Writes per-index, per-cost-center, per-user and per-search cost rows into
+monthly partitions for Finance:
+
+    lookups/chargeback/month=YYYY-MM/<kind>.parquet   (pyarrow available)
+    lookups/chargeback/month=YYYY-MM/<kind>.csv.gz    (fallback)
+
+Source rows are read and written in chunks of CHUNK_ROWS (one Parquet row
+group or one batch of CSV lines per chunk), so memory stays bounded by the
+chunk size rather than the month. Each partition records a fingerprint of
+its inputs in manifest.json; a partition whose inputs have not changed is
+skipped. Partitions are written through unique temp files and the manifest
+is updated under its FileLock, so a scheduled run and a forced CLI export
+can overlap.
+
+Index, cost center and user rows come from the daily budget rollups
+(bin/budget_rollup.py). Per-search rows come from governance_search_cache.csv,
+which is a current snapshot, so they are only exported for the current month.
+"""
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import budget_rollup
+from file_lock import FileLock
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+EXPORT_DIR = os.path.join(LOOKUPS_DIR, 'chargeback')
+SEARCH_CACHE = os.path.join(LOOKUPS_DIR, 'governance_search_cache.csv')
+INDEX_ALLOCATION = os.path.join(LOOKUPS_DIR, 'index_cost_allocation.csv')
+
+MANIFEST = 'manifest.json'
+CHUNK_ROWS = 10000
+
+# Output columns per partition kind; every value is written as a string
+COLUMNS = {
+    'index': ['month', 'day', 'index', 'cost_center', 'owner', 'gb', 'cost', 'budget_allocation'],
+    'cost_center': ['month', 'day', 'cost_center', 'gb', 'cost'],
+    'user': ['month', 'day', 'user', 'svc', 'cost'],
+    'search': ['month', 'search_name', 'owner', 'app', 'runs_per_month', 'monthly_svc', 'monthly_cost'],
+}
+
+
+def _current_month(now=None):
+    return datetime.fromtimestamp(now or time.time(), tz=timezone.utc).strftime('%Y-%m')
+
+
+def _file_digest(path, digest):
+    """Feed a file's bytes into a hash in blocks (missing files hash as empty)."""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+    digest.update(b'\0')
+
+
+def _read_dicts(path):
+    """Yield rows from a CSV lookup one at a time."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+class ChargebackExporter(object):
+    """Export monthly chargeback partitions, skipping unchanged ones."""
+
+    def __init__(self, root=EXPORT_DIR, rollups=None, fmt='auto', chunk_rows=CHUNK_ROWS):
+        if fmt == 'parquet' and pyarrow is None:
+            raise ValueError('pyarrow is not available; use format=csv')
+        self.root = root
+        self.rollups = rollups or budget_rollup.BudgetRollups()
+        self.format = 'parquet' if fmt in ('auto', 'parquet') and pyarrow is not None else 'csv'
+        self.chunk_rows = chunk_rows
+        self.manifest_path = os.path.join(root, MANIFEST)
+
+    # -- manifest -----------------------------------------------------------
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'partitions': {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _record(self, key, entry):
+        """Add one partition to the manifest, re-read under the lock so concurrent exports keep theirs."""
+        with FileLock(self.manifest_path):
+            manifest = self._load_manifest()
+            manifest['partitions'][key] = entry
+            self._save_manifest(manifest)
+
+    # -- sources ------------------------------------------------------------
+
+    def months(self):
+        """Months with rollup data, oldest first."""
+        if not os.path.isdir(self.rollups.root):
+            return []
+        return sorted(f[:7] for f in os.listdir(self.rollups.root)
+                      if f.endswith('.csv') and len(f) == 11)
+
+    def _fingerprint(self, kind, month):
+        digest = hashlib.md5()
+        digest.update(('%s|%s|%s' % (kind, month, self.format)).encode('utf-8'))
+        if kind == 'search':
+            _file_digest(SEARCH_CACHE, digest)
+        else:
+            _file_digest(os.path.join(self.rollups.root, month + '.csv'), digest)
+            _file_digest(INDEX_ALLOCATION, digest)
+        return digest.hexdigest()
+
+    def _rows(self, kind, month):
+        """Yield output rows for a partition without materialising the month."""
+        if kind == 'search':
+            for row in _read_dicts(SEARCH_CACHE):
+                if str(row.get('disabled', '0')).strip() not in ('0', ''):
+                    continue
+                yield {
+                    'month': month,
+                    'search_name': row.get('title', ''),
+                    'owner': row.get('owner', ''),
+                    'app': row.get('app', ''),
+                    'runs_per_month': row.get('runs_per_month', ''),
+                    # calculate_search_costs names these monthly_svc_usage / monthly_total_cost
+                    'monthly_svc': row.get('monthly_svc') or row.get('monthly_svc_usage', ''),
+                    'monthly_cost': row.get('monthly_cost') or row.get('monthly_total_cost', ''),
+                }
+            return
+
+        allocation = {}
+        if kind == 'index':
+            allocation = dict((r.get('index_name', ''), r) for r in _read_dicts(INDEX_ALLOCATION))
+
+        for row in _read_dicts(os.path.join(self.rollups.root, month + '.csv')):
+            if row.get('entity_type') != kind:
+                continue
+            if kind == 'index':
+                meta = allocation.get(row['entity'], {})
+                yield {'month': month, 'day': row['day'], 'index': row['entity'],
+                       'cost_center': meta.get('cost_center', ''), 'owner': meta.get('owner', ''),
+                       'gb': row.get('gb', ''), 'cost': row.get('cost', ''),
+                       'budget_allocation': meta.get('budget_allocation', '')}
+            elif kind == 'cost_center':
+                yield {'month': month, 'day': row['day'], 'cost_center': row['entity'],
+                       'gb': row.get('gb', ''), 'cost': row.get('cost', '')}
+            else:
+                yield {'month': month, 'day': row['day'], 'user': row['entity'],
+                       'svc': row.get('svc', ''), 'cost': row.get('cost', '')}
+
+    def _chunks(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    # -- writers ------------------------------------------------------------
+
+    def _write_parquet(self, path, columns, rows):
+        schema = pyarrow.schema([(c, pyarrow.string()) for c in columns])
+        count = 0
+        with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+            for chunk in self._chunks(rows):
+                arrays = [pyarrow.array([str(r.get(c, '')) for r in chunk], pyarrow.string()) for c in columns]
+                writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+                count += len(chunk)
+        return count
+
+    def _write_csv_gz(self, path, columns, rows):
+        count = 0
+        with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for chunk in self._chunks(rows):
+                writer.writerows(chunk)
+                count += len(chunk)
+        return count
+
+    # -- export -------------------------------------------------------------
+
+    def export_month(self, month, force=False, now=None):
+        """
+        Export every partition kind for one month.
+
+        Args:
+            month: YYYY-MM
+            force: Rewrite partitions even if their inputs are unchanged
+            now: Epoch seconds, used to decide the current month
+
+        Returns:
+            list: One dict per partition (kind, status written/skipped, rows, path)
+        """
+        kinds = ['index', 'cost_center', 'user']
+        if month == _current_month(now):
+            kinds.append('search')
+
+        os.makedirs(self.root, exist_ok=True)
+        manifest = self._load_manifest()
+        results = []
+        for kind in kinds:
+            key = '%s/%s' % (month, kind)
+            ext = '.parquet' if self.format == 'parquet' else '.csv.gz'
+            partition_dir = os.path.join(self.root, 'month=' + month)
+            path = os.path.join(partition_dir, kind + ext)
+            fingerprint = self._fingerprint(kind, month)
+            entry = manifest['partitions'].get(key)
+
+            if not force and entry and entry.get('fingerprint') == fingerprint and os.path.exists(path):
+                results.append({'month': month, 'kind': kind, 'status': 'skipped',
+                                'rows': entry.get('rows', 0), 'path': path})
+                continue
+
+            os.makedirs(partition_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=partition_dir, prefix='.%s.' % kind, suffix='.tmp')
+            os.close(fd)
+            writer = self._write_parquet if self.format == 'parquet' else self._write_csv_gz
+            try:
+                count = writer(tmp_path, COLUMNS[kind], self._rows(kind, month))
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            self._record(key, {'fingerprint': fingerprint, 'rows': count, 'format': self.format,
+                               'file': os.path.relpath(path, self.root), 'exported': int(time.time())})
+            results.append({'month': month, 'kind': kind, 'status': 'written', 'rows': count, 'path': path})
+        return results
+
+    def export(self, months=None, force=False):
+        """Export the given months (default: every month with rollup data plus the current one)."""
+        months = months or sorted(set(self.months()) | {_current_month()})
+        results = []
+        for month in months:
+            results.extend(self.export_month(month, force=force))
+        return results
+
+
+def main():
+    """Command line entry point: chargeback_export.py [YYYY-MM|all] [--force] [--format=csv|parquet]"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    flags = [a for a in sys.argv[1:] if a.startswith('--')]
+    fmt = next((f.split('=', 1)[1] for f in flags if f.startswith('--format=')), 'auto')
+
+    exporter = ChargebackExporter(fmt=fmt)
+    months = None if not args or args[0] == 'all' else [args[0]]
+    print(json.dumps(exporter.export(months, force='--force' in flags), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+deadline_extension.py - Bulk remediation deadline extension of flagged_searches.csv rows
+
+Selects rows by search name or by an owner/app/status/deadline filter and
+moves their remediation deadlines in one pass. Used by the extend deadline
+REST handler (bin/extend_deadline_handler.py), which reads and rewrites the
+lookup around it.
+"""
+import time
+
+# Filter matches default to searches still awaiting remediation
+DEFAULT_FILTER_STATUSES = ("pending", "notified")
+
+FILTER_FIELDS = ("owner", "app", "status", "deadline_before")
+
+
+def parse_names(values):
+    """Flatten repeated and comma/newline separated search_name values."""
+    names = []
+    for value in values or []:
+        for part in str(value).replace("\n", ",").split(","):
+            part = part.strip()
+            if part and part not in names:
+                names.append(part)
+    return names
+
+
+def row_matches(row, filters):
+    """
+    Check a flagged search row against a filter.
+
+    Args:
+        row: Row from flagged_searches.csv
+        filters: Dict with optional owner, app, status (comma separated)
+            and deadline_before (epoch seconds)
+
+    Returns:
+        bool: True if the row matches every given filter
+    """
+    if filters.get("owner") and row.get("search_owner") != filters["owner"]:
+        return False
+    if filters.get("app") and row.get("search_app") != filters["app"]:
+        return False
+    statuses = [s.strip() for s in filters.get("status", "").split(",") if s.strip()] or DEFAULT_FILTER_STATUSES
+    if row.get("status") not in statuses:
+        return False
+    if filters.get("deadline_before"):
+        deadline = int(float(row.get("remediation_deadline", 0) or 0))
+        if not deadline or deadline >= int(float(filters["deadline_before"])):
+            return False
+    return True
+
+
+def extend_rows(rows, days, names=None, filters=None, now=None):
+    """
+    Apply a deadline extension to every targeted row in one pass.
+
+    Rows are modified in place. New deadlines are floored at the current
+    time, so a reduction never sets a deadline in the past.
+
+    Args:
+        rows: Rows from flagged_searches.csv
+        days: Days to add (negative to reduce)
+        names: Search names to target, or None to use filters
+        filters: Filter dict (see row_matches) used when names is empty
+        now: Current epoch seconds
+
+    Returns:
+        tuple: (results, changes) - results is one dict per targeted search
+        (search_name, status, old_deadline, new_deadline); changes is a list
+        of (old_row, new_row) pairs for the rows that were updated
+    """
+    now = int(time.time()) if now is None else now
+    extension = days * 86400
+    results = []
+    changes = []
+    found = set()
+
+    for row in rows:
+        name = row.get("search_name", "")
+        if names:
+            if name not in names or name in found:
+                continue
+        elif not row_matches(row, filters or {}):
+            continue
+        found.add(name)
+
+        old_row = dict(row)
+        current = int(float(row.get("remediation_deadline", 0) or 0))
+        new_deadline = max(now, current + extension)
+        row["remediation_deadline"] = str(new_deadline)
+        changes.append((old_row, row))
+        results.append({
+            "search_name": name,
+            "status": "updated",
+            "old_deadline": str(current),
+            "new_deadline": str(new_deadline),
+        })
+
+    for name in names or []:
+        if name not in found:
+            results.append({"search_name": name, "status": "not_found", "old_deadline": "", "new_deadline": ""})
+
+    return results, changes
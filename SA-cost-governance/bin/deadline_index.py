@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+deadline_index.py - Persistent remediation deadline index
+
+Keeps flagged searches that are still counting down (pending/notified) in a
+file sorted by remediation_deadline, so overdue and expiring-soon checks are
+binary-search range reads instead of full scans of flagged_searches.csv.
+Auto-disabled searches are kept in a second sorted list, so the overdue
+report reads the searches disabled in a window the same way.
+
+The index is maintained by the handlers that change flagged searches
+(lookup_writer, update_lookup, extend_deadline_handler, disable_scheduler),
+each under the index's FileLock. Saved searches and the JavaScript fallback
+rewrite the lookup with outputlookup and bypass the handlers, so readers
+go through current(): when flagged_searches.csv was written after the
+index, the index is rebuilt from it first.
+
+Usage:
+    python deadline_index.py rebuild
+    python deadline_index.py expired [since_epoch]
+    python deadline_index.py expiring <hours>
+    python deadline_index.py disabled [since_epoch]
+    python deadline_index.py next
+"""
+
+import bisect
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+FLAGGED_LOOKUP = os.path.join(LOOKUPS_DIR, 'flagged_searches.csv')
+INDEX_PATH = os.path.join(LOOKUPS_DIR, 'deadline_index.csv')
+
+INDEX_FIELDS = ['remediation_deadline', 'search_name', 'search_owner', 'search_app', 'status']
+
+# Only these statuses are counting down towards auto-disable
+ACTIVE_STATUSES = ('pending', 'notified')
+DISABLED_STATUS = 'disabled'
+
+# Index last loaded or written by this process, keyed by path -> ((mtime_ns, size), index)
+_warm = {}
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _to_int(value):
+    """Convert a lookup value to int, treating blanks and junk as 0."""
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class DeadlineIndex(object):
+    """
+    Sorted (deadline, search_name) index backed by a CSV file.
+
+    Entries are held in lists ordered by (deadline, search_name) - one for
+    active searches, one for disabled ones - alongside a dict keyed by
+    search_name, so lookups by name are O(1) and time range queries are
+    O(log n + k).
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._keys = []
+        self._disabled = []
+        self._entries = {}
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """Load the index from disk, returning an empty index if missing."""
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    index._insert(row)
+        return index
+
+    @classmethod
+    def rebuild(cls, lookup_path=FLAGGED_LOOKUP, path=INDEX_PATH):
+        """Build a fresh index from flagged_searches.csv and save it."""
+        with FileLock(path):
+            return cls._rebuild(lookup_path, path)
+
+    @classmethod
+    def _rebuild(cls, lookup_path, path):
+        index = cls(path)
+        if os.path.exists(lookup_path):
+            with open(lookup_path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    index.update(row)
+        index.save()
+        _warm[path] = (_signature(path), index)
+        return index
+
+    @classmethod
+    def current(cls, lookup_path=FLAGGED_LOOKUP, path=INDEX_PATH):
+        """
+        Load the index, rebuilding it first if the lookup was written after it.
+
+        Handlers update the index right after each lookup write, so a lookup
+        newer than the index means a saved search or the JavaScript fallback
+        rewrote flagged_searches.csv with outputlookup.
+        """
+        if not _is_stale(lookup_path, path):
+            return _load_warm(path)
+        with FileLock(path):
+            # Another process may have rebuilt it while this one waited
+            if _is_stale(lookup_path, path):
+                return cls._rebuild(lookup_path, path)
+        return _load_warm(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, search_name):
+        return search_name in self._entries
+
+    def _insert(self, row):
+        deadline = _to_int(row.get('remediation_deadline'))
+        name = row.get('search_name', '')
+        entry = {
+            'remediation_deadline': deadline,
+            'search_name': name,
+            'search_owner': row.get('search_owner', ''),
+            'search_app': row.get('search_app', ''),
+            'status': row.get('status', ''),
+        }
+        bisect.insort(self._keys_for(entry['status']), (deadline, name))
+        self._entries[name] = entry
+
+    def _keys_for(self, status):
+        return self._disabled if status == DISABLED_STATUS else self._keys
+
+    def remove(self, search_name):
+        """Drop a search from the index. Returns True if it was present."""
+        entry = self._entries.pop(search_name, None)
+        if entry is None:
+            return False
+        keys = self._keys_for(entry['status'])
+        key = (entry['remediation_deadline'], search_name)
+        pos = bisect.bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            del keys[pos]
+        return True
+
+    def update(self, row):
+        """
+        Apply a flagged search row to the index.
+
+        Rows with an active or disabled status and a deadline are
+        (re)inserted; anything else (resolved, review, ok, deleted) is
+        removed.
+
+        Args:
+            row: dict with at least search_name, status and remediation_deadline
+        """
+        search_name = row.get('search_name', '')
+        if not search_name:
+            return
+        self.remove(search_name)
+        status = row.get('status')
+        if (status in ACTIVE_STATUSES or status == DISABLED_STATUS) and _to_int(row.get('remediation_deadline')) > 0:
+            self._insert(row)
+
+    def get(self, search_name):
+        """Return the indexed entry for a search, or None."""
+        return self._entries.get(search_name)
+
+    def range(self, start, end, disabled=False):
+        """Return active (or disabled) entries with start <= deadline < end, ordered by deadline."""
+        keys = self._disabled if disabled else self._keys
+        lo = bisect.bisect_left(keys, (start, ''))
+        hi = bisect.bisect_left(keys, (end, ''))
+        return [self._entries[name] for _, name in keys[lo:hi]]
+
+    def expired(self, since=0, now=None):
+        """Return searches whose deadline passed in [since, now)."""
+        now = int(time.time()) if now is None else now
+        return self.range(since, now)
+
+    def expiring_within(self, hours, now=None):
+        """Return searches whose deadline falls in the next N hours."""
+        now = int(time.time()) if now is None else now
+        return self.range(now, now + int(hours * 3600))
+
+    def disabled_since(self, since=0, now=None):
+        """Return disabled searches whose deadline passed in [since, now)."""
+        now = int(time.time()) if now is None else now
+        return self.range(since, now, disabled=True)
+
+    def next_deadline(self, after=None):
+        """Return the earliest active entry (with a deadline at or after `after`), or None."""
+        pos = 0 if after is None else bisect.bisect_left(self._keys, (after, ''))
+        if pos >= len(self._keys):
+            return None
+        return self._entries[self._keys[pos][1]]
+
+    def save(self):
+        """
+        Write the index to disk atomically, in deadline order.
+
+        Each save writes its own temporary file, so concurrent writers never
+        interleave their rows before the rename.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix='.deadline_index.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=INDEX_FIELDS)
+                writer.writeheader()
+                for keys in (self._keys, self._disabled):
+                    for _, name in keys:
+                        writer.writerow(self._entries[name])
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _is_stale(lookup_path, path):
+    """True if the lookup exists and was modified after the index was written."""
+    lookup_sig = _signature(lookup_path)
+    if lookup_sig is None:
+        return False
+    index_sig = _signature(path)
+    return index_sig is None or lookup_sig[0] > index_sig[0]
+
+
+def _load_warm(path):
+    """The index this process last loaded or wrote, re-read if another process changed it."""
+    cached = _warm.get(path)
+    if cached is not None and cached[0] == _signature(path):
+        return cached[1]
+    index = DeadlineIndex.load(path)
+    _warm[path] = (_signature(path), index)
+    return index
+
+
+def sync_rows(rows, removed=(), path=INDEX_PATH):
+    """
+    Update the on-disk index after flagged_searches.csv was modified.
+
+    The load, update and save run under the index's FileLock, so handler
+    processes syncing at the same time cannot drop each other's rows.
+    Callers sync while still holding the lookup's lock, which keeps the
+    index newer than the lookup they wrote (see DeadlineIndex.current).
+
+    Args:
+        rows: Iterable of flagged search rows that were added or changed
+        removed: Iterable of search names that were deleted from the lookup
+        path: Index file path
+
+    Returns:
+        DeadlineIndex: The updated index
+    """
+    with FileLock(path):
+        # Reuse the index this process last wrote unless another process has changed it
+        index = _load_warm(path)
+        for search_name in removed:
+            index.remove(search_name)
+        for row in rows:
+            index.update(row)
+        index.save()
+        _warm[path] = (_signature(path), index)
+    return index
+
+
+def main():
+    """Command line entry point for scripted inputs and manual maintenance."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'next'
+
+    if command == 'rebuild':
+        index = DeadlineIndex.rebuild()
+        print(json.dumps({'success': True, 'indexed': len(index)}))
+        return
+
+    index = DeadlineIndex.current()
+    if command == 'expired':
+        since = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        results = index.expired(since)
+    elif command == 'disabled':
+        since = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        results = index.disabled_since(since)
+    elif command == 'expiring':
+        hours = float(sys.argv[2]) if len(sys.argv) > 2 else 24
+        results = index.expiring_within(hours)
+    elif command == 'next':
+        entry = index.next_deadline()
+        results = [entry] if entry else []
+    else:
+        print(f"Error: unknown command '{command}'", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
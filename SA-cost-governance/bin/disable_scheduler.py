@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+disable_scheduler.py - Cost-prioritised, rate-limited disable of overdue searches
+
+When a wave of remediation deadlines expires, the overdue searches are
+disabled server-side in order of the monthly cost they save, most expensive
+first:
+
+- Overdue searches come from the deadline index (bin/deadline_index.py);
+  their monthly cost from governance_search_cache.csv.
+- At most max_concurrency disable calls are in flight at once and calls
+  start no faster than max_per_minute, so a large wave does not flood the
+  search head (or the SHC captain replicating the change).
+- Progress is checkpointed to lookups/disable_queue.json. A run that is
+  stopped (search timeout, restart) leaves the remaining searches queued,
+  and the next run resumes from there. Failures are retried on later runs
+  up to MAX_ATTEMPTS times.
+- Each checkpoint marks the disabled searches in flagged_searches.csv in one
+  lookup rewrite and writes their audit records as one batch.
+- The index only nominates candidates. Planning, each disable call and the
+  checkpoint re-read the search's row in flagged_searches.csv under the
+  lookup lock and act only while it is still pending/notified with its
+  deadline passed, so a deadline extended or a search resolved after the
+  index was read is left alone.
+
+The REST call itself is supplied by the caller (see governancedisable.py),
+so this module has no splunkd dependency.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import audit_store
+import change_feed
+import deadline_index
+import lookup_cache
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+QUEUE_PATH = os.path.join(LOOKUPS_DIR, 'disable_queue.json')
+SEARCH_CACHE = os.path.join(LOOKUPS_DIR, 'governance_search_cache.csv')
+FLAGGED_LOOKUP = os.path.join(LOOKUPS_DIR, 'flagged_searches.csv')
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_PER_MINUTE = 60
+DEFAULT_TIME_BUDGET_SEC = 240  # stay inside the scheduled search's run window
+CHECKPOINT_EVERY = 10
+MAX_ATTEMPTS = 3
+
+# queued -> done | failed (retried on a later run) | abandoned (MAX_ATTEMPTS reached)
+#        | skipped (no longer overdue when its turn came)
+PENDING_STATES = ('queued', 'failed')
+
+# Lookup statuses a search can be auto-disabled from
+OVERDUE_STATUSES = ('pending', 'notified')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_overdue(row, now):
+    """True if a flagged_searches.csv row is still awaiting remediation past its deadline."""
+    deadline = _to_float(row.get('remediation_deadline'))
+    return row.get('status') in OVERDUE_STATUSES and 0 < deadline < now
+
+
+def load_costs(path=SEARCH_CACHE):
+    """Monthly cost per search title from the search cache."""
+    costs = {}
+    if os.path.exists(path):
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                costs[row.get('title', '')] = _to_float(row.get('monthly_cost') or row.get('monthly_total_cost'))
+    return costs
+
+
+class RateLimiter(object):
+    """Space call starts at least 60/max_per_minute seconds apart across threads."""
+
+    def __init__(self, max_per_minute):
+        self.interval = 60.0 / max_per_minute if max_per_minute and max_per_minute > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DisableScheduler(object):
+    """Checkpointed queue of overdue searches, disabled most expensive first."""
+
+    def __init__(self, queue_path=QUEUE_PATH, lookup_path=FLAGGED_LOOKUP, index_path=deadline_index.INDEX_PATH,
+                 costs=None, feed_path=change_feed.FEED_PATH, audit_root=audit_store.STORE_DIR):
+        self.queue_path = queue_path
+        self.lookup_path = lookup_path
+        self.index_path = index_path
+        self.costs = costs
+        self.feed_path = feed_path
+        self.audit_root = audit_root
+
+    # -- checkpoint ---------------------------------------------------------
+
+    def load_queue(self):
+        if not os.path.exists(self.queue_path):
+            return {'run_id': '', 'items': []}
+        with open(self.queue_path, 'r') as f:
+            return json.load(f)
+
+    def save_queue(self, queue):
+        queue['updated'] = int(time.time())
+        tmp_path = self.queue_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(queue, f, indent=1)
+        os.replace(tmp_path, self.queue_path)
+
+    def still_overdue(self, names, now):
+        """The names whose lookup row, read under the lookup lock, is still overdue."""
+        if not names or not os.path.exists(self.lookup_path):
+            return set()
+        with lookup_cache.locked(self.lookup_path):
+            _, rows = lookup_cache.read(self.lookup_path, lookup_cache.FLAGGED_FIELDS)
+        return set(row['search_name'] for row in rows if row.get('search_name') in names and is_overdue(row, now))
+
+    # -- planning -----------------------------------------------------------
+
+    def plan(self, queue, now):
+        """
+        Merge newly overdue searches into the queue and order it by cost.
+
+        Items finished on earlier runs are dropped; unfinished ones keep
+        their attempt counts unless they are no longer overdue (extended,
+        resolved or disabled by someone else since).
+
+        Returns:
+            dict: The updated queue
+        """
+        costs = self.costs if self.costs is not None else load_costs()
+        index = deadline_index.DeadlineIndex.current(self.lookup_path, self.index_path)
+        overdue = dict((e['search_name'], e) for e in index.expired(0, now))
+        # The index can trail a rewrite that has not been reconciled yet: confirm against the lookup
+        confirmed = self.still_overdue(set(overdue), now)
+        overdue = dict((name, entry) for name, entry in overdue.items() if name in confirmed)
+        items = dict((i['search_name'], i) for i in queue.get('items', [])
+                     if i.get('state') in PENDING_STATES and i['search_name'] in overdue)
+
+        for name, entry in overdue.items():
+            if name not in items:
+                items[name] = {
+                    'search_name': name,
+                    'owner': entry.get('search_owner', ''),
+                    'app': entry.get('search_app', ''),
+                    'remediation_deadline': entry.get('remediation_deadline', 0),
+                    'state': 'queued',
+                    'attempts': 0,
+                    'message': '',
+                }
+            items[name]['monthly_cost'] = round(costs.get(name, 0.0), 2)
+
+        ordered = sorted(items.values(), key=lambda i: (-i['monthly_cost'], i['remediation_deadline'], i['search_name']))
+        # A new run id once the previous queue has drained; a resumed run keeps its id
+        if not queue.get('run_id') or not any(i.get('state') in PENDING_STATES for i in queue.get('items', [])):
+            queue['run_id'] = str(now)
+        queue['items'] = ordered
+        return queue
+
+    # -- execution ----------------------------------------------------------
+
+    def _commit(self, finished, now):
+        """Mark disabled searches in the lookup and write their audit records."""
+        done = dict((i['search_name'], i) for i in finished if i['state'] == 'done')
+        if done and os.path.exists(self.lookup_path):
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.gmtime(now))
+            changes = []
+            with lookup_cache.locked(self.lookup_path):
+                fieldnames, rows = lookup_cache.read(self.lookup_path, lookup_cache.FLAGGED_FIELDS)
+                matched = [row for row in rows if row.get('search_name') in done]
+                for row in matched:
+                    if row.get('status') == 'disabled':
+                        continue
+                    if not is_overdue(row, now):
+                        # Extended or resolved while the disable call was in flight: leave the row as it is
+                        item = done[row['search_name']]
+                        item['message'] = (item.get('message', '') + ' Flagged row changed during the run; '
+                                           'not marked disabled.').strip()
+                        continue
+                    old_row = dict(row)
+                    row['status'] = 'disabled'
+                    if 'AUTO-DISABLED' not in (row.get('notes') or ''):
+                        row['notes'] = (row.get('notes') or '') + ' | AUTO-DISABLED: Deadline exceeded on ' + stamp
+                    changes.append((old_row, row))
+                if changes:
+                    lookup_cache.write(self.lookup_path, fieldnames, rows)
+                # Also moves rows already marked disabled by a search to the index's disabled list
+                deadline_index.sync_rows(matched, path=self.index_path)
+                if changes:
+                    events = []
+                    for old_row, new_row in changes:
+                        events.extend(change_feed.diff_rows(old_row, new_row))
+                    change_feed.append_events(events, path=self.feed_path, lookups=[self.lookup_path])
+
+        records = []
+        for item in finished:
+            if item['state'] == 'skipped':
+                continue
+            records.append({
+                'timestamp': int(now),
+                'action': 'auto-disabled' if item['state'] == 'done' else 'auto-disable-failed',
+                'search_name': item['search_name'],
+                'search_owner': item.get('owner', ''),
+                'search_app': item.get('app', ''),
+                'performed_by': 'system',
+                'new_status': 'disabled' if item['state'] == 'done' else '',
+                'details': 'Deadline exceeded; saves %.2f/month. %s' % (item.get('monthly_cost', 0.0),
+                                                                       item.get('message', '')),
+            })
+        if records:
+            audit_store.AuditStore(self.audit_root).append(records)
+
+    def run(self, disable_fn, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_per_minute=DEFAULT_MAX_PER_MINUTE,
+            time_budget=DEFAULT_TIME_BUDGET_SEC, max_items=None, dry_run=False, now=None):
+        """
+        Disable queued overdue searches, most expensive first.
+
+        Args:
+            disable_fn: Callable(item) -> (ok, message) performing the REST disable
+            max_concurrency: Maximum disable calls in flight
+            max_per_minute: Maximum disable calls started per minute (0 = unlimited)
+            time_budget: Stop starting new calls after this many seconds
+            max_items: Stop after this many calls (None = no limit)
+            dry_run: Plan and return the queue without disabling anything
+            now: Epoch seconds used to decide what is overdue
+
+        Returns:
+            dict: run_id, attempted (items tried this run, in completion
+            order) and remaining (still queued for a later run)
+        """
+        now = int(now or time.time())
+        os.makedirs(os.path.dirname(self.queue_path), exist_ok=True)
+
+        # One scheduler at a time; a concurrent run waits and then finds the queue drained
+        with FileLock(self.queue_path):
+            queue = self.plan(self.load_queue(), now)
+            self.save_queue(queue)
+            pending = [i for i in queue['items'] if i['state'] in PENDING_STATES]
+            if dry_run:
+                return {'run_id': queue['run_id'], 'attempted': [], 'remaining': pending}
+            if max_items is not None:
+                pending = pending[:max_items]
+
+            limiter = RateLimiter(max_per_minute)
+            started = time.monotonic()
+            attempted = []
+            unflushed = []
+
+            def task(item):
+                limiter.acquire()
+                if item['search_name'] not in self.still_overdue({item['search_name']}, now):
+                    return None, 'No longer overdue; not disabled'
+                try:
+                    return disable_fn(item)
+                except Exception as e:
+                    return False, str(e)
+
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+                in_flight = {}
+                position = 0
+                while position < len(pending) or in_flight:
+                    # Submit in priority order, never more than max_concurrency at once
+                    while (position < len(pending) and len(in_flight) < max_concurrency
+                           and time.monotonic() - started < time_budget):
+                        item = pending[position]
+                        position += 1
+                        in_flight[pool.submit(task, item)] = item
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = in_flight.pop(future)
+                        ok, message = future.result()
+                        item['attempts'] = item.get('attempts', 0) + 1
+                        item['message'] = message or ''
+                        item['finished'] = int(time.time())
+                        if ok is None:
+                            item['state'] = 'skipped'
+                            item['attempts'] -= 1
+                        elif ok:
+                            item['state'] = 'done'
+                        else:
+                            item['state'] = 'failed' if item['attempts'] < MAX_ATTEMPTS else 'abandoned'
+                        attempted.append(item)
+                        unflushed.append(item)
+
+                    if len(unflushed) >= CHECKPOINT_EVERY:
+                        self._commit(unflushed, now)
+                        self.save_queue(queue)
+                        unflushed = []
+
+            if unflushed:
+                self._commit(unflushed, now)
+            self.save_queue(queue)
+
+        return {
+            'run_id': queue['run_id'],
+            'attempted': attempted,
+            'remaining': [i for i in queue['items'] if i['state'] == 'queued'],
+        }
@@ -21,6 +21,9 @@ import splunk.rest as rest
 import splunk.entity as entity
 from splunk.clilib import cli_common as cli
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import audit_store
+
 
 def get_session_key():
     """Get session key from stdin (when run as alert action) or environment."""
@@ -163,6 +166,11 @@ def log_action(session_key, action, search_name, details):
     """
     Log an action to the governance audit log KV store.
     """
+    try:
+        audit_store.log_action(action, search_name, 'system', details)
+    except Exception as e:
+        print(f"Error writing audit log partition: {str(e)}", file=sys.stderr)
+
     try:
         uri = '/servicesNS/nobody/SA-cost-governance/storage/collections/data/governance_audit_log'
 
@@ -213,11 +221,12 @@ Best regards,
 Splunk Governance System
 """
 
-        # Use Splunk's sendemail command
+        # Use Splunk's sendemail command (escaped outside the f-string for Python < 3.12)
+        escaped_body = body.replace('"', '\\"').replace('\n', '\\n')
         search_query = f'''| makeresults
 | sendemail to="{owner}@company.com"
   subject="{subject}"
-  message="{body.replace('"', '\\"').replace('\n', '\\n')}"
+  message="{escaped_body}"
   sendresults=false'''
 
         uri = '/services/search/jobs'
@@ -239,6 +248,34 @@ Splunk Governance System
         return False
 
 
+def enforce(session_key, search_name, app=None, owner=None, send_email=True):
+    """
+    Disable a search, mark it disabled, audit it and notify its owner.
+
+    Args:
+        session_key: Splunk session key
+        search_name: Name of the saved search to disable
+        app: App context (optional)
+        owner: Owner context (optional); also the notification recipient
+        send_email: Send the owner a disable notification
+
+    Returns:
+        dict: Result of disable_scheduled_search
+    """
+    result = disable_scheduled_search(session_key, search_name, app, owner)
+    if result['success']:
+        # Update KV store status
+        update_kv_store_status(session_key, search_name, 'disabled')
+
+        # Log the action
+        log_action(session_key, 'disabled', search_name, 'Auto-disabled due to exceeded remediation deadline')
+
+        # Send notification if enabled
+        if send_email and owner:
+            send_disable_notification(session_key, search_name, owner, app or 'unknown')
+    return result
+
+
 def main():
     """Main entry point for the disable search script."""
 
@@ -271,21 +308,10 @@ def main():
         sys.exit(1)
 
     # Disable the search
-    result = disable_scheduled_search(session_key, search_name, app, owner)
+    result = enforce(session_key, search_name, app, owner, send_email)
 
     if result['success']:
         print(f"SUCCESS: {result['message']}")
-
-        # Update KV store status
-        update_kv_store_status(session_key, search_name, 'disabled')
-
-        # Log the action
-        log_action(session_key, 'disabled', search_name, 'Auto-disabled due to exceeded remediation deadline')
-
-        # Send notification if enabled
-        if send_email and owner:
-            send_disable_notification(session_key, search_name, owner, app or 'unknown')
-
         sys.exit(0)
     else:
         print(f"FAILED: {result['message']}", file=sys.stderr)
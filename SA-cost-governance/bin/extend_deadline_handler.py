@@ -1,86 +1,102 @@
 #!/usr/bin/env python3
 """
-REST handler for extending search deadlines using admin framework.
+REST handler for extending search deadlines.
 Directly modifies the CSV lookup file to bypass outputlookup permission issues.
+
+POST /servicesNS/nobody/SA-cost-governance/data/governance/extend_deadline/_bulk
+
+Targets are either a list of search names (search_name may be repeated, or
+search_names given as a comma/newline separated list) or a filter on
+owner, app, status and deadline_before (epoch). Every matching row is
+updated in a single read/rewrite of the lookup, one result is returned per
+search and one batched audit record is written for the whole request.
+
+Runs as a persistent handler, so the parsed lookup stays cached between
+requests (bin/lookup_cache.py). Row targeting and the extension itself are
+in bin/deadline_extension.py.
 """
 import sys
 import os
 import csv
-import time
-
-# Add Splunk Python libs
-sys.path.insert(0, os.path.join(os.environ.get("SPLUNK_HOME", "/opt/splunk"), "lib", "python3.9", "site-packages"))
 
-import splunk.admin as admin
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import audit_store
+import change_feed
+import deadline_index
+import lookup_cache
+from deadline_extension import FILTER_FIELDS, extend_rows, parse_names
+from persistent_handler import PersistentAdminHandler, RequestError
 
+LOOKUP_PATH = lookup_cache.lookup_path("flagged_searches.csv")
 
-class ExtendDeadlineHandler(admin.MConfigHandler):
-    """Admin REST handler for extending/reducing search remediation deadlines."""
+class ExtendDeadlineHandler(PersistentAdminHandler):
+    """Persistent REST handler for extending/reducing search remediation deadlines."""
 
-    def setup(self):
-        """Setup supported arguments."""
-        if self.requestedAction == admin.ACTION_EDIT:
-            self.supportedArgs.addReqArg("search_name")
-            self.supportedArgs.addReqArg("days")
+    def handle_request(self, method, resource_id, args, user):
+        """GET returns status; POST extends/reduces deadlines for a list or filter."""
+        if method != "POST":
+            return [("info", {"status": "ready", "message": "Extend deadline endpoint is available"})]
 
-    def handleEdit(self, confInfo):
-        """Handle POST/edit request - extend/reduce deadline."""
+        if not args.get("days"):
+            raise RequestError("days is required")
         try:
-            search_name = self.callerArgs.data["search_name"][0]
-            days = int(self.callerArgs.data["days"][0])
-
-            lookup_path = "/opt/splunk/etc/apps/SA-cost-governance/lookups/flagged_searches.csv"
-
-            if not os.path.exists(lookup_path):
-                confInfo["result"].append("status", "error")
-                confInfo["result"].append("message", "Lookup file not found")
-                return
-
-            # Read current data
-            with open(lookup_path, "r") as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-                fieldnames = reader.fieldnames
-
-            # Find and update the target row
-            now = int(time.time())
-            updated = False
-            new_deadline = 0
-
-            for row in rows:
-                if row["search_name"] == search_name:
-                    current = int(row.get("remediation_deadline", 0) or 0)
-                    extension = days * 86400
-                    # Use max(now, current + extension) to floor at current time
-                    new_deadline = max(now, current + extension)
-                    row["remediation_deadline"] = str(new_deadline)
-                    updated = True
-                    break
-
-            if not updated:
-                confInfo["result"].append("status", "error")
-                confInfo["result"].append("message", "Search not found: " + search_name)
-                return
-
-            # Write back
-            with open(lookup_path, "w") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-                writer.writeheader()
-                writer.writerows(rows)
-
-            confInfo["result"].append("status", "success")
-            confInfo["result"].append("new_deadline", str(new_deadline))
-            confInfo["result"].append("search_name", search_name)
-            confInfo["result"].append("days_extended", str(days))
-
-        except Exception as e:
-            confInfo["result"].append("status", "error")
-            confInfo["result"].append("message", str(e))
-
-    def handleList(self, confInfo):
-        """Handle GET/list request - return status."""
-        confInfo["info"].append("status", "ready")
-        confInfo["info"].append("message", "Extend deadline endpoint is available")
-
-
-admin.init(ExtendDeadlineHandler, admin.CONTEXT_NONE)
+            days = int(args["days"][0])
+        except ValueError:
+            raise RequestError("days must be a whole number of days")
+        names = parse_names(args.get("search_name", []) + args.get("search_names", []))
+        if not names and resource_id and resource_id != "_bulk":
+            names = [resource_id]
+        filters = dict((f, args[f][0]) for f in FILTER_FIELDS if args.get(f) and args[f][0])
+        if "deadline_before" in filters:
+            try:
+                float(filters["deadline_before"])
+            except ValueError:
+                raise RequestError("deadline_before must be epoch seconds")
+
+        if not names and not filters:
+            return [("result", {"status": "error", "message": "Provide search_name(s) or at least one filter"})]
+
+        if not os.path.exists(LOOKUP_PATH):
+            return [("result", {"status": "error", "message": "Lookup file not found"})]
+
+        with lookup_cache.locked(LOOKUP_PATH):
+            fieldnames, rows = lookup_cache.read(LOOKUP_PATH)
+            results, changes = extend_rows(rows, days, names=names, filters=filters)
+            if changes:
+                # Write back once for the whole batch
+                lookup_cache.write(LOOKUP_PATH, fieldnames, rows, quoting=csv.QUOTE_ALL)
+                # Sync the index and feed before releasing the lookup, so neither lags a later writer
+                deadline_index.sync_rows([new for _, new in changes])
+                events = []
+                for old_row, new_row in changes:
+                    events.extend(change_feed.diff_rows(old_row, new_row))
+                change_feed.append_events(events, lookups=[LOOKUP_PATH])
+
+        if changes:
+            updated = [r["search_name"] for r in results if r["status"] == "updated"]
+            verb = "reduced" if days < 0 else "extended"
+            audit_store.log_action(
+                verb,
+                updated[0] if len(updated) == 1 else "%d searches" % len(updated),
+                args.get("performed_by", [""])[0] or user or "system",
+                "Deadline %s by %d days for %d search(es): %s" % (verb, abs(days), len(updated), ", ".join(updated)),
+                extension_days=str(days),
+                reason=args.get("reason", [""])[0] or "",
+                notes=" ".join("%s=%s" % (k, v) for k, v in sorted(filters.items())) if not names else "",
+            )
+
+        updated_count = len(changes)
+        result = {"status": "success" if updated_count else "error"}
+        if not updated_count:
+            result["message"] = "No matching searches found"
+        result["days_extended"] = str(days)
+        result["matched"] = str(updated_count)
+        result["not_found"] = str(len(results) - updated_count)
+        if len(results) == 1:
+            result["search_name"] = results[0]["search_name"]
+            result["new_deadline"] = results[0]["new_deadline"]
+
+        sections = [("result", result)]
+        for i, item in enumerate(results):
+            sections.append(("search_%d" % i, item))
+        return sections
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+file_lock.py - Cross-process lock for state files under lookups/
+
+Handlers run as separate processes, so writers of shared state files take an
+exclusive flock on a ".lock" sidecar for the duration of the update.
+"""
+
+try:
+    import fcntl
+except ImportError:  # Windows search heads - fall back to unlocked writes
+    fcntl = None
+
+
+class FileLock(object):
+    """Exclusive lock on a sidecar file for the duration of a with-block."""
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+governance_summary.py - Precomputed governance dashboard summary
+
+Builds the metric tile counts (total, suspicious, flagged, pending, notified,
+review, expiring, overdue, disabled, ok) and the metric popup lists from the
+governance lookups in one pass, so the dashboards do not need a search per
+tile.
+
+Each source lookup is parsed once and cached against its (mtime, size)
+signature; only a lookup that changed on disk is re-read. Counts that depend
+on the current time (expiring, overdue, disabled this period) are answered
+from lists pre-sorted by deadline / flagged time with a binary search.
+"""
+
+import bisect
+import csv
+import hashlib
+import json
+import os
+import time
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+
+SEARCH_CACHE = 'governance_search_cache.csv'
+FLAGGED_LOOKUP = 'flagged_searches.csv'
+OK_LOOKUP = 'ok_searches.csv'
+
+ACTIVE_STATUSES = ('pending', 'notified')
+
+# Windows used by the dashboard tiles
+EXPIRING_DAYS = 3
+DISABLED_PERIOD_DAYS = 7
+
+DEFAULT_TOP_N = 50
+
+# Parsed sources keyed by lookup path: {'signature': ..., 'data': ...}
+_sources = {}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _parse_search_cache(rows):
+    enabled = [r for r in rows if str(r.get('disabled', '')).strip() in ('0', '')]
+    for r in enabled:
+        r['_monthly_cost'] = _to_float(r.get('monthly_cost'))
+    enabled.sort(key=lambda r: -r['_monthly_cost'])
+    return {
+        'enabled': enabled,
+        'suspicious': [r for r in enabled if str(r.get('is_suspicious', '')).strip() == '1'],
+    }
+
+
+def _parse_flagged(rows):
+    # Keep the first row per search, as the tiles' dedup search_name does
+    seen = {}
+    for r in rows:
+        name = r.get('search_name', '')
+        if name and name not in seen:
+            seen[name] = r
+
+    by_status = {}
+    for r in seen.values():
+        by_status.setdefault(r.get('status', ''), []).append(r)
+
+    active = [r for status in ACTIVE_STATUSES for r in by_status.get(status, [])]
+    active.sort(key=lambda r: _to_float(r.get('remediation_deadline')))
+    disabled = sorted(by_status.get('disabled', []), key=lambda r: _to_float(r.get('flagged_time')))
+
+    return {
+        'by_name': seen,
+        'by_status': by_status,
+        'active': active,
+        'active_deadlines': [_to_float(r.get('remediation_deadline')) for r in active],
+        'disabled': disabled,
+        'disabled_times': [_to_float(r.get('flagged_time')) for r in disabled],
+    }
+
+
+def _parse_ok(rows):
+    return {'names': set(r.get('search_name', '') for r in rows)}
+
+
+_PARSERS = {
+    SEARCH_CACHE: _parse_search_cache,
+    FLAGGED_LOOKUP: _parse_flagged,
+    OK_LOOKUP: _parse_ok,
+}
+
+
+def _load(name, lookups_dir):
+    """Return parsed data for a lookup, re-reading it only if it changed."""
+    path = os.path.join(lookups_dir, name)
+    signature = _signature(path)
+    cached = _sources.get(path)
+    if cached is None or cached['signature'] != signature:
+        cached = {'signature': signature, 'data': _PARSERS[name](_read_csv(path))}
+        _sources[path] = cached
+    return cached['data']
+
+
+def _row(r, *fields):
+    return [r.get(f, '') for f in fields]
+
+
+def build_summary(now=None, top_n=DEFAULT_TOP_N, lookups_dir=LOOKUPS_DIR):
+    """
+    Build the dashboard summary document.
+
+    List rows use the same column order as the metric popup searches in
+    governance.js, so the popup can render either source unchanged.
+
+    Args:
+        now: Epoch seconds to evaluate deadlines against (defaults to now)
+        top_n: Maximum rows per list
+        lookups_dir: Directory containing the lookups
+
+    Returns:
+        dict: {'generated': ..., 'counts': {...}, 'lists': {...}}
+    """
+    now = int(time.time()) if now is None else int(now)
+    cache = _load(SEARCH_CACHE, lookups_dir)
+    flagged = _load(FLAGGED_LOOKUP, lookups_dir)
+    ok = _load(OK_LOOKUP, lookups_dir)
+
+    by_status = flagged['by_status']
+
+    suspicious = [r for r in cache['suspicious']
+                  if not flagged['by_name'].get(r.get('title', ''), {}).get('status')
+                  and r.get('title', '') not in ok['names']]
+
+    # Expiring: round((deadline - now) / 86400, 1) between 0 and 3, as on the tile
+    lo = bisect.bisect_left(flagged['active_deadlines'], now - 4320)
+    hi = bisect.bisect_right(flagged['active_deadlines'], now + EXPIRING_DAYS * 86400 + 4320)
+    expiring = []
+    for r in flagged['active'][lo:hi]:
+        days_remaining = round((_to_float(r.get('remediation_deadline')) - now) / 86400.0, 1)
+        if 0 <= days_remaining <= EXPIRING_DAYS:
+            expiring.append((r, days_remaining))
+
+    overdue_end = bisect.bisect_left(flagged['active_deadlines'], now)
+    overdue_start = bisect.bisect_right(flagged['active_deadlines'], 0)
+    overdue = flagged['active'][overdue_start:overdue_end]
+
+    period_start = bisect.bisect_left(flagged['disabled_times'], now - DISABLED_PERIOD_DAYS * 86400)
+    disabled_recent = flagged['disabled'][period_start:]
+
+    counts = {
+        'total': len(cache['enabled']),
+        'suspicious': len(suspicious),
+        'flagged': len(flagged['active']),
+        'pending': len(by_status.get('pending', [])),
+        'notified': len(by_status.get('notified', [])),
+        'pending_review': len(by_status.get('review', [])),
+        'expiring': len(expiring),
+        'overdue': len(overdue),
+        'disabled': len(disabled_recent),
+        'ok': len(ok['names'] - {''}),
+    }
+
+    lists = {
+        'total': [_row(r, 'title', 'owner', 'app') +
+                  [flagged['by_name'].get(r.get('title', ''), {}).get('status') or 'active', r.get('frequency_label', '')]
+                  for r in cache['enabled'][:top_n]],
+        'suspicious': [_row(r, 'title', 'owner', 'app') + ['suspicious', r.get('suspicious_reason', '')]
+                       for r in suspicious[:top_n]],
+        'flagged': [_row(r, 'search_name', 'search_owner', 'search_app', 'status', 'reason', 'status', 'remediation_deadline') +
+                    [str(round((_to_float(r.get('remediation_deadline')) - now) / 86400.0, 2))]
+                    for r in flagged['active'][:top_n]],
+        'pending_review': [_row(r, 'search_name', 'search_owner', 'search_app') + ['review', r.get('reason', '')]
+                           for r in by_status.get('review', [])[:top_n]],
+        'expiring': [_row(r, 'search_name', 'search_owner', 'search_app') + ['expiring', str(days), r.get('reason', '')]
+                     for r, days in expiring[:top_n]],
+        'overdue': [_row(r, 'search_name', 'search_owner', 'search_app', 'status', 'remediation_deadline')
+                    for r in overdue[:top_n]],
+        'disabled': [_row(r, 'search_name', 'search_owner', 'search_app') + ['disabled', r.get('reason', '')]
+                     for r in reversed(disabled_recent[-top_n:])],
+    }
+
+    return {'generated': now, 'counts': counts, 'lists': lists}
+
+
+def render(summary):
+    """
+    Serialise a summary and compute its ETag.
+
+    The generation time is left out of the hash so repeated requests against
+    unchanged lookups produce the same ETag.
+
+    Returns:
+        tuple: (json_body, etag)
+    """
+    stable = dict(summary)
+    stable.pop('generated', None)
+    digest = hashlib.md5(json.dumps(stable, sort_keys=True).encode('utf-8')).hexdigest()
+    return json.dumps(summary, sort_keys=True), '"%s"' % digest
+
+
+def respond(if_none_match=None, top_n=DEFAULT_TOP_N, now=None, lookups_dir=LOOKUPS_DIR):
+    """
+    Build the summary response, or 304 when the client's ETag still matches.
+
+    Args:
+        if_none_match: The request's If-None-Match header, if any
+
+    Returns:
+        dict: status, headers and payload for the persistent handler
+    """
+    body, etag = render(build_summary(now=now, top_n=top_n, lookups_dir=lookups_dir))
+    if if_none_match == etag:
+        return {'status': 304, 'headers': {'ETag': etag}, 'payload': ''}
+    return {
+        'status': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Cache-Control': 'no-cache',
+            'ETag': etag,
+        },
+        'payload': body,
+    }
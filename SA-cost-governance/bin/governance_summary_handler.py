@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Persistent REST handler for the governance dashboard summary.
+
+GET /governance/summary[?top=N]
+
+Returns all metric tile counts and popup lists as one JSON document. The
+handler runs as a persistent process, so parsed lookups stay cached between
+requests; responses carry an ETag and a matching If-None-Match returns 304.
+"""
+import json
+import os
+import sys
+
+# Add Splunk Python libs
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+from splunk.persistconn.application import PersistentServerConnectionApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import governance_summary
+
+
+class GovernanceSummaryHandler(PersistentServerConnectionApplication):
+    """Serve the precomputed governance summary with ETag revalidation."""
+
+    def __init__(self, command_line, command_arg):
+        PersistentServerConnectionApplication.__init__(self)
+
+    def handle(self, in_string):
+        """Handle a request from splunkd."""
+        try:
+            request = json.loads(in_string)
+            headers = dict((k.lower(), v) for k, v in request.get('headers', []))
+            query = dict(request.get('query', []))
+            top_n = int(query.get('top', governance_summary.DEFAULT_TOP_N))
+
+            return governance_summary.respond(headers.get('if-none-match'), top_n=top_n)
+
+        except Exception as e:
+            return {
+                'status': 500,
+                'headers': {'Content-Type': 'application/json'},
+                'payload': json.dumps({'status': 'error', 'message': str(e)}),
+            }
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+governanceaudit - Generating search command over the partitioned audit log
+
+Usage:
+    | governanceaudit [earliest=<epoch>] [latest=<epoch>] [action=<action>]
+                      [performed_by=<user>] [search_name=<name>] [limit=<n>]
+    | governanceaudit mode=maintain [retention_days=365]
+
+Query mode reads only the day partitions overlapping the search time range
+(or the earliest/latest options). Maintain mode folds rows appended to the
+legacy governance_audit_log.csv into partitions, compresses closed days and
+deletes partitions older than the retention window.
+"""
+
+import csv
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import audit_store
+
+
+def get_search_time_range(settings):
+    """Read the dispatch time range from the search info file, if provided."""
+    info_path = settings.get('infoPath')
+    if not info_path or not os.path.exists(info_path):
+        return 0, None
+    with open(info_path, 'r', newline='') as f:
+        info = next(csv.DictReader(f), {})
+
+    def to_epoch(value):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    return to_epoch(info.get('_search_et')) or 0, to_epoch(info.get('_search_lt'))
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        store = audit_store.AuditStore()
+        mode = options.get('mode', 'query')
+
+        if mode == 'maintain':
+            retention_days = int(options.get('retention_days', audit_store.DEFAULT_RETENTION_DAYS))
+            migrated = store.migrate_legacy()
+            compressed = store.compress_closed()
+            removed = store.apply_retention(retention_days)
+            si.outputResults([{
+                '_time': int(time.time()),
+                'migrated_rows': migrated,
+                'compressed_partitions': len(compressed),
+                'removed_partitions': len(removed),
+                'removed_days': ','.join(removed),
+                'partitions': len(store.partitions()),
+            }])
+            return
+
+        earliest, latest = get_search_time_range(settings)
+        if 'earliest' in options:
+            earliest = int(float(options['earliest']))
+        if 'latest' in options:
+            latest = int(float(options['latest']))
+        limit = int(options['limit']) if 'limit' in options else None
+
+        filters = dict((k, options[k]) for k in ('action', 'performed_by', 'search_name') if k in options)
+        rows = store.query(earliest, latest, filters=filters, limit=limit)
+        for row in rows:
+            row['_time'] = row['timestamp']
+        si.outputResults(rows)
+
+    except Exception as e:
+        si.generateErrorResults('governanceaudit: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+governancebudget - Month-to-date budget burn-down from the daily rollups
+
+Usage:
+    | governancebudget [entity_type=<user|index|cost_center>] [mark_alerts=<bool>]
+    | governancebudget mode=backfill source=<license|scheduler>
+
+Reads the current month's rollup file (bin/budget_rollup.py) and returns,
+per entity, month-to-date spend, budget, burn rate, projected month-end
+spend, projected exhaustion date and alert flags. newly_alerted is set the
+first time an entity crosses its alert threshold in a month.
+
+backfill mode returns a single search=earliest=<epoch> row for the oldest
+hour of the source not yet folded, for use as a subsearch in the fold
+searches so a missed run is caught up by the next one.
+"""
+
+import os
+import sys
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import budget_rollup
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        if options.get('mode') == 'backfill':
+            if not options.get('source'):
+                si.generateErrorResults('governancebudget: source is required for mode=backfill')
+                return
+            earliest = budget_rollup.BudgetRollups().backfill_start(options['source'])
+            si.outputResults([{'search': 'earliest=%d' % earliest}])
+            return
+
+        mark_alerts = options.get('mark_alerts', 'true').lower() in ('1', 'true', 't')
+
+        rows = budget_rollup.BudgetRollups().burn_down(mark_alerts=mark_alerts)
+        if options.get('entity_type'):
+            rows = [r for r in rows if r['entity_type'] == options['entity_type']]
+        si.outputResults(rows)
+
+    except Exception as e:
+        si.generateErrorResults('governancebudget: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
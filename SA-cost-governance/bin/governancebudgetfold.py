@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+governancebudgetfold - Fold new usage into the daily budget rollups
+
+Usage:
+    ... [| governancebudget mode=backfill source=<source>]
+        | stats ... by day, hour, entity_type, entity
+        | governancebudgetfold source=<source> [earliest=<epoch>]
+
+Adds the pre-aggregated input rows (day, hour, entity_type, entity and gb,
+svc or cost) to the daily rollups (bin/budget_rollup.py). The complete hours
+of the search time range are recorded per source and rows of hours already
+folded are dropped, so overlapping or re-run windows are not counted twice.
+Searches started at the backfill subsearch's earliest pass the same
+earliest here, since the dispatch range no longer describes the rows.
+"""
+
+import csv
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import budget_rollup
+
+
+def get_search_time_range(settings, earliest=None):
+    """Read the dispatch time range from the search info file, if provided."""
+    info_path = settings.get('infoPath')
+    if not info_path or not os.path.exists(info_path):
+        return None
+    with open(info_path, 'r', newline='') as f:
+        info = next(csv.DictReader(f), {})
+    try:
+        return int(float(earliest or info['_search_et'])), int(float(info['_search_lt']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        source = options.get('source')
+        if not source:
+            si.generateErrorResults('governancebudgetfold: source is required')
+            return
+
+        window = get_search_time_range(settings, options.get('earliest'))
+        summary = budget_rollup.BudgetRollups().fold(results, source, window=window)
+        si.outputResults([{
+            '_time': int(time.time()),
+            'source': source,
+            'rows_folded': summary['rows_folded'],
+            'rows_skipped': summary['rows_skipped'],
+            'skipped': 1 if summary['skipped'] else 0,
+            'checkpoint': summary['checkpoint'],
+        }])
+
+    except Exception as e:
+        si.generateErrorResults('governancebudgetfold: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+governancechargeback - Export monthly chargeback partitions
+
+Usage:
+    | governancechargeback [month=<YYYY-MM|all>] [format=<auto|parquet|csv>] [force=<bool>]
+
+Streams per-index, per-cost-center, per-user and per-search cost rows into
+monthly partitions under lookups/chargeback/ (bin/chargeback_export.py) and
+returns one row per partition with its status (written or skipped when its
+inputs are unchanged), row count and path.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import chargeback_export
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        month = options.get('month', 'all')
+        force = options.get('force', 'false').lower() in ('1', 'true', 't')
+
+        exporter = chargeback_export.ChargebackExporter(fmt=options.get('format', 'auto'))
+        results = exporter.export(None if month == 'all' else [month], force=force)
+
+        now = int(time.time())
+        for row in results:
+            row['_time'] = now
+            row['format'] = exporter.format
+        si.outputResults(results)
+
+    except Exception as e:
+        si.generateErrorResults('governancechargeback: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
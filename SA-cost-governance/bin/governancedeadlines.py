@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+governancedeadlines - Generating search command over the deadline index
+
+Usage:
+    | governancedeadlines [mode=expired] [hours=<n>]
+    | governancedeadlines mode=expiring [hours=24]
+    | governancedeadlines mode=disabled [hours=<n>]
+    | governancedeadlines mode=next
+    | governancedeadlines mode=rebuild
+
+Reads bin/deadline_index.py instead of scanning flagged_searches.csv.
+expired returns active searches whose deadline has passed (in the last
+hours, if given), expiring those whose deadline falls in the next hours and
+disabled the disabled searches whose deadline passed in the last hours. The
+index is rebuilt first if a saved search rewrote the lookup since it was
+last synced; rebuild mode forces that.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import deadline_index
+
+MODES = ('expired', 'expiring', 'disabled', 'next', 'rebuild')
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        mode = options.get('mode', 'expired')
+        if mode not in MODES:
+            si.generateErrorResults('governancedeadlines: mode must be one of %s' % ', '.join(MODES))
+            return
+
+        now = int(time.time())
+        if mode == 'rebuild':
+            index = deadline_index.DeadlineIndex.rebuild()
+            si.outputResults([{'_time': now, 'indexed': len(index)}])
+            return
+
+        index = deadline_index.DeadlineIndex.current()
+        hours = float(options['hours']) if 'hours' in options else None
+        since = now - int(hours * 3600) if hours is not None else 0
+        if mode == 'expired':
+            entries = index.expired(since, now)
+        elif mode == 'disabled':
+            entries = index.disabled_since(since, now)
+        elif mode == 'expiring':
+            entries = index.expiring_within(24 if hours is None else hours, now)
+        else:
+            entry = index.next_deadline()
+            entries = [entry] if entry else []
+
+        output = []
+        for entry in entries:
+            row = dict(entry)
+            row['_time'] = entry['remediation_deadline']
+            output.append(row)
+        si.outputResults(output)
+
+    except Exception as e:
+        si.generateErrorResults('governancedeadlines: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
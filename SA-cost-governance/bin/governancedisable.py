@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+governancedisable - Disable overdue searches, most expensive first
+
+Usage:
+    | governancedisable [max_concurrency=4] [max_per_minute=60] [time_budget=240]
+                        [max_items=<n>] [notify=true] [dry_run=false]
+
+Runs the checkpointed disable queue (bin/disable_scheduler.py): overdue
+searches are disabled through the saved/searches REST endpoint in order of
+monthly cost saved, with at most max_concurrency calls in flight. Searches
+not reached within time_budget stay queued for the next run. Returns one row
+per search attempted this run, followed by the searches still queued.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import disable_scheduler
+import disable_search
+
+OUTPUT_FIELDS = ('search_name', 'owner', 'app', 'monthly_cost', 'state', 'attempts', 'message')
+
+
+def _known(value):
+    return value if value and value != 'unknown' else None
+
+
+def make_disable_fn(session_key, notify):
+    """Disable one queued search via REST, optionally emailing its owner."""
+    def disable(item):
+        owner, app = _known(item.get('owner')), _known(item.get('app'))
+        result = disable_search.disable_scheduled_search(session_key, item['search_name'], app, owner)
+        if result['success'] and notify and owner:
+            disable_search.send_disable_notification(session_key, item['search_name'], owner, app or 'unknown')
+        return result['success'], result['message']
+    return disable
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        session_key = settings.get('sessionKey')
+        if not session_key:
+            si.generateErrorResults('governancedisable: no session key (passauth must be enabled)')
+            return
+
+        max_items = options.get('max_items')
+        summary = disable_scheduler.DisableScheduler().run(
+            make_disable_fn(session_key, options.get('notify', 'true').lower() in ('true', '1', 'yes')),
+            max_concurrency=int(options.get('max_concurrency', disable_scheduler.DEFAULT_MAX_CONCURRENCY)),
+            max_per_minute=float(options.get('max_per_minute', disable_scheduler.DEFAULT_MAX_PER_MINUTE)),
+            time_budget=float(options.get('time_budget', disable_scheduler.DEFAULT_TIME_BUDGET_SEC)),
+            max_items=int(max_items) if max_items else None,
+            dry_run=options.get('dry_run', 'false').lower() in ('true', '1', 'yes'),
+        )
+
+        now = int(time.time())
+        attempted = sorted(summary['attempted'], key=lambda i: -i.get('monthly_cost', 0.0))
+        output = []
+        for rank, item in enumerate(attempted + summary['remaining'], 1):
+            row = dict((f, item.get(f, '')) for f in OUTPUT_FIELDS)
+            row.update({'_time': now, 'run_id': summary['run_id'], 'rank': rank})
+            output.append(row)
+        si.outputResults(output)
+
+    except Exception as e:
+        si.generateErrorResults('governancedisable: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+governancedupes - Cluster near-duplicate scheduled searches
+
+Usage:
+    | rest /servicesNS/-/-/saved/searches splunk_server=local | search is_scheduled=1
+    | rename eai:acl.owner as owner, eai:acl.app as app
+    | governancedupes [threshold=0.8]
+
+Normalises and MinHash/LSH-clusters the input searches' qualifiedSearch
+(bin/spl_dedup.py) and returns one row per cluster of two or more
+near-duplicates with the members, apps, owners, combined monthly cost and
+the savings from consolidating them into one search. Costs come from
+monthly_cost / monthly_total_cost on the input rows, or from
+governance_search_cache.csv.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import spl_dedup
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        threshold = float(options.get('threshold', spl_dedup.DEFAULT_THRESHOLD))
+        if not 0 < threshold <= 1:
+            si.generateErrorResults('governancedupes: threshold must be between 0 and 1')
+            return
+
+        now = int(time.time())
+        clusters = spl_dedup.find_clusters(results, threshold=threshold)
+        for cluster in clusters:
+            cluster['_time'] = now
+        si.outputResults(clusters)
+
+    except Exception as e:
+        si.generateErrorResults('governancedupes: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+governanceledger - Drop notifications already sent today
+
+Usage:
+    ... | governanceledger type=<initial|reminder|...> [owner_field=search_owner] [mode=check|claim|mark]
+
+For each input row, checks the (search_name, owner, type, UTC day) key in
+the notification ledger (bin/notification_ledger.py). Rows whose key is
+already present are dropped. check mode (the default) only filters: the
+key is claimed by the sender once the notification was delivered
+(governancenotify / send_notification.py), so a failed send is retried by
+the next run. claim mode also claims the remaining rows' keys, for
+callers that record a delivery made elsewhere. mark mode keeps every row
+and sets ledger_sent=1 on rows whose notification was sent today, so a
+status update only moves searches whose owner was actually mailed.
+"""
+
+import os
+import sys
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import notification_ledger
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        notification_type = options.get('type')
+        if not notification_type:
+            si.generateErrorResults('governanceledger: type is required')
+            return
+        owner_field = options.get('owner_field', 'search_owner')
+        mode = options.get('mode', 'check')
+
+        ledger = notification_ledger.NotificationLedger()
+        output = []
+        for row in results:
+            search_name, owner = row.get('search_name', ''), row.get(owner_field, '')
+            if mode == 'mark':
+                row['ledger_sent'] = 1 if ledger.sent(search_name, owner, notification_type) else 0
+                keep = True
+            elif mode == 'check':
+                keep = not ledger.sent(search_name, owner, notification_type)
+            else:
+                keep = ledger.claim(search_name, owner, notification_type)
+            if keep:
+                output.append(row)
+        si.outputResults(output)
+
+    except Exception as e:
+        si.generateErrorResults('governanceledger: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
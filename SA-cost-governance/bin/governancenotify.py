@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+governancenotify - Email search owners and record each delivery in the ledger
+
+Usage:
+    ... | governanceledger type=<initial|reminder> mode=check
+        | governancenotify type=<initial|reminder> [owner_field=search_owner] [days=7]
+
+Sends one notification per input row through send_notification.notify().
+The row's (search, owner, type, UTC day) key is claimed in the notification
+ledger only once the mail was sent, so a failed send is retried by the next
+run, and a row another run already sent today is skipped. Adds
+notification_result (sent, skipped or failed) and notification_message to
+each row.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import send_notification
+
+
+def _deadline(value):
+    """Format an epoch remediation_deadline for the email; pass anything else through."""
+    try:
+        return time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(int(float(value))))
+    except (TypeError, ValueError):
+        return value or 'unknown'
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        notification_type = options.get('type')
+        if not notification_type:
+            si.generateErrorResults('governancenotify: type is required')
+            return
+        session_key = settings.get('sessionKey')
+        if not session_key:
+            si.generateErrorResults('governancenotify: no session key (passauth must be enabled)')
+            return
+        owner_field = options.get('owner_field', 'search_owner')
+        days = int(options.get('days', 7))
+
+        for row in results:
+            search_name, owner = row.get('search_name', ''), row.get(owner_field, '')
+            if not search_name or not owner:
+                row['notification_result'] = 'failed'
+                row['notification_message'] = 'search_name and %s are required' % owner_field
+                continue
+            try:
+                days_remaining = int(float(row.get('days_remaining') or 0))
+            except ValueError:
+                days_remaining = 0
+            outcome, message = send_notification.notify(
+                session_key, notification_type, search_name, owner,
+                app=row.get('search_app') or 'unknown', reason=row.get('reason') or 'No reason specified',
+                schedule=row.get('cron_schedule') or 'unknown', avg_runtime=row.get('avg_runtime') or 'unknown',
+                days=days, days_remaining=days_remaining, deadline=_deadline(row.get('remediation_deadline')),
+                new_deadline='unknown', disabled_date='unknown', extended_by='governance team')
+            row['notification_result'] = outcome
+            row['notification_message'] = message
+        si.outputResults(results)
+
+    except Exception as e:
+        si.generateErrorResults('governancenotify: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+governanceruntime - Fold scheduler runs into the runtime regression baselines
+
+Usage:
+    index=_internal sourcetype=scheduler status=success
+    | table _time, savedsearch_name, run_time
+    | governanceruntime [alpha=0.1] [threshold=4]
+
+Updates the per-search EWMA runtime baselines (bin/runtime_regression.py)
+from the input runs, oldest first, and returns one row per search updated.
+new_regression=1 marks searches whose regression was raised by this fold.
+Runs already folded are skipped, so overlapping windows are safe.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import runtime_regression
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+
+        summary = runtime_regression.RuntimeRegressionDetector().fold(
+            results,
+            alpha=float(options.get('alpha', runtime_regression.EWMA_ALPHA)),
+            threshold=float(options.get('threshold', runtime_regression.CUSUM_THRESHOLD)),
+        )
+
+        now = int(time.time())
+        raised = set(summary['raised'])
+        output = []
+        for name in summary['updated']:
+            row = summary['baselines'][name].to_row()
+            row.update({'_time': now, 'new_regression': 1 if name in raised else 0})
+            output.append(row)
+        si.outputResults(output)
+
+    except Exception as e:
+        si.generateErrorResults('governanceruntime: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+governancesplcost - Static SPL cost estimate per search
+
+Usage:
+    ... | governancesplcost [field=qualifiedSearch] [earliest_field=dispatch.earliest_time]
+
+Parses the SPL in `field` into a command pipeline (bin/spl_parser.py),
+scores it with the rule-based estimator (bin/spl_cost.py) and adds:
+
+    spl_cost_score, spl_wasteful, spl_cost_reasons, spl_time_range_sec,
+    spl_index_breadth, spl_subsearches, spl_commands
+
+Estimates are cached by search hash in spl_cost_cache.csv, so only searches
+whose text or time range changed since the last run are parsed.
+"""
+
+import os
+import sys
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import spl_cost
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        field = options.get('field', 'qualifiedSearch')
+        earliest_field = options.get('earliest_field', 'dispatch.earliest_time')
+
+        cache = spl_cost.CostCache()
+        for result in results:
+            spl = result.get(field) or ''
+            if not spl:
+                continue
+            entry = cache.get(spl, result.get(earliest_field))
+            result['spl_cost_score'] = entry['score']
+            result['spl_wasteful'] = entry['wasteful']
+            result['spl_cost_reasons'] = entry['reasons']
+            result['spl_time_range_sec'] = entry['time_range_sec']
+            result['spl_index_breadth'] = entry['index_breadth']
+            result['spl_subsearches'] = entry['subsearches']
+            result['spl_commands'] = entry['commands']
+        cache.save()
+
+        si.outputResults(results)
+
+    except Exception as e:
+        si.generateErrorResults('governancesplcost: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
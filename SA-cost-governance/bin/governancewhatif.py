@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+governancewhatif - What-if simulation of disables and reschedules
+
+Usage:
+    | inputlookup candidates.csv | governancewhatif [output=summary|searches]
+    | makeresults | eval title="My Search", action="reschedule", cron_schedule="0 */6 * * *"
+      | governancewhatif
+
+Each input row is a candidate change: title plus action (disable,
+reschedule or narrow), cron_schedule for a reschedule, and range_factor or
+earliest/current_earliest for a narrower time range. The whole set is
+evaluated against governance_search_cache.csv in one pass
+(bin/whatif_simulator.py).
+
+output=summary (default) returns one row per metric with baseline, proposed
+and delta values; output=searches returns the per-search estimates.
+"""
+
+import os
+import sys
+import time
+
+# Add Splunk lib to path
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import whatif_simulator
+
+
+def main():
+    """Main entry point."""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+        output = options.get('output', 'summary')
+
+        simulation = whatif_simulator.simulate(results)
+
+        if output == 'searches':
+            si.outputResults(simulation['searches'])
+            return
+
+        now = int(time.time())
+        rows = []
+        for metric in ('monthly_svc', 'monthly_cost', 'peak_concurrency', 'enabled_searches'):
+            rows.append({
+                '_time': now,
+                'metric': metric,
+                'baseline': simulation['baseline'][metric],
+                'proposed': simulation['proposed'][metric],
+                'delta': simulation['delta'][metric],
+            })
+        si.outputResults(rows)
+
+    except Exception as e:
+        si.generateErrorResults('governancewhatif: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+lookup_cache.py - Warm read/write cache for CSV lookups
+
+The lookup REST handlers run as persistent processes, so a lookup parsed
+for one request can serve the next. Each cached copy is keyed by the file's
+(mtime_ns, size) signature and re-parsed only when another process has
+rewritten the file; a handler's own writes refresh the cache in place.
+
+Writers take the FileLock sidecar for the whole read-modify-write, so
+concurrent handler processes cannot lose each other's updates:
+
+    with lookup_cache.locked(path):
+        fieldnames, rows = lookup_cache.read(path, DEFAULT_FIELDS)
+        ...
+        lookup_cache.write(path, fieldnames, rows)
+"""
+
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+
+FLAGGED_FIELDS = ['search_name', 'search_owner', 'search_app', 'flagged_by', 'flagged_time',
+                  'notification_sent', 'notification_time', 'remediation_deadline', 'status', 'reason', 'notes']
+
+# path -> {'signature': (mtime_ns, size), 'fieldnames': [...], 'rows': [...]}
+_cache = {}
+
+stats = {'hits': 0, 'misses': 0}
+
+
+def lookup_path(name):
+    """Resolve a lookup file name inside the app's lookups directory."""
+    return os.path.join(LOOKUPS_DIR, os.path.basename(name))
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def locked(path):
+    """Exclusive cross-process lock for a read-modify-write of a lookup."""
+    return FileLock(path)
+
+
+def read(path, default_fields=None):
+    """
+    Read a lookup, from the warm cache when the file is unchanged.
+
+    Args:
+        path: Lookup file path
+        default_fields: Header used when the file does not exist yet
+
+    Returns:
+        tuple: (fieldnames, rows) - rows are copies the caller may modify
+    """
+    signature = _signature(path)
+    if signature is None:
+        return list(default_fields or []), []
+
+    cached = _cache.get(path)
+    if cached is None or cached['signature'] != signature:
+        stats['misses'] += 1
+        with open(path, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = reader.fieldnames or list(default_fields or [])
+        cached = {'signature': signature, 'fieldnames': fieldnames, 'rows': rows}
+        _cache[path] = cached
+    else:
+        stats['hits'] += 1
+    return list(cached['fieldnames']), [dict(r) for r in cached['rows']]
+
+
+def write(path, fieldnames, rows, quoting=csv.QUOTE_MINIMAL):
+    """Atomically rewrite a lookup and keep the written rows as the cached copy."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=quoting, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+    _cache[path] = {
+        'signature': _signature(path),
+        'fieldnames': list(fieldnames),
+        'rows': [dict(r) for r in rows],
+    }
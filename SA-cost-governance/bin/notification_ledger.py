@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+notification_ledger.py - Keyed ledger of sent notifications
+
+Every notification send_notification.py delivers is keyed by
+(search_name, owner, type, UTC day). Before sending, the key is checked; a
+key that is already present means another run (an overlapping schedule or
+a retry) sent that notification today, and the mail is skipped. The key is
+claimed only once the send succeeded, so a failed or interrupted send
+leaves it free for the next run.
+
+The ledger is an append-only file of "day<TAB>key_hash<TAB>op" lines in
+lookups/notification_ledger.log, loaded into a dict so a check is O(1).
+key_hash is a 64-bit BLAKE2b digest of the key, which keeps lines short.
+Claims append under a file lock after catching up on lines other processes
+appended since the last read. Keys older than RETENTION_DAYS are dropped by
+compaction, which rewrites the file once expired lines outnumber live ones;
+the file's first line is a generation header, so readers notice a rewrite.
+
+Usage:
+    python notification_ledger.py stats
+    python notification_ledger.py compact
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+LEDGER_PATH = os.path.join(LOOKUPS_DIR, 'notification_ledger.log')
+
+# Keys are per day; keep yesterday as well so runs straddling midnight UTC still dedupe
+RETENTION_DAYS = 2
+# Compact once at least this many expired or released lines make up half the file
+COMPACT_MIN_LINES = 1000
+
+CLAIM = '+'
+RELEASE = '-'
+HEADER_PREFIX = '#ledger\t'
+
+
+def _today(now=None):
+    return datetime.fromtimestamp(now or time.time(), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def ledger_key(search_name, owner, notification_type, day):
+    """64-bit hash of a (search, owner, type, day) key, as hex."""
+    raw = '\x1f'.join((search_name or '', owner or '', notification_type or '', day))
+    return blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class NotificationLedger(object):
+    """Append-only (search, owner, type, day) ledger with O(1) membership checks."""
+
+    def __init__(self, path=LEDGER_PATH, retention_days=RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.keys = {}  # key_hash -> day
+        self.lines = 0
+        self._offset = 0
+        self._header = None
+        self._next_compact_check = COMPACT_MIN_LINES
+
+    def _cutoff(self, now=None):
+        start = datetime.fromtimestamp(now or time.time(), tz=timezone.utc) - timedelta(days=self.retention_days - 1)
+        return start.strftime('%Y-%m-%d')
+
+    def _reset(self):
+        self.keys, self.lines, self._offset, self._header = {}, 0, 0, None
+        self._next_compact_check = COMPACT_MIN_LINES
+
+    def _catch_up(self):
+        """Apply lines appended since the last read (all of them after a compaction)."""
+        if not os.path.exists(self.path):
+            self._reset()
+            return
+        with open(self.path, 'r') as f:
+            header = f.readline()
+            if header != self._header:
+                # New or rewritten file
+                self._reset()
+                self._header = header
+                self._offset = len(header.encode('utf-8'))
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # partial line from a writer that has not finished
+                self._offset += len(line.encode('utf-8'))
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) != 3:
+                    continue
+                day, key, op = parts
+                self.lines += 1
+                if op == CLAIM:
+                    self.keys[key] = day
+                else:
+                    self.keys.pop(key, None)
+
+    def _append(self, day, key, op):
+        if not os.path.exists(self.path):
+            self._write_file([])
+        with open(self.path, 'a') as f:
+            f.write('%s\t%s\t%s\n' % (day, key, op))
+
+    def _write_file(self, claims):
+        """Atomically write a new ledger generation holding the given (key, day) claims."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('%s%s\n' % (HEADER_PREFIX, uuid.uuid4().hex))
+            for key, day in claims:
+                f.write('%s\t%s\t%s\n' % (day, key, CLAIM))
+        os.replace(tmp_path, self.path)
+
+    def sent(self, search_name, owner, notification_type, now=None):
+        """True if this notification was already sent (claimed) today."""
+        self._catch_up()
+        day = _today(now)
+        return ledger_key(search_name, owner, notification_type, day) in self.keys
+
+    def claim(self, search_name, owner, notification_type, now=None):
+        """
+        Claim today's key for a notification that was sent.
+
+        Returns:
+            bool: True if the key was claimed; False if another run had
+            already claimed it today
+        """
+        day = _today(now)
+        key = ledger_key(search_name, owner, notification_type, day)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with FileLock(self.path):
+            self._catch_up()
+            if key in self.keys:
+                return False
+            self._append(day, key, CLAIM)
+            self._catch_up()
+            self._maybe_compact(now)
+        return True
+
+    def release(self, search_name, owner, notification_type, now=None):
+        """Give a claimed key back, so a later run may send it again."""
+        day = _today(now)
+        key = ledger_key(search_name, owner, notification_type, day)
+        with FileLock(self.path):
+            self._catch_up()
+            if key in self.keys:
+                self._append(day, key, RELEASE)
+                self._catch_up()
+
+    def _maybe_compact(self, now=None):
+        # Checked every COMPACT_MIN_LINES lines, so the O(keys) scan is amortised
+        if self.lines < self._next_compact_check:
+            return
+        self._next_compact_check = self.lines + COMPACT_MIN_LINES
+        cutoff = self._cutoff(now)
+        live = sum(1 for day in self.keys.values() if day >= cutoff)
+        dead = self.lines - live
+        if dead >= COMPACT_MIN_LINES and dead >= live:
+            self._compact(cutoff)
+
+    def _compact(self, cutoff):
+        """Rewrite the ledger with only unexpired claims (caller holds the lock)."""
+        live = sorted(((k, d) for k, d in self.keys.items() if d >= cutoff), key=lambda kv: kv[1])
+        self._write_file(live)
+        self._reset()
+        self._catch_up()
+
+    def compact(self, now=None):
+        """Drop expired keys now, regardless of the compaction threshold."""
+        if not os.path.exists(self.path):
+            return
+        with FileLock(self.path):
+            self._catch_up()
+            self._compact(self._cutoff(now))
+
+    def stats(self):
+        self._catch_up()
+        return {'keys': len(self.keys), 'lines': self.lines,
+                'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    ledger = NotificationLedger()
+    if command == 'compact':
+        ledger.compact()
+    elif command != 'stats':
+        print('Usage: notification_ledger.py [stats|compact]', file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(ledger.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Base class for persistent REST handlers that replace admin_external handlers.
+
+splunkd starts an admin_external handler in a fresh interpreter for every
+request. A persistent handler ([script:] stanza with scripttype = persist)
+stays up between requests, so module imports, parsed lookups and indexes
+are reused. Subclasses implement handle_request() and return named result
+sections; they are rendered in the admin handler's JSON shape
+({"entry": [{"name": ..., "content": {...}}]}) so existing callers that read
+entry[].content keep working unchanged.
+"""
+import json
+import os
+import sys
+from urllib.parse import parse_qsl
+
+# Add Splunk Python libs
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+from splunk.persistconn.application import PersistentServerConnectionApplication
+
+
+class RequestError(Exception):
+    """Client error returned as HTTP 400 with the message in a result section."""
+
+
+class PersistentAdminHandler(PersistentServerConnectionApplication):
+    """Parse a persistent request into admin-style args and render admin-style entries."""
+
+    def __init__(self, command_line, command_arg):
+        PersistentServerConnectionApplication.__init__(self)
+
+    def handle_request(self, method, resource_id, args, user):
+        """
+        Handle one request.
+
+        Args:
+            method: HTTP method (GET, POST, ...)
+            resource_id: Path after the endpoint match (the admin handler's callerArgs.id)
+            args: Dict of argument name -> list of values, from query and form
+            user: Authenticated user name
+
+        Returns:
+            list: (section_name, {field: value}) tuples
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_args(request):
+        """Merge query, form and url-encoded payload arguments into name -> [values]."""
+        args = {}
+        pairs = list(request.get('query') or []) + list(request.get('form') or [])
+        payload = request.get('payload') or ''
+        if not request.get('form') and payload and not payload.lstrip().startswith(('{', '[')):
+            pairs.extend(parse_qsl(payload, keep_blank_values=True))
+        for key, value in pairs:
+            if key != 'output_mode':
+                args.setdefault(key, []).append(value)
+        return args
+
+    @staticmethod
+    def render(sections, status=200):
+        entries = [{'name': name, 'content': dict((k, '' if v is None else str(v)) for k, v in content.items())}
+                   for name, content in sections]
+        return {
+            'status': status,
+            'headers': {'Content-Type': 'application/json'},
+            'payload': json.dumps({'entry': entries}),
+        }
+
+    def handle(self, in_string):
+        """Handle a request from splunkd."""
+        try:
+            request = json.loads(in_string)
+            method = (request.get('method') or 'GET').upper()
+            resource_id = (request.get('path_info') or '').strip('/')
+            user = (request.get('session') or {}).get('user', '')
+            return self.render(self.handle_request(method, resource_id, self.parse_args(request), user))
+
+        except RequestError as e:
+            return self.render([('result', {'status': 'error', 'message': str(e)})], status=400)
+        except Exception as e:
+            return self.render([('result', {'status': 'error', 'message': str(e)})], status=500)
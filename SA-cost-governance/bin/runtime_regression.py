@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+runtime_regression.py - Streaming runtime regression detector per scheduled search
+
+The static runtime_ratio_threshold only fires once a search's average
+runtime crosses a fixed share of its schedule interval. This module keeps a
+small baseline per search instead, updated from each scheduler run as it
+happens:
+
+    lookups/runtime_baselines.csv   one row per search (constant size)
+
+- The baseline is an exponentially weighted mean and variance of run_time
+  (EWMA_ALPHA). The first WARMUP_RUNS runs use a plain running mean so the
+  baseline starts from an average rather than the first run.
+- Each later run is scored as z = (run_time - mean) / std, and a one-sided
+  CUSUM accumulates max(0, S + z - CUSUM_SLACK). z is capped at Z_CAP, so
+  a single slow run cannot cross CUSUM_THRESHOLD on its own, while a
+  sustained slowdown of a few standard deviations crosses it within two or
+  three runs. Runs are also capped at Z_CAP before updating the baseline,
+  so one outlier does not inflate the variance.
+- A regression must also be material: the run is at least
+  MIN_RELATIVE_INCREASE times the baseline and MIN_ABSOLUTE_INCREASE_SEC
+  slower, and std is floored, so very stable or very short searches do not
+  alarm on noise.
+- The baseline keeps adapting, so a slowdown that persists becomes the new
+  normal after roughly 1/EWMA_ALPHA runs and the flag clears once the CUSUM
+  has decayed below half the threshold. regression_time records when the
+  regression was detected; baseline_runtime_sec the baseline at that time.
+
+Runs are folded in time order and each search remembers its last folded
+run, so re-running an overlapping window does not count a run twice.
+
+Usage:
+    python runtime_regression.py report [--regressed]
+"""
+
+import csv
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+BASELINE_PATH = os.path.join(LOOKUPS_DIR, 'runtime_baselines.csv')
+
+BASELINE_FIELDS = ['search_name', 'runs', 'mean_runtime_sec', 'var_runtime_sec', 'cusum', 'last_run_time',
+                   'last_runtime_sec', 'last_zscore', 'regressed', 'regression_time', 'baseline_runtime_sec']
+
+EWMA_ALPHA = 0.1
+WARMUP_RUNS = 5
+CUSUM_SLACK = 0.5
+CUSUM_THRESHOLD = 4.0
+Z_CAP = 3.0
+MIN_RELATIVE_INCREASE = 1.2
+MIN_ABSOLUTE_INCREASE_SEC = 5.0
+# std never below this share of the mean or this many seconds
+MIN_STD_FRACTION = 0.05
+MIN_STD_SEC = 1.0
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class RuntimeBaseline(object):
+    """EWMA mean/variance and CUSUM state of one search."""
+
+    __slots__ = ('search_name', 'runs', 'mean', 'var', 'cusum', 'last_run_time', 'last_runtime', 'last_zscore',
+                 'regressed', 'regression_time', 'baseline_runtime')
+
+    def __init__(self, search_name):
+        self.search_name = search_name
+        self.runs = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum = 0.0
+        self.last_run_time = 0.0
+        self.last_runtime = 0.0
+        self.last_zscore = 0.0
+        self.regressed = False
+        self.regression_time = 0
+        self.baseline_runtime = 0.0
+
+    @classmethod
+    def from_row(cls, row):
+        b = cls(row['search_name'])
+        b.runs = int(_to_float(row.get('runs')))
+        b.mean = _to_float(row.get('mean_runtime_sec'))
+        b.var = _to_float(row.get('var_runtime_sec'))
+        b.cusum = _to_float(row.get('cusum'))
+        b.last_run_time = _to_float(row.get('last_run_time'))
+        b.last_runtime = _to_float(row.get('last_runtime_sec'))
+        b.last_zscore = _to_float(row.get('last_zscore'))
+        b.regressed = row.get('regressed') == '1'
+        b.regression_time = int(_to_float(row.get('regression_time')))
+        b.baseline_runtime = _to_float(row.get('baseline_runtime_sec'))
+        return b
+
+    def to_row(self):
+        return {
+            'search_name': self.search_name,
+            'runs': self.runs,
+            'mean_runtime_sec': round(self.mean, 3),
+            'var_runtime_sec': round(self.var, 3),
+            'cusum': round(self.cusum, 3),
+            'last_run_time': int(self.last_run_time),
+            'last_runtime_sec': round(self.last_runtime, 3),
+            'last_zscore': round(self.last_zscore, 2),
+            'regressed': 1 if self.regressed else 0,
+            'regression_time': self.regression_time or '',
+            'baseline_runtime_sec': round(self.baseline_runtime, 3) if self.regression_time else '',
+        }
+
+    def std(self):
+        return max(math.sqrt(max(self.var, 0.0)), MIN_STD_FRACTION * self.mean, MIN_STD_SEC)
+
+    def update(self, run_time, runtime, alpha=EWMA_ALPHA, threshold=CUSUM_THRESHOLD):
+        """
+        Fold one run into the baseline.
+
+        Returns:
+            bool: True if this run raised a new regression
+        """
+        self.last_run_time = run_time
+        self.last_runtime = runtime
+        raised = False
+
+        if self.runs >= WARMUP_RUNS:
+            std = self.std()
+            z = (runtime - self.mean) / std
+            material = runtime >= self.mean * MIN_RELATIVE_INCREASE and runtime - self.mean >= MIN_ABSOLUTE_INCREASE_SEC
+            self.last_zscore = z
+            runtime = min(runtime, self.mean + Z_CAP * std)
+            z = min(z, Z_CAP) if material or z < 0 else 0.0  # slower, but not by enough to matter
+            self.cusum = max(0.0, self.cusum + z - CUSUM_SLACK)
+            if not self.regressed and self.cusum >= threshold:
+                self.regressed = True
+                self.regression_time = int(run_time)
+                self.baseline_runtime = self.mean
+                raised = True
+            elif self.regressed and self.cusum < threshold / 2.0:
+                self.regressed = False
+
+        # West's EWMA variance; a running mean and variance during warm-up
+        self.runs += 1
+        weight = max(alpha, 1.0 / self.runs)
+        diff = runtime - self.mean
+        increment = weight * diff
+        self.mean += increment
+        self.var = (1.0 - weight) * (self.var + diff * increment)
+        return raised
+
+
+class RuntimeRegressionDetector(object):
+    """Per-search runtime baselines stored in runtime_baselines.csv."""
+
+    def __init__(self, path=BASELINE_PATH):
+        self.path = path
+
+    def load(self):
+        baselines = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    if row.get('search_name'):
+                        baselines[row['search_name']] = RuntimeBaseline.from_row(row)
+        return baselines
+
+    def save(self, baselines):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=BASELINE_FIELDS)
+            writer.writeheader()
+            for name in sorted(baselines):
+                writer.writerow(baselines[name].to_row())
+        os.replace(tmp_path, self.path)
+
+    def fold(self, runs, alpha=EWMA_ALPHA, threshold=CUSUM_THRESHOLD):
+        """
+        Update baselines from scheduler runs.
+
+        Args:
+            runs: Iterable of dicts with savedsearch_name, _time and run_time
+            alpha: EWMA smoothing factor
+            threshold: CUSUM level that raises a regression
+
+        Returns:
+            dict: runs_folded, updated (search names touched this fold),
+            raised (search names that regressed this fold) and baselines
+            (all baselines by search name)
+        """
+        parsed = []
+        for run in runs:
+            name = run.get('savedsearch_name') or run.get('search_name')
+            run_time = _to_float(run.get('_time'), None)
+            runtime = _to_float(run.get('run_time'), None)
+            if name and run_time is not None and runtime is not None and runtime >= 0:
+                parsed.append((run_time, name, runtime))
+        parsed.sort()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with FileLock(self.path):
+            baselines = self.load()
+            folded, updated, raised = 0, set(), []
+            for run_time, name, runtime in parsed:
+                baseline = baselines.get(name)
+                if baseline is None:
+                    baseline = baselines[name] = RuntimeBaseline(name)
+                if run_time <= baseline.last_run_time:
+                    continue  # already folded
+                if baseline.update(run_time, runtime, alpha, threshold):
+                    raised.append(name)
+                folded += 1
+                updated.add(name)
+            if folded:
+                self.save(baselines)
+
+        return {'runs_folded': folded, 'updated': sorted(updated), 'raised': raised, 'baselines': baselines}
+
+    def report(self, regressed_only=False):
+        """Baseline rows, optionally only searches currently in regression."""
+        return [b.to_row() for _, b in sorted(self.load().items()) if b.regressed or not regressed_only]
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command != 'report':
+        print('Usage: runtime_regression.py report [--regressed]', file=sys.stderr)
+        sys.exit(1)
+    for row in RuntimeRegressionDetector().report('--regressed' in sys.argv[2:]):
+        print(json.dumps(row))
+
+
+if __name__ == '__main__':
+    main()
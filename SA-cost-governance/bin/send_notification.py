@@ -7,6 +7,12 @@ scheduled searches are flagged, reminded, or disabled.
 
 Usage:
     Called by alert action or manually with appropriate parameters
+
+Each (search, owner, type) notification is sent at most once per UTC day:
+a notification whose key is in the notification ledger
+(bin/notification_ledger.py) is skipped, and the key is claimed once the
+send succeeded, so a failed send is retried by the next run. Pass
+force=true to send regardless.
 """
 
 import sys
@@ -19,6 +25,10 @@ sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'l
 
 import splunk.rest as rest
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import audit_store
+import notification_ledger
+
 
 def get_session_key():
     """Get session key from stdin or environment."""
@@ -196,6 +206,12 @@ Splunk Governance Team
 
 def log_notification(session_key, notification_type, search_name, recipient):
     """Log the notification to the audit log."""
+    try:
+        audit_store.log_action(f'{notification_type}_notification_sent', search_name, 'system',
+                               f'{notification_type.capitalize()} notification sent to {recipient}')
+    except Exception as e:
+        print(f"Error writing audit log partition: {str(e)}", file=sys.stderr)
+
     try:
         uri = '/servicesNS/nobody/SA-cost-governance/storage/collections/data/governance_audit_log'
 
@@ -222,6 +238,40 @@ def log_notification(session_key, notification_type, search_name, recipient):
         return False
 
 
+def notify(session_key, notification_type, search_name, owner, force=False, **template_args):
+    """
+    Send one notification to a search owner, at most once per UTC day.
+
+    Args:
+        session_key: Splunk session key
+        notification_type: Template type (initial, reminder, disabled, ...)
+        search_name: Name of the flagged search
+        owner: Search owner; mailed at <owner>@company.com
+        force: Send even if the ledger says it was sent today
+        **template_args: Other template variables (app, reason, deadline, ...)
+
+    Returns:
+        tuple: (outcome, message) with outcome 'sent', 'skipped' or 'failed'
+    """
+    subject, body = get_email_template(notification_type, search_name=search_name, owner=owner, **template_args)
+
+    # Construct email address (assuming company.com domain)
+    to_address = f"{owner}@company.com"
+
+    # Skip a notification another run already sent today
+    ledger = notification_ledger.NotificationLedger()
+    if not force and ledger.sent(search_name, owner, notification_type):
+        return 'skipped', (f"{notification_type.capitalize()} notification for '{search_name}' "
+                           f"already sent to {to_address} today")
+
+    # Send the email; only a delivered notification claims today's key
+    if not send_email(session_key, to_address, subject, body):
+        return 'failed', f"Could not send notification to {to_address}"
+    ledger.claim(search_name, owner, notification_type)
+    log_notification(session_key, notification_type, search_name, to_address)
+    return 'sent', f"{notification_type.capitalize()} notification sent to {to_address}"
+
+
 def main():
     """Main entry point."""
 
@@ -239,6 +289,7 @@ def main():
     new_deadline = 'unknown'
     disabled_date = 'unknown'
     extended_by = 'governance team'
+    force = False
 
     for arg in sys.argv[1:]:
         if '=' in arg:
@@ -271,6 +322,8 @@ def main():
                 disabled_date = value
             elif key == 'extended_by':
                 extended_by = value
+            elif key == 'force':
+                force = value.lower() in ('true', '1', 'yes')
 
     if not search_name or not owner:
         print("Error: search_name and owner parameters are required", file=sys.stderr)
@@ -283,35 +336,15 @@ def main():
         print("Error: Could not obtain session key", file=sys.stderr)
         sys.exit(1)
 
-    # Get email template
-    subject, body = get_email_template(
-        notification_type,
-        search_name=search_name,
-        owner=owner,
-        app=app,
-        reason=reason,
-        schedule=schedule,
-        avg_runtime=avg_runtime,
-        days=days,
-        days_remaining=days_remaining,
-        deadline=deadline,
-        new_deadline=new_deadline,
-        disabled_date=disabled_date,
-        extended_by=extended_by
-    )
-
-    # Construct email address (assuming company.com domain)
-    to_address = f"{owner}@company.com"
-
-    # Send the email
-    if send_email(session_key, to_address, subject, body):
-        print(f"SUCCESS: {notification_type.capitalize()} notification sent to {to_address}")
-        log_notification(session_key, notification_type, search_name, to_address)
-        sys.exit(0)
-    else:
-        print(f"FAILED: Could not send notification to {to_address}", file=sys.stderr)
+    outcome, message = notify(session_key, notification_type, search_name, owner, force=force, app=app,
+                              reason=reason, schedule=schedule, avg_runtime=avg_runtime, days=days,
+                              days_remaining=days_remaining, deadline=deadline, new_deadline=new_deadline,
+                              disabled_date=disabled_date, extended_by=extended_by)
+    if outcome == 'failed':
+        print(f"FAILED: {message}", file=sys.stderr)
         sys.exit(1)
-
+    print(f"{outcome.upper()}: {message}")
+    sys.exit(0)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+spl_cost.py - Rule-based static cost estimate for SPL
+
+Scores a search from its parsed pipeline (bin/spl_parser.py) instead of
+regexes over the raw text:
+
+- Scan cost: index breadth x time range. index=* counts as
+  ALL_INDEX_BREADTH indexes, a wildcard index as WILDCARD_INDEX_BREADTH and
+  index IN (...) as its listed indexes. A search without an index term (or
+  whose indexes come from a macro) searches the role's default indexes, so
+  it counts as DEFAULT_INDEX_BREADTH and is not flagged as all-index.
+  Commands that do not scan events (inputlookup, makeresults, rest, ...)
+  have a negligible scan; tstats scans index-time summaries only.
+- Command cost: each command adds COMMAND_WEIGHTS[name] x scan cost, so a
+  transaction over 90 days of every index scores far above one over an
+  hour of a single index.
+- Subsearches are scored recursively with the outer time range and added.
+  join, append, appendcols, union and multisearch cost what their
+  subsearch costs (scaled by their weight), not the outer scan, so a join
+  against an inputlookup stays cheap. appendpipe's bracket is a
+  subpipeline over the current results and scans nothing.
+
+Scores are cached in lookups/spl_cost_cache.csv keyed by a hash of the
+search text, its dispatch earliest time and RULES_VERSION, so re-scoring
+the catalog only parses searches that changed.
+"""
+
+import csv
+import hashlib
+import os
+import re
+import time
+
+import spl_parser
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+CACHE_PATH = os.path.join(LOOKUPS_DIR, 'spl_cost_cache.csv')
+
+# Bump when the rules change so cached scores are recomputed
+RULES_VERSION = '2'
+
+CACHE_FIELDS = ['search_hash', 'score', 'wasteful', 'reasons', 'time_range_sec', 'index_breadth',
+                'subsearches', 'commands', 'last_seen']
+
+DEFAULT_TIME_RANGE_SEC = 86400
+ALL_INDEX_BREADTH = 10.0
+DEFAULT_INDEX_BREADTH = 1.0
+WILDCARD_INDEX_BREADTH = 3.0
+LONG_RANGE_SEC = 30 * 86400
+WASTEFUL_COMMAND_COST = 1.0
+
+# Commands that produce results without scanning indexed events
+NON_SCANNING_COMMANDS = {'inputlookup', 'makeresults', 'rest', 'metadata', 'dbinspect', 'inputcsv',
+                         'loadjob', 'savedsearch', 'eventcount', 'datamodel', 'from'}
+
+# Commands whose cost is that of their subsearches rather than the outer scan
+SUBSEARCH_COMMANDS = {'join', 'append', 'appendcols', 'union', 'multisearch'}
+
+# Commands whose bracket is a subpipeline over the current results, not a search
+SUBPIPELINE_COMMANDS = {'appendpipe'}
+
+# Multiplier of the pipeline's scan cost (or, for SUBSEARCH_COMMANDS, the subsearch cost) added by each command
+COMMAND_WEIGHTS = {
+    'transaction': 2.0,
+    'map': 5.0,
+    'join': 1.0,
+    'append': 0.5,
+    'appendcols': 0.5,
+    'appendpipe': 0.3,
+    'union': 0.5,
+    'multisearch': 0.5,
+    'sort': 0.3,
+    'dedup': 0.3,
+    'eventstats': 0.4,
+    'streamstats': 0.4,
+    'spath': 0.2,
+    'xmlkv': 0.2,
+    'kvform': 0.2,
+    'rex': 0.1,
+    'regex': 0.1,
+    'stats': 0.2,
+    'chart': 0.2,
+    'timechart': 0.2,
+    'top': 0.2,
+    'rare': 0.2,
+    'lookup': 0.1,
+    'tstats': 0.05,
+}
+DEFAULT_COMMAND_WEIGHT = 0.02
+
+# Commands whose cost is flagged as wasteful once it passes WASTEFUL_COMMAND_COST
+WASTEFUL_COMMANDS = ('join', 'append', 'appendcols', 'transaction', 'map')
+
+_RELATIVE_RE = re.compile(r'^-?(\d*)(s|sec|secs|second|seconds|m|min|mins|minute|minutes|h|hr|hrs|hour|hours|'
+                          r'd|day|days|w|week|weeks|mon|month|months|q|qtr|quarter|quarters|y|yr|year|years)$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'mon': 2592000, 'q': 7776000, 'y': 31536000}
+
+
+def time_range_seconds(earliest, default=DEFAULT_TIME_RANGE_SEC):
+    """Length in seconds of a relative earliest time like '-7d@d' (0 / 'all' = all time)."""
+    value = str(earliest or '').strip().strip('"').split('@')[0]
+    if value in ('0', 'all', 'rt'):
+        return 5 * 31536000
+    match = _RELATIVE_RE.match(value.lower())
+    if not match:
+        return default
+    unit = match.group(2)
+    unit = 'mon' if unit.startswith('mon') else unit[0]
+    return int(match.group(1) or 1) * _UNIT_SECONDS[unit]
+
+
+def _index_breadth(indexes):
+    if not indexes:
+        return DEFAULT_INDEX_BREADTH
+    breadth = 0.0
+    for index in indexes:
+        if index == '*':
+            return ALL_INDEX_BREADTH
+        breadth += WILDCARD_INDEX_BREADTH if '*' in index else 1.0
+    return breadth
+
+
+def estimate_pipeline(pipeline, time_range=DEFAULT_TIME_RANGE_SEC):
+    """
+    Score a parsed pipeline.
+
+    Args:
+        pipeline: spl_parser.Pipeline
+        time_range: Inherited time range in seconds
+
+    Returns:
+        dict: score, reasons (list), wasteful (bool), time_range_sec,
+        index_breadth, subsearches
+    """
+    commands = pipeline.commands
+    reasons = []
+    wasteful = False
+    if not commands:
+        return {'score': 0.0, 'reasons': reasons, 'wasteful': False, 'time_range_sec': time_range,
+                'index_breadth': 0.0, 'subsearches': 0}
+
+    first = commands[0]
+    options = first.options()
+    if options.get('earliest'):
+        time_range = time_range_seconds(options['earliest'][-1], time_range)
+
+    if first.name in NON_SCANNING_COMMANDS or first.name in SUBSEARCH_COMMANDS:
+        breadth = 0.0
+        scan = 0.01
+    else:
+        # A macro-led search without an index term hides its indexes: score it as the default
+        breadth = _index_breadth(options.get('index', []))
+        scan = breadth * time_range / 86400.0
+        if first.name == 'tstats':
+            scan *= COMMAND_WEIGHTS['tstats']
+        if breadth >= ALL_INDEX_BREADTH and first.name != 'tstats':
+            reasons.append('Scans all indexes')
+            wasteful = True
+        if time_range >= LONG_RANGE_SEC and first.name != 'tstats':
+            reasons.append('Searches %d days of data' % (time_range // 86400))
+            wasteful = True
+
+    score = scan
+    subsearch_count = 0
+    for command in commands:
+        sub_cost = 0.0
+        if command.name not in SUBPIPELINE_COMMANDS:
+            for sub in command.subsearches:
+                sub_result = estimate_pipeline(sub, time_range)
+                sub_cost += sub_result['score']
+                subsearch_count += 1 + sub_result['subsearches']
+                reasons.extend('%s subsearch: %s' % (command.name, r) for r in sub_result['reasons'])
+                wasteful = wasteful or sub_result['wasteful']
+
+        if command is first:
+            score += sub_cost
+            continue
+
+        weight = COMMAND_WEIGHTS.get(command.name, DEFAULT_COMMAND_WEIGHT)
+        if command.name in SUBSEARCH_COMMANDS and command.subsearches:
+            command_cost = (1 + weight) * sub_cost
+        else:
+            command_cost = weight * scan + sub_cost
+        score += command_cost
+        if command.name in WASTEFUL_COMMANDS and command_cost >= WASTEFUL_COMMAND_COST:
+            reasons.append('%s over an expensive input (cost %.1f)' % (command.name, command_cost))
+            wasteful = True
+
+    return {'score': round(score, 3), 'reasons': reasons, 'wasteful': wasteful, 'time_range_sec': time_range,
+            'index_breadth': breadth, 'subsearches': subsearch_count}
+
+
+def estimate(spl, dispatch_earliest=None):
+    """Parse and score a search string (see estimate_pipeline)."""
+    pipeline = spl_parser.parse(spl)
+    result = estimate_pipeline(pipeline, time_range_seconds(dispatch_earliest))
+    result['commands'] = pipeline.command_names()
+    return result
+
+
+def search_hash(spl, dispatch_earliest=None):
+    key = '%s\0%s\0%s' % (RULES_VERSION, dispatch_earliest or '', spl or '')
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+class CostCache(object):
+    """Parse cache of cost estimates keyed by search hash."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    self.entries[row['search_hash']] = row
+
+    def get(self, spl, dispatch_earliest=None, now=None):
+        """Return the cached estimate row for a search, scoring it on a miss."""
+        key = search_hash(spl, dispatch_earliest)
+        now = str(int(now or time.time()))
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            result = estimate(spl, dispatch_earliest)
+            entry = {
+                'search_hash': key,
+                'score': str(result['score']),
+                'wasteful': '1' if result['wasteful'] else '0',
+                'reasons': '; '.join(result['reasons']),
+                'time_range_sec': str(result['time_range_sec']),
+                'index_breadth': str(result['index_breadth']),
+                'subsearches': str(result['subsearches']),
+                'commands': ' '.join(result['commands']),
+                'last_seen': now,
+            }
+            self.entries[key] = entry
+            self.dirty = True
+        else:
+            self.hits += 1
+            # Refresh at most daily so an unchanged catalog does not rewrite the cache
+            if int(float(entry.get('last_seen') or 0)) < int(now) - 86400:
+                entry['last_seen'] = now
+                self.dirty = True
+        return entry
+
+    def save(self, max_age_days=30, now=None):
+        """Write the cache, dropping entries not seen for max_age_days."""
+        if not self.dirty:
+            return
+        cutoff = int(now or time.time()) - max_age_days * 86400
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CACHE_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for entry in self.entries.values():
+                if int(float(entry.get('last_seen') or 0)) >= cutoff:
+                    writer.writerow(entry)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
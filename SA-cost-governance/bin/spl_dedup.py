@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+spl_dedup.py - Near-duplicate scheduled search detection
+
+Copies of the same scheduled search with small edits (a different literal,
+time range or whitespace) are found by:
+
+1. Normalising the SPL - comments and time modifiers removed, quoted
+   strings and numbers replaced by placeholders, case and whitespace folded.
+2. Shingling the normalised token stream into overlapping k-token shingles.
+3. Computing a MinHash signature per search and banding it into an LSH
+   index, so only searches sharing a band bucket are compared.
+4. Joining candidate pairs whose estimated Jaccard similarity reaches the
+   threshold into clusters (union-find).
+
+Each search is hashed once and bucketed once, so the catalog is processed
+in roughly linear time instead of comparing every pair.
+"""
+
+import csv
+import os
+import re
+import struct
+import zlib
+from hashlib import md5
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+SEARCH_CACHE = os.path.join(LOOKUPS_DIR, 'governance_search_cache.csv')
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity are likely to share a bucket
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Deterministic permutation coefficients so signatures are stable across runs
+_PERMUTATIONS = [
+    struct.unpack('>QQ', md5(('minhash-%d' % i).encode('ascii')).digest())
+    for i in range(NUM_PERM)
+]
+_PERMUTATIONS = [(a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME) for a, b in _PERMUTATIONS]
+
+_COMMENT_RE = re.compile(r'```.*?```', re.S)
+_TIME_MODIFIER_RE = re.compile(r'\b(earliest|latest|_index_earliest|_index_latest|starttime|endtime)\s*=\s*("[^"]*"|\S+)', re.I)
+_QUOTED_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_NUMBER_RE = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_TOKEN_RE = re.compile(r'[a-z_][\w.:*-]*|\$\w+\$|<num>|<str>|\*|[|=<>!]=?|[()\[\],+/%-]')
+
+
+def normalize(spl):
+    """
+    Normalise SPL for fingerprinting.
+
+    Returns:
+        list: Tokens of the normalised search
+    """
+    text = _COMMENT_RE.sub(' ', spl or '')
+    text = _TIME_MODIFIER_RE.sub(' ', text)
+    text = _QUOTED_RE.sub(' <str> ', text)
+    text = _NUMBER_RE.sub(' <num> ', text)
+    text = text.lower().strip()
+    if text.startswith('search '):
+        text = text[7:]
+    return _TOKEN_RE.findall(text)
+
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """Return the set of k-token shingles as 32-bit hashes."""
+    if len(tokens) <= size:
+        return {zlib.crc32(' '.join(tokens).encode('utf-8'))} if tokens else set()
+    return set(zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8'))
+               for i in range(len(tokens) - size + 1))
+
+
+def minhash(shingle_set):
+    """MinHash signature of a shingle set (NUM_PERM values)."""
+    if not shingle_set:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in shingle_set)
+                 for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / float(NUM_PERM)
+
+
+class _UnionFind(object):
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def load_costs(path=SEARCH_CACHE):
+    """Monthly cost per search title from the search cache."""
+    costs = {}
+    if os.path.exists(path):
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                costs[row.get('title', '')] = _to_float(row.get('monthly_cost') or row.get('monthly_total_cost'))
+    return costs
+
+
+def find_clusters(searches, threshold=DEFAULT_THRESHOLD, costs=None):
+    """
+    Cluster near-duplicate searches.
+
+    Args:
+        searches: Iterable of dicts with title, owner, app, qualifiedSearch
+            (or search) and optionally monthly_cost / monthly_total_cost
+        threshold: Minimum estimated Jaccard similarity to link two searches
+        costs: Optional {title: monthly_cost} used when a row has no cost
+
+    Returns:
+        list: Clusters of two or more searches, most expensive first; each
+        with members, apps, owners, combined_monthly_cost,
+        consolidation_savings and min_similarity
+    """
+    costs = costs if costs is not None else load_costs()
+    items = []
+    for row in searches:
+        spl = row.get('qualifiedSearch') or row.get('search') or ''
+        if not spl.strip():
+            continue
+        cost = row.get('monthly_cost') or row.get('monthly_total_cost')
+        items.append({
+            'title': row.get('title') or row.get('search_name', ''),
+            'owner': row.get('owner') or row.get('eai:acl.owner', ''),
+            'app': row.get('app') or row.get('eai:acl.app', ''),
+            'cost': _to_float(cost) if cost not in (None, '') else costs.get(row.get('title', ''), 0.0),
+            'signature': minhash(shingles(normalize(spl))),
+        })
+
+    rows_per_band = NUM_PERM // BANDS
+    buckets = {}
+    for i, item in enumerate(items):
+        sig = item['signature']
+        for band in range(BANDS):
+            key = (band, sig[band * rows_per_band:(band + 1) * rows_per_band])
+            buckets.setdefault(key, []).append(i)
+
+    uf = _UnionFind(len(items))
+    links = {}
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for pos, i in enumerate(members):
+            for j in members[pos + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                score = similarity(items[i]['signature'], items[j]['signature'])
+                if score >= threshold:
+                    uf.union(i, j)
+                    links[(i, j)] = score
+
+    groups = {}
+    for i in range(len(items)):
+        groups.setdefault(uf.find(i), []).append(i)
+    # Link scores per cluster in one pass over the links
+    per_root = {}
+    for (i, j), score in links.items():
+        per_root.setdefault(uf.find(i), []).append(score)
+
+    clusters = []
+    for root, members in groups.items():
+        if len(members) < 2:
+            continue
+        scores = per_root.get(root, [])
+        member_costs = [items[i]['cost'] for i in members]
+        total = sum(member_costs)
+        clusters.append({
+            'size': len(members),
+            'members': [items[i]['title'] for i in members],
+            'apps': sorted(set(items[i]['app'] for i in members)),
+            'owners': sorted(set(items[i]['owner'] for i in members)),
+            'combined_monthly_cost': round(total, 2),
+            # Keeping the most expensive copy is the conservative consolidation
+            'consolidation_savings': round(total - max(member_costs), 2),
+            'min_similarity': round(min(scores), 2) if scores else 1.0,
+        })
+
+    clusters.sort(key=lambda c: (-c['combined_monthly_cost'], -c['size']))
+    for n, cluster in enumerate(clusters, 1):
+        cluster['cluster_id'] = n
+    return clusters
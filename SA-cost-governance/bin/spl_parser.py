@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+spl_parser.py - SPL tokenizer and pipeline parser
+
+Splits a search into its command pipeline, respecting quoted strings,
+backtick macros, comments and [ ... ] subsearches, so callers can reason
+about the commands a search actually runs instead of pattern-matching the
+raw text - a "| join" inside a quoted string is an argument, not a command.
+
+    >>> p = parse('index=web earliest=-7d | join host [| inputlookup hosts.csv] | stats count')
+    >>> [c.name for c in p.commands]
+    ['search', 'join', 'stats']
+    >>> p.commands[1].subsearches[0].commands[0].name
+    'inputlookup'
+"""
+
+import re
+
+_KV_RE = re.compile(r'^([\w.:]+)\s*(=|!=)\s*(.*)$', re.S)
+
+
+class Command(object):
+    """One command in a pipeline: name, argument tokens and subsearches."""
+
+    def __init__(self, name, args, subsearches):
+        self.name = name
+        self.args = args
+        self.subsearches = subsearches
+
+    def options(self):
+        """
+        Return key=value arguments as a dict of lowercased key -> list of values.
+
+        'key IN (a, b)' contributes each listed value, as key=a OR key=b would,
+        and grouping parentheses around a term are ignored.
+        """
+        opts = {}
+        args = self.args
+        i = 0
+        while i < len(args):
+            arg = args[i].lstrip('(')
+            match = _KV_RE.match(arg)
+            if match and match.group(2) == '=':
+                value = match.group(3)
+                # Drop a closing group parenthesis after the value
+                value = value[:value.rindex('"') + 1] if value.count('"') > 1 else value.rstrip(')')
+                opts.setdefault(match.group(1).lower(), []).append(value.strip('"'))
+            elif i + 2 < len(args) and args[i + 1].upper() == 'IN' and args[i + 2].startswith('('):
+                values = []
+                j = i + 2
+                while j < len(args):
+                    values.append(args[j])
+                    if args[j].endswith(')'):
+                        break
+                    j += 1
+                key = arg.lower()
+                for value in ' '.join(values)[1:].rstrip(')').replace(',', ' ').split():
+                    opts.setdefault(key, []).append(value.strip('"'))
+                i = j
+            i += 1
+        return opts
+
+    def __repr__(self):
+        return 'Command(%r, %r, %d subsearches)' % (self.name, self.args, len(self.subsearches))
+
+
+class Pipeline(object):
+    """A parsed search: its ordered commands."""
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def command_names(self):
+        return [c.name for c in self.commands]
+
+    def walk(self):
+        """Yield every command, including those inside subsearches."""
+        for command in self.commands:
+            yield command
+            for sub in command.subsearches:
+                for nested in sub.walk():
+                    yield nested
+
+
+def _strip_comments(spl):
+    return re.sub(r'```.*?```', ' ', spl, flags=re.S)
+
+
+def tokenize(spl):
+    """
+    Split SPL into tokens.
+
+    Quoted strings and backtick macros are single tokens, '|' is its own
+    token and a bracketed subsearch is returned as one ('[', text) token.
+
+    Args:
+        spl: Search string
+
+    Returns:
+        list: Tokens; subsearches are tuples ('[', inner_text)
+    """
+    text = _strip_comments(spl or '')
+    tokens = []
+    current = []
+    i, n = 0, len(text)
+
+    def flush():
+        if current:
+            tokens.append(''.join(current))
+            del current[:]
+
+    while i < n:
+        ch = text[i]
+        if ch in '"\'':
+            # Quoted string (kept attached to a preceding key=)
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == '\\' else 1
+            current.append(text[i:j + 1])
+            i = j + 1
+        elif ch == '`':
+            j = text.find('`', i + 1)
+            j = n - 1 if j < 0 else j
+            current.append(text[i:j + 1])
+            i = j + 1
+        elif ch == '[':
+            flush()
+            depth, j = 1, i + 1
+            while j < n and depth:
+                if text[j] in '"\'':
+                    quote = text[j]
+                    j += 1
+                    while j < n and text[j] != quote:
+                        j += 2 if text[j] == '\\' else 1
+                elif text[j] == '[':
+                    depth += 1
+                elif text[j] == ']':
+                    depth -= 1
+                j += 1
+            tokens.append(('[', text[i + 1:j - 1]))
+            i = j
+        elif ch == '|':
+            flush()
+            tokens.append('|')
+            i += 1
+        elif ch.isspace():
+            flush()
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+    flush()
+    return _join_assignments(tokens)
+
+
+def _join_assignments(tokens):
+    """Merge 'key = value' / 'key= value' / 'key =value' into one 'key=value' token."""
+    merged = []
+    for token in tokens:
+        prev = merged[-1] if merged else None
+        if isinstance(token, str) and isinstance(prev, str) and prev != '|' and token != '|':
+            joins_prev = token in ('=', '!=') or (token.startswith('=') and not token.startswith('=='))
+            joins_next = prev.endswith('=') and not prev.endswith('==')
+            if joins_prev or joins_next:
+                merged[-1] = prev + token
+                continue
+        merged.append(token)
+    return merged
+
+
+def parse(spl):
+    """
+    Parse SPL into a Pipeline.
+
+    A search that does not start with '|' begins with an implicit search
+    command, as in Splunk.
+
+    Returns:
+        Pipeline: Parsed commands
+    """
+    tokens = tokenize(spl)
+    segments = [[]]
+    for token in tokens:
+        if token == '|':
+            segments.append([])
+        else:
+            segments[-1].append(token)
+
+    leading_pipe = bool(tokens) and tokens[0] == '|'
+    commands = []
+    for idx, segment in enumerate(segments):
+        if not segment:
+            continue
+        first = segment[0]
+        if idx == 0 and not leading_pipe:
+            # Implicit search command; an explicit leading 'search' keyword is dropped
+            name = 'search'
+            rest = segment[1:] if isinstance(first, str) and first.lower() == 'search' else segment
+        elif isinstance(first, tuple):
+            name, rest = 'search', segment
+        else:
+            name, rest = first.lower(), segment[1:]
+        args = [t for t in rest if not isinstance(t, tuple)]
+        subsearches = [parse(t[1]) for t in rest if isinstance(t, tuple)]
+        commands.append(Command(name, args, subsearches))
+    return Pipeline(commands)
@@ -2,124 +2,106 @@
 """
 REST endpoint for updating lookup files in SA-cost-governance app.
 This bypasses the outputlookup permission issues in certain environments.
+
+POST /data/governance/update_lookup/<search_name>
+    lookup_name=<file>, action=update|delete, status=..., ...
+
+Runs as a persistent handler: the parsed lookup stays cached between
+requests (bin/lookup_cache.py) and is only re-read when another process
+has rewritten it.
 """
 
-import csv
-import io
-import json
 import os
 import sys
 
-# Add Splunk lib to path
-sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
-
-import splunk.admin as admin
-import splunk.rest as rest
-
-
-class UpdateLookupHandler(admin.MConfigHandler):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import change_feed
+import deadline_index
+import lookup_cache
+from persistent_handler import PersistentAdminHandler, RequestError
+
+
+def merge_row(rows, action, search_name, new_data, lookup_name):
+    """
+    Update, add or delete a search's row.
+
+    Updates only overwrite fields with non-empty values. Rows marked 'ok'
+    are dropped from flagged_searches.csv (they go to a different lookup).
+
+    Returns:
+        list: The updated rows
+    """
+    if action == 'delete':
+        # Remove the record
+        rows = [r for r in rows if r.get('search_name') != search_name]
+    else:
+        # Update or add
+        for row in rows:
+            if row.get('search_name') == search_name:
+                # Merge: only update non-empty values
+                for key, value in new_data.items():
+                    if value and value != 'undefined':
+                        row[key] = value
+                break
+        else:
+            rows.append(new_data)
+
+    # Filter out 'ok' status (they go to different lookup)
+    if lookup_name == 'flagged_searches.csv':
+        rows = [r for r in rows if r.get('status') != 'ok']
+    return rows
+
+
+class UpdateLookupHandler(PersistentAdminHandler):
     """REST handler for updating governance lookup files."""
 
-    def setup(self):
-        """Set up the handler."""
-        if self.requestedAction == admin.ACTION_EDIT:
-            # Required args for update
-            self.supportedArgs.addOptArg('lookup_name')
-            self.supportedArgs.addOptArg('search_name')
-            self.supportedArgs.addOptArg('search_owner')
-            self.supportedArgs.addOptArg('search_app')
-            self.supportedArgs.addOptArg('flagged_by')
-            self.supportedArgs.addOptArg('flagged_time')
-            self.supportedArgs.addOptArg('notification_sent')
-            self.supportedArgs.addOptArg('notification_time')
-            self.supportedArgs.addOptArg('remediation_deadline')
-            self.supportedArgs.addOptArg('status')
-            self.supportedArgs.addOptArg('reason')
-            self.supportedArgs.addOptArg('notes')
-            self.supportedArgs.addOptArg('action')  # update, delete
-
-    def handleList(self, confInfo):
-        """Handle GET requests - return current lookup data."""
-        confInfo['status'].append('ready', 'Lookup update endpoint ready')
-
-    def handleEdit(self, confInfo):
-        """Handle POST requests - update the lookup file."""
-        try:
-            lookup_name = self.callerArgs.data.get('lookup_name', ['flagged_searches.csv'])[0]
-            action = self.callerArgs.data.get('action', ['update'])[0]
-            search_name = self.callerArgs.data.get('search_name', [''])[0]
-
-            if not search_name:
-                raise Exception("search_name is required")
-
-            # Get lookup file path
-            app_path = os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'),
-                                     'etc', 'apps', 'SA-cost-governance', 'lookups')
-            lookup_path = os.path.join(app_path, lookup_name)
-
-            # Read current lookup data
-            rows = []
-            fieldnames = ['search_name', 'search_owner', 'search_app', 'flagged_by',
-                          'flagged_time', 'notification_sent', 'notification_time',
-                          'remediation_deadline', 'status', 'reason', 'notes']
-
-            if os.path.exists(lookup_path):
-                with open(lookup_path, 'r', newline='') as f:
-                    reader = csv.DictReader(f)
-                    fieldnames = reader.fieldnames or fieldnames
-                    rows = list(reader)
-
-            # Find and update or add the record
-            found = False
-            new_data = {
-                'search_name': search_name,
-                'search_owner': self.callerArgs.data.get('search_owner', ['unknown'])[0],
-                'search_app': self.callerArgs.data.get('search_app', ['unknown'])[0],
-                'flagged_by': self.callerArgs.data.get('flagged_by', ['admin'])[0],
-                'flagged_time': self.callerArgs.data.get('flagged_time', [''])[0],
-                'notification_sent': self.callerArgs.data.get('notification_sent', ['0'])[0],
-                'notification_time': self.callerArgs.data.get('notification_time', ['0'])[0],
-                'remediation_deadline': self.callerArgs.data.get('remediation_deadline', ['0'])[0],
-                'status': self.callerArgs.data.get('status', ['pending'])[0],
-                'reason': self.callerArgs.data.get('reason', [''])[0],
-                'notes': self.callerArgs.data.get('notes', [''])[0]
-            }
-
-            if action == 'delete':
-                # Remove the record
-                rows = [r for r in rows if r.get('search_name') != search_name]
-            else:
-                # Update or add
-                for i, row in enumerate(rows):
-                    if row.get('search_name') == search_name:
-                        # Merge: only update non-empty values
-                        for key, value in new_data.items():
-                            if value and value != 'undefined':
-                                rows[i][key] = value
-                        found = True
-                        break
-
-                if not found:
-                    rows.append(new_data)
-
-            # Filter out 'ok' status (they go to different lookup)
+    def handle_request(self, method, resource_id, args, user):
+        """GET returns readiness; POST updates the lookup file."""
+        if method != 'POST':
+            return [('status', {'ready': 'Lookup update endpoint ready'})]
+
+        def arg(name, default=''):
+            return args.get(name, [default])[0]
+
+        lookup_name = os.path.basename(arg('lookup_name', 'flagged_searches.csv'))
+        action = arg('action', 'update')
+        search_name = arg('search_name') or resource_id
+
+        if not search_name:
+            raise RequestError('search_name is required')
+
+        lookup_path = lookup_cache.lookup_path(lookup_name)
+        new_data = {
+            'search_name': search_name,
+            'search_owner': arg('search_owner', 'unknown'),
+            'search_app': arg('search_app', 'unknown'),
+            'flagged_by': arg('flagged_by', 'admin'),
+            'flagged_time': arg('flagged_time'),
+            'notification_sent': arg('notification_sent', '0'),
+            'notification_time': arg('notification_time', '0'),
+            'remediation_deadline': arg('remediation_deadline', '0'),
+            'status': arg('status', 'pending'),
+            'reason': arg('reason'),
+            'notes': arg('notes'),
+        }
+
+        with lookup_cache.locked(lookup_path):
+            fieldnames, rows = lookup_cache.read(lookup_path, lookup_cache.FLAGGED_FIELDS)
+            old_row = next((dict(r) for r in rows if r.get('search_name') == search_name), None)
+            rows = merge_row(rows, action, search_name, new_data, lookup_name)
+            lookup_cache.write(lookup_path, fieldnames, rows)
+            changed = [] if action == 'delete' else [r for r in rows if r.get('search_name') == search_name]
+            # Sync the deadline index before releasing the lookup so it is never older than the lookup
             if lookup_name == 'flagged_searches.csv':
-                rows = [r for r in rows if r.get('status') != 'ok']
-
-            # Write updated lookup
-            with open(lookup_path, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in rows:
-                    writer.writerow(row)
-
-            confInfo['result'].append('success', 'Lookup updated successfully')
-            confInfo['result'].append('search_name', search_name)
-            confInfo['result'].append('action', action)
-
-        except Exception as e:
-            confInfo['error'].append('error', str(e))
-
-
-# Initialize the handler
-admin.init(UpdateLookupHandler, admin.CONTEXT_NONE)
+                deadline_index.sync_rows(changed, removed=[] if changed else [search_name])
+
+        # Keep the change feed in step with flagged_searches.csv
+        if lookup_name == 'flagged_searches.csv':
+            if changed:
+                change_feed.record_row_change(old_row, changed[0], lookup_path=lookup_path)
+            elif old_row:
+                # Deleted, or marked ok and dropped from flagged_searches.csv
+                change_feed.record_row_change(old_row, None, lookup_path=lookup_path)
+
+        return [('result', {'success': 'Lookup updated successfully', 'search_name': search_name,
+                            'action': action})]
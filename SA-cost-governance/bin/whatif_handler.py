@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Persistent REST handler for the what-if savings simulator.
+
+POST /governance/whatif
+    {"candidates": [{"title": "...", "action": "disable"}, ...]}
+GET  /governance/whatif?disable=<title>&disable=<title>
+
+Returns baseline, proposed and delta monthly SVC, cost and peak scheduler
+concurrency plus per-search estimates. The handler runs as a persistent
+process, so the search cache table stays loaded between requests and the
+dashboard can re-run the simulation on every checkbox change.
+"""
+import json
+import os
+import sys
+
+# Add Splunk Python libs
+sys.path.insert(0, os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages'))
+
+from splunk.persistconn.application import PersistentServerConnectionApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import whatif_simulator
+
+
+class WhatIfHandler(PersistentServerConnectionApplication):
+    """Run what-if simulations against the cached search table."""
+
+    def __init__(self, command_line, command_arg):
+        PersistentServerConnectionApplication.__init__(self)
+
+    def handle(self, in_string):
+        """Handle a request from splunkd."""
+        try:
+            request = json.loads(in_string)
+            candidates = [{'title': v, 'action': 'disable'}
+                          for k, v in request.get('query', []) if k == 'disable']
+
+            payload = request.get('payload') or ''
+            if payload:
+                body = json.loads(payload)
+                candidates.extend(body.get('candidates', []) if isinstance(body, dict) else body)
+
+            return {
+                'status': 200,
+                'headers': {'Content-Type': 'application/json'},
+                'payload': json.dumps(whatif_simulator.simulate(candidates)),
+            }
+
+        except Exception as e:
+            return {
+                'status': 500,
+                'headers': {'Content-Type': 'application/json'},
+                'payload': json.dumps({'status': 'error', 'message': str(e)}),
+            }
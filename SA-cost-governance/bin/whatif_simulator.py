@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+whatif_simulator.py - What-if savings simulator for disables and reschedules
+
+Estimates the combined effect of a candidate set of changes - disable a
+search, move it to a new cron schedule, or narrow its time range - on
+monthly SVC, monthly cost and peak scheduler concurrency, before anything
+is changed.
+
+governance_search_cache.csv is loaded once into column arrays (cached
+against the file's mtime/size) together with the baseline totals and a
+minute-of-day scheduler occupancy profile. A scenario only recomputes the
+rows it touches: their old contribution is subtracted from the baseline and
+the new one added, so re-running as admins toggle checkboxes costs
+O(candidates), not O(searches).
+"""
+
+import csv
+import math
+import os
+import re
+from array import array
+
+# Path to the app's lookups directory
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+SEARCH_CACHE = os.path.join(LOOKUPS_DIR, 'governance_search_cache.csv')
+SETTINGS_LOOKUP = os.path.join(LOOKUPS_DIR, 'governance_settings.csv')
+
+DEFAULT_SVC_UNIT_COST = 1600.0
+DEFAULT_RUNTIME_SEC = 30.0
+DEFAULT_FREQUENCY_SEC = 3600
+MINUTES_PER_DAY = 1440
+DAYS_PER_MONTH = 30
+
+ACTIONS = ('disable', 'reschedule', 'narrow')
+
+_RELATIVE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'mon': 2592000, 'y': 31536000}
+
+# Parsed table keyed by cache path: {'signature': ..., 'table': SearchTable}
+_tables = {}
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# -- cron -------------------------------------------------------------------
+
+def _expand_field(field, lo, hi):
+    """Expand one cron field (*, */N, N, N-M, N-M/S, lists) to sorted values."""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = int(step_str)
+            if step <= 0:
+                raise ValueError('invalid cron step: %s' % field)
+        if part in ('*', ''):
+            start, end = lo, hi
+        elif '-' in part:
+            start, end = [int(p) for p in part.split('-', 1)]
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return sorted(v for v in values if lo <= v <= hi)
+
+
+def parse_cron(cron):
+    """
+    Parse a five-field cron expression.
+
+    Args:
+        cron: Cron expression, e.g. '*/15 * * * *'
+
+    Returns:
+        tuple: (minutes_of_day, runs_per_day) - minutes_of_day are the
+        minute offsets the search fires at on a day it runs; runs_per_day
+        is averaged over the day-of-month/month/day-of-week restrictions
+    """
+    fields = cron.split()
+    if len(fields) != 5:
+        raise ValueError('expected 5 cron fields: %s' % cron)
+    minutes = _expand_field(fields[0], 0, 59)
+    hours = _expand_field(fields[1], 0, 23)
+    doms = _expand_field(fields[2], 1, 31)
+    months = _expand_field(fields[3], 1, 12)
+    dows = sorted(set(d % 7 for d in _expand_field(fields[4], 0, 7)))
+
+    dom_fraction = len(doms) / 31.0
+    dow_fraction = len(dows) / 7.0
+    dom_restricted, dow_restricted = fields[2] != '*', fields[4] != '*'
+    if dom_restricted and dow_restricted:
+        # cron runs when either day field matches
+        day_fraction = min(1.0, dom_fraction + dow_fraction - dom_fraction * dow_fraction)
+    elif dom_restricted:
+        day_fraction = dom_fraction
+    elif dow_restricted:
+        day_fraction = dow_fraction
+    else:
+        day_fraction = 1.0
+    day_fraction *= len(months) / 12.0
+
+    minutes_of_day = [h * 60 + m for h in hours for m in minutes]
+    return minutes_of_day, len(minutes_of_day) * day_fraction
+
+
+def _schedule(cron, frequency_seconds):
+    """Return (minutes_of_day, runs_per_day), falling back to the frequency."""
+    try:
+        return parse_cron(cron)
+    except (ValueError, AttributeError):
+        freq = int(frequency_seconds) if frequency_seconds and frequency_seconds > 0 else DEFAULT_FREQUENCY_SEC
+        step = max(1, freq // 60)
+        minutes_of_day = list(range(0, MINUTES_PER_DAY, step)) if step < MINUTES_PER_DAY else [0]
+        return minutes_of_day, 86400.0 / freq
+
+
+def relative_seconds(value):
+    """Length of a relative time modifier such as '-24h' or '-7d@d' in seconds."""
+    match = re.match(r'^\s*-?(\d*)\s*(s|m|h|d|w|mon|y)\w*', str(value).split('@')[0])
+    if not match:
+        raise ValueError('unsupported relative time: %s' % value)
+    return int(match.group(1) or 1) * _RELATIVE_UNITS[match.group(2)]
+
+
+# -- cost model -------------------------------------------------------------
+
+def estimate_svc_per_run(frequency_seconds, avg_runtime_sec):
+    """
+    Deterministic SVC per run for rows without a measured value.
+
+    Uses the midpoint of each tier in the calculate_mock_svc_usage macro.
+    """
+    if frequency_seconds <= 300:
+        return 100.0 if avg_runtime_sec > 60 else 85.0
+    if frequency_seconds <= 900:
+        return 102.0 if avg_runtime_sec > 120 else 72.0
+    if avg_runtime_sec > 180:
+        return 65.0
+    if avg_runtime_sec > 60:
+        return 35.0
+    return 22.0
+
+
+def load_svc_unit_cost(path=SETTINGS_LOOKUP):
+    """Annual cost per SVC from governance_settings.csv (default 1600)."""
+    if os.path.exists(path):
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('setting_name') == 'svc_unit_cost':
+                    return _to_float(row.get('setting_value'), DEFAULT_SVC_UNIT_COST)
+    return DEFAULT_SVC_UNIT_COST
+
+
+def _add_occupancy(diff, minutes_of_day, duration, sign=1):
+    """Add (or remove) a search's runs to a minute-of-day difference array."""
+    for start in minutes_of_day:
+        end = start + duration
+        diff[start] += sign
+        if end <= MINUTES_PER_DAY:
+            diff[end] -= sign
+        else:
+            # Wrap past midnight
+            diff[MINUTES_PER_DAY] -= sign
+            diff[0] += sign
+            diff[end - MINUTES_PER_DAY] -= sign
+
+
+def _peak(diff):
+    running = peak = 0
+    for delta in diff[:MINUTES_PER_DAY]:
+        running += delta
+        if running > peak:
+            peak = running
+    return peak
+
+
+def _duration_minutes(runtime_sec):
+    return max(1, int(math.ceil(runtime_sec / 60.0)))
+
+
+# -- table ------------------------------------------------------------------
+
+class SearchTable(object):
+    """Column arrays over governance_search_cache.csv plus baseline totals."""
+
+    def __init__(self, rows, svc_unit_cost=DEFAULT_SVC_UNIT_COST):
+        self.svc_unit_cost = svc_unit_cost
+        self.titles = []
+        self.index = {}
+        self.crons = []
+        self.minutes = []
+        self.enabled = array('b')
+        self.frequency = array('d')
+        self.runtime = array('d')
+        self.runs_per_month = array('d')
+        self.svc_per_run = array('d')
+        self.monthly_svc = array('d')
+
+        for row in rows:
+            title = row.get('title', '')
+            if not title or title in self.index:
+                continue
+            freq = _to_float(row.get('frequency_seconds'), DEFAULT_FREQUENCY_SEC)
+            runtime = _to_float(row.get('avg_runtime_sec'), DEFAULT_RUNTIME_SEC) or DEFAULT_RUNTIME_SEC
+            minutes_of_day, runs_per_day = _schedule(row.get('cron_schedule', ''), freq)
+            runs_per_month = _to_float(row.get('runs_per_month')) or runs_per_day * DAYS_PER_MONTH
+            monthly_svc = _to_float(row.get('monthly_svc'))
+            if monthly_svc and runs_per_month:
+                svc_per_run = monthly_svc / runs_per_month
+            else:
+                svc_per_run = _to_float(row.get('svc_per_run')) or estimate_svc_per_run(freq, runtime)
+                monthly_svc = runs_per_month * svc_per_run
+
+            self.index[title] = len(self.titles)
+            self.titles.append(title)
+            self.crons.append(row.get('cron_schedule', ''))
+            self.minutes.append(minutes_of_day)
+            self.enabled.append(0 if str(row.get('disabled', '0')).strip() not in ('0', '') else 1)
+            self.frequency.append(freq)
+            self.runtime.append(runtime)
+            self.runs_per_month.append(runs_per_month)
+            self.svc_per_run.append(svc_per_run)
+            self.monthly_svc.append(monthly_svc)
+
+        self.baseline_svc = sum(s for s, on in zip(self.monthly_svc, self.enabled) if on)
+        self.baseline_diff = array('l', [0] * (MINUTES_PER_DAY + 1))
+        for i, on in enumerate(self.enabled):
+            if on:
+                _add_occupancy(self.baseline_diff, self.minutes[i], _duration_minutes(self.runtime[i]))
+        self.baseline_peak = _peak(self.baseline_diff)
+
+    def monthly_cost(self, monthly_svc):
+        return round(monthly_svc * self.svc_unit_cost / 12.0, 2)
+
+    def simulate(self, candidates):
+        """
+        Evaluate a candidate set against the baseline.
+
+        Args:
+            candidates: Iterable of dicts with title and optionally
+                action (disable|reschedule|narrow), cron_schedule,
+                range_factor, or earliest plus current_earliest
+
+        Returns:
+            dict: baseline, proposed and delta (monthly_svc, monthly_cost,
+            peak_concurrency, enabled_searches) and one result per search
+        """
+        diff = array('l', self.baseline_diff)
+        svc = self.baseline_svc
+        enabled = sum(self.enabled)
+        searches = []
+        seen = set()
+
+        for candidate in candidates:
+            title = candidate.get('title') or candidate.get('search_name') or ''
+            result = {'title': title, 'action': candidate.get('action', ''), 'status': 'ok', 'message': ''}
+            searches.append(result)
+            i = self.index.get(title)
+            if i is None:
+                result.update(status='not_found', message='Not in governance_search_cache')
+                continue
+            if title in seen:
+                result.update(status='duplicate', message='Search already in candidate set')
+                continue
+            seen.add(title)
+            if not self.enabled[i]:
+                result.update(status='disabled', message='Search is already disabled')
+                continue
+
+            old_svc = self.monthly_svc[i]
+            old_duration = _duration_minutes(self.runtime[i])
+            result.update(old_monthly_svc=round(old_svc), old_runs_per_month=round(self.runs_per_month[i]),
+                          old_monthly_cost=self.monthly_cost(old_svc))
+
+            try:
+                action = candidate.get('action') or ('reschedule' if candidate.get('cron_schedule') else
+                                                     'narrow' if candidate.get('range_factor') or candidate.get('earliest') else
+                                                     'disable')
+                if action not in ACTIONS:
+                    raise ValueError('unknown action: %s' % action)
+                result['action'] = action
+
+                if action == 'disable':
+                    new_minutes, runs_per_month, svc_per_run, runtime = [], 0.0, 0.0, 0.0
+                    enabled -= 1
+                else:
+                    new_minutes, runs_per_month = self.minutes[i], self.runs_per_month[i]
+                    svc_per_run, runtime = self.svc_per_run[i], self.runtime[i]
+                    if candidate.get('cron_schedule'):
+                        new_minutes, runs_per_day = parse_cron(candidate['cron_schedule'])
+                        runs_per_month = runs_per_day * DAYS_PER_MONTH
+                    factor = self._range_factor(candidate)
+                    if factor is not None:
+                        # Scanned volume - and so SVC and runtime - scales with the window
+                        svc_per_run *= factor
+                        runtime *= factor
+            except ValueError as e:
+                result.update(status='error', message=str(e))
+                continue
+
+            new_svc = runs_per_month * svc_per_run
+            _add_occupancy(diff, self.minutes[i], old_duration, sign=-1)
+            if new_minutes:
+                _add_occupancy(diff, new_minutes, _duration_minutes(runtime))
+            svc += new_svc - old_svc
+            result.update(new_monthly_svc=round(new_svc), new_runs_per_month=round(runs_per_month),
+                          new_monthly_cost=self.monthly_cost(new_svc))
+
+        baseline = self._totals(self.baseline_svc, self.baseline_peak, sum(self.enabled))
+        proposed = self._totals(svc, _peak(diff), enabled)
+        delta = dict((k, round(proposed[k] - baseline[k], 2)) for k in baseline)
+        return {'baseline': baseline, 'proposed': proposed, 'delta': delta, 'searches': searches}
+
+    def _totals(self, monthly_svc, peak, enabled):
+        return {
+            'monthly_svc': round(monthly_svc),
+            'monthly_cost': self.monthly_cost(monthly_svc),
+            'peak_concurrency': peak,
+            'enabled_searches': enabled,
+        }
+
+    @staticmethod
+    def _range_factor(candidate):
+        if candidate.get('range_factor') not in (None, ''):
+            factor = float(candidate['range_factor'])
+        elif candidate.get('earliest'):
+            if not candidate.get('current_earliest'):
+                raise ValueError('current_earliest is required with earliest')
+            factor = relative_seconds(candidate['earliest']) / float(relative_seconds(candidate['current_earliest']))
+        else:
+            return None
+        if factor <= 0:
+            raise ValueError('time range factor must be positive')
+        return factor
+
+
+def load_table(path=SEARCH_CACHE, settings_path=SETTINGS_LOOKUP):
+    """Return the SearchTable for a cache file, re-reading it only if it changed."""
+    try:
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+    cached = _tables.get(path)
+    if cached is None or cached['signature'] != signature:
+        rows = []
+        if signature is not None:
+            with open(path, 'r', newline='') as f:
+                rows = list(csv.DictReader(f))
+        cached = {'signature': signature, 'table': SearchTable(rows, load_svc_unit_cost(settings_path))}
+        _tables[path] = cached
+    return cached['table']
+
+
+def simulate(candidates, path=SEARCH_CACHE):
+    """Evaluate a candidate set against the current search cache."""
+    return load_table(path).simulate(candidates)
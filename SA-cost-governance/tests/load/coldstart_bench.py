@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+coldstart_bench.py - Per-request cost of the lookup REST handlers, before and after persist
+
+Before: admin_external handlers ran in a new interpreter per request, which
+imported the handler modules (and splunk.admin) and parsed the whole lookup
+before changing one row. After: a persistent process keeps the modules
+loaded and the parsed lookup cached (bin/lookup_cache.py), so a request is a
+cached read plus the rewrite.
+
+Both modes apply the same update_status change to a synthetic
+flagged_searches.csv of --rows rows and report per-request latency. splunkd's
+own dispatch overhead is not included; splunk.admin is imported in the
+per-request mode when it can be found under $SPLUNK_HOME.
+
+Usage:
+    python3 coldstart_bench.py --rows 5000 --requests 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin')
+SPLUNK_SITE = os.path.join(os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'lib', 'python3.9', 'site-packages')
+
+sys.path.insert(0, BIN_DIR)
+import lookup_cache
+
+# One request of the old handler: fresh interpreter, imports, full parse and rewrite
+COLD_REQUEST = r'''
+import csv, os, sys
+sys.path.insert(0, %(site)r)
+try:
+    import splunk.admin
+except ImportError:
+    pass
+sys.path.insert(0, %(bin)r)
+import change_feed, deadline_index
+path, name, status = %(path)r, %(name)r, %(status)r
+with open(path, 'r', newline='') as f:
+    reader = csv.DictReader(f)
+    fieldnames = reader.fieldnames
+    rows = list(reader)
+for r in rows:
+    if r['search_name'] == name:
+        r['status'] = status
+        break
+with open(path, 'w', newline='') as f:
+    writer = csv.DictWriter(f, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+'''
+
+
+def make_lookup(path, rows):
+    now = int(time.time())
+    data = [{'search_name': 'Scheduled Search %05d' % i, 'search_owner': 'user%03d' % (i % 150),
+             'search_app': 'search', 'flagged_by': 'admin', 'flagged_time': str(now),
+             'notification_sent': '1', 'notification_time': str(now),
+             'remediation_deadline': str(now + 86400 * (i % 14)), 'status': 'pending',
+             'reason': 'Scans all indexes', 'notes': ''} for i in range(rows)]
+    lookup_cache.write(path, lookup_cache.FLAGGED_FIELDS, data)
+
+
+def per_request_process(path, requests, rows):
+    timings = []
+    for i in range(requests):
+        code = COLD_REQUEST % {'site': SPLUNK_SITE, 'bin': BIN_DIR, 'path': path,
+                               'name': 'Scheduled Search %05d' % (i % rows),
+                               'status': 'review' if i % 2 else 'pending'}
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def persistent_process(path, requests, rows):
+    timings = []
+    for i in range(requests):
+        name = 'Scheduled Search %05d' % (i % rows)
+        start = time.perf_counter()
+        with lookup_cache.locked(path):
+            fieldnames, data = lookup_cache.read(path, lookup_cache.FLAGGED_FIELDS)
+            for r in data:
+                if r['search_name'] == name:
+                    r['status'] = 'review' if i % 2 else 'pending'
+                    break
+            lookup_cache.write(path, fieldnames, data)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        'requests': len(ordered),
+        'first_ms': round(timings[0] * 1000, 2),
+        'p50_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lookup handler per-request cost: per-request process vs persistent')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='coldstart_') as tmp:
+        path = os.path.join(tmp, 'flagged_searches.csv')
+        make_lookup(path, args.rows)
+        before = summarize(per_request_process(path, args.requests, args.rows))
+
+        # Start from an empty cache so the persistent first request pays the parse
+        lookup_cache._cache.clear()
+        make_lookup(path, args.rows)
+        lookup_cache._cache.clear()
+        after = summarize(persistent_process(path, args.requests, args.rows))
+
+    print(json.dumps({'rows': args.rows, 'per_request_process': before, 'persistent': after,
+                      'speedup_p50': round(before['p50_ms'] / after['p50_ms'], 1) if after['p50_ms'] else None},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
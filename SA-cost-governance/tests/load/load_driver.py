@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+load_driver.py - Replay governance workloads against splunkd (or the stand-in)
+
+The enforce and notify workflows call the app's own code, imported from a
+sandbox copy of the app (splunkd_standin.AppSandbox), so the load is the
+REST sequence the shipped scripts actually issue:
+
+    enforce   bin/disable_search.py enforce(): find the saved search,
+              disable it, update the flagged_searches KV record, write the
+              audit record, send the owner a sendemail one-shot
+    notify    bin/send_notification.py notify() with force=true: sendemail
+              one-shot + audit record
+    flag      governance.js dashboard actions: update_status through the
+              lookup writer endpoint (served by the real handler)
+    search    a plain one-shot search (dashboard panels, cache refresh)
+
+splunk.rest.simpleRequest is pointed at the target and timed, so the app's
+requests are attributed to components like the driver's own. Workers pick
+workflows at random by profile weight and run them back to back for
+--duration seconds (or --iterations workflows each). The report gives
+throughput, p50/p95/p99/max latency and error rate per component and per
+workflow.
+
+The app code imports Splunk's Python libraries, so run under Splunk's
+interpreter:
+
+    # Start an in-process stand-in with injected latency and errors
+    $SPLUNK_HOME/bin/splunk cmd python3 load_driver.py --standin --profile nightly --concurrency 16 \\
+        --duration 60 --latency sendemail=250:100 --error-rate kvstore=0.02
+
+    # Or target a running stand-in / splunkd
+    $SPLUNK_HOME/bin/splunk cmd python3 load_driver.py --url http://127.0.0.1:8089 --session-key "$KEY" \\
+        --profile dashboard
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import splunkd_standin
+
+APP_NS = '/servicesNS/nobody/SA-cost-governance'
+
+# Workflow weights per profile (normalised at run time)
+PROFILES = {
+    'nightly': {'enforce': 6, 'notify': 3, 'search': 1},
+    'dashboard': {'flag': 6, 'search': 4},
+    'mixed': {'enforce': 3, 'notify': 3, 'flag': 3, 'search': 1},
+}
+
+
+class Client(object):
+    """Keep-alive HTTP client for one worker; records every request."""
+
+    def __init__(self, base_url, session_key, recorder, timeout=30):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.session_key = session_key
+        self.recorder = recorder
+        self.timeout = timeout
+        self.conn = None
+
+    def _connect(self):
+        if self.scheme == 'https':
+            import ssl
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=ssl._create_unverified_context())
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, component, method, path, getargs=None, postargs=None, json_body=None):
+        """Issue one request; returns (status, parsed JSON or None). Status 0 = transport error."""
+        query = dict(getargs or {})
+        query.setdefault('output_mode', 'json')
+        url = path + '?' + urlencode(query)
+        headers = {}
+        body = None
+        if self.session_key:
+            headers['Authorization'] = 'Splunk %s' % self.session_key
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        elif postargs is not None:
+            body = urlencode(postargs)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        start = time.perf_counter()
+        status, payload = 0, None
+        for attempt in (1, 2):
+            try:
+                if self.conn is None:
+                    self.conn = self._connect()
+                self.conn.request(method, url, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                status = response.status
+                try:
+                    payload = json.loads(data) if data else None
+                except ValueError:
+                    payload = None
+                break
+            except (http.client.HTTPException, OSError):
+                # Reconnect once for a dropped keep-alive connection
+                self.close()
+                status = 0
+        self.recorder.record(component, time.perf_counter() - start, status == 0 or status >= 400)
+        return status, payload
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# -- app code -----------------------------------------------------------------
+
+class AppCode(object):
+    """The app's scripts, imported from a sandbox and sending splunk.rest requests to the target."""
+
+    def __init__(self, sandbox, base_url, recorder):
+        try:
+            import splunk
+            import splunk.rest
+        except ImportError:
+            raise RuntimeError('the app scripts need Splunk\'s Python libraries; '
+                               'run under $SPLUNK_HOME/bin/splunk cmd python3')
+        parsed = urlparse(base_url)
+        splunk.setDefault('protocol', parsed.scheme)
+        splunk.setDefault('host', parsed.hostname)
+        splunk.setDefault('port', parsed.port)
+        instrument_rest(splunk.rest, recorder)
+        self.disable_search = sandbox.import_module('disable_search')
+        self.send_notification = sandbox.import_module('send_notification')
+
+
+def instrument_rest(rest, recorder):
+    """Time every splunk.rest.simpleRequest call and record it against its component."""
+    if getattr(rest.simpleRequest, 'instrumented', False):
+        return
+    simple_request = rest.simpleRequest
+
+    def timed(path, *args, **kwargs):
+        method = kwargs.get('method', args[3] if len(args) > 3 else 'GET')
+        postargs = kwargs.get('postargs', args[2] if len(args) > 2 else None)
+        search = postargs.get('search', '') if isinstance(postargs, dict) else ''
+        component = splunkd_standin.classify(method, path, search) or 'other'
+        start = time.perf_counter()
+        error = True
+        try:
+            response, content = simple_request(path, *args, **kwargs)
+            error = response.status >= 400
+            return response, content
+        finally:
+            recorder.record(component, time.perf_counter() - start, error)
+
+    timed.instrumented = True
+    rest.simpleRequest = timed
+
+
+# -- workflows ----------------------------------------------------------------
+
+def wf_enforce(client, ctx, rng):
+    name = ctx.pick_search(rng)
+    result = ctx.app.disable_search.enforce(client.session_key, name, owner=ctx.owner(name))
+    return result['success']
+
+
+def wf_notify(client, ctx, rng):
+    name = ctx.pick_search(rng)
+    # force: the same search is picked many times a run; every pick should send
+    outcome, _ = ctx.app.send_notification.notify(client.session_key, 'reminder', name, ctx.owner(name),
+                                                  force=True, app='search')
+    return outcome == 'sent'
+
+
+def wf_flag(client, ctx, rng):
+    name = ctx.pick_search(rng)
+    status, _ = client.request('lookup_writer', 'POST', APP_NS + '/data/governance/lookup', postargs={
+        'action': 'update_status', 'lookup': 'flagged_searches.csv', 'search_name': name,
+        'status': rng.choice(['pending', 'review', 'notified'])})
+    return status in (200, 201)
+
+
+def wf_search(client, ctx, rng):
+    status, _ = client.request('search_jobs', 'POST', '/services/search/jobs', postargs={
+        'search': '| inputlookup flagged_searches_lookup | stats count by status', 'exec_mode': 'oneshot'})
+    return status in (200, 201)
+
+
+WORKFLOWS = {'enforce': wf_enforce, 'notify': wf_notify, 'flag': wf_flag, 'search': wf_search}
+
+
+# -- measurement --------------------------------------------------------------
+
+class Recorder(object):
+    """Thread-safe latency samples and error counts keyed by name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, name, seconds, error):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        rows = []
+        with self.lock:
+            for name in sorted(self.samples):
+                samples = sorted(self.samples[name])
+                count = len(samples)
+                errors = self.errors.get(name, 0)
+                rows.append({
+                    'name': name,
+                    'requests': count,
+                    'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+                    'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 2),
+                    'max_ms': round(samples[-1] * 1000, 2) if samples else 0.0,
+                    'errors': errors,
+                    'error_rate': round(errors / float(count), 4) if count else 0.0,
+                })
+        return rows
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class WorkloadContext(object):
+    """Search names workers draw from (the seeded or real flagged searches) and the app code they run."""
+
+    def __init__(self, names, owners=None, app=None):
+        self.names = names or ['Scheduled Search %05d' % i for i in range(200)]
+        self.owners = owners or {}
+        self.app = app
+
+    def pick_search(self, rng):
+        return rng.choice(self.names)
+
+    def owner(self, name):
+        return self.owners.get(name, 'admin')
+
+
+def run(base_url, profile, concurrency=8, duration=30.0, iterations=None, session_key='', names=None, seed=1,
+        owners=None, sandbox=None):
+    """
+    Run a workload and return the report.
+
+    Args:
+        base_url: splunkd management URL (stand-in or real)
+        profile: {workflow: weight}
+        concurrency: Worker threads
+        duration: Seconds to run (ignored when iterations is set)
+        iterations: Workflows per worker
+        session_key: Sent as "Authorization: Splunk <key>" when set
+        names: Search names to act on
+        seed: Base RNG seed; worker i uses seed + i
+        owners: {search name: owner} for notifications (default 'admin')
+        sandbox: splunkd_standin.AppSandbox to import the app code from
+            (default: a new one)
+
+    Returns:
+        dict: elapsed_sec, components (per-request rows), workflows (per-workflow rows)
+    """
+    unknown = [w for w in profile if w not in WORKFLOWS]
+    if unknown:
+        raise ValueError('Unknown workflow(s): %s' % ', '.join(unknown))
+    choices = [w for w in profile if profile[w] > 0]
+    weights = [profile[w] for w in choices]
+
+    components = Recorder()
+    workflows = Recorder()
+    app = None
+    if set(choices) & {'enforce', 'notify'}:
+        app = AppCode(sandbox or splunkd_standin.AppSandbox(), base_url, components)
+    ctx = WorkloadContext(names, owners, app)
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(base_url, session_key, components)
+        done = 0
+        try:
+            while (iterations is None and time.perf_counter() < deadline) or \
+                    (iterations is not None and done < iterations):
+                name = rng.choices(choices, weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok = WORKFLOWS[name](client, ctx, rng)
+                except Exception:
+                    ok = False
+                workflows.record(name, time.perf_counter() - start, not ok)
+                done += 1
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'elapsed_sec': round(elapsed, 3),
+        'concurrency': concurrency,
+        'profile': profile,
+        'components': components.summary(elapsed),
+        'workflows': workflows.summary(elapsed),
+    }
+
+
+def format_report(report):
+    header = '%-16s %9s %9s %9s %9s %9s %9s %8s' % ('name', 'requests', 'rps', 'p50_ms', 'p95_ms', 'p99_ms',
+                                                    'max_ms', 'err%')
+    lines = ['Elapsed %.1fs, concurrency %d' % (report['elapsed_sec'], report['concurrency'])]
+    for section in ('components', 'workflows'):
+        lines.extend(['', section.upper(), header])
+        for row in report[section]:
+            lines.append('%-16s %9d %9.1f %9.1f %9.1f %9.1f %9.1f %7.2f%%' % (
+                row['name'], row['requests'], row['throughput_rps'], row['p50_ms'], row['p95_ms'],
+                row['p99_ms'], row['max_ms'], row['error_rate'] * 100))
+    return '\n'.join(lines)
+
+
+def load_profile(args):
+    if args.workload:
+        with open(args.workload, 'r') as f:
+            workload = json.load(f)
+        return workload.get('mix', workload)
+    return PROFILES[args.profile]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay governance workloads and report per-component latency')
+    parser.add_argument('--url', help='splunkd management URL (e.g. http://127.0.0.1:8089)')
+    parser.add_argument('--standin', action='store_true', help='Start an in-process splunkd stand-in')
+    parser.add_argument('--session-key', default=os.environ.get('SPLUNK_SESSION_KEY', ''))
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='mixed')
+    parser.add_argument('--workload', help='JSON file with {"mix": {workflow: weight}}')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--iterations', type=int, help='Workflows per worker (overrides --duration)')
+    parser.add_argument('--searches', type=int, default=1000, help='Stand-in: saved searches to seed')
+    parser.add_argument('--flagged', type=int, default=200, help='Stand-in: flagged searches to seed')
+    parser.add_argument('--latency', action='append', metavar='COMPONENT=MEAN_MS[:JITTER_MS]')
+    parser.add_argument('--error-rate', action='append', metavar='COMPONENT=RATE')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    if not args.url and not args.standin:
+        parser.error('one of --url or --standin is required')
+
+    server = None
+    names = None
+    owners = None
+    base_url = args.url
+    if args.standin:
+        try:
+            state = splunkd_standin.StandinState(args.searches, args.flagged, seed=args.seed)
+            splunkd_standin.parse_fault_args(state, args.latency, args.error_rate)
+        except ImportError as e:
+            parser.error('%s: the app handlers need Splunk\'s Python libraries; '
+                         'run under $SPLUNK_HOME/bin/splunk cmd python3' % e)
+        except ValueError as e:
+            parser.error(str(e))
+        server, base_url = splunkd_standin.start_in_thread(state)
+        names = ['Scheduled Search %05d' % i for i in range(min(args.flagged, args.searches))]
+        owners = dict((name, state.saved_searches[name]['owner']) for name in names)
+
+    try:
+        report = run(base_url, load_profile(args), args.concurrency, args.duration, args.iterations,
+                     args.session_key or 'standin', names, args.seed, owners,
+                     server.state.sandbox if server is not None else None)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    if server is not None:
+        report['standin'] = server.state.snapshot()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+splunkd_standin.py - Local splunkd stand-in for load testing
+
+Emulates the splunkd management endpoints the governance scripts and
+dashboards call, with per-component latency and error injection, so the
+real bin/disable_search.py, bin/send_notification.py and REST handlers can
+be driven at volume without a Splunk instance:
+
+    component        endpoint
+    ---------------  -----------------------------------------------------
+    saved_searches   GET/POST  /servicesNS/<owner>/<app>/saved/searches[/<name>]
+    kvstore          GET/POST  /servicesNS/<owner>/<app>/storage/collections/data/<coll>[/<key>]
+    search_jobs      POST      /services/search/jobs          (any other search)
+    sendemail        POST      /services/search/jobs          (search containing "| sendemail")
+    lookup_writer    POST      /servicesNS/<owner>/<app>/data/governance/lookup
+                               (and the old admin/lookup_writer path)
+    update_lookup    POST      /servicesNS/<owner>/<app>/data/governance/update_lookup
+    extend_deadline  POST      /servicesNS/<owner>/<app>/data/governance/extend_deadline
+
+splunkd's own endpoints keep their state in memory. The app endpoints are
+served by the app's persistent handler classes (restmap.conf), imported
+from a sandbox copy of the app (AppSandbox) so their lookups, deadline
+index, change feed, audit log and notification ledger are written under a
+temporary directory instead of the working tree.
+
+The handlers and scripts import Splunk's Python libraries
+(splunk.persistconn, splunk.rest), so run under Splunk's interpreter:
+
+    $SPLUNK_HOME/bin/splunk cmd python3 splunkd_standin.py --port 8089 --searches 2000 \\
+        --latency saved_searches=40:15 --latency sendemail=250:100 \\
+        --error-rate kvstore=0.02
+
+Latency is "mean_ms[:jitter_ms]"; the delay is drawn uniformly from
+mean +/- jitter. GET /__standin/stats returns per-component counters.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, parse_qsl, unquote, urlparse
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMPONENTS = ('saved_searches', 'kvstore', 'search_jobs', 'sendemail', 'lookup_writer', 'update_lookup',
+              'extend_deadline')
+
+LOOKUP_HEADERS = ['search_name', 'search_owner', 'search_app', 'flagged_by', 'flagged_time',
+                  'notification_sent', 'notification_time', 'remediation_deadline', 'status', 'reason', 'notes']
+
+# component -> (module, handler class), as in restmap.conf
+APP_HANDLERS = {
+    'lookup_writer': ('lookup_writer', 'LookupWriterHandler'),
+    'update_lookup': ('update_lookup', 'UpdateLookupHandler'),
+    'extend_deadline': ('extend_deadline_handler', 'ExtendDeadlineHandler'),
+}
+
+_SAVED_RE = re.compile(r'^/servicesNS/([^/]+)/([^/]+)/saved/searches(?:/(.+))?$')
+_KV_RE = re.compile(r'^/servicesNS/([^/]+)/([^/]+)/storage/collections/data/([^/]+)(?:/(.+))?$')
+_JOBS_RE = re.compile(r'^/services(?:NS/[^/]+/[^/]+)?/search/jobs$')
+_APP_RE = re.compile(r'^/servicesNS/[^/]+/[^/]+/(?:admin/lookup_writer|data/governance/(lookup|update_lookup|'
+                     r'extend_deadline))(?:/(.*))?$')
+_SENDEMAIL_RE = re.compile(r'\|\s*sendemail\b')
+
+
+def classify(method, path, search=''):
+    """Return the component a request is served by, or None for an unknown endpoint."""
+    path = unquote(urlparse(path).path.rstrip('/'))
+    if _SAVED_RE.match(path):
+        return 'saved_searches'
+    if _KV_RE.match(path):
+        return 'kvstore'
+    if method == 'POST' and _JOBS_RE.match(path):
+        return 'sendemail' if _SENDEMAIL_RE.search(search or '') else 'search_jobs'
+    match = _APP_RE.match(path)
+    if match:
+        return 'lookup_writer' if match.group(1) in (None, 'lookup') else match.group(1)
+    return None
+
+
+class AppSandbox(object):
+    """
+    A copy of the app's bin/ beside an empty lookups/ directory.
+
+    The app's modules locate their lookups relative to their own file, so
+    importing them from the copy keeps every write inside the sandbox.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or tempfile.mkdtemp(prefix='splunkd_standin_')
+        self.bin_dir = os.path.join(self.root, 'bin')
+        self.lookup_dir = os.path.join(self.root, 'lookups')
+        if not os.path.isdir(self.bin_dir):
+            shutil.copytree(os.path.join(APP_DIR, 'bin'), self.bin_dir,
+                            ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+        os.makedirs(self.lookup_dir, exist_ok=True)
+
+    def import_module(self, name):
+        """Import one of the app's modules from the sandbox copy."""
+        if self.bin_dir not in sys.path:
+            sys.path.insert(0, self.bin_dir)
+        module = __import__(name)
+        if not os.path.abspath(module.__file__).startswith(self.bin_dir + os.sep):
+            raise RuntimeError('%s was already imported from %s, not the sandbox' % (name, module.__file__))
+        return module
+
+
+class Fault(object):
+    """Latency and error injection settings for one component."""
+
+    def __init__(self, mean_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self, rng):
+        ms = self.mean_ms + rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else self.mean_ms
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def fails(self, rng):
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class StandinState(object):
+    """In-memory splunkd state shared by all request threads."""
+
+    def __init__(self, searches=1000, flagged=200, app_dir=None, seed=1):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.faults = dict((c, Fault()) for c in COMPONENTS)
+        self.stats = dict((c, {'requests': 0, 'errors': 0}) for c in COMPONENTS)
+        self.sandbox = AppSandbox(app_dir)
+        self.lookup_dir = self.sandbox.lookup_dir
+        self.saved_searches = {}
+        self.collections = {'flagged_searches': {}, 'governance_audit_log': {}}
+        self.jobs = 0
+        self._seed(searches, flagged)
+        # One instance per handler, as splunkd keeps one persistent process per [script:] stanza
+        self.handlers = {}
+        for component, (module_name, class_name) in APP_HANDLERS.items():
+            handler_class = getattr(self.sandbox.import_module(module_name), class_name)
+            self.handlers[component] = handler_class(None, None)
+
+    def _seed(self, searches, flagged):
+        now = int(time.time())
+        for i in range(searches):
+            name = 'Scheduled Search %05d' % i
+            self.saved_searches[name] = {'owner': 'user%03d' % (i % 150), 'app': 'search', 'disabled': '0',
+                                         'cron_schedule': '*/%d * * * *' % (5 * (1 + i % 12))}
+        rows = []
+        for i in range(min(flagged, searches)):
+            name = 'Scheduled Search %05d' % i
+            meta = self.saved_searches[name]
+            key = '%024x' % i
+            self.collections['flagged_searches'][key] = {
+                '_key': key, 'search_name': name, 'search_owner': meta['owner'], 'search_app': meta['app'],
+                'status': 'pending', 'notification_time': now, 'remediation_deadline': now - 3600,
+            }
+            rows.append({'search_name': name, 'search_owner': meta['owner'], 'search_app': meta['app'],
+                         'flagged_by': 'admin', 'flagged_time': str(now), 'notification_sent': '1',
+                         'notification_time': str(now), 'remediation_deadline': str(now - 3600),
+                         'status': 'pending', 'reason': 'load test', 'notes': ''})
+        self._write_lookup('flagged_searches.csv', LOOKUP_HEADERS, rows)
+
+    def _write_lookup(self, lookup, headers, rows):
+        path = os.path.join(self.lookup_dir, lookup)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def configure(self, component, mean_ms=None, jitter_ms=None, error_rate=None):
+        fault = self.faults[component]
+        if mean_ms is not None:
+            fault.mean_ms = mean_ms
+        if jitter_ms is not None:
+            fault.jitter_ms = jitter_ms
+        if error_rate is not None:
+            fault.error_rate = error_rate
+
+    def record(self, component, error):
+        with self.lock:
+            self.stats[component]['requests'] += 1
+            if error:
+                self.stats[component]['errors'] += 1
+
+    # -- endpoint behaviour -------------------------------------------------
+
+    def list_saved_searches(self, query):
+        match = re.search(r'name="([^"]+)"', query.get('search', [''])[0])
+        with self.lock:
+            names = [match.group(1)] if match else list(self.saved_searches)[:int(query.get('count', ['30'])[0])]
+            entries = []
+            for name in names:
+                meta = self.saved_searches.get(name)
+                if meta is None:
+                    continue
+                edit = '/servicesNS/%s/%s/saved/searches/%s' % (meta['owner'], meta['app'], name)
+                entries.append({'name': name, 'links': {'edit': edit},
+                                'acl': {'owner': meta['owner'], 'app': meta['app']},
+                                'content': {'disabled': meta['disabled'], 'cron_schedule': meta['cron_schedule']}})
+        return 200, {'entry': entries}
+
+    def update_saved_search(self, name, form):
+        with self.lock:
+            meta = self.saved_searches.get(name)
+            if meta is None:
+                return 404, {'messages': [{'type': 'ERROR', 'text': 'Could not find object id=%s' % name}]}
+            for key in ('disabled', 'cron_schedule'):
+                if key in form:
+                    meta[key] = form[key][0]
+        return 200, {'entry': [{'name': name, 'content': dict(meta)}]}
+
+    def kv_get(self, collection, key):
+        with self.lock:
+            records = self.collections.setdefault(collection, {})
+            if key:
+                record = records.get(key)
+                return (200, dict(record)) if record else (404, {'messages': [{'type': 'ERROR', 'text': 'Not found'}]})
+            return 200, [dict(r) for r in records.values()]
+
+    def kv_post(self, collection, key, body):
+        try:
+            record = json.loads(body or '{}')
+        except ValueError:
+            return 400, {'messages': [{'type': 'ERROR', 'text': 'Invalid JSON'}]}
+        with self.lock:
+            records = self.collections.setdefault(collection, {})
+            key = key or record.get('_key') or '%024x' % self.rng.getrandbits(96)
+            status = 200 if key in records else 201
+            record['_key'] = key
+            records[key] = record
+        return status, {'_key': key}
+
+    def create_job(self):
+        with self.lock:
+            self.jobs += 1
+            sid = 'standin_%d_%d' % (int(time.time()), self.jobs)
+        return 201, {'sid': sid, 'results': []}
+
+    def call_handler(self, component, method, resource_id, query, body, user='admin'):
+        """Pass a request to the app's persistent handler in the shape splunkd sends it."""
+        request = {
+            'method': method,
+            'path_info': resource_id or '',
+            'query': [[k, v] for k, values in query.items() for v in values],
+            'form': [list(pair) for pair in parse_qsl(body, keep_blank_values=True)],
+            'payload': body,
+            'session': {'user': user},
+        }
+        response = self.handlers[component].handle(json.dumps(request))
+        return response['status'], json.loads(response['payload'])
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'stats': json.loads(json.dumps(self.stats)),
+                'faults': dict((c, vars(f)) for c, f in self.faults.items()),
+                'disabled_searches': sum(1 for m in self.saved_searches.values() if m['disabled'] == '1'),
+                'jobs': self.jobs,
+                'app_dir': self.sandbox.root,
+            }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Routes requests to StandinState, applying the component's fault settings."""
+
+    server_version = 'splunkd-standin/1.0'
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this Nagle + delayed ACK adds ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, fmt, *args)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ''
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method):
+        url = urlparse(self.path)
+        path = unquote(url.path.rstrip('/'))
+        query = parse_qs(url.query)
+        body = self._body() if method == 'POST' else ''
+        state = self.server.state
+
+        if path == '/__standin/stats':
+            return None, lambda: (200, state.snapshot())
+
+        component = classify(method, path, parse_qs(body).get('search', [''])[0])
+        if component == 'saved_searches':
+            name = _SAVED_RE.match(path).group(3)
+            if method == 'GET' and not name:
+                return component, lambda: state.list_saved_searches(query)
+            form = parse_qs(body)
+            return component, lambda: state.update_saved_search(name, form)
+
+        if component == 'kvstore':
+            collection, key = _KV_RE.match(path).group(3, 4)
+            if method == 'GET':
+                return component, lambda: state.kv_get(collection, key)
+            return component, lambda: state.kv_post(collection, key, body)
+
+        if component in ('search_jobs', 'sendemail'):
+            return component, state.create_job
+
+        if component in APP_HANDLERS:
+            resource_id = _APP_RE.match(path).group(2)
+            return component, lambda: state.call_handler(component, method, resource_id, query, body)
+
+        return None, lambda: (404, {'messages': [{'type': 'ERROR', 'text': 'Unknown endpoint %s' % path}]})
+
+    def _handle(self, method):
+        component, action = self._route(method)
+        state = self.server.state
+        if component is None:
+            return self._send(*action())
+
+        fault = state.faults[component]
+        fault.delay(state.rng)
+        if fault.fails(state.rng):
+            state.record(component, True)
+            return self._send(503, {'messages': [{'type': 'ERROR', 'text': 'Injected failure (%s)' % component}]})
+
+        status, payload = action()
+        state.record(component, status >= 400)
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the shared stand-in state."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, state, verbose=False):
+        ThreadingHTTPServer.__init__(self, address, StandinHandler)
+        self.state = state
+        self.verbose = verbose
+
+
+def parse_fault_args(state, latencies, error_rates):
+    """Apply --latency component=mean[:jitter] and --error-rate component=rate options."""
+    for spec in latencies or []:
+        component, value = spec.split('=', 1)
+        if component not in COMPONENTS:
+            raise ValueError('Unknown component %r (expected one of %s)' % (component, ', '.join(COMPONENTS)))
+        mean, _, jitter = value.partition(':')
+        state.configure(component, mean_ms=float(mean), jitter_ms=float(jitter or 0))
+    for spec in error_rates or []:
+        component, value = spec.split('=', 1)
+        if component not in COMPONENTS:
+            raise ValueError('Unknown component %r (expected one of %s)' % (component, ', '.join(COMPONENTS)))
+        state.configure(component, error_rate=float(value))
+
+
+def start_in_thread(state, host='127.0.0.1', port=0):
+    """Start a stand-in on a background thread; returns (server, base_url)."""
+    server = StandinServer((host, port), state)
+    thread = threading.Thread(target=server.serve_forever, name='splunkd-standin', daemon=True)
+    thread.start()
+    return server, 'http://%s:%d' % server.server_address[:2]
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Local splunkd stand-in for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--searches', type=int, default=1000, help='Saved searches to seed')
+    parser.add_argument('--flagged', type=int, default=200, help='Flagged (overdue) searches to seed')
+    parser.add_argument('--app-dir', help='Directory for the sandbox copy of the app (default: temp dir)')
+    parser.add_argument('--latency', action='append', metavar='COMPONENT=MEAN_MS[:JITTER_MS]')
+    parser.add_argument('--error-rate', action='append', metavar='COMPONENT=RATE')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true')
+    return parser
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    try:
+        state = StandinState(args.searches, args.flagged, args.app_dir, args.seed)
+        parse_fault_args(state, args.latency, args.error_rate)
+    except ImportError as e:
+        print('Error: %s (run under $SPLUNK_HOME/bin/splunk cmd python3)' % e, file=sys.stderr)
+        sys.exit(2)
+    except ValueError as e:
+        print('Error: %s' % e, file=sys.stderr)
+        sys.exit(2)
+
+    server = StandinServer((args.host, args.port), state, verbose=args.verbose)
+    print('splunkd stand-in listening on http://%s:%d (app sandbox in %s)'
+          % (args.host, args.port, state.sandbox.root))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+test_audit_store.py - Partitioned appends, queries and legacy migration of bin/audit_store.py
+
+Usage:
+    python3 -m pytest tests/python/test_audit_store.py
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import audit_store
+
+DAY = 86400
+T0 = 1700000000
+LEGACY_FIELDS = ['timestamp', 'action', 'search_name', 'performed_by', 'details']
+
+
+def legacy_row(i):
+    return {'timestamp': T0 + i, 'action': 'flagged', 'search_name': 's%d' % i, 'performed_by': 'alice',
+            'details': 'row %d' % i}
+
+
+class AuditStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = audit_store.AuditStore(os.path.join(self.tmpdir, 'audit_log'))
+        self.legacy = os.path.join(self.tmpdir, 'governance_audit_log.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_legacy(self, rows, mode='w'):
+        with open(self.legacy, mode, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=LEGACY_FIELDS)
+            if mode == 'w':
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def read_legacy(self):
+        with open(self.legacy, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_append_and_query_by_day(self):
+        self.store.append([{'timestamp': T0 + d * DAY, 'action': 'flagged', 'search_name': 's%d' % d}
+                           for d in range(3)], today=audit_store._day(T0 + 2 * DAY))
+        self.assertEqual([p['file'].endswith('.gz') for p in self.store.partitions()], [True, True, False])
+        rows = self.store.query(T0 + DAY, T0 + 3 * DAY, legacy_path=None)
+        self.assertEqual([r['search_name'] for r in rows], ['s2', 's1'])
+        self.assertEqual(len(self.store.query(0, T0 + 3 * DAY, filters={'search_name': 's0'}, legacy_path=None)), 1)
+
+    def test_migrate_legacy(self):
+        self.write_legacy([legacy_row(i) for i in range(5)])
+        self.assertEqual(self.store.migrate_legacy(self.legacy), 5)
+        self.assertEqual(self.read_legacy(), [])
+        self.assertFalse(os.path.exists(self.legacy + '.migrating'))
+        self.assertEqual(len(self.store.query(0, T0 + DAY, legacy_path=self.legacy)), 5)
+        self.assertEqual(self.store.migrate_legacy(self.legacy), 0)
+
+    def test_row_appended_during_migration_is_kept(self):
+        self.write_legacy([legacy_row(i) for i in range(3)])
+        real_append = self.store.append
+
+        def append_then_write(rows):
+            # An outputlookup append=true landing while the claimed rows are migrated
+            self.write_legacy([legacy_row(99)], mode='a')
+            return real_append(rows)
+
+        with mock.patch.object(self.store, 'append', append_then_write):
+            self.assertEqual(self.store.migrate_legacy(self.legacy), 3)
+        self.assertEqual([r['search_name'] for r in self.read_legacy()], ['s99'])
+
+        self.assertEqual(self.store.migrate_legacy(self.legacy), 1)
+        names = sorted(r['search_name'] for r in self.store.query(0, T0 + DAY, legacy_path=self.legacy))
+        self.assertEqual(names, ['s0', 's1', 's2', 's99'])
+
+    def test_interrupted_migration_does_not_duplicate(self):
+        self.write_legacy([legacy_row(i) for i in range(3)])
+        real_remove = os.remove
+
+        def crash_on_claimed(path):
+            if path.endswith('.migrating'):
+                raise OSError('killed')
+            real_remove(path)
+
+        with mock.patch('os.remove', crash_on_claimed):
+            with self.assertRaises(OSError):
+                self.store.migrate_legacy(self.legacy)
+
+        # The claimed rows were already appended; the retry only removes the claim
+        self.assertEqual(self.store.migrate_legacy(self.legacy), 0)
+        self.assertEqual(len(self.store.query(0, T0 + DAY, legacy_path=None)), 3)
+        self.assertFalse(os.path.exists(self.legacy + '.migrating'))
+
+
+if __name__ == '__main__':
+    unittest.main()
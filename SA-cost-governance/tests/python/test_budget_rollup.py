@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+test_budget_rollup.py - Hour-bucket folding, backfill and budget units of bin/budget_rollup.py
+
+Usage:
+    python3 -m pytest tests/python/test_budget_rollup.py
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import budget_rollup
+
+HOUR = budget_rollup.HOUR
+# 2023-11-14 22:00 UTC
+H0 = 1700000000 // HOUR * HOUR
+DAY = '2023-11-14'
+
+
+def usage(hour, entity='main', gb=1.0):
+    return {'day': DAY, 'hour': hour, 'entity_type': 'index', 'entity': entity, 'gb': gb}
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class BudgetRollupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patches = dict((name, os.path.join(self.tmpdir, name.lower() + '.csv'))
+                       for name in ('USER_BUDGETS', 'INDEX_ALLOCATION', 'COST_SETTINGS', 'GOVERNANCE_SETTINGS'))
+        for name, path in patches.items():
+            patcher = mock.patch.object(budget_rollup, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        write_csv(budget_rollup.COST_SETTINGS, [{'cost_per_gb': 10, 'warning_threshold_percent': 80}])
+        write_csv(budget_rollup.GOVERNANCE_SETTINGS, [{'setting_name': 'svc_unit_cost', 'setting_value': 1200}])
+        self.rollups = budget_rollup.BudgetRollups(os.path.join(self.tmpdir, 'budget_rollups'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def gb(self, entity='main'):
+        return float(self.rollups.read_month(DAY[:7])[(DAY, 'index', entity)]['gb'])
+
+    def test_overlapping_windows_fold_each_hour_once(self):
+        summary = self.rollups.fold([usage(H0 - 2 * HOUR), usage(H0 - HOUR)], 'license',
+                                    window=(H0 - 2 * HOUR, H0), now=H0)
+        self.assertEqual((summary['rows_folded'], summary['rows_skipped']), (2, 0))
+
+        # A later run overlapping the folded hours only adds the new one
+        summary = self.rollups.fold([usage(H0 - HOUR), usage(H0)], 'license', window=(H0 - HOUR, H0 + HOUR),
+                                    now=H0 + HOUR)
+        self.assertEqual((summary['rows_folded'], summary['rows_skipped']), (1, 1))
+        self.assertEqual(self.gb(), 3.0)
+        self.assertEqual(self.rollups.backfill_start('license', now=H0 + HOUR, max_hours=3), H0 + HOUR)
+
+    def test_missed_runs_are_backfilled(self):
+        # The first run reaches back as far as a backfill may go
+        first = self.rollups.backfill_start('license', now=H0 - 4 * HOUR)
+        self.assertEqual(first, H0 - 4 * HOUR - budget_rollup.MAX_BACKFILL_HOURS * HOUR)
+        self.rollups.fold([usage(H0 - 5 * HOUR)], 'license', window=(first, H0 - 4 * HOUR), now=H0)
+        # The runs for the next three hours never happened
+        start = self.rollups.backfill_start('license', now=H0)
+        self.assertEqual(start, H0 - 4 * HOUR)
+
+        rows = [usage(h) for h in range(start, H0, HOUR)]
+        summary = self.rollups.fold(rows, 'license', window=(start, H0), now=H0)
+        self.assertEqual(summary['rows_folded'], 4)
+        self.assertEqual(self.gb(), 5.0)
+        self.assertEqual(self.rollups.backfill_start('license', now=H0), H0)
+        # Sources are tracked separately
+        self.assertEqual(self.rollups.backfill_start('scheduler', now=H0),
+                         H0 - budget_rollup.MAX_BACKFILL_HOURS * HOUR)
+
+    def test_partial_hours_are_left_for_the_next_run(self):
+        summary = self.rollups.fold([usage(H0 - HOUR), usage(H0)], 'license',
+                                    window=(H0 - HOUR, H0 + HOUR // 2), now=H0 + HOUR // 2)
+        self.assertEqual((summary['rows_folded'], summary['rows_skipped']), (1, 1))
+        self.assertEqual(self.rollups.backfill_start('license', now=H0 + HOUR, max_hours=2), H0)
+
+    def test_legacy_checkpoint_is_the_floor(self):
+        os.makedirs(self.rollups.root)
+        with open(self.rollups.state_path, 'w') as f:
+            f.write('{"folded": {"license": %d}, "alerted": {}}' % H0)
+        self.assertEqual(self.rollups.backfill_start('license', now=H0 + 2 * HOUR), H0)
+        summary = self.rollups.fold([usage(H0 - HOUR)], 'license', window=(H0 - HOUR, H0), now=H0)
+        self.assertTrue(summary['skipped'])
+
+    def test_user_budget_is_costed_like_user_spend(self):
+        write_csv(budget_rollup.USER_BUDGETS, [{'username': 'alice', 'monthly_budget_svc': 120,
+                                                'alert_threshold_percent': 50, 'manager_email': ''}])
+        self.rollups.fold([{'day': DAY, 'hour': H0 - HOUR, 'entity_type': 'user', 'entity': 'alice', 'svc': 60}],
+                          'scheduler', window=(H0 - HOUR, H0), now=H0)
+
+        row = [r for r in self.rollups.burn_down(now=H0, mark_alerts=False) if r['entity'] == 'alice'][0]
+        # 120 SVC x $1200 / 12 budget against 60 SVC of spend
+        self.assertEqual(row['budget'], 12000.0)
+        self.assertEqual(row['spend_mtd'], 6000.0)
+        self.assertEqual(row['percent_used'], 50.0)
+        self.assertEqual(row['alert'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
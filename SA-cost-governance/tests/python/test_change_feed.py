@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+test_change_feed.py - Events, cursors and out-of-band lookup rewrites in bin/change_feed.py
+
+Usage:
+    python3 -m pytest tests/python/test_change_feed.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import change_feed
+
+
+def touch(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    # Force a distinct mtime even on coarse-grained filesystems
+    stamp = time.time_ns() + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+class ChangeFeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'governance_changes.jsonl')
+        self.lookup = os.path.join(self.tmpdir, 'flagged_searches.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_row_changes_and_cursor(self):
+        change_feed.record_row_change(None, {'search_name': 'a', 'status': 'pending'}, path=self.path)
+        change_feed.record_row_change({'search_name': 'a', 'status': 'pending', 'remediation_deadline': '1'},
+                                      {'search_name': 'a', 'status': 'notified', 'remediation_deadline': '2'},
+                                      path=self.path)
+        feed = change_feed.read_since(0, path=self.path)
+        self.assertEqual([e['type'] for e in feed['events']], ['flag', 'status', 'deadline'])
+        self.assertEqual(feed['cursor'], 3)
+        self.assertEqual(change_feed.read_since(3, path=self.path)['events'], [])
+
+    def test_long_poll_limit_keeps_the_cursor_at_the_last_event_returned(self):
+        change_feed.append_events([{'type': 'flag', 'search_name': 's%d' % i} for i in range(7)], path=self.path)
+        first = change_feed.wait_for_changes(0, timeout=1, poll_interval=0.01, limit=3, path=self.path, lookups=[])
+        self.assertEqual(([e['seq'] for e in first['events']], first['cursor']), ([1, 2, 3], 3))
+        second = change_feed.wait_for_changes(first['cursor'], timeout=1, poll_interval=0.01, limit=3,
+                                              path=self.path, lookups=[])
+        self.assertEqual([e['seq'] for e in second['events']], [4, 5, 6])
+
+    def test_outputlookup_rewrite_is_a_refresh_event(self):
+        touch(self.lookup, 'search_name,status\n')
+        # First sighting only records the signature
+        self.assertEqual(change_feed.sync_lookups([self.lookup], self.path), 0)
+
+        # A handler write records its own signature: no refresh
+        touch(self.lookup, 'search_name,status\na,pending\n')
+        change_feed.record_row_change(None, {'search_name': 'a', 'status': 'pending'}, path=self.path,
+                                      lookup_path=self.lookup)
+        self.assertEqual(change_feed.sync_lookups([self.lookup], self.path), 1)
+
+        # A saved search rewrites it: one refresh event, reported once
+        touch(self.lookup, 'search_name,status\na,notified\n')
+        feed = change_feed.wait_for_changes(1, timeout=1, poll_interval=0.01, path=self.path, lookups=[self.lookup])
+        self.assertEqual([(e['type'], e['lookup']) for e in feed['events']], [('refresh', 'flagged_searches.csv')])
+        self.assertEqual(change_feed.sync_lookups([self.lookup], self.path), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+test_chargeback_export.py - Partitions, manifest fingerprints and chunked writes of bin/chargeback_export.py
+
+Usage:
+    python3 -m pytest tests/python/test_chargeback_export.py
+"""
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import budget_rollup
+import chargeback_export
+
+# 2023-11-14 22:13 UTC
+NOW = 1700000000
+MONTH = '2023-11'
+LAST_MONTH = '2023-10'
+
+
+def write_csv(path, fields, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    # Force a distinct mtime even on coarse-grained filesystems
+    stamp = time.time_ns() + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+def rollup(day, entity_type, entity, cost):
+    return {'day': day, 'entity_type': entity_type, 'entity': entity, 'gb': '1.0', 'svc': '', 'cost': cost}
+
+
+def read_partition(result):
+    with gzip.open(result['path'], 'rt', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class ChargebackExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ('SEARCH_CACHE', 'INDEX_ALLOCATION'):
+            patcher = mock.patch.object(chargeback_export, name, os.path.join(self.tmpdir, name.lower() + '.csv'))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.rollups = budget_rollup.BudgetRollups(os.path.join(self.tmpdir, 'budget_rollups'))
+        os.makedirs(self.rollups.root)
+        for month in (LAST_MONTH, MONTH):
+            write_csv(os.path.join(self.rollups.root, month + '.csv'), budget_rollup.ROLLUP_FIELDS, [
+                rollup(month + '-01', 'index', 'main', '10'),
+                rollup(month + '-02', 'index', 'main', '12'),
+                rollup(month + '-01', 'cost_center', 'IT', '22'),
+                rollup(month + '-01', 'user', 'alice', '3'),
+            ])
+        write_csv(chargeback_export.INDEX_ALLOCATION, ['index_name', 'cost_center', 'owner', 'budget_allocation'],
+                  [{'index_name': 'main', 'cost_center': 'IT', 'owner': 'ops', 'budget_allocation': '500'}])
+        write_csv(chargeback_export.SEARCH_CACHE, ['title', 'owner', 'app', 'disabled', 'runs_per_month',
+                                                   'monthly_svc', 'monthly_cost'], [
+            {'title': 'hourly', 'owner': 'alice', 'app': 'search', 'disabled': '0', 'runs_per_month': '720',
+             'monthly_svc': '7200', 'monthly_cost': '720'},
+            {'title': 'retired', 'owner': 'bob', 'app': 'search', 'disabled': '1', 'runs_per_month': '720',
+             'monthly_svc': '100', 'monthly_cost': '10'},
+        ])
+        self.exporter = self.make_exporter()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_exporter(self, chunk_rows=chargeback_export.CHUNK_ROWS):
+        return chargeback_export.ChargebackExporter(os.path.join(self.tmpdir, 'chargeback'), self.rollups,
+                                                    fmt='csv', chunk_rows=chunk_rows)
+
+    def statuses(self, results):
+        return dict((r['kind'], r['status']) for r in results)
+
+    def test_partitions_and_rows(self):
+        results = dict((r['kind'], r) for r in self.exporter.export_month(MONTH, now=NOW))
+        self.assertEqual(sorted(results), ['cost_center', 'index', 'search', 'user'])
+        index_rows = read_partition(results['index'])
+        self.assertEqual([(r['day'], r['cost_center'], r['cost']) for r in index_rows],
+                         [('2023-11-01', 'IT', '10'), ('2023-11-02', 'IT', '12')])
+        self.assertTrue(results['index']['path'].endswith(os.path.join('month=2023-11', 'index.csv.gz')))
+
+    def test_disabled_searches_are_not_exported(self):
+        results = dict((r['kind'], r) for r in self.exporter.export_month(MONTH, now=NOW))
+        self.assertEqual([r['search_name'] for r in read_partition(results['search'])], ['hourly'])
+
+    def test_search_partition_only_for_the_current_month(self):
+        kinds = [r['kind'] for r in self.exporter.export_month(LAST_MONTH, now=NOW)]
+        self.assertEqual(kinds, ['index', 'cost_center', 'user'])
+
+    def test_unchanged_partitions_are_skipped(self):
+        self.exporter.export_month(MONTH, now=NOW)
+        again = self.make_exporter().export_month(MONTH, now=NOW)
+        self.assertEqual(set(self.statuses(again).values()), {'skipped'})
+        self.assertEqual(dict((r['kind'], r['rows']) for r in again)['index'], 2)
+
+    def test_changed_input_or_force_rewrites(self):
+        self.exporter.export_month(MONTH, now=NOW)
+        write_csv(chargeback_export.INDEX_ALLOCATION, ['index_name', 'cost_center', 'owner', 'budget_allocation'],
+                  [{'index_name': 'main', 'cost_center': 'Finance', 'owner': 'ops', 'budget_allocation': '500'}])
+        self.assertEqual(self.statuses(self.exporter.export_month(MONTH, now=NOW)),
+                         {'index': 'written', 'cost_center': 'written', 'user': 'written', 'search': 'skipped'})
+        self.assertEqual(set(self.statuses(self.exporter.export_month(MONTH, force=True, now=NOW)).values()),
+                         {'written'})
+
+    def test_csv_fallback_writes_in_chunks(self):
+        exporter = self.make_exporter(chunk_rows=1)
+        self.assertEqual([len(c) for c in exporter._chunks(iter(range(5)))], [1, 1, 1, 1, 1])
+        with mock.patch.object(csv.DictWriter, 'writerows', autospec=True,
+                               side_effect=csv.DictWriter.writerows) as writerows:
+            results = dict((r['kind'], r) for r in exporter.export_month(LAST_MONTH, now=NOW))
+        self.assertEqual(results['index']['rows'], 2)
+        self.assertEqual([len(call.args[1]) for call in writerows.call_args_list], [1, 1, 1, 1])
+        self.assertEqual(len(read_partition(results['index'])), 2)
+
+    def export_during_another(self, month):
+        """Export MONTH while a forced export of month runs as the index partition is being written"""
+        other = self.make_exporter()
+        rows = self.exporter._rows
+
+        def interleaved(kind, partition_month):
+            if kind == 'index':
+                other.export_month(month, force=True, now=NOW)
+            for row in rows(kind, partition_month):
+                yield row
+
+        with mock.patch.object(self.exporter, '_rows', side_effect=interleaved):
+            return dict((r['kind'], r) for r in self.exporter.export_month(MONTH, now=NOW))
+
+    def test_overlapping_exports_of_one_partition_use_their_own_temp_files(self):
+        results = self.export_during_another(MONTH)
+        self.assertEqual(len(read_partition(results['index'])), 2)
+
+    def test_overlapping_exports_keep_both_partitions(self):
+        self.export_during_another(LAST_MONTH)
+        with open(self.exporter.manifest_path) as f:
+            partitions = json.load(f)['partitions']
+        self.assertEqual(len(partitions), 7)
+        leftovers = [name for _, _, files in os.walk(self.exporter.root) for name in files if name.endswith('.tmp')]
+        self.assertEqual(leftovers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
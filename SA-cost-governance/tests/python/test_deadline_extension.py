@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+test_deadline_extension.py - Row targeting and deadline extension in bin/deadline_extension.py
+
+Usage:
+    python3 -m pytest tests/python/test_deadline_extension.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import deadline_extension
+
+DAY = 86400
+NOW = 1700000000
+
+
+def flagged(name, deadline, owner='alice', app='search', status='pending'):
+    return {'search_name': name, 'search_owner': owner, 'search_app': app, 'remediation_deadline': str(deadline),
+            'status': status}
+
+
+class DeadlineExtensionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [
+            flagged('a', NOW + DAY),
+            flagged('b', NOW - DAY, owner='bob'),
+            flagged('c', NOW + 2 * DAY, status='resolved'),
+            flagged('d', NOW + 3 * DAY, app='other', status='notified'),
+        ]
+
+    def test_parse_names(self):
+        self.assertEqual(deadline_extension.parse_names(['a, b', 'c\nd', 'a', ' ']), ['a', 'b', 'c', 'd'])
+
+    def test_extend_by_name(self):
+        results, changes = deadline_extension.extend_rows(self.rows, 7, names=['a', 'missing'], now=NOW)
+        self.assertEqual(self.rows[0]['remediation_deadline'], str(NOW + 8 * DAY))
+        self.assertEqual([(r['search_name'], r['status']) for r in results],
+                         [('a', 'updated'), ('missing', 'not_found')])
+        self.assertEqual(changes[0][0]['remediation_deadline'], str(NOW + DAY))
+        self.assertIs(changes[0][1], self.rows[0])
+
+    def test_reduction_is_floored_at_now(self):
+        results, _ = deadline_extension.extend_rows(self.rows, -5, names=['a'], now=NOW)
+        self.assertEqual(results[0]['new_deadline'], str(NOW))
+
+    def test_filters_default_to_open_statuses(self):
+        results, _ = deadline_extension.extend_rows(self.rows, 1, filters={'app': 'search'}, now=NOW)
+        self.assertEqual([r['search_name'] for r in results], ['a', 'b'])
+
+        filters = {'owner': 'alice', 'status': 'notified,resolved'}
+        results, _ = deadline_extension.extend_rows(self.rows, 1, filters=filters, now=NOW)
+        self.assertEqual([r['search_name'] for r in results], ['c', 'd'])
+
+    def test_deadline_before_filter(self):
+        results, _ = deadline_extension.extend_rows(self.rows, 1, filters={'deadline_before': str(NOW)}, now=NOW)
+        self.assertEqual([r['search_name'] for r in results], ['b'])
+
+    def test_duplicate_rows_are_extended_once(self):
+        self.rows.append(flagged('a', NOW))
+        results, changes = deadline_extension.extend_rows(self.rows, 1, names=['a'], now=NOW)
+        self.assertEqual((len(results), len(changes)), (1, 1))
+        self.assertEqual(self.rows[-1]['remediation_deadline'], str(NOW))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+test_deadline_index.py - Range queries, locking and reconciliation of bin/deadline_index.py
+
+Usage:
+    python3 -m pytest tests/python/test_deadline_index.py
+"""
+
+import csv
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import deadline_index
+import lookup_cache
+
+NOW = 1700000000
+
+
+def flagged(name, deadline, status='pending'):
+    return {'search_name': name, 'search_owner': 'alice', 'search_app': 'search', 'remediation_deadline': deadline,
+            'status': status}
+
+
+def write_lookup(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=lookup_cache.FLAGGED_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sync_worker(path, worker, count):
+    for i in range(count):
+        deadline_index.sync_rows([flagged('w%d_s%d' % (worker, i), NOW + i)], path=path)
+
+
+class DeadlineIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'deadline_index.csv')
+        self.lookup = os.path.join(self.tmpdir, 'flagged_searches.csv')
+        deadline_index._warm.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        deadline_index._warm.clear()
+
+    def test_range_queries(self):
+        index = deadline_index.DeadlineIndex(self.path)
+        for i, status in enumerate(['pending', 'notified', 'resolved', 'disabled', 'pending']):
+            index.update(flagged('s%d' % i, NOW + (i - 2) * 3600, status))
+        index.update(flagged('no_deadline', 0))
+
+        self.assertEqual([e['search_name'] for e in index.expired(0, NOW)], ['s0', 's1'])
+        self.assertEqual([e['search_name'] for e in index.expiring_within(3, NOW)], ['s4'])
+        self.assertEqual([e['search_name'] for e in index.disabled_since(NOW - 86400, NOW + 7200)], ['s3'])
+        self.assertEqual(index.next_deadline()['search_name'], 's0')
+        self.assertNotIn('s2', index)
+        self.assertNotIn('no_deadline', index)
+
+        # Extending moves the entry; resolving drops it
+        index.update(flagged('s0', NOW + 86400))
+        index.update(flagged('s1', NOW - 3600, 'resolved'))
+        self.assertEqual(index.expired(0, NOW), [])
+        self.assertEqual(index.next_deadline()['search_name'], 's4')
+
+    def test_save_and_load_round_trip(self):
+        index = deadline_index.DeadlineIndex(self.path)
+        index.update(flagged('b', NOW + 10))
+        index.update(flagged('a', NOW + 10))
+        index.update(flagged('c', NOW - 10, 'disabled'))
+        index.save()
+
+        loaded = deadline_index.DeadlineIndex.load(self.path)
+        self.assertEqual([e['search_name'] for e in loaded.range(0, NOW + 100)], ['a', 'b'])
+        self.assertEqual(loaded.get('c')['status'], 'disabled')
+        self.assertEqual([name for name in os.listdir(self.tmpdir) if name.endswith('.tmp')], [])
+
+    def test_concurrent_sync_rows_keeps_every_row(self):
+        deadline_index.DeadlineIndex(self.path).save()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=sync_worker, args=(self.path, w, 50)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        index = deadline_index.DeadlineIndex.load(self.path)
+        self.assertEqual(len(index), 200)
+        self.assertEqual([name for name in os.listdir(self.tmpdir) if name.endswith('.tmp')], [])
+
+    def test_current_rebuilds_after_outputlookup(self):
+        write_lookup(self.lookup, [flagged('a', NOW - 60), flagged('b', NOW + 60)])
+        index = deadline_index.DeadlineIndex.current(self.lookup, self.path)
+        self.assertEqual([e['search_name'] for e in index.expired(0, NOW)], ['a'])
+
+        # A handler write syncs the index after the lookup: no rebuild
+        deadline_index.sync_rows([flagged('c', NOW - 30)], path=self.path)
+        self.assertIn('c', deadline_index.DeadlineIndex.current(self.lookup, self.path))
+
+        # A saved search rewrites the lookup behind the handlers' back
+        time.sleep(0.01)
+        write_lookup(self.lookup, [flagged('a', NOW - 60, 'resolved'), flagged('b', NOW + 60)])
+        os.utime(self.lookup, ns=(time.time_ns() + 10 ** 9,) * 2)
+        index = deadline_index.DeadlineIndex.current(self.lookup, self.path)
+        self.assertEqual(index.expired(0, NOW), [])
+        self.assertEqual(len(index), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+test_disable_scheduler.py - Planning and committing auto-disables in bin/disable_scheduler.py
+
+Usage:
+    python3 -m pytest tests/python/test_disable_scheduler.py
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import deadline_index
+import disable_scheduler
+import lookup_cache
+
+NOW = 1700000000
+
+
+def flagged(name, deadline, status='pending'):
+    return {'search_name': name, 'search_owner': 'alice', 'search_app': 'search',
+            'remediation_deadline': str(deadline), 'status': status, 'notes': ''}
+
+
+class DisableSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.lookup = os.path.join(self.tmpdir, 'flagged_searches.csv')
+        self.write_lookup([flagged('a', NOW - 60), flagged('b', NOW - 120, 'notified'),
+                           flagged('c', NOW - 60, 'resolved'), flagged('d', NOW + 3600)])
+        self.scheduler = disable_scheduler.DisableScheduler(
+            queue_path=os.path.join(self.tmpdir, 'disable_queue.json'), lookup_path=self.lookup,
+            index_path=os.path.join(self.tmpdir, 'deadline_index.csv'), costs={'a': 10.0, 'b': 50.0},
+            feed_path=os.path.join(self.tmpdir, 'governance_changes.jsonl'),
+            audit_root=os.path.join(self.tmpdir, 'audit_log'))
+        deadline_index._warm.clear()
+        self.disabled = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        deadline_index._warm.clear()
+
+    def write_lookup(self, rows):
+        with lookup_cache.locked(self.lookup):
+            lookup_cache.write(self.lookup, lookup_cache.FLAGGED_FIELDS, rows)
+
+    def change_row(self, name, **changes):
+        """Rewrite one row the way another writer would, holding the lookup lock."""
+        with lookup_cache.locked(self.lookup):
+            fieldnames, rows = lookup_cache.read(self.lookup, lookup_cache.FLAGGED_FIELDS)
+            for row in rows:
+                if row['search_name'] == name:
+                    row.update(changes)
+            lookup_cache.write(self.lookup, fieldnames, rows)
+
+    def statuses(self):
+        with open(self.lookup, newline='') as f:
+            return dict((r['search_name'], r['status']) for r in csv.DictReader(f))
+
+    def disable(self, item):
+        self.disabled.append(item['search_name'])
+        return True, 'disabled'
+
+    def test_plan_orders_overdue_searches_by_cost(self):
+        queue = self.scheduler.plan({}, NOW)
+        self.assertEqual([i['search_name'] for i in queue['items']], ['b', 'a'])
+
+    def test_plan_confirms_candidates_against_the_lookup(self):
+        deadline_index.DeadlineIndex.current(self.lookup, self.scheduler.index_path)
+        # Extended by a writer whose change the index has not picked up
+        self.change_row('a', remediation_deadline=str(NOW + 86400))
+        stamp = time.time_ns() - 10 ** 9
+        os.utime(self.lookup, ns=(stamp, stamp))
+        self.assertIn('a', deadline_index.DeadlineIndex.current(self.lookup, self.scheduler.index_path))
+
+        queue = self.scheduler.plan({}, NOW)
+        self.assertEqual([i['search_name'] for i in queue['items']], ['b'])
+
+    def test_search_extended_before_its_turn_is_skipped(self):
+        def disable_then_extend(item):
+            # b goes first; a is extended while b's call is in flight
+            self.change_row('a', remediation_deadline=str(NOW + 86400))
+            return self.disable(item)
+
+        summary = self.scheduler.run(disable_then_extend, max_concurrency=1, max_per_minute=0, now=NOW)
+        self.assertEqual(self.disabled, ['b'])
+        self.assertEqual([(i['search_name'], i['state']) for i in summary['attempted']],
+                         [('b', 'done'), ('a', 'skipped')])
+        self.assertEqual(self.statuses(), {'a': 'pending', 'b': 'disabled', 'c': 'resolved', 'd': 'pending'})
+
+    def test_commit_leaves_rows_changed_during_the_call(self):
+        def resolve_during_call(item):
+            self.change_row(item['search_name'], status='resolved')
+            return self.disable(item)
+
+        summary = self.scheduler.run(resolve_during_call, max_concurrency=1, max_per_minute=0, now=NOW)
+        self.assertEqual(sorted(self.disabled), ['a', 'b'])
+        self.assertEqual(self.statuses(), {'a': 'resolved', 'b': 'resolved', 'c': 'resolved', 'd': 'pending'})
+        self.assertTrue(all('not marked disabled' in i['message'] for i in summary['attempted']))
+
+    def test_failures_stay_queued(self):
+        summary = self.scheduler.run(lambda item: (False, 'HTTP 503'), max_per_minute=0, now=NOW)
+        self.assertEqual([i['state'] for i in summary['attempted']], ['failed', 'failed'])
+        self.assertEqual(self.statuses()['a'], 'pending')
+        queue = self.scheduler.plan(self.scheduler.load_queue(), NOW)
+        self.assertEqual([(i['search_name'], i['attempts']) for i in queue['items']], [('b', 1), ('a', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
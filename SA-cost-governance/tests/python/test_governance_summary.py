@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+test_governance_summary.py - Tile counts, ETags and lookup caching of bin/governance_summary.py
+
+Usage:
+    python3 -m pytest tests/python/test_governance_summary.py
+"""
+
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import governance_summary
+
+DAY = 86400
+NOW = 1700000000
+
+CACHE_FIELDS = ['title', 'owner', 'app', 'disabled', 'frequency_label', 'is_suspicious', 'suspicious_reason',
+                'monthly_cost']
+FLAGGED_FIELDS = ['search_name', 'search_owner', 'search_app', 'status', 'reason', 'flagged_time',
+                  'remediation_deadline']
+
+
+def write_csv(path, fields, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    # Force a distinct mtime even on coarse-grained filesystems
+    stamp = time.time_ns() + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+def search(title, cost, disabled='0', suspicious='0'):
+    return {'title': title, 'owner': 'alice', 'app': 'search', 'disabled': disabled, 'frequency_label': 'Hourly',
+            'is_suspicious': suspicious, 'suspicious_reason': 'too often' if suspicious == '1' else '',
+            'monthly_cost': cost}
+
+
+def flagged(name, status, deadline=0, flagged_time=NOW - DAY):
+    return {'search_name': name, 'search_owner': 'alice', 'search_app': 'search', 'status': status,
+            'reason': 'cost', 'flagged_time': flagged_time, 'remediation_deadline': deadline}
+
+
+class GovernanceSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = os.path.join(self.tmpdir, governance_summary.SEARCH_CACHE)
+        self.flagged = os.path.join(self.tmpdir, governance_summary.FLAGGED_LOOKUP)
+        write_csv(self.cache, CACHE_FIELDS, [
+            search('cheap', '1.5'),
+            search('costly', '120'),
+            search('odd', '40', suspicious='1'),
+            search('flagged odd', '30', suspicious='1'),
+            search('off', '999', disabled='1'),
+        ])
+        write_csv(self.flagged, FLAGGED_FIELDS, [
+            flagged('flagged odd', 'pending', NOW + 2 * DAY),
+            flagged('late', 'notified', NOW - DAY),
+            flagged('later', 'pending', NOW + 10 * DAY),
+            flagged('late', 'pending', NOW + DAY),
+            flagged('asking', 'review'),
+            flagged('gone', 'disabled', flagged_time=NOW - 2 * DAY),
+            flagged('gone long ago', 'disabled', flagged_time=NOW - 30 * DAY),
+        ])
+        write_csv(os.path.join(self.tmpdir, governance_summary.OK_LOOKUP), ['search_name'], [{'search_name': 'fine'}])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def summary(self):
+        return governance_summary.build_summary(now=NOW, lookups_dir=self.tmpdir)
+
+    def test_counts(self):
+        self.assertEqual(self.summary()['counts'], {
+            'total': 4, 'suspicious': 1, 'flagged': 3, 'pending': 2, 'notified': 1, 'pending_review': 1,
+            'expiring': 1, 'overdue': 1, 'disabled': 1, 'ok': 1,
+        })
+
+    def test_lists_are_ordered_by_cost_and_deadline(self):
+        lists = self.summary()['lists']
+        self.assertEqual([row[0] for row in lists['total']], ['costly', 'odd', 'flagged odd', 'cheap'])
+        self.assertEqual(lists['total'][2][3], 'pending')
+        self.assertEqual([row[0] for row in lists['flagged']], ['late', 'flagged odd', 'later'])
+        self.assertEqual(lists['expiring'][0][:5], ['flagged odd', 'alice', 'search', 'expiring', '2.0'])
+        self.assertEqual(lists['suspicious'][0][0], 'odd')
+
+    def test_etag_is_stable_while_the_lookups_are_unchanged(self):
+        first = governance_summary.respond(now=NOW, lookups_dir=self.tmpdir)
+        later = governance_summary.respond(now=NOW + 60, lookups_dir=self.tmpdir)
+        self.assertEqual(first['status'], 200)
+        self.assertEqual(first['headers']['ETag'], later['headers']['ETag'])
+        self.assertEqual(json.loads(first['payload'])['counts']['total'], 4)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        etag = governance_summary.respond(now=NOW, lookups_dir=self.tmpdir)['headers']['ETag']
+        response = governance_summary.respond(etag, now=NOW, lookups_dir=self.tmpdir)
+        self.assertEqual((response['status'], response['payload'], response['headers']['ETag']), (304, '', etag))
+        self.assertEqual(governance_summary.respond('"stale"', now=NOW, lookups_dir=self.tmpdir)['status'], 200)
+
+    def test_changed_lookup_is_read_again(self):
+        etag = governance_summary.respond(now=NOW, lookups_dir=self.tmpdir)['headers']['ETag']
+        write_csv(self.cache, CACHE_FIELDS, [search('cheap', '1.5'), search('new', '2')])
+        response = governance_summary.respond(etag, now=NOW, lookups_dir=self.tmpdir)
+        self.assertEqual(response['status'], 200)
+        self.assertNotEqual(response['headers']['ETag'], etag)
+        self.assertEqual(json.loads(response['payload'])['counts']['total'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
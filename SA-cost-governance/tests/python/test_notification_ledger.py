@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+test_notification_ledger.py - Day-keyed claims, catch-up and compaction of bin/notification_ledger.py
+
+Usage:
+    python3 -m pytest tests/python/test_notification_ledger.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import notification_ledger
+
+DAY = 86400
+# 2023-11-14 22:13 UTC
+NOW = 1700000000
+
+
+class NotificationLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'notification_ledger.log')
+        self.ledger = notification_ledger.NotificationLedger(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_claim_once_per_day(self):
+        self.assertFalse(self.ledger.sent('s', 'alice', 'initial', now=NOW))
+        self.assertTrue(self.ledger.claim('s', 'alice', 'initial', now=NOW))
+        self.assertTrue(self.ledger.sent('s', 'alice', 'initial', now=NOW))
+        self.assertFalse(self.ledger.claim('s', 'alice', 'initial', now=NOW))
+        # Other types, owners and days are separate keys
+        self.assertFalse(self.ledger.sent('s', 'alice', 'reminder', now=NOW))
+        self.assertFalse(self.ledger.sent('s', 'bob', 'initial', now=NOW))
+        self.assertFalse(self.ledger.sent('s', 'alice', 'initial', now=NOW + DAY))
+
+    def test_release_frees_the_key(self):
+        self.ledger.claim('s', 'alice', 'initial', now=NOW)
+        self.ledger.release('s', 'alice', 'initial', now=NOW)
+        self.assertFalse(self.ledger.sent('s', 'alice', 'initial', now=NOW))
+        self.assertTrue(self.ledger.claim('s', 'alice', 'initial', now=NOW))
+
+    def test_other_processes_claims_are_seen(self):
+        other = notification_ledger.NotificationLedger(self.path)
+        self.ledger.claim('s', 'alice', 'initial', now=NOW)
+        self.assertTrue(other.sent('s', 'alice', 'initial', now=NOW))
+        self.assertFalse(other.claim('s', 'alice', 'initial', now=NOW))
+        other.claim('t', 'bob', 'initial', now=NOW)
+        self.assertTrue(self.ledger.sent('t', 'bob', 'initial', now=NOW))
+
+    def test_partial_line_is_read_once_complete(self):
+        self.ledger.claim('s', 'alice', 'initial', now=NOW)
+        key = notification_ledger.ledger_key('t', 'bob', 'initial', '2023-11-14')
+        with open(self.path, 'a') as f:
+            f.write('2023-11-14\t%s' % key)
+        self.assertFalse(self.ledger.sent('t', 'bob', 'initial', now=NOW))
+        with open(self.path, 'a') as f:
+            f.write('\t+\n')
+        self.assertTrue(self.ledger.sent('t', 'bob', 'initial', now=NOW))
+
+    def test_compaction_drops_expired_keys_and_readers_follow(self):
+        other = notification_ledger.NotificationLedger(self.path)
+        self.ledger.claim('old', 'alice', 'initial', now=NOW - 3 * DAY)
+        self.ledger.claim('new', 'alice', 'initial', now=NOW)
+        self.assertEqual(other.stats()['keys'], 2)
+
+        self.ledger.compact(now=NOW)
+        self.assertEqual(self.ledger.stats()['keys'], 1)
+        # The rewrite has a new generation header, so the other reader starts over
+        self.assertEqual(other.stats()['keys'], 1)
+        self.assertTrue(other.sent('new', 'alice', 'initial', now=NOW))
+
+    def test_claims_compact_once_expired_lines_dominate(self):
+        with mock.patch.object(notification_ledger, 'COMPACT_MIN_LINES', 4):
+            ledger = notification_ledger.NotificationLedger(self.path)
+            for i in range(6):
+                ledger.claim('s%d' % i, 'alice', 'initial', now=NOW - 5 * DAY)
+            ledger.claim('s', 'alice', 'initial', now=NOW)
+            self.assertEqual(ledger.stats()['keys'], 7)
+            # The eighth line triggers the next check, which finds six expired keys
+            ledger.claim('t', 'alice', 'initial', now=NOW)
+        self.assertEqual(ledger.stats()['keys'], 2)
+        with open(self.path) as f:
+            self.assertTrue(f.readline().startswith(notification_ledger.HEADER_PREFIX))
+            self.assertEqual(len(f.readlines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
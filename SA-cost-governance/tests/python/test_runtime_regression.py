@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+test_runtime_regression.py - EWMA baselines and CUSUM regression detection of bin/runtime_regression.py
+
+Usage:
+    python3 -m pytest tests/python/test_runtime_regression.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import runtime_regression
+
+T0 = 1700000000
+INTERVAL = 900
+# Steady runs around a minute, with a little noise
+STEADY = [60, 62, 58, 61, 59, 60, 63, 57, 60, 61, 59, 62, 58, 60, 61, 60, 59, 62, 60, 61]
+
+
+def runs(runtimes, start=0, name='s'):
+    return [{'savedsearch_name': name, '_time': T0 + (start + i) * INTERVAL, 'run_time': r}
+            for i, r in enumerate(runtimes)]
+
+
+class RuntimeRegressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.detector = runtime_regression.RuntimeRegressionDetector(os.path.join(self.tmpdir, 'baselines.csv'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def baseline(self, name='s'):
+        return self.detector.load()[name]
+
+    def test_steady_runs_do_not_regress(self):
+        summary = self.detector.fold(runs(STEADY))
+        self.assertEqual((summary['runs_folded'], summary['raised']), (len(STEADY), []))
+        self.assertAlmostEqual(self.baseline().mean, 60, delta=1)
+
+    def test_single_slow_run_is_not_a_regression(self):
+        self.detector.fold(runs(STEADY))
+        summary = self.detector.fold(runs([600] + STEADY[:5], start=len(STEADY)))
+        self.assertEqual(summary['raised'], [])
+        # The outlier is capped before it updates the baseline
+        self.assertLess(self.baseline().mean, 70)
+
+    def test_sustained_slowdown_is_raised_within_a_few_runs(self):
+        self.detector.fold(runs(STEADY))
+        raised_after = None
+        for i in range(10):
+            if self.detector.fold(runs([90], start=len(STEADY) + i))['raised']:
+                raised_after = i + 1
+                break
+        self.assertIsNotNone(raised_after)
+        self.assertLessEqual(raised_after, 3)
+        baseline = self.baseline()
+        self.assertTrue(baseline.regressed)
+        # The baseline before the slowdown, give or take the capped slow runs already folded
+        self.assertAlmostEqual(baseline.baseline_runtime, 60, delta=3)
+        self.assertEqual([r['search_name'] for r in self.detector.report(regressed_only=True)], ['s'])
+
+    def test_persistent_slowdown_becomes_the_new_normal(self):
+        self.detector.fold(runs(STEADY))
+        self.detector.fold(runs([90] * 100, start=len(STEADY)))
+        baseline = self.baseline()
+        self.assertFalse(baseline.regressed)
+        self.assertAlmostEqual(baseline.mean, 90, delta=2)
+        # When it was detected is kept for the report
+        self.assertTrue(baseline.regression_time)
+
+    def test_small_slowdown_is_not_material(self):
+        # A very stable 10s search getting 3s slower is below MIN_ABSOLUTE_INCREASE_SEC
+        self.detector.fold(runs([10] * 20))
+        summary = self.detector.fold(runs([13] * 10, start=20))
+        self.assertEqual(summary['raised'], [])
+        self.assertEqual(self.baseline().cusum, 0.0)
+
+    def test_overlapping_windows_fold_each_run_once(self):
+        self.detector.fold(runs(STEADY[:10]))
+        summary = self.detector.fold(runs(STEADY))
+        self.assertEqual(summary['runs_folded'], 10)
+        self.assertEqual(self.baseline().runs, len(STEADY))
+
+    def test_runs_are_folded_in_time_order_per_search(self):
+        mixed = runs(STEADY, name='a') + runs([30] * 5, name='b')
+        summary = self.detector.fold(list(reversed(mixed)) + [{'savedsearch_name': 'c', '_time': T0}])
+        self.assertEqual(summary['updated'], ['a', 'b'])
+        self.assertEqual(self.baseline('a').last_run_time, T0 + (len(STEADY) - 1) * INTERVAL)
+        self.assertEqual(self.baseline('b').runs, 5)
+
+    def test_baseline_round_trips_through_the_lookup(self):
+        self.detector.fold(runs(STEADY))
+        before = self.baseline().to_row()
+        self.detector.save(self.detector.load())
+        self.assertEqual(self.baseline().to_row(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+test_spl_cost.py - Pipeline parsing (bin/spl_parser.py) and static cost estimates (bin/spl_cost.py)
+
+Usage:
+    python3 -m pytest tests/python/test_spl_cost.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import spl_cost
+import spl_parser
+
+
+class SplParserTest(unittest.TestCase):
+
+    def test_pipeline_and_subsearches(self):
+        pipeline = spl_parser.parse('index=web earliest=-7d | join host [| inputlookup hosts.csv] | stats count')
+        self.assertEqual(pipeline.command_names(), ['search', 'join', 'stats'])
+        self.assertEqual(pipeline.commands[1].subsearches[0].command_names(), ['inputlookup'])
+
+    def test_quoted_pipe_and_comment_are_not_commands(self):
+        pipeline = spl_parser.parse('index=web msg="a | join b" ```| transaction x``` | stats count')
+        self.assertEqual(pipeline.command_names(), ['search', 'stats'])
+
+    def test_options(self):
+        options = spl_parser.parse('index = web (index=app OR index="db two") earliest=-4h').commands[0].options()
+        self.assertEqual(options['index'], ['web', 'app', 'db two'])
+        self.assertEqual(options['earliest'], ['-4h'])
+
+    def test_index_in_list(self):
+        options = spl_parser.parse('index IN (web, "app", db*) sourcetype=access').commands[0].options()
+        self.assertEqual(options['index'], ['web', 'app', 'db*'])
+        self.assertEqual(options['sourcetype'], ['access'])
+
+
+class SplCostTest(unittest.TestCase):
+
+    def test_time_range(self):
+        self.assertEqual(spl_cost.time_range_seconds('-7d@d'), 7 * 86400)
+        self.assertEqual(spl_cost.time_range_seconds('-90m'), 90 * 60)
+        self.assertEqual(spl_cost.time_range_seconds('bogus'), spl_cost.DEFAULT_TIME_RANGE_SEC)
+
+    def test_missing_index_is_default_not_all(self):
+        result = spl_cost.estimate('sourcetype=access | stats count')
+        self.assertEqual(result['index_breadth'], spl_cost.DEFAULT_INDEX_BREADTH)
+        self.assertFalse(result['wasteful'])
+
+    def test_index_star_is_all(self):
+        result = spl_cost.estimate('index=* | stats count')
+        self.assertEqual(result['index_breadth'], spl_cost.ALL_INDEX_BREADTH)
+        self.assertIn('Scans all indexes', result['reasons'])
+
+    def test_index_in_counts_each_index(self):
+        self.assertEqual(spl_cost.estimate('index IN (web, app, db*) | stats count')['index_breadth'],
+                         2 + spl_cost.WILDCARD_INDEX_BREADTH)
+
+    def test_macro_led_search_is_not_all_index(self):
+        result = spl_cost.estimate('`web_events` | stats count by host')
+        self.assertEqual(result['index_breadth'], spl_cost.DEFAULT_INDEX_BREADTH)
+        self.assertFalse(result['wasteful'])
+
+    def test_join_cost_follows_the_subsearch(self):
+        cheap = spl_cost.estimate('index=web earliest=-30d | join host [| inputlookup hosts.csv]', '-30d')
+        expensive = spl_cost.estimate('index=web | join host [search index=* earliest=-30d]')
+        self.assertNotIn('join over an expensive input', ' '.join(cheap['reasons']))
+        self.assertTrue(any(r.startswith('join over an expensive input') for r in expensive['reasons']))
+        self.assertTrue(expensive['wasteful'])
+        self.assertEqual(expensive['subsearches'], 1)
+
+    def test_quoted_join_is_not_flagged(self):
+        result = spl_cost.estimate('index=web msg="| join x [search index=*]" | stats count')
+        self.assertEqual(result['commands'], ['search', 'stats'])
+        self.assertFalse(result['wasteful'])
+
+    def test_transaction_scales_with_scan(self):
+        small = spl_cost.estimate('index=web earliest=-1h | transaction session')
+        large = spl_cost.estimate('index=* earliest=-90d | transaction session')
+        self.assertGreater(large['score'], small['score'] * 1000)
+        self.assertFalse(small['wasteful'])
+
+    def test_appendpipe_scans_nothing(self):
+        plain = spl_cost.estimate('index=web | stats count')
+        piped = spl_cost.estimate('index=web | stats count | appendpipe [stats sum(count)]')
+        # Only its own weight over the outer scan (one index for a day), no scan of the bracket
+        self.assertAlmostEqual(piped['score'] - plain['score'], spl_cost.COMMAND_WEIGHTS['appendpipe'])
+
+
+class CostCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'spl_cost_cache.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_unchanged_searches_hit_the_cache(self):
+        cache = spl_cost.CostCache(self.path)
+        entry = cache.get('index=* | stats count', '-7d', now=1700000000)
+        cache.save(now=1700000000)
+
+        cache = spl_cost.CostCache(self.path)
+        self.assertEqual(cache.get('index=* | stats count', '-7d', now=1700000000)['score'], entry['score'])
+        cache.get('index=web | stats count', '-7d', now=1700000000)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
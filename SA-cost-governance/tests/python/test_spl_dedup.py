@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+test_spl_dedup.py - SPL normalisation and near-duplicate clustering of bin/spl_dedup.py
+
+Usage:
+    python3 -m pytest tests/python/test_spl_dedup.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import spl_dedup
+
+WEB_ERRORS = ('index=web sourcetype=access_combined status=500 host="web-01" earliest=-24h '
+              '| stats count by host, uri_path | where count > 100 | sort - count | head 20')
+WEB_NOT_FOUND = ('index=web sourcetype=access_combined status=404 host="web-02" earliest=-7d@d latest=now '
+                 '| stats count by host, uri_path | where count > 50 | sort - count | head 20')
+SPLUNKD_ERRORS = ('index=_internal sourcetype=splunkd log_level=ERROR '
+                  '| timechart span=1h count by component | fillnull value=0')
+FAILED_LOGINS = ('index=security action=failure | stats dc(user) as users by src_ip '
+                 '| where users > 10 | lookup geo_ip ip as src_ip')
+
+
+def search(title, spl, cost, app='search', owner='alice'):
+    return {'title': title, 'qualifiedSearch': spl, 'monthly_cost': cost, 'app': app, 'owner': owner}
+
+
+class SplDedupTest(unittest.TestCase):
+
+    def test_normalize_folds_literals_time_modifiers_and_comments(self):
+        tokens = spl_dedup.normalize('search index=web earliest=-24h latest=now status=500 '
+                                     '```only errors``` host="web-01" | STATS count BY host')
+        self.assertEqual(tokens, ['index', '=', 'web', 'status', '=', '<num>', 'host', '=', '<str>',
+                                  '|', 'stats', 'count', 'by', 'host'])
+        self.assertEqual(spl_dedup.normalize('index=web status=404 host=\'web-02\' | stats count by host'),
+                         spl_dedup.normalize('index=web  status=500 host="web-01" earliest=-7d@d '
+                                             '| stats   count by host'))
+
+    def test_copies_differing_in_literals_and_time_range_cluster(self):
+        clusters = spl_dedup.find_clusters([
+            search('web errors', WEB_ERRORS, '30'),
+            search('web not found', WEB_NOT_FOUND, '50', app='ops', owner='bob'),
+            search('splunkd errors', SPLUNKD_ERRORS, '5'),
+            search('failed logins', FAILED_LOGINS, '5'),
+        ], costs={})
+        self.assertEqual(len(clusters), 1)
+        cluster = clusters[0]
+        self.assertEqual(sorted(cluster['members']), ['web errors', 'web not found'])
+        self.assertEqual((cluster['apps'], cluster['owners']), (['ops', 'search'], ['alice', 'bob']))
+        self.assertEqual(cluster['min_similarity'], 1.0)
+
+    def test_unrelated_searches_do_not_cluster(self):
+        self.assertEqual(spl_dedup.find_clusters([
+            search('web errors', WEB_ERRORS, '30'),
+            search('splunkd errors', SPLUNKD_ERRORS, '5'),
+            search('failed logins', FAILED_LOGINS, '5'),
+        ], costs={}), [])
+
+    def test_consolidation_keeps_the_most_expensive_copy(self):
+        clusters = spl_dedup.find_clusters([
+            search('a', WEB_ERRORS, '30'),
+            search('b', WEB_NOT_FOUND, '50'),
+            search('c', WEB_ERRORS.replace('head 20', 'head 5'), ''),
+            search('splunkd errors', SPLUNKD_ERRORS, '5'),
+            search('splunkd copy', SPLUNKD_ERRORS.replace('value=0', 'value=-1'), '2'),
+        ], costs={'c': 20.0})
+        self.assertEqual([sorted(c['members']) for c in clusters], [['a', 'b', 'c'], ['splunkd copy', 'splunkd errors']])
+        self.assertEqual((clusters[0]['combined_monthly_cost'], clusters[0]['consolidation_savings']), (100.0, 50.0))
+        self.assertEqual((clusters[1]['combined_monthly_cost'], clusters[1]['consolidation_savings']), (7.0, 2.0))
+        self.assertEqual([c['cluster_id'] for c in clusters], [1, 2])
+
+    def test_threshold(self):
+        edited = WEB_ERRORS + ' | eval note=host | table host uri_path count note'
+        pair = [search('a', WEB_ERRORS, '1'), search('b', edited, '1')]
+        score = spl_dedup.similarity(*[spl_dedup.minhash(spl_dedup.shingles(spl_dedup.normalize(s)))
+                                       for s in (WEB_ERRORS, edited)])
+        self.assertLess(score, 1.0)
+        self.assertEqual(spl_dedup.find_clusters(pair, threshold=min(1.0, score + 0.01), costs={}), [])
+        clusters = spl_dedup.find_clusters(pair, threshold=score, costs={})
+        self.assertEqual(clusters[0]['min_similarity'], round(score, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
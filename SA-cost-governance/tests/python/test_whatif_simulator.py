@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+test_whatif_simulator.py - Cost deltas and peak concurrency of bin/whatif_simulator.py
+
+Usage:
+    python3 -m pytest tests/python/test_whatif_simulator.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'bin'))
+import whatif_simulator
+
+# 1200 per SVC a year: a monthly SVC costs 100 a month
+SVC_UNIT_COST = 1200.0
+
+
+def row(title, cron, runtime_sec, **values):
+    return dict({'title': title, 'cron_schedule': cron, 'avg_runtime_sec': runtime_sec, 'disabled': '0'}, **values)
+
+
+class WhatIfSimulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        # All three run at midnight: hourly for 10 minutes, every 15 minutes for 2, nightly for 30
+        self.table = whatif_simulator.SearchTable([
+            row('hourly', '0 * * * *', 600, monthly_svc=7200),
+            row('quarter', '*/15 * * * *', 120, svc_per_run=5),
+            row('nightly', '0 0 * * *', 1800, svc_per_run=100),
+            row('off', '* * * * *', 60, svc_per_run=50, disabled='1'),
+        ], SVC_UNIT_COST)
+
+    def test_baseline(self):
+        baseline = self.table.simulate([])['baseline']
+        self.assertEqual(baseline, {'monthly_svc': 7200 + 14400 + 3000, 'monthly_cost': 2460000.0,
+                                    'peak_concurrency': 3, 'enabled_searches': 3})
+
+    def test_disable(self):
+        result = self.table.simulate([{'title': 'hourly', 'action': 'disable'}])
+        self.assertEqual(result['delta'], {'monthly_svc': -7200, 'monthly_cost': -720000.0,
+                                           'peak_concurrency': -1, 'enabled_searches': -1})
+        self.assertEqual(result['searches'][0]['new_monthly_svc'], 0)
+
+    def test_reschedule_to_fewer_runs(self):
+        result = self.table.simulate([{'title': 'hourly', 'cron_schedule': '0 */2 * * *'}])
+        search = result['searches'][0]
+        self.assertEqual((search['action'], search['old_runs_per_month'], search['new_runs_per_month']),
+                         ('reschedule', 720, 360))
+        self.assertEqual(result['delta']['monthly_svc'], -3600)
+        self.assertEqual(result['delta']['monthly_cost'], -360000.0)
+        self.assertEqual(result['delta']['enabled_searches'], 0)
+
+    def test_reschedule_off_the_peak(self):
+        result = self.table.simulate([{'title': 'nightly', 'cron_schedule': '30 2 * * *'}])
+        self.assertEqual(result['delta']['monthly_svc'], 0)
+        self.assertEqual(result['proposed']['peak_concurrency'], 2)
+
+    def test_runs_wrapping_past_midnight_overlap_the_next_day(self):
+        result = self.table.simulate([{'title': 'nightly', 'cron_schedule': '45 23 * * *'}])
+        self.assertEqual(result['proposed']['peak_concurrency'], 3)
+
+    def test_narrowed_range_scales_cost_and_runtime(self):
+        result = self.table.simulate([{'title': 'nightly', 'earliest': '-6h', 'current_earliest': '-24h'}])
+        self.assertEqual(result['delta']['monthly_svc'], -2250)
+        # The shorter run still starts alongside the others at midnight
+        self.assertEqual(result['proposed']['peak_concurrency'], 3)
+
+    def test_candidate_statuses(self):
+        searches = self.table.simulate([{'title': 'missing'}, {'title': 'off'}, {'title': 'quarter'},
+                                        {'title': 'quarter'}, {'title': 'hourly', 'range_factor': '0'}])['searches']
+        self.assertEqual([s['status'] for s in searches], ['not_found', 'disabled', 'ok', 'duplicate', 'error'])
+
+    def test_parse_cron(self):
+        minutes, runs_per_day = whatif_simulator.parse_cron('*/15 9-10 * * *')
+        self.assertEqual((minutes[:3], runs_per_day), ([540, 555, 570], 8))
+        self.assertAlmostEqual(whatif_simulator.parse_cron('0 9 * * 1-5')[1], 5 / 7.0)
+        with self.assertRaises(ValueError):
+            whatif_simulator.parse_cron('0 9 * *')
+
+
+if __name__ == '__main__':
+    unittest.main()
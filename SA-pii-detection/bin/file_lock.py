@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+PII File Lock
+Cross-process lock for the state files under lookups/
+
+Search commands, scripted scans and remediation run as separate processes,
+so every read-modify-write of a shared file (pii_findings.csv,
+pii_scan_checkpoints.json) holds an exclusive flock on a '.lock' sidecar
+for the whole update.
+"""
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows search heads - fall back to unlocked writes
+    fcntl = None
+
+
+class FileLock(object):
+    """Exclusive lock on a sidecar file for the duration of a with-block"""
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self.handle = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.handle = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
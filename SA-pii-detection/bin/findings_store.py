@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+PII Findings Store
+Stable finding identities and upsert-merge writes to pii_findings.csv
+
+A finding is one exposure: one PII type in one index, sourcetype, source
+and host. Its finding_id is the md5 of those five values joined by '|',
+the same value the pii_finding_id macro computes in SPL, so every scan that
+sees the exposure again addresses the same row:
+
+    upsert   merges a scan's findings into the store. A known finding keeps
+             its status and review fields (flagged_by, reviewed_by, notes,
+             masked_value, ...); event_count adds the new events,
+             first_seen/last_seen widen, and detection_count and timestamp
+             (the last detection) move on. A new finding is added as
+             detected. The deep and sampling scans re-read windows the
+             daily scan already counted, so they upsert with rescan=True
+             and event_count keeps the larger of the two counts instead.
+    migrate  folds rows written before stable IDs (a new finding_id per
+             finding per scan) into one row per exposure, keeping the most
+             recent review.
+
+The file is rewritten in one pass (a temporary file unique to the writer,
+then os.replace), so it grows with the number of distinct exposures, not
+scans x exposures. load_index() returns the rows keyed by finding_id for
+callers that change many findings at once (flag_finding.py, mask_pii.py);
+append_records() adds a batch of whitelist or audit rows with one open of
+the target file.
+
+Every writer - piiupsertfindings, the deep and sampling scans, flag_finding
+and batch remediation - runs in its own process, so each load-modify-save
+holds the store's file lock (file_lock.py). upsert() and migrate() take it
+themselves; callers of load_index() and save() wrap both in locked().
+
+Usage:
+    python3 findings_store.py stats
+    python3 findings_store.py migrate
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+FINDINGS_FILE = os.path.join(LOOKUPS_DIR, 'pii_findings.csv')
+WHITELIST_FILE = os.path.join(LOOKUPS_DIR, 'pii_whitelist.csv')
+AUDIT_LOG_FILE = os.path.join(LOOKUPS_DIR, 'pii_audit_log.csv')
+
+IDENTITY_FIELDS = ('index', 'sourcetype', 'source', 'host', 'pii_type')
+
+FINDINGS_FIELDS = [
+    'finding_id', 'timestamp', 'index', 'sourcetype', 'source', 'host', 'pii_type', 'event_count', 'severity',
+    'status', 'first_seen', 'last_seen', 'detection_count', 'last_event_count', 'flagged_by', 'flagged_time',
+    'reviewed_by', 'reviewed_time', 'notes', 'masked_value',
+]
+
+WHITELIST_FIELDS = ['whitelist_id', 'pattern', 'pii_type', 'index', 'sourcetype', 'field_name', 'reason', 'added_by',
+                    'added_time', 'expires', 'is_active']
+
+AUDIT_FIELDS = ['audit_id', 'timestamp', 'action', 'finding_id', 'pii_type', 'performed_by', 'old_status',
+                'new_status', 'details', 'ip_address']
+
+# Set by reviewers and remediation; an upsert never overwrites them
+REVIEW_FIELDS = ('status', 'flagged_by', 'flagged_time', 'reviewed_by', 'reviewed_time', 'notes', 'masked_value')
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def finding_id(index, sourcetype, source, host, pii_type):
+    """Stable finding ID; matches the pii_finding_id macro"""
+    return hashlib.md5('|'.join((index, sourcetype, source, host, pii_type)).encode('utf-8')).hexdigest()
+
+
+def finding_key(row):
+    return finding_id(*(str(row.get(field) or '') for field in IDENTITY_FIELDS))
+
+
+def append_records(path, fieldnames, records):
+    """Append a batch of rows to a lookup with one open, writing the header if the file is new"""
+    if not records:
+        return 0
+    with FileLock(path):
+        file_exists = os.path.exists(path) and os.path.getsize(path) > 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows(records)
+    return len(records)
+
+
+def parse_finding_ids(arg, stream=None):
+    """Finding IDs from a comma-separated argument, or one per line from stream when arg is '-'"""
+    if arg == '-':
+        lines = (stream or sys.stdin).read().splitlines()
+    else:
+        lines = arg.split(',')
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _review_time(row):
+    return max(_to_int(row.get('reviewed_time')), _to_int(row.get('flagged_time')))
+
+
+class FindingsStore(object):
+    """pii_findings.csv keyed by stable finding_id"""
+
+    def __init__(self, path=FINDINGS_FILE):
+        self.path = path
+
+    def locked(self):
+        """
+        Exclusive lock on the store for a load_index() ... save() update
+
+        Returns:
+            FileLock to use in a with-block
+        """
+        return FileLock(self.path)
+
+    def load(self):
+        """
+        Read the store
+
+        Returns:
+            tuple of (fieldnames, list of rows in file order)
+        """
+        if not os.path.exists(self.path):
+            return list(FINDINGS_FIELDS), []
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = reader.fieldnames or []
+        return fieldnames, rows
+
+    def load_index(self):
+        """
+        Read the store keyed by finding_id
+
+        Returns:
+            tuple of (fieldnames, list of rows in file order, dict of
+            finding_id -> row); the dict holds the same row objects, so a
+            change through it is written by save(rows, fieldnames)
+        """
+        fieldnames, rows = self.load()
+        by_id = {}
+        for row in rows:
+            by_id.setdefault(row.get('finding_id'), row)
+        return fieldnames, rows, by_id
+
+    def save(self, rows, fieldnames=None):
+        """Rewrite the store with the standard columns plus any extra ones it already had (caller holds locked())"""
+        extra = [name for name in (fieldnames or []) if name not in FINDINGS_FIELDS]
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                        dir=os.path.dirname(self.path) or '.')
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=FINDINGS_FIELDS + extra, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(rows)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _new_row(finding, fid, now):
+        detected = _to_int(finding.get('timestamp')) or now
+        event_count = _to_int(finding.get('event_count'))
+        row = dict((field, finding.get(field, '')) for field in FINDINGS_FIELDS)
+        row.update({
+            'finding_id': fid,
+            'timestamp': detected,
+            'event_count': event_count,
+            'status': finding.get('status') or 'detected',
+            'first_seen': _to_int(finding.get('first_seen')) or detected,
+            'last_seen': _to_int(finding.get('last_seen')) or detected,
+            'detection_count': 1,
+            'last_event_count': event_count,
+        })
+        return row
+
+    @staticmethod
+    def _merge_detection(row, finding, now, rescan=False):
+        """Fold a new detection into a known finding, leaving its review fields alone"""
+        detected = _to_int(finding.get('timestamp')) or now
+        event_count = _to_int(finding.get('event_count'))
+        first_seen = _to_int(finding.get('first_seen')) or detected
+        last_seen = _to_int(finding.get('last_seen')) or detected
+        if rescan:
+            row['event_count'] = max(_to_int(row.get('event_count')), event_count)
+        else:
+            row['event_count'] = _to_int(row.get('event_count')) + event_count
+        row['first_seen'] = min(_to_int(row.get('first_seen')) or first_seen, first_seen)
+        row['last_seen'] = max(_to_int(row.get('last_seen')), last_seen)
+        row['timestamp'] = max(_to_int(row.get('timestamp')), detected)
+        row['detection_count'] = (_to_int(row.get('detection_count')) or 1) + 1
+        row['last_event_count'] = event_count
+        if finding.get('severity'):
+            row['severity'] = finding['severity']
+
+    def upsert(self, findings, now=None, rescan=False):
+        """
+        Merge detected findings into the store
+
+        Args:
+            findings: Iterable of finding rows; finding_id is recomputed from
+                index, sourcetype, source, host and pii_type
+            now: Epoch seconds used where a finding has no timestamp
+            rescan: The findings come from a scan over windows other scans
+                may already have counted (deep and sampling scans); a known
+                finding keeps the larger event_count instead of the sum
+
+        Returns:
+            dict with inserted, updated, total and rows (the stored row of
+            each finding passed in, in input order)
+        """
+        now = int(now or time.time())
+        with self.locked():
+            fieldnames, rows, by_id = self.load_index()
+
+            inserted = updated = 0
+            touched = []
+            for finding in findings:
+                fid = finding_key(finding)
+                row = by_id.get(fid)
+                if row is None:
+                    row = by_id[fid] = self._new_row(finding, fid, now)
+                    rows.append(row)
+                    inserted += 1
+                else:
+                    self._merge_detection(row, finding, now, rescan)
+                    updated += 1
+                touched.append(row)
+
+            if inserted or updated:
+                self.save(rows, fieldnames)
+        return {'inserted': inserted, 'updated': updated, 'total': len(rows), 'rows': touched}
+
+    def migrate(self):
+        """
+        Fold rows into one per exposure under its stable finding_id
+
+        Counts are summed and first_seen/last_seen widened. Review fields come
+        from the most recently reviewed or flagged row; notes of all rows are
+        kept.
+
+        Returns:
+            dict with rows_before and rows_after
+        """
+        with self.locked():
+            fieldnames, rows = self.load()
+            merged = {}
+            order = []
+            for row in rows:
+                fid = finding_key(row)
+                detected = _to_int(row.get('timestamp'))
+                row_first = _to_int(row.get('first_seen')) or detected
+                row_last = _to_int(row.get('last_seen')) or detected
+                target = merged.get(fid)
+                if target is None:
+                    target = merged[fid] = dict(row)
+                    target.update({
+                        'finding_id': fid,
+                        'event_count': _to_int(row.get('event_count')),
+                        'first_seen': row_first,
+                        'last_seen': row_last,
+                        'detection_count': _to_int(row.get('detection_count')) or 1,
+                        'last_event_count': row.get('last_event_count') or _to_int(row.get('event_count')),
+                    })
+                    order.append(fid)
+                    continue
+
+                if _review_time(row) > _review_time(target) and (row.get('status') or 'detected') != 'detected':
+                    for field in REVIEW_FIELDS:
+                        if field != 'notes':
+                            target[field] = row.get(field, '')
+                if row.get('notes') and row['notes'] not in (target.get('notes') or ''):
+                    target['notes'] = '\n'.join(n for n in (target.get('notes'), row['notes']) if n)
+                target['event_count'] += _to_int(row.get('event_count'))
+                target['first_seen'] = min(target['first_seen'] or row_first, row_first or target['first_seen'])
+                target['last_seen'] = max(target['last_seen'], row_last)
+                target['detection_count'] += _to_int(row.get('detection_count')) or 1
+                if detected >= _to_int(target.get('timestamp')):
+                    target['timestamp'] = detected
+                    target['last_event_count'] = row.get('last_event_count') or _to_int(row.get('event_count'))
+
+            self.save([merged[fid] for fid in order], fieldnames)
+        return {'rows_before': len(rows), 'rows_after': len(order)}
+
+    def stats(self):
+        fieldnames, rows = self.load()
+        ids = set(row.get('finding_id') for row in rows)
+        stable = sum(1 for row in rows if row.get('finding_id') == finding_key(row))
+        return {'rows': len(rows), 'distinct_ids': len(ids), 'stable_ids': stable,
+                'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    store = FindingsStore()
+    if command == 'migrate':
+        print(json.dumps(store.migrate()))
+    elif command == 'stats':
+        print(json.dumps(store.stats()))
+    else:
+        print('Usage: findings_store.py [stats|migrate]', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
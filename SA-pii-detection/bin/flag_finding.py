@@ -2,17 +2,29 @@
 """
 PII Finding Flag/Whitelist Script
 Manages finding status changes (flag, whitelist, false positive)
+
+One or many findings move to the same status in one batch: the findings
+lookup is read and rewritten once, and the batch's whitelist and audit
+entries are appended with one write each.
+
+Usage:
+    ./flag_finding.py <finding_id> <status> [user] [notes]
+    ./flag_finding.py <finding_id>,<finding_id>,... <status> [user] [notes]
+    ./flag_finding.py - <status> [user] [notes]    (IDs on stdin, one per line after the session key)
 """
 
 import sys
 import json
-import csv
 import os
 import hashlib
 from datetime import datetime
 
 # Add Splunk SDK to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from findings_store import (AUDIT_FIELDS, LOOKUPS_DIR, WHITELIST_FIELDS, FindingsStore, append_records,
+                            parse_finding_ids)
+from whitelist_matcher import WhitelistMatcher
 
 
 def get_session_key():
@@ -23,119 +35,161 @@ def get_session_key():
     return session_key
 
 
-def update_finding_status(finding_id, new_status, user='system', notes='', session_key=''):
+def _apply_status(finding, new_status, user, notes, timestamp, note_time):
+    """Set the status and reviewer fields of one finding row"""
+    finding['status'] = new_status
+
+    if new_status == 'flagged':
+        finding['flagged_by'] = user
+        finding['flagged_time'] = str(timestamp)
+    elif new_status in ['whitelisted', 'false_positive', 'remediated']:
+        finding['reviewed_by'] = user
+        finding['reviewed_time'] = str(timestamp)
+
+    if notes:
+        existing_notes = finding.get('notes', '')
+        finding['notes'] = f"{existing_notes}\n{note_time} - {user}: {notes}".strip()
+
+
+def update_findings_status(finding_ids, new_status, user='system', notes='', session_key='',
+                           lookups_path=LOOKUPS_DIR):
     """
-    Update finding status
+    Update the status of many findings in one batch
+
+    The findings file is read once, the findings are looked up by
+    finding_id and the file is rewritten once; the whitelist entries (when
+    whitelisting) and the audit entries of the whole batch are each
+    appended with one write. A finding already covered by an active
+    whitelist entry (or by one added earlier in the batch) does not get a
+    new one.
 
     Args:
-        finding_id: ID of the finding
+        finding_ids: IDs of the findings; duplicates are ignored
         new_status: New status (flagged, whitelisted, false_positive, remediated)
         user: Username performing the action
-        notes: Additional notes
+        notes: Additional notes, added to every finding in the batch
         session_key: Splunk session key
+        lookups_path: Directory holding the findings, whitelist and audit lookups
 
     Returns:
-        dict with success status and message
+        dict with success, message, new_status, updated (list of
+        {finding_id, old_status}), not_found (list of IDs) and
+        whitelist_added (number of whitelist entries written)
     """
-    lookups_path = os.path.join(os.path.dirname(__file__), '..', 'lookups')
-    findings_file = os.path.join(lookups_path, 'pii_findings.csv')
+    store = FindingsStore(os.path.join(lookups_path, 'pii_findings.csv'))
     audit_log_file = os.path.join(lookups_path, 'pii_audit_log.csv')
     whitelist_file = os.path.join(lookups_path, 'pii_whitelist.csv')
 
-    if not os.path.exists(findings_file):
+    if not os.path.exists(store.path):
         return {'success': False, 'message': 'Findings lookup file not found'}
 
-    # Load findings
-    findings = []
-    target_finding = None
-
-    with open(findings_file, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['finding_id'] == finding_id:
-                target_finding = row
-            findings.append(row)
+    # Hold the store lock from load to save, so a scan upserting meanwhile is not overwritten
+    with store.locked():
+        fieldnames, findings, by_id = store.load_index()
+        whitelist = WhitelistMatcher.load(whitelist_file) if new_status == 'whitelisted' else None
+
+        timestamp = int(datetime.now().timestamp())
+        note_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        updated = []
+        not_found = []
+        whitelist_entries = []
+        audit_entries = []
+        seen = set()
+
+        for finding_id in finding_ids:
+            if finding_id in seen:
+                continue
+            seen.add(finding_id)
+
+            target_finding = by_id.get(finding_id)
+            if target_finding is None:
+                not_found.append(finding_id)
+                continue
+
+            old_status = target_finding['status']
+            _apply_status(target_finding, new_status, user, notes, timestamp, note_time)
+            updated.append({'finding_id': finding_id, 'old_status': old_status})
+
+            # If whitelisting, add to whitelist unless an entry already covers the finding
+            if new_status == 'whitelisted' and not whitelist.match(
+                    target_finding.get('pii_type', ''), target_finding.get('sample_value', ''),
+                    target_finding.get('index', ''), target_finding.get('sourcetype', ''),
+                    target_finding.get('field_name', '')):
+                whitelist_entries.append({
+                    'whitelist_id': hashlib.md5(f"{finding_id}{timestamp}".encode()).hexdigest()[:16],
+                    'pattern': target_finding.get('sample_value', ''),
+                    'pii_type': target_finding.get('pii_type', ''),
+                    'index': target_finding.get('index', ''),
+                    'sourcetype': target_finding.get('sourcetype', ''),
+                    'field_name': target_finding.get('field_name', ''),
+                    'reason': notes or 'Whitelisted via finding management',
+                    'added_by': user,
+                    'added_time': str(timestamp),
+                    'expires': '',  # No expiration
+                    'is_active': '1'
+                })
+                whitelist.add(whitelist_entries[-1], timestamp)
+
+            audit_entries.append({
+                'audit_id': hashlib.md5(f"{finding_id}{timestamp}".encode()).hexdigest()[:16],
+                'timestamp': timestamp,
+                'action': new_status,
+                'finding_id': finding_id,
+                'pii_type': target_finding.get('pii_type', ''),
+                'performed_by': user,
+                'old_status': old_status,
+                'new_status': new_status,
+                'details': notes or f'Status changed from {old_status} to {new_status}',
+                'ip_address': 'localhost'
+            })
+
+        if updated:
+            # One rewrite of the findings, then one append each to the whitelist and audit log
+            store.save(findings, fieldnames)
+            append_records(whitelist_file, WHITELIST_FIELDS, whitelist_entries)
+            append_records(audit_log_file, AUDIT_FIELDS, audit_entries)
+
+    message = f'Updated {len(updated)} finding(s) to {new_status}'
+    if not_found:
+        message += f'; {len(not_found)} not found'
 
-    if not target_finding:
-        return {'success': False, 'message': f'Finding {finding_id} not found'}
-
-    old_status = target_finding['status']
-    timestamp = int(datetime.now().timestamp())
-
-    # Update finding
-    for finding in findings:
-        if finding['finding_id'] == finding_id:
-            finding['status'] = new_status
-
-            if new_status == 'flagged':
-                finding['flagged_by'] = user
-                finding['flagged_time'] = str(timestamp)
-            elif new_status in ['whitelisted', 'false_positive', 'remediated']:
-                finding['reviewed_by'] = user
-                finding['reviewed_time'] = str(timestamp)
-
-            if notes:
-                existing_notes = finding.get('notes', '')
-                finding['notes'] = f"{existing_notes}\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {user}: {notes}".strip()
-            break
-
-    # Write back findings
-    with open(findings_file, 'w', newline='', encoding='utf-8') as f:
-        if findings:
-            writer = csv.DictWriter(f, fieldnames=findings[0].keys())
-            writer.writeheader()
-            writer.writerows(findings)
-
-    # If whitelisting, add to whitelist
-    if new_status == 'whitelisted':
-        whitelist_entry = {
-            'whitelist_id': hashlib.md5(f"{finding_id}{timestamp}".encode()).hexdigest()[:16],
-            'pattern': target_finding.get('sample_value', ''),
-            'pii_type': target_finding.get('pii_type', ''),
-            'index': target_finding.get('index', ''),
-            'sourcetype': target_finding.get('sourcetype', ''),
-            'field_name': target_finding.get('field_name', ''),
-            'reason': notes or 'Whitelisted via finding management',
-            'added_by': user,
-            'added_time': str(timestamp),
-            'expires': '',  # No expiration
-            'is_active': '1'
-        }
-
-        # Append to whitelist
-        file_exists = os.path.exists(whitelist_file)
-        with open(whitelist_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=whitelist_entry.keys())
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(whitelist_entry)
-
-    # Log to audit log
-    audit_entry = {
-        'audit_id': hashlib.md5(f"{finding_id}{timestamp}".encode()).hexdigest()[:16],
-        'timestamp': timestamp,
-        'action': new_status,
-        'finding_id': finding_id,
-        'pii_type': target_finding.get('pii_type', ''),
-        'performed_by': user,
-        'old_status': old_status,
+    return {
+        'success': bool(updated),
+        'message': message,
         'new_status': new_status,
-        'details': notes or f'Status changed from {old_status} to {new_status}',
-        'ip_address': 'localhost'
+        'updated': updated,
+        'not_found': not_found,
+        'whitelist_added': len(whitelist_entries)
     }
 
-    # Append to audit log
-    file_exists = os.path.exists(audit_log_file)
-    with open(audit_log_file, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=audit_entry.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(audit_entry)
+
+def update_finding_status(finding_id, new_status, user='system', notes='', session_key='',
+                          lookups_path=LOOKUPS_DIR):
+    """
+    Update finding status
+
+    Args:
+        finding_id: ID of the finding
+        new_status: New status (flagged, whitelisted, false_positive, remediated)
+        user: Username performing the action
+        notes: Additional notes
+        session_key: Splunk session key
+        lookups_path: Directory holding the findings, whitelist and audit lookups
+
+    Returns:
+        dict with success status and message
+    """
+    result = update_findings_status([finding_id], new_status, user, notes, session_key, lookups_path)
+    if result.get('not_found'):
+        return {'success': False, 'message': f'Finding {finding_id} not found'}
+    if not result['success']:
+        return result
 
     return {
         'success': True,
         'message': f'Successfully updated finding {finding_id} to {new_status}',
-        'old_status': old_status,
+        'old_status': result['updated'][0]['old_status'],
         'new_status': new_status
     }
 
@@ -149,11 +203,11 @@ def main():
     if len(sys.argv) < 3:
         print(json.dumps({
             'success': False,
-            'message': 'Usage: flag_finding.py <finding_id> <status> [user] [notes]'
+            'message': 'Usage: flag_finding.py <finding_id[,finding_id...]|-> <status> [user] [notes]'
         }))
         sys.exit(1)
 
-    finding_id = sys.argv[1]
+    finding_ids = parse_finding_ids(sys.argv[1])
     new_status = sys.argv[2]
     user = sys.argv[3] if len(sys.argv) > 3 else 'system'
     notes = sys.argv[4] if len(sys.argv) > 4 else ''
@@ -167,8 +221,11 @@ def main():
         }))
         sys.exit(1)
 
-    # Update finding
-    result = update_finding_status(finding_id, new_status, user, notes, session_key)
+    # Update finding(s)
+    if len(finding_ids) == 1 and sys.argv[1] != '-':
+        result = update_finding_status(finding_ids[0], new_status, user, notes, session_key)
+    else:
+        result = update_findings_status(finding_ids, new_status, user, notes, session_key)
 
     # Output result
     print(json.dumps(result, indent=2))
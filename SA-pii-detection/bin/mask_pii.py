@@ -2,11 +2,21 @@
 """
 PII Masking Script
 Masks or redacts PII data based on finding ID and remediation method
+
+A batch of findings, given by ID or selected by filter, is remediated with
+one read of the findings lookup, one pass over the findings with the mask
+functions dispatched from tables, and one write each of the findings and
+the audit log.
+
+Usage:
+    ./mask_pii.py <finding_id> [method]
+    ./mask_pii.py <finding_id>,<finding_id>,... [method]
+    ./mask_pii.py - [method]    (IDs on stdin, one per line after the session key)
+    ./mask_pii.py --filter pii_type=ssn --filter severity=critical,high [method]
 """
 
 import sys
 import json
-import csv
 import os
 import re
 import hashlib
@@ -14,6 +24,10 @@ from datetime import datetime
 
 # Add Splunk SDK to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from findings_store import AUDIT_FIELDS, LOOKUPS_DIR, FindingsStore, append_records, parse_finding_ids
+from pii_scanner import PIIScanner
+from token_vault import TokenKeyError, get_vault
 
 try:
     import splunk.rest as rest
@@ -64,8 +78,8 @@ def mask_phone(value):
 
 
 def hash_value(value):
-    """Hash the value using SHA256"""
-    return hashlib.sha256(value.encode()).hexdigest()[:16]
+    """Keyed hash of the value (HMAC-SHA256, see token_vault.py; the vault must be loaded)"""
+    return get_vault().keyed_hash(value)
 
 
 def redact_value(value):
@@ -74,133 +88,354 @@ def redact_value(value):
 
 
 def tokenize_value(value):
-    """Generate a token for the value"""
-    token = hashlib.md5(value.encode()).hexdigest()[:12].upper()
-    return f"TOKEN-{token}"
+    """Keyed deterministic token for the value, recorded in the vault when enabled"""
+    return get_vault().tokenize(value)
+
+
+# Per-type masking for the 'mask' method
+MASK_FUNCTIONS = {
+    'ssn': mask_ssn,
+    'credit_card': mask_credit_card,
+    'email': mask_email,
+    'phone': mask_phone,
+}
+
+# Type-independent methods
+METHOD_FUNCTIONS = {
+    'hash': hash_value,
+    'redact': redact_value,
+    'tokenize': tokenize_value,
+}
+
+# Stored when there is no value to transform (or no masker for the PII type)
+PLACEHOLDERS = {
+    'mask': '***MASKED***',
+    'hash': '***HASHED***',
+    'redact': '***REDACTED***',
+    'tokenize': '***TOKENIZED***',
+}
+
+# Findings a filter selects only when it names the status explicitly
+CLOSED_STATUSES = ('whitelisted', 'false_positive', 'remediated')
 
+FILTER_FIELDS = ('pii_type', 'index', 'sourcetype', 'host', 'severity', 'status')
 
-def remediate_pii(finding_id, method='mask', session_key=''):
+
+def get_masker(method, pii_type):
+    """Masking function for a method and PII type, or None when there is none"""
+    if method == 'mask':
+        return MASK_FUNCTIONS.get(pii_type)
+    return METHOD_FUNCTIONS.get(method)
+
+
+def remediated_value(value, pii_type, method='mask'):
+    """Apply a remediation method to one value"""
+    masker = get_masker(method, pii_type)
+    if masker is None or not value:
+        return PLACEHOLDERS.get(method, '***REMEDIATED***')
+    return masker(value)
+
+
+class PIIMasker(object):
+    """Replaces every PII match in a text with its remediated value, in one scanner pass"""
+
+    def __init__(self, method='mask', types=None, scanner=None, vault=None):
+        """
+        Compile the masker
+
+        Args:
+            method: Remediation method (mask, hash, redact, tokenize)
+            types: PII types to mask, as for PIIScanner (None = default types, 'all' = every type)
+            scanner: Compiled PIIScanner to use instead of building one from types
+            vault: TokenVault for hash and tokenize (default: the process-wide vault)
+        """
+        if method not in PLACEHOLDERS:
+            raise ValueError(f'Invalid method {method!r}; must be one of: {", ".join(PLACEHOLDERS)}')
+        self.method = method
+        self.scanner = scanner or PIIScanner(types)
+        self.placeholder = PLACEHOLDERS[method]
+        # Resolved once per type instead of per match
+        if vault is not None and method in ('hash', 'tokenize'):
+            masker = vault.keyed_hash if method == 'hash' else vault.tokenize
+            self.maskers = dict((pii_type, masker) for pii_type in self.scanner.types)
+        else:
+            self.maskers = dict((pii_type, get_masker(method, pii_type)) for pii_type in self.scanner.types)
+
+    def mask(self, text):
+        """
+        Mask one text
+
+        Returns:
+            tuple of (masked text, number of matches replaced)
+        """
+        if not text:
+            return text, 0
+        parts = []
+        last = 0
+        for pii_type, start, end in self.scanner.finditer(text):
+            masker = self.maskers.get(pii_type)
+            parts.append(text[last:start])
+            parts.append(masker(text[start:end]) if masker else self.placeholder)
+            last = end
+        if not parts:
+            return text, 0
+        parts.append(text[last:])
+        return ''.join(parts), len(parts) // 2
+
+
+def mask_result(result, fields, masker):
+    """Mask the fields of one search result in place; returns the number of matches replaced"""
+    total = 0
+    for field in fields:
+        value = result.get(field)
+        if isinstance(value, list):
+            masked = []
+            for item in value:
+                text, count = masker.mask(item)
+                masked.append(text)
+                total += count
+            if total:
+                result[field] = masked
+        elif value:
+            text, count = masker.mask(value)
+            if count:
+                result[field] = text
+                total += count
+    return total
+
+
+def mask_results(results, method='mask', fields=('_raw',), types=None, session_key=None, scanner=None):
     """
-    Remediate PII based on finding ID
+    Mask PII in search results in place, as the piimask command does
 
     Args:
-        finding_id: ID of the finding to remediate
+        results: Search result dicts; pii_masked_count is set on each
+        method: Remediation method (mask, hash, redact, tokenize)
+        fields: Fields to mask
+        types: PII types to mask, as for PIIScanner
+        session_key: Caller's session key, used by hash and tokenize to read
+            the tokenisation key
+        scanner: Compiled PIIScanner to use instead of building one from types
+
+    Returns:
+        list: The results
+
+    Raises:
+        TokenKeyError: hash or tokenize, and the key cannot be read with
+            session_key (see token_vault.load_key())
+    """
+    vault = None
+    if method in ('hash', 'tokenize'):
+        vault = get_vault(session_key, defer_writes=True)
+    masker = PIIMasker(method, types, scanner=scanner, vault=vault)
+    for result in results:
+        result['pii_masked_count'] = mask_result(result, fields, masker)
+    if vault is not None:
+        # The chunk's new tokens, in one vault transaction
+        vault.flush()
+    return results
+
+
+def select_findings(rows, filters):
+    """
+    Findings matching every filter
+
+    Args:
+        rows: Finding rows
+        filters: dict of field -> list of accepted values (fields from FILTER_FIELDS)
+
+    Returns:
+        list of matching rows; closed findings (whitelisted, false_positive,
+        remediated) only when the filter names their status
+    """
+    accepted = dict((field, set(values)) for field, values in filters.items())
+    if 'status' not in accepted:
+        rows = [row for row in rows if row.get('status') not in CLOSED_STATUSES]
+    return [row for row in rows
+            if all(row.get(field, '') in values for field, values in accepted.items())]
+
+
+def remediate_findings(finding_ids=None, filters=None, method='mask', session_key='', lookups_path=LOOKUPS_DIR):
+    """
+    Remediate a batch of findings selected by ID or by filter
+
+    The findings lookup is read once, every masked value is computed in one
+    pass through the dispatch tables, and the findings and audit entries are
+    each written once for the whole batch.
+
+    Args:
+        finding_ids: IDs of the findings to remediate; duplicates are ignored
+        filters: dict of field -> list of values, used when finding_ids is None
         method: Remediation method (mask, hash, redact, tokenize)
         session_key: Splunk session key
+        lookups_path: Directory holding the findings and audit lookups
 
     Returns:
-        dict with success status and message
+        dict with success, message, method, remediated (list of
+        {finding_id, old_status, masked_value}) and not_found (list of IDs)
     """
-    # Read findings lookup
-    lookups_path = os.path.join(os.path.dirname(__file__), '..', 'lookups')
-    findings_file = os.path.join(lookups_path, 'pii_findings.csv')
+    store = FindingsStore(os.path.join(lookups_path, 'pii_findings.csv'))
     audit_log_file = os.path.join(lookups_path, 'pii_audit_log.csv')
 
-    if not os.path.exists(findings_file):
+    if not os.path.exists(store.path):
         return {'success': False, 'message': 'Findings lookup file not found'}
 
-    # Load findings
-    findings = []
-    target_finding = None
+    if method in ('hash', 'tokenize'):
+        # Load the key before taking the lock; remediation may create it on first use
+        try:
+            get_vault(session_key, create_key=True)
+        except TokenKeyError as e:
+            return {'success': False, 'message': str(e)}
 
-    with open(findings_file, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['finding_id'] == finding_id:
-                target_finding = row
-            findings.append(row)
-
-    if not target_finding:
-        return {'success': False, 'message': f'Finding {finding_id} not found'}
+    # Hold the store lock from load to save, so a scan upserting meanwhile is not overwritten
+    with store.locked():
+        fieldnames, findings, by_id = store.load_index()
 
-    # Apply remediation based on PII type and method
-    pii_type = target_finding.get('pii_type', '')
-    sample_value = target_finding.get('sample_value', '')
-
-    if method == 'mask':
-        if pii_type == 'ssn':
-            masked = mask_ssn(sample_value) if sample_value else "***MASKED***"
-        elif pii_type == 'credit_card':
-            masked = mask_credit_card(sample_value) if sample_value else "***MASKED***"
-        elif pii_type == 'email':
-            masked = mask_email(sample_value) if sample_value else "***MASKED***"
-        elif pii_type == 'phone':
-            masked = mask_phone(sample_value) if sample_value else "***MASKED***"
+        not_found = []
+        if finding_ids is None:
+            targets = select_findings(findings, filters or {})
         else:
-            masked = "***MASKED***"
-    elif method == 'hash':
-        masked = hash_value(sample_value) if sample_value else "***HASHED***"
-    elif method == 'redact':
-        masked = redact_value(sample_value) if sample_value else "***REDACTED***"
-    elif method == 'tokenize':
-        masked = tokenize_value(sample_value) if sample_value else "***TOKENIZED***"
-    else:
-        masked = "***REMEDIATED***"
+            targets = []
+            seen = set()
+            for finding_id in finding_ids:
+                if finding_id in seen:
+                    continue
+                seen.add(finding_id)
+                if finding_id in by_id:
+                    targets.append(by_id[finding_id])
+                else:
+                    not_found.append(finding_id)
+
+        if method == 'tokenize':
+            # Tokenise the whole batch at once: one vault transaction, then cache hits below
+            get_vault().tokenize_many([f['sample_value'] for f in targets if f.get('sample_value')])
+
+        now = datetime.now()
+        timestamp = int(now.timestamp())
+        notes = f"Remediated using {method} method on {now.strftime('%Y-%m-%d %H:%M:%S')}"
+
+        remediated = []
+        audit_entries = []
+        for finding in targets:
+            finding_id = finding['finding_id']
+            pii_type = finding.get('pii_type', '')
+            masked = remediated_value(finding.get('sample_value', ''), pii_type, method)
 
-    # Update finding
-    for finding in findings:
-        if finding['finding_id'] == finding_id:
             old_status = finding['status']
             finding['status'] = 'remediated'
             finding['masked_value'] = masked
             finding['reviewed_by'] = 'system'
-            finding['reviewed_time'] = str(int(datetime.now().timestamp()))
-            finding['notes'] = f"Remediated using {method} method on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-
-    # Write back findings
-    with open(findings_file, 'w', newline='', encoding='utf-8') as f:
-        if findings:
-            writer = csv.DictWriter(f, fieldnames=findings[0].keys())
-            writer.writeheader()
-            writer.writerows(findings)
-
-    # Log to audit log
-    audit_entry = {
-        'audit_id': hashlib.md5(f"{finding_id}{datetime.now().timestamp()}".encode()).hexdigest()[:16],
-        'timestamp': int(datetime.now().timestamp()),
-        'action': 'remediate',
-        'finding_id': finding_id,
-        'pii_type': pii_type,
-        'performed_by': 'system',
-        'old_status': old_status,
-        'new_status': 'remediated',
-        'details': f"Remediated using {method} method",
-        'ip_address': 'localhost'
+            finding['reviewed_time'] = str(timestamp)
+            finding['notes'] = notes
+            remediated.append({'finding_id': finding_id, 'old_status': old_status, 'masked_value': masked})
+
+            audit_entries.append({
+                'audit_id': hashlib.md5(f"{finding_id}{now.timestamp()}".encode()).hexdigest()[:16],
+                'timestamp': timestamp,
+                'action': 'remediate',
+                'finding_id': finding_id,
+                'pii_type': pii_type,
+                'performed_by': 'system',
+                'old_status': old_status,
+                'new_status': 'remediated',
+                'details': f"Remediated using {method} method",
+                'ip_address': 'localhost'
+            })
+
+        if remediated:
+            store.save(findings, fieldnames)
+            append_records(audit_log_file, AUDIT_FIELDS, audit_entries)
+
+    message = f'Remediated {len(remediated)} finding(s) using {method} method'
+    if not_found:
+        message += f'; {len(not_found)} not found'
+
+    return {
+        'success': bool(remediated),
+        'message': message,
+        'method': method,
+        'remediated': remediated,
+        'not_found': not_found
     }
 
-    # Append to audit log
-    file_exists = os.path.exists(audit_log_file)
-    with open(audit_log_file, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=audit_entry.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(audit_entry)
+
+def remediate_pii(finding_id, method='mask', session_key='', lookups_path=LOOKUPS_DIR):
+    """
+    Remediate PII based on finding ID
+
+    Args:
+        finding_id: ID of the finding to remediate
+        method: Remediation method (mask, hash, redact, tokenize)
+        session_key: Splunk session key
+        lookups_path: Directory holding the findings and audit lookups
+
+    Returns:
+        dict with success status and message
+    """
+    result = remediate_findings([finding_id], method=method, session_key=session_key, lookups_path=lookups_path)
+    if result.get('not_found'):
+        return {'success': False, 'message': f'Finding {finding_id} not found'}
+    if not result['success']:
+        return result
 
     return {
         'success': True,
         'message': f'Successfully remediated finding {finding_id} using {method} method',
-        'masked_value': masked
+        'masked_value': result['remediated'][0]['masked_value']
     }
 
 
+def parse_filters(specs):
+    """dict of field -> values from FIELD=VALUE[,VALUE...] arguments"""
+    filters = {}
+    for spec in specs:
+        field, sep, values = spec.partition('=')
+        field = field.strip()
+        if not sep or field not in FILTER_FIELDS:
+            raise ValueError(f'Invalid filter {spec!r}; use FIELD=VALUE[,VALUE...] with FIELD one of: '
+                             f'{", ".join(FILTER_FIELDS)}')
+        filters.setdefault(field, []).extend(v.strip() for v in values.split(',') if v.strip())
+    return filters
+
+
 def main():
     """Main execution"""
     # Get session key
     session_key = get_session_key()
 
-    # Parse arguments
-    if len(sys.argv) < 2:
+    # Parse arguments: --filter FIELD=VALUE options select findings in place of IDs
+    args = sys.argv[1:]
+    specs = []
+    while '--filter' in args:
+        position = args.index('--filter')
+        specs.extend(args[position + 1:position + 2])
+        del args[position:position + 2]
+
+    if not args and not specs:
         print(json.dumps({
             'success': False,
-            'message': 'Usage: mask_pii.py <finding_id> [method]'
+            'message': 'Usage: mask_pii.py <finding_id[,finding_id...]|-> [method] | '
+                       'mask_pii.py --filter FIELD=VALUE[,VALUE...] [--filter ...] [method]'
         }))
         sys.exit(1)
 
-    finding_id = sys.argv[1]
-    method = sys.argv[2] if len(sys.argv) > 2 else 'mask'
+    try:
+        filters = parse_filters(specs)
+    except ValueError as e:
+        print(json.dumps({'success': False, 'message': str(e)}))
+        sys.exit(1)
 
     # Remediate PII
-    result = remediate_pii(finding_id, method, session_key)
+    if filters:
+        method = args[0] if args else 'mask'
+        result = remediate_findings(filters=filters, method=method, session_key=session_key)
+    else:
+        method = args[1] if len(args) > 1 else 'mask'
+        finding_ids = parse_finding_ids(args[0])
+        if len(finding_ids) == 1 and args[0] != '-':
+            result = remediate_pii(finding_ids[0], method, session_key)
+        else:
+            result = remediate_findings(finding_ids, method=method, session_key=session_key)
 
     # Output result
     print(json.dumps(result, indent=2))
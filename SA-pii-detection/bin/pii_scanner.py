@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+PII Scanner Library
+Single-pass multi-pattern PII scanner shared by the piiscan search command
+
+All pii_*_pattern macros (default/macros.conf, overridden by
+local/macros.conf) and the enabled rows of pii_patterns.csv are compiled
+into one alternation of named groups, so an event is scanned once instead
+of once per PII type. Types are ranked - custom patterns first, then the
+built-in types most specific first - and where matches overlap, the span
+counts towards the higher ranked type.
+
+Most built-in types match only digits and separators (or only upper-case
+letters and digits). Their alternation is only run inside runs of those
+characters, found by one character-class search. The remaining types
+(email, ipv6, mrn, custom patterns) are skipped unless a cheap prefilter
+finds the literal they need ('@', ':', an MRN label, a custom pattern's
+leading literal).
+
+Candidates are validated inline:
+    credit_card  Luhn checksum
+    ssn          area not 000/666/9xx, group not 00, serial not 0000,
+                 consistent separators, not a well-known sample SSN
+    custom       validation_regex from pii_patterns.csv, if set
+A span that fails validation is retried against the lower priority types
+starting at the same position (a 16-digit number failing Luhn may still be
+a bank account number).
+
+With a WhitelistMatcher (whitelist_matcher.py), matches whose type is
+whitelisted for the event's index/sourcetype/field, or whose value is a
+whitelisted pattern, are dropped before they are counted.
+"""
+
+import csv
+import os
+import re
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MACRO_FILES = [
+    os.path.join(APP_DIR, 'default', 'macros.conf'),
+    os.path.join(APP_DIR, 'local', 'macros.conf'),
+]
+PATTERNS_FILE = os.path.join(APP_DIR, 'lookups', 'pii_patterns.csv')
+
+# pii_type -> pattern macro, in match priority order (most specific first).
+# Type names follow the has_* flags of the scan_all_pii macro.
+BUILTIN_TYPES = [
+    ('mrn', 'pii_mrn_pattern'),
+    ('email', 'pii_email_pattern'),
+    ('ipv6', 'pii_ipv6_pattern'),
+    ('ip', 'pii_ipv4_pattern'),
+    ('dob', 'pii_dob_pattern'),
+    ('ssn', 'pii_ssn_pattern'),
+    ('credit_card', 'pii_credit_card_pattern'),
+    ('phone', 'pii_phone_us_pattern'),
+    ('passport', 'pii_passport_pattern'),
+    ('drivers_license', 'pii_drivers_license_pattern'),
+    ('bank_account', 'pii_bank_account_pattern'),
+    ('phone_intl', 'pii_phone_intl_pattern'),
+]
+
+# Types scanned by default - the same set as the original scan_all_pii macro
+DEFAULT_TYPES = ['ssn', 'credit_card', 'email', 'phone', 'ip']
+
+# Types whose matches consist only of one character class, with their shortest
+# possible match; these are only searched inside runs of that class
+RUN_CLASSES = [
+    (r'[0-9().+/-]', {
+        'ip': 7,
+        'dob': 8,
+        'ssn': 9,
+        'credit_card': 13,
+        'phone': 10,
+        'bank_account': 8,
+        'phone_intl': 3,
+    }),
+    (r'[A-Z0-9]', {
+        'passport': 7,
+        'drivers_license': 6,
+    }),
+]
+
+# Characters or literals every match of another built-in type must contain
+PREFILTERS = {
+    'mrn': r'MRN|mrn|Medical Record|Patient ID',
+    'email': r'@',
+    'ipv6': r':',
+}
+
+# Published sample SSNs that are never issued to a person
+INVALID_SSNS = {'078051120', '219099999'}
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+_REGEX_META = set('.^$*+?{}[]\\|()')
+
+
+def read_macros(paths=None):
+    """Read macro definitions from macros.conf files, later files overriding earlier ones"""
+    macros = {}
+    for path in paths or MACRO_FILES:
+        if not os.path.exists(path):
+            continue
+        stanza = None
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = iter(f.read().splitlines())
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith('[') and stripped.endswith(']'):
+                stanza = stripped[1:-1]
+            elif stanza and stripped.startswith('definition') and '=' in stripped:
+                value = stripped.split('=', 1)[1].strip()
+                # A single trailing backslash continues the definition on the next line
+                while value.endswith('\\'):
+                    value = value[:-1] + next(lines, '').strip()
+                macros[stanza] = value
+    return macros
+
+
+def read_custom_patterns(path=PATTERNS_FILE):
+    """Read enabled custom patterns from pii_patterns.csv"""
+    patterns = []
+    if not os.path.exists(path):
+        return patterns
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if str(row.get('is_enabled', '1')).strip().lower() not in ('1', 'true', 'yes') or not row.get('regex_pattern'):
+                continue
+            pii_type = re.sub(r'[^a-z0-9_]', '_', (row.get('pii_type') or 'custom').strip().lower()) or 'custom'
+            patterns.append({
+                'pattern_id': row.get('pattern_id', ''),
+                'pii_type': pii_type,
+                'regex_pattern': row['regex_pattern'],
+                'validation_regex': row.get('validation_regex') or '',
+            })
+    return patterns
+
+
+def luhn_valid(digits):
+    """Luhn checksum of a digit string"""
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = ord(ch) - 48
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def ssn_valid(text):
+    """SSN area/group/serial rules and separator consistency"""
+    digits = _NON_DIGITS.sub('', text)
+    if len(digits) != 9:
+        return False
+    area, group, serial = digits[:3], digits[3:5], digits[5:]
+    if area in ('000', '666') or area[0] == '9' or group == '00' or serial == '0000':
+        return False
+    if digits in INVALID_SSNS:
+        return False
+    # 123-45-6789 or 123456789, not 123-456789
+    return text.count('-') in (0, 2)
+
+
+def credit_card_valid(text):
+    """Luhn check of a card number candidate"""
+    return luhn_valid(_NON_DIGITS.sub('', text))
+
+
+BUILTIN_VALIDATORS = {
+    'ssn': ssn_valid,
+    'credit_card': credit_card_valid,
+}
+
+
+def _literal_prefix(pattern):
+    """Leading literal text of a regex, used as a prefilter for custom patterns"""
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if nxt == 'b' and not prefix:
+                i += 2
+                continue
+            if nxt.isalnum():
+                break
+            prefix.append(nxt)
+            i += 2
+            continue
+        if ch in _REGEX_META:
+            # A quantifier applies to the last literal character
+            if ch in '*?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(ch)
+        i += 1
+    return ''.join(prefix)
+
+
+def _embeddable(pattern):
+    """True if a custom regex can be embedded in the combined alternation"""
+    try:
+        compiled = re.compile(pattern)
+    except re.error:
+        return False
+    # Named groups would clash and backreferences would be renumbered
+    return not compiled.groupindex and not re.search(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)', pattern)
+
+
+class PIIScanner(object):
+    """Compiled single-pass scanner over a set of PII types"""
+
+    def __init__(self, types=None, macros=None, custom_patterns=None, whitelist=None):
+        """
+        Compile the scanner
+
+        Args:
+            types: Built-in pii_types to scan (None = DEFAULT_TYPES, 'all' = every type)
+            macros: Macro definitions (default: read from macros.conf)
+            custom_patterns: Custom pattern rows (default: read from pii_patterns.csv)
+            whitelist: WhitelistMatcher whose entries suppress matches (default: none)
+        """
+        self.whitelist = whitelist
+        macros = read_macros() if macros is None else macros
+        custom_patterns = read_custom_patterns() if custom_patterns is None else custom_patterns
+        if types is None:
+            types = DEFAULT_TYPES
+        elif types == 'all':
+            types = [t for t, _ in BUILTIN_TYPES]
+
+        # (group name, pii_type, regex, validator) in priority order
+        entries = []
+        for i, pattern in enumerate(custom_patterns):
+            validator = None
+            if pattern.get('validation_regex'):
+                validator = re.compile(pattern['validation_regex']).search
+            entries.append(('custom_%d' % i, pattern['pii_type'], pattern['regex_pattern'], validator))
+        for pii_type, macro in BUILTIN_TYPES:
+            if pii_type in types and macros.get(macro):
+                entries.append((pii_type, pii_type, macros[macro], BUILTIN_VALIDATORS.get(pii_type)))
+
+        self.types = []
+        for _, pii_type, _, _ in entries:
+            if pii_type not in self.types:
+                self.types.append(pii_type)
+
+        self.group_types = {}
+        self.rank = {}
+        self.validators = {}
+        self.single = {}
+        run_groups = [[] for _ in RUN_CLASSES]
+        other_groups, prefilters = [], []
+        self.separate = []
+        for rank, (group, pii_type, regex, validator) in enumerate(entries):
+            self.group_types[group] = pii_type
+            self.rank[group] = rank
+            self.validators[group] = validator
+            self.single[group] = re.compile(regex, re.ASCII)
+            run_class = next((i for i, (_, run_types) in enumerate(RUN_CLASSES) if group in run_types), None)
+            if run_class is not None:
+                run_groups[run_class].append((group, regex))
+            elif group.startswith('custom_') and not _embeddable(regex):
+                self.separate.append(group)
+            else:
+                other_groups.append((group, regex))
+                if group in PREFILTERS:
+                    prefilters.append(PREFILTERS[group])
+                else:
+                    prefix = _literal_prefix(regex)
+                    prefilters.append(re.escape(prefix) if len(prefix) >= 2 else None)
+
+        # (run finder, alternation) per character class with enabled types
+        self.runs = []
+        for (chars, run_types), groups in zip(RUN_CLASSES, run_groups):
+            if groups:
+                min_length = min(run_types[g] for g, _ in groups)
+                self.runs.append((re.compile(r'%s{%d,}' % (chars, min_length)), self._combine(groups)))
+        self.others = self._combine(other_groups)
+        # One prefilter for the other alternation; any pattern without one disables it
+        self.prefilter = None
+        if prefilters and None not in prefilters:
+            self.prefilter = re.compile('|'.join(sorted(set(prefilters))), re.ASCII)
+
+    @staticmethod
+    def _combine(groups):
+        """One alternation of named groups, plus the group order for validation retries"""
+        if not groups:
+            return None
+        regex = re.compile('|'.join('(?P<%s>%s)' % (g, r) for g, r in groups), re.ASCII)
+        return regex, [g for g, _ in groups]
+
+    def _validate(self, group, text):
+        validator = self.validators.get(group)
+        return validator is None or bool(validator(text))
+
+    def _collect(self, combined, text, pos, endpos, found):
+        regex, order = combined
+        for m in regex.finditer(text, pos, endpos):
+            group = m.lastgroup
+            start = m.start()
+            if self._validate(group, m.group()):
+                found.append((self.rank[group], start, m.end(), group))
+                continue
+            # Retry the lower priority types at the same position
+            for other in order[order.index(group) + 1:]:
+                alt = self.single[other].match(text, start, endpos)
+                if alt and self._validate(other, alt.group()):
+                    found.append((self.rank[other], start, alt.end(), other))
+                    break
+
+    def finditer(self, text, scope=None):
+        """
+        Yield (pii_type, start, end) for each validated match in text, in text order
+
+        Where matches of different types overlap, the higher ranked type
+        (custom patterns, then BUILTIN_TYPES order) keeps the span. With a
+        whitelist, scope is the (index, sourcetype, field_name) of the text
+        and whitelisted matches are skipped.
+        """
+        if not text:
+            return
+        found = []
+        if self.others is not None and (self.prefilter is None or self.prefilter.search(text)):
+            self._collect(self.others, text, 0, len(text), found)
+        limit = len(text)
+        for run_finder, combined in self.runs:
+            # Matches lie inside one run of the class; the character after the
+            # run stays visible so \b still sees it
+            for run in run_finder.finditer(text):
+                self._collect(combined, text, run.start(), min(limit, run.end() + 1), found)
+        for group in self.separate:
+            for m in self.single[group].finditer(text):
+                if self._validate(group, m.group()):
+                    found.append((self.rank[group], m.start(), m.end(), group))
+
+        if len(found) > 1:
+            accepted = []
+            for match in sorted(found):
+                if not any(match[1] < end and start < match[2] for _, start, end, _ in accepted):
+                    accepted.append(match)
+            found = sorted(accepted, key=lambda m: m[1])
+        # An empty whitelist is skipped altogether
+        whitelist = self.whitelist if self.whitelist else None
+        scope = scope or ('*', '*', '*')
+        for _, start, end, group in found:
+            pii_type = self.group_types[group]
+            if whitelist is not None and whitelist.match(pii_type, text[start:end], *scope):
+                continue
+            yield pii_type, start, end
+
+    def scan(self, text, scope=None):
+        """
+        Count validated matches per type in one pass
+
+        Returns:
+            dict of pii_type -> match count (types with no match omitted)
+        """
+        counts = {}
+        for pii_type, _, _ in self.finditer(text, scope):
+            counts[pii_type] = counts.get(pii_type, 0) + 1
+        return counts
+
+    def flags(self, text, scope=None):
+        """
+        has_<type>, <type>_matches, has_pii and pii_match_count fields for one event
+
+        Returns:
+            dict of field name -> value
+        """
+        counts = self.scan(text, scope)
+        fields = {}
+        for pii_type in self.types:
+            count = counts.get(pii_type, 0)
+            fields[f'has_{pii_type}'] = 1 if count else 0
+            fields[f'{pii_type}_matches'] = count
+        total = sum(counts.values())
+        fields['has_pii'] = 1 if total else 0
+        fields['pii_match_count'] = total
+        return fields
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+PII Mask Search Command
+Streaming command that masks PII in _raw or chosen fields at search time
+
+Usage:
+    ... | piimask [method=mask|hash|redact|tokenize] [fields=_raw,...] [types=ssn,credit_card,...|all]
+
+Every match the piiscan scanner finds (same types, validation and custom
+patterns; see pii_scanner.py) is replaced in place with the value
+mask_pii.py would store for it: mask keeps the last four digits of SSNs,
+cards and phones and the domain of emails, hash and tokenize replace the
+match with a digest, redact removes it. The scanner and the masking
+functions are compiled once per invocation and reused across the chunk of
+events Splunk streams to the command. pii_masked_count is set to the
+number of matches replaced in the event.
+
+hash and tokenize use the keyed HMAC of token_vault.py, so a value gets the
+same token here as in batch remediation. The key lives in storage/passwords
+on the search head, so the command runs there (local = true in
+commands.conf) and reads the key with the caller's session key: hash and
+tokenize need a role with the list_storage_passwords capability, and fail
+closed, naming it, otherwise. tokenize records the chunk's new tokens in
+the vault in one transaction, so they can be detokenised with
+token_vault.py. The masking itself is mask_pii.mask_results().
+"""
+
+import sys
+import os
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mask_pii import mask_results
+
+
+def main():
+    """Main execution"""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+
+        method = options.get('method', 'mask')
+        fields = [f.strip() for f in options.get('fields', '_raw').split(',') if f.strip()]
+        types = options.get('types')
+        if types and types != 'all':
+            types = [t.strip() for t in types.split(',') if t.strip()]
+        si.outputResults(mask_results(results, method, fields, types, settings.get('sessionKey')))
+
+    except Exception as e:
+        si.generateErrorResults(f'piimask: {e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+PII Scan Search Command
+Streaming command that scans each event for every enabled PII type in one pass
+
+Usage:
+    ... | piiscan [field=_raw] [types=ssn,credit_card,...|all] [whitelist=true|false]
+
+Adds has_<type> and <type>_matches for each scanned type, plus has_pii and
+pii_match_count. Default types are those of the original scan_all_pii macro
+(ssn, credit_card, email, phone, ip); enabled pii_patterns.csv rows are
+always included. Card numbers are Luhn-checked and SSNs checked against the
+area/group/serial rules. See pii_scanner.py.
+
+Active pii_whitelist.csv entries (whitelist_matcher.py) are applied to each
+match with the event's index, sourcetype and the scanned field as scope,
+so whitelisted types and values never set has_<type>; whitelist=false
+counts every match.
+"""
+
+import sys
+import os
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pii_scanner import PIIScanner
+from whitelist_matcher import WhitelistMatcher
+
+
+def main():
+    """Main execution"""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+
+        field = options.get('field', '_raw')
+        types = options.get('types')
+        if types and types != 'all':
+            types = [t.strip() for t in types.split(',') if t.strip()]
+        whitelist = None
+        if options.get('whitelist', 'true').lower() not in ('false', 'f', '0', 'no'):
+            whitelist = WhitelistMatcher.load()
+        scanner = PIIScanner(types, whitelist=whitelist)
+
+        for result in results:
+            scope = (result.get('index', '*'), result.get('sourcetype', '*'), field)
+            result.update(scanner.flags(result.get(field, ''), scope))
+
+        si.outputResults(results)
+
+    except Exception as e:
+        si.generateErrorResults(f'piiscan: {e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+PII Scan Commit Search Command
+Advances the cursors of a checkpointed PII scan once its findings are stored
+
+Usage:
+    ... | stats count as events_scanned, sum(has_pii) as event_count,
+            max(has_*) as has_*, max(indextime) as max_indextime,
+            max(index_delay) as max_index_delay by index, sourcetype, source, host
+        | appendpipe [stats count as events_scanned | where events_scanned=0]
+        | addinfo
+        | piiscancommit name=daily mode=stage
+        | ... | piiupsertfindings
+        | addinfo
+        | piiscancommit name=daily
+
+mode=stage records the scan's per index/sourcetype totals on the window
+opened by piiscanwindow. mode=commit, after the findings are stored, moves
+every cursor to the end of that window and appends the run's coverage and
+lag metrics to pii_scan_history.csv, so a run whose findings were not
+stored scans its window again. A run without findings has nothing to store
+and commits at the stage; the appendpipe gives the stage a row to work
+from when the window held no events.
+
+The run's window is the pending one whose latest bound is the search's
+info_max_time (from addinfo); scan_id=<id> names it instead. Results pass
+through unchanged. See scan_checkpoint.py.
+"""
+
+import sys
+import os
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scan_checkpoint import ScanCheckpoints, _to_int
+
+
+def summarize(results):
+    """
+    Per index/sourcetype totals and the number of findings in the scan's stats rows
+
+    Returns:
+        tuple of (pair_stats dict, findings count)
+    """
+    pair_stats = {}
+    findings = 0
+    for result in results:
+        if not result.get('index'):
+            continue  # the appendpipe row of a window without events
+        pair = (result.get('index', ''), result.get('sourcetype', ''))
+        stats = pair_stats.setdefault(pair, {'events': 0, 'max_indextime': 0, 'max_index_delay': 0})
+        stats['events'] += _to_int(result.get('events_scanned'))
+        stats['max_indextime'] = max(stats['max_indextime'], _to_int(result.get('max_indextime')))
+        stats['max_index_delay'] = max(stats['max_index_delay'], _to_int(result.get('max_index_delay')))
+        if _to_int(result.get('event_count')) > 0:
+            findings += sum(1 for key, value in result.items()
+                            if key.startswith('has_') and key != 'has_pii' and _to_int(value) == 1)
+    return pair_stats, findings
+
+
+def find_window(checkpoints, options, results):
+    """scan_id of the run's window: the scan_id option, else the pending window matching info_max_time"""
+    if options.get('scan_id'):
+        return options['scan_id']
+    latest = next((r['info_max_time'] for r in results if r.get('info_max_time')), None)
+    scan_id = checkpoints.find_window(latest)
+    if not scan_id:
+        raise ValueError(f'no open scan window for {checkpoints.name} matches this search - '
+                         f'run piiscanwindow first or pass scan_id')
+    return scan_id
+
+
+def main():
+    """Main execution"""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+
+        checkpoints = ScanCheckpoints(options.get('name', 'daily'))
+        initiated_by = settings.get('owner') or 'scheduler'
+        if options.get('mode', 'commit') == 'stage':
+            scan_id = find_window(checkpoints, options, results)
+            pair_stats, findings = summarize(results)
+            if findings:
+                checkpoints.stage(scan_id, pair_stats)
+            else:
+                checkpoints.commit(scan_id, pair_stats, initiated_by=initiated_by)
+            for result in results:
+                result['scan_id'] = scan_id
+        elif results:
+            # One row per stored finding; without rows the stage already committed
+            findings = sum(1 for r in results if r.get('finding_id'))
+            checkpoints.commit(find_window(checkpoints, options, results), findings=findings,
+                               initiated_by=initiated_by)
+
+        si.outputResults(results)
+
+    except Exception as e:
+        si.generateErrorResults(f'piiscancommit: {e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+PII Scan Window Search Command
+Opens the next index-time window of a checkpointed PII scan
+
+Usage (as a subsearch of the scan's base search):
+    `pii_scan_indexes` [| piiscanwindow name=daily]
+
+Returns a single `search` field with the earliest/latest and
+_index_earliest/_index_latest bounds of the window, which Splunk inserts
+into the outer search. Index/sourcetype pairs already scanned past the
+window start get their own _index_earliest, so the filtering happens on
+the indexers. piiscancommit finds the window again through addinfo's
+info_max_time, so the row carries nothing else. See scan_checkpoint.py.
+"""
+
+import sys
+import os
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scan_checkpoint import ScanCheckpoints, subsearch_row
+
+
+def main():
+    """Main execution"""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        window = ScanCheckpoints(options.get('name', 'daily')).open_window()
+
+        si.outputResults([subsearch_row(window)])
+
+    except Exception as e:
+        si.generateErrorResults(f'piiscanwindow: {e}')
+
+
+if __name__ == '__main__':
+    main()
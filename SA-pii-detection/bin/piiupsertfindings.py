@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+PII Findings Upsert Search Command
+Merges a scan's findings into pii_findings.csv under stable finding IDs
+
+Usage (in place of outputlookup append=true pii_findings_lookup):
+    ... | `pii_finding_id` | piiupsertfindings
+
+Each result is one finding (index, sourcetype, source, host, pii_type,
+event_count, severity, optional first_seen/last_seen). Known findings keep
+their status and review fields and have their counts and first/last seen
+merged; new ones are added as detected. Returns the stored row of each
+finding, so later commands see its current status. See findings_store.py.
+"""
+
+import sys
+import os
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import splunk.Intersplunk as si
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from findings_store import FindingsStore
+
+
+def main():
+    """Main execution"""
+    try:
+        keywords, options = si.getKeywordsAndOptions()
+        results, dummy, settings = si.getOrganizedResults()
+
+        outcome = FindingsStore().upsert(results)
+        si.outputResults(outcome['rows'])
+
+    except Exception as e:
+        si.generateErrorResults(f'piiupsertfindings: {e}')
+
+
+if __name__ == '__main__':
+    main()
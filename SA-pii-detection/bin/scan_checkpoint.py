@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+PII Scan Checkpoint Library
+Per index/sourcetype index-time cursors for incremental PII scans
+
+A checkpointed scan covers the index-time window [window_start, window_end):
+
+    piiscanwindow   (start of run) picks the window. window_start is the
+                    oldest cursor of the scan; window_end is now minus
+                    scan_settle_seconds, capped at scan_max_window after
+                    window_start so a scan that fell behind catches up in
+                    bounded steps. The window is recorded as pending.
+                    Its bounds go into the base search (search_bounds()):
+                    an index/sourcetype whose cursor is past window_start
+                    gets its own _index_earliest term, so the indexers
+                    never return an event that was already scanned.
+    piiscancommit   mode=stage (after the scan's stats) records the run's
+                    per-pair stats on its window. mode=commit (after
+                    piiupsertfindings has stored the findings) moves every
+                    cursor to window_end and appends coverage and lag
+                    metrics to pii_scan_history.csv. A run without
+                    findings commits at the stage, as there is nothing to
+                    store.
+
+Windows are on _indextime, so data that arrives late (old _time, new
+_indextime) is still scanned by the next run. A run that fails before the
+commit, including one whose findings could not be stored, leaves the
+cursors unchanged, and the next run scans the same window again.
+
+Pending windows are keyed by scan_id, so overlapping runs (a manual run
+during the scheduled one) each commit their own window. piiscancommit finds
+its run's window by the latest bound the search ran with (addinfo's
+info_max_time), which open_window() keeps unique. Every read-modify-write
+of the state holds a file lock.
+
+State lives in lookups/pii_scan_checkpoints.json, one entry per scan name:
+
+    {"daily": {"watermark": <window_end of the last commit>,
+               "pairs": {"<index>|<sourcetype>": {cursor, last_indextime, ...}},
+               "pending": {"<scan_id>": {scan_id, window_start, window_end, started,
+                                         earliest, latest, pair_stats}}}}
+
+Index/sourcetype pairs without a cursor of their own start at the scan's
+watermark; a scan without a watermark starts scan_initial_lookback ago.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_lock import FileLock
+
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+STATE_FILE = os.path.join(LOOKUPS_DIR, 'pii_scan_checkpoints.json')
+SETTINGS_FILE = os.path.join(LOOKUPS_DIR, 'pii_settings.csv')
+HISTORY_FILE = os.path.join(LOOKUPS_DIR, 'pii_scan_history.csv')
+
+HISTORY_FIELDS = [
+    'scan_id', 'scan_start_time', 'scan_end_time', 'scan_duration', 'indexes_scanned', 'events_processed',
+    'findings_detected', 'scan_type', 'initiated_by', 'status', 'error_message', 'coverage_start',
+    'coverage_end', 'pairs_scanned', 'coverage_lag_sec', 'backlog_sec', 'max_index_delay_sec', 'population_events',
+    'sample_fraction', 'estimated_pii_events', 'estimated_pii_events_low', 'estimated_pii_events_high',
+    'confidence_level', 'strata_clean', 'strata_dirty', 'strata_inconclusive',
+]
+
+DEFAULT_SETTINGS = {
+    'scan_initial_lookback': 86400,
+    'scan_max_window': 172800,
+    'scan_settle_seconds': 120,
+    'scan_max_event_delay': 604800,
+}
+
+# Pending windows of runs that never committed are dropped after this long
+PENDING_EXPIRY_SEC = 7 * 86400
+
+
+def pair_key(index, sourcetype):
+    return f'{index}|{sourcetype}'
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def load_settings(path=SETTINGS_FILE, defaults=DEFAULT_SETTINGS):
+    """Integer settings from pii_settings.csv, falling back to defaults"""
+    settings = dict(defaults)
+    if os.path.exists(path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                name = row.get('setting_name')
+                if name in settings:
+                    settings[name] = _to_int(row.get('setting_value'), settings[name])
+    return settings
+
+
+def append_history(row, path=HISTORY_FILE):
+    """Append a scan history row, adding any missing columns to an older header"""
+    with FileLock(path):
+        _append_history(row, path)
+
+
+def _append_history(row, path):
+    existing, rows = [], []
+    if os.path.exists(path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            existing = reader.fieldnames or []
+            if existing and all(name in existing for name in HISTORY_FIELDS):
+                rows = None
+            else:
+                rows = list(reader)
+
+    if rows is None:
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=existing, extrasaction='ignore').writerow(row)
+        return
+
+    fieldnames = existing + [name for name in HISTORY_FIELDS if name not in existing]
+    rows.append(row)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def _quote(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def search_bounds(window):
+    """
+    Search-language time bounds of a window, for the scan's base search
+
+    Pairs scanned past window_start start at their own cursor; every other
+    pair starts at window_start. All end at window_end.
+
+    Args:
+        window: dict returned by ScanCheckpoints.open_window()
+
+    Returns:
+        str: earliest/latest, _index_earliest and _index_latest terms
+    """
+    bounds = f"earliest={window['earliest']} latest={window['latest']} _index_latest={window['window_end']}"
+    ahead = window.get('pairs_ahead') or []
+    if not ahead:
+        return f"{bounds} _index_earliest={window['window_start']}"
+
+    pairs = [f'index={_quote(index)} sourcetype={_quote(sourcetype)}' for index, sourcetype, _ in ahead]
+    terms = [f'({pair} _index_earliest={cursor})' for pair, (_, _, cursor) in zip(pairs, ahead)]
+    rest = ' '.join(f'NOT ({pair})' for pair in pairs)
+    terms.append(f"({rest} _index_earliest={window['window_start']})")
+    return f"{bounds} ({' OR '.join(terms)})"
+
+
+def subsearch_row(window):
+    """
+    The row piiscanwindow returns to the scan's base search
+
+    Only the search field: Splunk passes it through verbatim, but would AND
+    any other field of the row into the base search as a field term that
+    no event has.
+    """
+    return {'search': search_bounds(window)}
+
+
+def _merge_stats(into, pair_stats):
+    """Add pair_stats to into: events summed, max_indextime and max_index_delay maxed"""
+    for pair, stats in pair_stats.items():
+        merged = into.setdefault(pair, {'events': 0, 'max_indextime': 0, 'max_index_delay': 0})
+        merged['events'] += stats['events']
+        merged['max_indextime'] = max(merged['max_indextime'], stats['max_indextime'])
+        merged['max_index_delay'] = max(merged['max_index_delay'], stats['max_index_delay'])
+    return into
+
+
+def _encode_stats(pair_stats):
+    return [[index, sourcetype, stats] for (index, sourcetype), stats in sorted(pair_stats.items())]
+
+
+def _decode_stats(rows):
+    return dict(((index, sourcetype), stats) for index, sourcetype, stats in rows or [])
+
+
+class ScanCheckpoints(object):
+    """Index-time cursors of one named scan"""
+
+    def __init__(self, name='daily', path=STATE_FILE, settings=None, history_path=HISTORY_FILE):
+        self.name = name
+        self.path = path
+        self.settings = settings or load_settings()
+        self.history_path = history_path
+
+    def _load_all(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_all(self, state):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        scan = self._load_all().get(self.name) or {}
+        scan.setdefault('watermark', 0)
+        scan.setdefault('pairs', {})
+        pending = scan.get('pending') or {}
+        if 'scan_id' in pending:
+            # Written before pending windows were keyed by scan_id
+            pending = {pending['scan_id']: pending}
+        scan['pending'] = pending
+        return scan
+
+    def _save(self, scan):
+        state = self._load_all()
+        state[self.name] = scan
+        self._save_all(state)
+
+    def cursor(self, scan, index, sourcetype):
+        """Index time from which a pair's events still need scanning"""
+        pair = scan['pairs'].get(pair_key(index, sourcetype))
+        return pair['cursor'] if pair else scan['watermark']
+
+    def _ahead(self, scan, window_start):
+        """(index, sourcetype, cursor) of the pairs whose cursor is past window_start"""
+        return sorted((p['index'], p['sourcetype'], p['cursor']) for p in scan['pairs'].values()
+                      if p['cursor'] > window_start)
+
+    def open_window(self, now=None):
+        """
+        Pick and record the index-time window of the next run
+
+        Returns:
+            dict with scan_id, window_start, window_end, started, the
+            earliest/latest _time bounds the search should use and
+            pairs_ahead, the (index, sourcetype, cursor) of pairs whose
+            cursor is past window_start
+        """
+        now = int(now or time.time())
+        with FileLock(self.path):
+            scan = self.load()
+            # Runs that died without committing never will; forget their windows
+            expiry = now - PENDING_EXPIRY_SEC
+            scan['pending'] = dict((scan_id, p) for scan_id, p in scan['pending'].items() if p['started'] >= expiry)
+
+            cursors = [p['cursor'] for p in scan['pairs'].values()]
+            if scan['watermark']:
+                cursors.append(scan['watermark'])
+            if cursors:
+                window_start = min(cursors)
+            elif scan['pending']:
+                # The first run failed; retry its window rather than sliding it forward
+                window_start = min(p['window_start'] for p in scan['pending'].values())
+            else:
+                window_start = now - self.settings['scan_initial_lookback']
+            window_end = now - self.settings['scan_settle_seconds']
+            window_end = max(window_start, min(window_end, window_start + self.settings['scan_max_window']))
+
+            # latest identifies the run to piiscancommit (addinfo's info_max_time), so keep it unique
+            latest = now + 86400
+            taken = set(p.get('latest') for p in scan['pending'].values())
+            while latest in taken:
+                latest += 1
+
+            pending = {
+                'scan_id': uuid.uuid4().hex[:16],
+                'window_start': window_start,
+                'window_end': window_end,
+                'started': now,
+                # Late data can carry an old _time; look back far enough on _time to reach it
+                'earliest': window_start - self.settings['scan_max_event_delay'],
+                'latest': latest,
+            }
+            scan['pending'][pending['scan_id']] = pending
+            self._save(scan)
+
+        window = dict(pending)
+        window['pairs_ahead'] = self._ahead(scan, window_start)
+        return window
+
+    def find_window(self, latest=None):
+        """
+        scan_id of the pending window a run searched
+
+        Args:
+            latest: The run's latest _time bound (addinfo's info_max_time)
+
+        Returns:
+            str: The scan_id, or None if no pending window matches. Without
+            latest, the only pending window, if there is exactly one
+        """
+        pending = self.load()['pending']
+        if latest is not None:
+            latest = _to_int(latest, None)
+            for scan_id, window in pending.items():
+                if window.get('latest') == latest:
+                    return scan_id
+        if len(pending) == 1:
+            return next(iter(pending))
+        return None
+
+    def stage(self, scan_id, pair_stats):
+        """
+        Record a run's per-pair stats on its pending window, for commit()
+
+        Args:
+            scan_id: The run's window, from find_window()
+            pair_stats: dict of (index, sourcetype) -> {events, max_indextime, max_index_delay}
+        """
+        with FileLock(self.path):
+            scan = self.load()
+            pending = scan['pending'].get(scan_id)
+            if not pending:
+                raise ValueError(f'no open scan window {scan_id} for {self.name} - run piiscanwindow first')
+            staged = _decode_stats(pending.get('pair_stats'))
+            pending['pair_stats'] = _encode_stats(_merge_stats(staged, pair_stats))
+            self._save(scan)
+
+    def commit(self, scan_id, pair_stats=None, findings=0, initiated_by='scheduler', now=None):
+        """
+        Advance every cursor to a pending window's end and record the run
+
+        Args:
+            scan_id: The run's window, from find_window()
+            pair_stats: dict of (index, sourcetype) -> {events, max_indextime, max_index_delay},
+                added to any the run staged
+            findings: Number of findings the run produced
+            initiated_by: User or scheduler that ran the scan
+            now: Epoch seconds of the commit
+
+        Returns:
+            dict: The scan history row written
+        """
+        now = int(now or time.time())
+        with FileLock(self.path):
+            scan = self.load()
+            pending = scan['pending'].pop(scan_id, None)
+            if not pending:
+                raise ValueError(f'no open scan window {scan_id} for {self.name} - run piiscanwindow first')
+            pair_stats = _merge_stats(_decode_stats(pending.get('pair_stats')), pair_stats or {})
+
+            window_end = pending['window_end']
+            for pair in scan['pairs'].values():
+                pair['cursor'] = max(pair['cursor'], window_end)
+                pair['events_last_run'] = 0
+            max_delay = 0
+            events = 0
+            for (index, sourcetype), stats in pair_stats.items():
+                pair = scan['pairs'].setdefault(pair_key(index, sourcetype), {
+                    'index': index, 'sourcetype': sourcetype, 'cursor': window_end, 'events_total': 0,
+                    'last_indextime': 0,
+                })
+                pair['cursor'] = max(pair['cursor'], window_end)
+                pair['events_last_run'] = stats['events']
+                pair['events_total'] = pair.get('events_total', 0) + stats['events']
+                pair['last_indextime'] = max(pair.get('last_indextime', 0), stats['max_indextime'])
+                pair['last_scan_id'] = pending['scan_id']
+                events += stats['events']
+                max_delay = max(max_delay, stats['max_index_delay'])
+            scan['watermark'] = max(scan['watermark'], window_end)
+            scan['last_commit'] = now
+            self._save(scan)
+
+        row = {
+            'scan_id': pending['scan_id'],
+            'scan_start_time': pending['started'],
+            'scan_end_time': now,
+            'scan_duration': now - pending['started'],
+            'indexes_scanned': ','.join(sorted(set(index for index, _ in pair_stats))),
+            'events_processed': events,
+            'findings_detected': findings,
+            'scan_type': f'incremental:{self.name}',
+            'initiated_by': initiated_by,
+            'status': 'completed',
+            'error_message': '',
+            'coverage_start': pending['window_start'],
+            'coverage_end': window_end,
+            'pairs_scanned': len(pair_stats),
+            # How far behind real time the scanned data now is
+            'coverage_lag_sec': now - window_end,
+            # Index time still to scan beyond what the settle delay holds back
+            'backlog_sec': max(0, now - self.settings['scan_settle_seconds'] - window_end),
+            # Largest _indextime - _time seen: how late data arrived
+            'max_index_delay_sec': max_delay,
+        }
+        append_history(row, self.history_path)
+        return row
+
+    def pairs(self):
+        """Cursor rows of this scan, for reporting"""
+        return [dict(p, scan_name=self.name) for _, p in sorted(self.load()['pairs'].items())]
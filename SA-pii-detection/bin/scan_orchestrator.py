@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+PII Deep Scan Orchestrator
+Runs a deep PII scan as parallel (index, time-slice) search jobs
+
+The Deep Scan saved search is one search over every index in
+pii_scan_indexes; on a 30 day range it runs for hours on one search
+process. The orchestrator splits the same range into partitions - one per
+index and deep_scan_slice_seconds of _time - and dispatches each as its own
+search job through the search/jobs REST endpoint:
+
+    plan_partitions     index x time-slice partitions, in a fixed order
+    ScanOrchestrator    keeps at most max_concurrency jobs in flight, polls
+                        them, retries failed or timed out partitions with
+                        backoff up to max_attempts, and collects the stats
+                        rows of each finished partition
+    merge_results       sums the partitions' rows per index, sourcetype,
+                        source and host in partition order, so the findings
+                        do not depend on which job finished first
+    build_findings      one finding per PII type, as the Daily Scan writes,
+                        upserted into pii_findings.csv (findings_store.py)
+
+Wall-clock time is roughly (partitions / max_concurrency) x the time of one
+partition. Keep max_concurrency below the scan user's search concurrency
+quota (srchJobsQuota), or splunkd queues the extra jobs instead of running
+them. A partition that still fails after max_attempts is reported, its
+findings are left out and the scan is recorded as partial in
+pii_scan_history.csv.
+
+The job API is passed in (SplunkJobAPI against splunkd, a stub in tests):
+    dispatch(search, earliest, latest, **params) -> sid
+    status(sid) -> (state, message), state one of running, done, failed
+    results(sid) -> list of result rows
+    cancel(sid)
+
+Usage:
+    echo $SESSION_KEY | python3 scan_orchestrator.py [--days 30] [--indexes main,web]
+        [--concurrency 4] [--slice-hours 24] [--max-attempts 3] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+# Add Splunk SDK to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+try:
+    import splunk.rest as rest
+except ImportError:
+    pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pii_scanner
+from findings_store import FINDINGS_FILE, FindingsStore, finding_key
+from scan_checkpoint import HISTORY_FILE, LOOKUPS_DIR, SETTINGS_FILE, _to_int, append_history, load_settings
+from whitelist_matcher import WhitelistMatcher
+
+APP_NAME = 'SA-pii-detection'
+WHITELIST_FILE = os.path.join(LOOKUPS_DIR, 'pii_whitelist.csv')
+
+DEFAULT_SETTINGS = {
+    'deep_scan_lookback': 2592000,
+    'deep_scan_slice_seconds': 86400,
+    'deep_scan_concurrency': 4,
+    'deep_scan_max_attempts': 3,
+    'deep_scan_partition_timeout': 3600,
+}
+
+# The Deep Scan search, per partition. Only the stats rows come back through
+# REST; events_scanned counts every event so the history row is complete.
+PARTITION_SEARCH = (
+    'search index="{index}" earliest={earliest} latest={latest} '
+    '| `scan_all_pii` '
+    '| stats count as events_scanned, sum(has_pii) as event_count, earliest(_time) as first_seen, '
+    'latest(_time) as last_seen, max(has_*) as has_* by index, sourcetype, source, host '
+    '| fields - has_pii'
+)
+
+# Same mapping as the severity eval of the Daily Scan
+SEVERITY = {
+    'ssn': 'critical',
+    'credit_card': 'critical',
+    'bank_account': 'critical',
+    'passport': 'critical',
+    'drivers_license': 'high',
+    'mrn': 'high',
+    'dob': 'high',
+    'phone': 'medium',
+    'email': 'medium',
+    'ip': 'low',
+}
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def scan_indexes(macros=None):
+    """Indexes named in the pii_scan_indexes macro (local/macros.conf overrides default)"""
+    macros = macros if macros is not None else pii_scanner.read_macros()
+    return re.findall(r'index\s*=\s*"?([^\s")]+)', macros.get('pii_scan_indexes', ''))
+
+
+def plan_partitions(indexes, earliest, latest, slice_seconds):
+    """
+    Split [earliest, latest) into index x time-slice partitions
+
+    Returns:
+        list of dicts with partition_id, order, index, earliest and latest,
+        ordered by index and then time
+    """
+    partitions = []
+    for index in sorted(set(indexes)):
+        start = earliest
+        while start < latest:
+            end = min(start + slice_seconds, latest)
+            partitions.append({
+                'partition_id': f'{index}@{start}',
+                'order': len(partitions),
+                'index': index,
+                'earliest': start,
+                'latest': end,
+            })
+            start = end
+    return partitions
+
+
+class SplunkJobAPI(object):
+    """search/jobs REST endpoint of the local splunkd"""
+
+    def __init__(self, session_key, app=APP_NAME, owner='nobody'):
+        self.session_key = session_key
+        self.jobs_path = f'/servicesNS/{owner}/{app}/search/jobs'
+
+    def _request(self, path, method='GET', getargs=None, postargs=None):
+        args = dict(getargs or {}, output_mode='json')
+        response, content = rest.simpleRequest(path, sessionKey=self.session_key, method=method,
+                                               getargs=args if method == 'GET' else None,
+                                               postargs=dict(postargs or {}, output_mode='json')
+                                               if method == 'POST' else None)
+        if response.status not in (200, 201):
+            raise RuntimeError(f'{method} {path} returned {response.status}')
+        return json.loads(content) if content else {}
+
+    def dispatch(self, search, earliest, latest, **params):
+        body = self._request(self.jobs_path, method='POST', postargs=dict(params, **{
+            'search': search,
+            'earliest_time': earliest,
+            'latest_time': latest,
+        }))
+        return body['sid']
+
+    def status(self, sid):
+        content = self._request(f'{self.jobs_path}/{sid}')['entry'][0]['content']
+        if content.get('isFailed') or content.get('dispatchState') == 'FAILED':
+            messages = content.get('messages') or []
+            text = '; '.join(m.get('text', '') for m in messages if isinstance(m, dict))
+            return FAILED, text or 'search job failed'
+        if content.get('isDone') or content.get('dispatchState') == 'DONE':
+            return DONE, ''
+        return RUNNING, content.get('dispatchState', '')
+
+    def results(self, sid):
+        return self._request(f'{self.jobs_path}/{sid}/results', getargs={'count': 0}).get('results', [])
+
+    def cancel(self, sid):
+        self._request(f'{self.jobs_path}/{sid}/control', method='POST', postargs={'action': 'cancel'})
+
+
+class ScanOrchestrator(object):
+    """Runs scan partitions as concurrent search jobs within a concurrency budget"""
+
+    def __init__(self, api, max_concurrency=DEFAULT_SETTINGS['deep_scan_concurrency'],
+                 max_attempts=DEFAULT_SETTINGS['deep_scan_max_attempts'], poll_interval=2.0,
+                 partition_timeout=DEFAULT_SETTINGS['deep_scan_partition_timeout'], retry_delay=30.0,
+                 search_template=PARTITION_SEARCH, clock=time.monotonic, sleep=time.sleep):
+        self.api = api
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.partition_timeout = partition_timeout
+        self.retry_delay = retry_delay
+        self.search_template = search_template
+        self.clock = clock
+        self.sleep = sleep
+
+    def _dispatch(self, partition):
+        # A partition may carry its own search and extra job parameters (e.g. sample_ratio)
+        search = partition.get('search') or self.search_template.format(**partition)
+        return self.api.dispatch(search, partition['earliest'], partition['latest'],
+                                 **partition.get('dispatch_args', {}))
+
+    def _retry_or_fail(self, partition, message, pending, now):
+        partition['message'] = message
+        if partition['attempts'] < self.max_attempts:
+            partition['state'] = 'retrying'
+            partition['not_before'] = now + self.retry_delay * 2 ** (partition['attempts'] - 1)
+            pending.append(partition)
+            pending.sort(key=lambda p: p['order'])
+        else:
+            partition['state'] = FAILED
+
+    def run(self, partitions):
+        """
+        Run every partition to completion or until it runs out of attempts
+
+        Args:
+            partitions: Partitions from plan_partitions
+
+        Returns:
+            dict with partitions (each with state, attempts, sid, message and
+            rows), results (partition_id -> result rows of finished
+            partitions), failed (partition_ids) and wall_clock_sec
+        """
+        started = self.clock()
+        pending = []
+        for partition in partitions:
+            partition.update({'state': 'queued', 'attempts': 0, 'sid': '', 'message': '', 'rows': 0,
+                              'not_before': started})
+            pending.append(partition)
+        in_flight = {}
+        results = {}
+
+        while pending or in_flight:
+            now = self.clock()
+
+            # Start due partitions in plan order while the budget allows
+            for partition in list(pending):
+                if len(in_flight) >= self.max_concurrency:
+                    break
+                if partition['not_before'] > now:
+                    continue
+                pending.remove(partition)
+                partition['attempts'] += 1
+                try:
+                    partition['sid'] = self._dispatch(partition)
+                except Exception as e:
+                    self._retry_or_fail(partition, f'dispatch failed: {e}', pending, now)
+                    continue
+                partition['state'] = RUNNING
+                partition['started'] = now
+                in_flight[partition['sid']] = partition
+
+            for sid, partition in list(in_flight.items()):
+                try:
+                    state, message = self.api.status(sid)
+                except Exception as e:
+                    state, message = RUNNING, f'status unavailable: {e}'
+                if state == RUNNING and now - partition['started'] >= self.partition_timeout:
+                    try:
+                        self.api.cancel(sid)
+                    except Exception:
+                        pass
+                    state, message = FAILED, f'timed out after {self.partition_timeout}s'
+                if state == DONE:
+                    try:
+                        rows = self.api.results(sid)
+                    except Exception as e:
+                        state, message = FAILED, f'results unavailable: {e}'
+                    else:
+                        del in_flight[sid]
+                        results[partition['partition_id']] = rows
+                        partition.update({'state': DONE, 'rows': len(rows), 'message': '',
+                                          'finished': self.clock()})
+                if state == FAILED:
+                    del in_flight[sid]
+                    self._retry_or_fail(partition, message, pending, now)
+
+            if in_flight:
+                self.sleep(self.poll_interval)
+            elif pending:
+                # Only retries waiting out their backoff
+                self.sleep(max(0.0, min(p['not_before'] for p in pending) - self.clock()))
+
+        for partition in partitions:
+            partition.pop('not_before', None)
+        return {
+            'partitions': partitions,
+            'results': results,
+            'failed': [p['partition_id'] for p in partitions if p['state'] == FAILED],
+            'wall_clock_sec': self.clock() - started,
+        }
+
+
+def merge_results(partitions, results):
+    """
+    Sum partition stats rows per index, sourcetype, source and host
+
+    Partitions are merged in plan order, not completion order, and the rows
+    are returned sorted by key, so a rerun over the same data returns the
+    same rows.
+
+    Returns:
+        list of dicts with index, sourcetype, source, host, events_scanned,
+        event_count, first_seen, last_seen and has_<type> flags
+    """
+    merged = {}
+    for partition in sorted(partitions, key=lambda p: p['order']):
+        for row in results.get(partition['partition_id'], []):
+            key = (row.get('index') or partition['index'], row.get('sourcetype', ''), row.get('source', ''),
+                   row.get('host', ''))
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {'index': key[0], 'sourcetype': key[1], 'source': key[2], 'host': key[3],
+                                       'events_scanned': 0, 'event_count': 0, 'first_seen': 0, 'last_seen': 0}
+            entry['events_scanned'] += _to_int(row.get('events_scanned'))
+            entry['event_count'] += _to_int(row.get('event_count'))
+            first_seen, last_seen = _to_int(row.get('first_seen')), _to_int(row.get('last_seen'))
+            if first_seen and (not entry['first_seen'] or first_seen < entry['first_seen']):
+                entry['first_seen'] = first_seen
+            entry['last_seen'] = max(entry['last_seen'], last_seen)
+            for field, value in row.items():
+                if field.startswith('has_') and field != 'has_pii':
+                    entry[field] = max(entry.get(field, 0), _to_int(value))
+    return [merged[key] for key in sorted(merged)]
+
+
+def load_whitelist(path=WHITELIST_FILE, now=None):
+    """Active whitelist entries compiled into a WhitelistMatcher"""
+    return WhitelistMatcher.load(path, now=now)
+
+
+def build_findings(merged, now=None, whitelist=None):
+    """
+    One detected finding per PII type of each merged row, skipping whitelisted ones
+
+    Returns:
+        list of finding rows in pii_findings.csv layout
+    """
+    now = int(now or time.time())
+    findings = []
+    for entry in merged:
+        if entry['event_count'] <= 0:
+            continue
+        for field in sorted(f for f in entry if f.startswith('has_')):
+            pii_type = field[len('has_'):]
+            if entry[field] != 1:
+                continue
+            if whitelist is not None and whitelist.match_scope(pii_type, entry['index'], entry['sourcetype']):
+                continue
+            finding = {
+                'timestamp': now,
+                'index': entry['index'],
+                'sourcetype': entry['sourcetype'],
+                'source': entry['source'],
+                'host': entry['host'],
+                'pii_type': pii_type,
+                'event_count': entry['event_count'],
+                'first_seen': entry.get('first_seen', ''),
+                'last_seen': entry.get('last_seen', ''),
+                'severity': SEVERITY.get(pii_type, 'medium'),
+                'status': 'detected',
+            }
+            finding['finding_id'] = finding_key(finding)
+            findings.append(finding)
+    return findings
+
+
+def run_deep_scan(api, indexes, earliest, latest, settings, initiated_by='admin', findings_path=FINDINGS_FILE,
+                  history_path=HISTORY_FILE, dry_run=False, **orchestrator_args):
+    """
+    Plan, run and record one partitioned deep scan
+
+    Returns:
+        dict with scan_id, status, partition counts, events_processed,
+        findings_detected and wall_clock_sec
+    """
+    partitions = plan_partitions(indexes, earliest, latest, settings['deep_scan_slice_seconds'])
+    summary = {'scan_id': uuid.uuid4().hex[:16], 'partitions': len(partitions), 'indexes': sorted(set(indexes)),
+               'earliest': earliest, 'latest': latest}
+    if dry_run:
+        summary['plan'] = partitions
+        return summary
+
+    scan_start = int(time.time())
+    orchestrator = ScanOrchestrator(api, max_concurrency=settings['deep_scan_concurrency'],
+                                    max_attempts=settings['deep_scan_max_attempts'],
+                                    partition_timeout=settings['deep_scan_partition_timeout'], **orchestrator_args)
+    outcome = orchestrator.run(partitions)
+    merged = merge_results(partitions, outcome['results'])
+    scan_end = int(time.time())
+    findings = build_findings(merged, now=scan_end, whitelist=load_whitelist())
+    if findings:
+        # A deep scan re-reads windows the daily scan already counted
+        FindingsStore(findings_path).upsert(findings, now=scan_end, rescan=True)
+
+    failed = outcome['failed']
+    status = 'completed' if not failed else 'partial'
+    row = {
+        'scan_id': summary['scan_id'],
+        'scan_start_time': scan_start,
+        'scan_end_time': scan_end,
+        'scan_duration': scan_end - scan_start,
+        'indexes_scanned': ','.join(summary['indexes']),
+        'events_processed': sum(e['events_scanned'] for e in merged),
+        'findings_detected': len(findings),
+        'scan_type': 'deep',
+        'initiated_by': initiated_by,
+        'status': status,
+        'error_message': f"{len(failed)} partition(s) failed: {', '.join(failed)}" if failed else '',
+        'coverage_start': earliest,
+        'coverage_end': latest,
+        'pairs_scanned': len(set((e['index'], e['sourcetype']) for e in merged)),
+    }
+    append_history(row, history_path)
+
+    summary.update({
+        'status': status,
+        'partitions_done': len(outcome['results']),
+        'partitions_failed': failed,
+        'retries': sum(max(0, p['attempts'] - 1) for p in partitions),
+        'events_processed': row['events_processed'],
+        'findings_detected': len(findings),
+        'wall_clock_sec': round(outcome['wall_clock_sec'], 1),
+    })
+    return summary
+
+
+def get_session_key():
+    """Get Splunk session key from stdin or environment"""
+    session_key = sys.stdin.readline().strip()
+    if not session_key:
+        session_key = os.environ.get('SPLUNK_SESSION_KEY', '')
+    return session_key
+
+
+def main():
+    """Main execution"""
+    settings = load_settings(SETTINGS_FILE, DEFAULT_SETTINGS)
+    parser = argparse.ArgumentParser(description='Partitioned parallel PII deep scan')
+    parser.add_argument('--days', type=float, default=settings['deep_scan_lookback'] / 86400.0)
+    parser.add_argument('--indexes', help='Comma-separated indexes (default: the pii_scan_indexes macro)')
+    parser.add_argument('--concurrency', type=int, default=settings['deep_scan_concurrency'])
+    parser.add_argument('--slice-hours', type=float, default=settings['deep_scan_slice_seconds'] / 3600.0)
+    parser.add_argument('--max-attempts', type=int, default=settings['deep_scan_max_attempts'])
+    parser.add_argument('--user', default='admin')
+    parser.add_argument('--dry-run', action='store_true', help='Print the partition plan without running it')
+    args = parser.parse_args()
+
+    settings.update({
+        'deep_scan_concurrency': args.concurrency,
+        'deep_scan_slice_seconds': max(60, int(args.slice_hours * 3600)),
+        'deep_scan_max_attempts': args.max_attempts,
+    })
+    indexes = [i.strip() for i in args.indexes.split(',') if i.strip()] if args.indexes else scan_indexes()
+    if not indexes:
+        print(json.dumps({'success': False, 'message': 'No indexes to scan'}))
+        sys.exit(1)
+
+    latest = int(time.time())
+    earliest = latest - int(args.days * 86400)
+    api = None if args.dry_run else SplunkJobAPI(get_session_key())
+    summary = run_deep_scan(api, indexes, earliest, latest, settings, initiated_by=args.user, dry_run=args.dry_run)
+    print(json.dumps(summary, indent=2))
+    sys.exit(0 if summary.get('status', 'completed') == 'completed' else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+PII Sampling Scan
+Adaptive stratified sampling of index/sourcetype/host strata with confidence intervals
+
+A `head 100000` scan reads the first events it finds: high volume
+sourcetypes use up the cap and quiet ones are never reached. A sampling
+scan instead gives each stratum (index, sourcetype, host) its own sample
+budget and reads only that many events, through the search job's
+sample_ratio (event sampling at the indexers):
+
+    volumes       one tstats job counts the events of every stratum
+    allocate      sample_budget is split by Neyman allocation -
+                  volume x sqrt(p(1-p)), p the stratum's historical PII hit
+                  rate from pii_sample_strata.csv (0.5 for a new stratum) -
+                  with at least sample_min_per_stratum events each, and
+                  never more than the stratum holds
+    rounds        the allocation is read over sample_rounds rounds. After
+                  each round a stratum whose Wilson interval of the hit rate
+                  is entirely below sample_rate_threshold_ppm is clean,
+                  entirely above it is dirty; either way it stops sampling.
+                  Strata still undecided when their allocation is used up
+                  are inconclusive.
+
+Jobs are grouped by index and a power-of-two sample ratio and run through
+ScanOrchestrator (scan_orchestrator.py), so they share its concurrency
+budget and retries. A stratum whose allocation or round sample is at least
+half of its events is scanned in full instead.
+
+Any PII seen in a sample becomes a finding, with event_count scaled up to
+the stratum's volume. The history row records events read against the
+population, the estimated number of PII events with a confidence interval
+(the sum of the per-stratum intervals, so it is conservative), and the
+number of clean, dirty and inconclusive strata. Per-stratum rates and
+intervals are kept in pii_sample_strata.csv and become the next scan's
+priors, older scans weighted down by PRIOR_DECAY.
+
+Usage:
+    echo $SESSION_KEY | python3 scan_sampler.py [--hours 24] [--indexes main,web]
+        [--budget 100000] [--rounds 3] [--concurrency 4]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import scan_orchestrator
+from findings_store import FINDINGS_FILE, FindingsStore
+from scan_checkpoint import HISTORY_FILE, LOOKUPS_DIR, SETTINGS_FILE, _to_int, append_history, load_settings
+from scan_orchestrator import ScanOrchestrator, SplunkJobAPI
+
+STRATA_FILE = os.path.join(LOOKUPS_DIR, 'pii_sample_strata.csv')
+
+STRATA_FIELDS = ['index', 'sourcetype', 'host', 'scans', 'volume', 'prior_sampled', 'prior_hits', 'sampled_events',
+                 'hit_events', 'hit_rate', 'hit_rate_low', 'hit_rate_high', 'decision', 'last_scan_id',
+                 'last_scan_time']
+
+DEFAULT_SETTINGS = {
+    'sample_lookback': 86400,
+    'sample_budget': 100000,
+    'sample_rounds': 3,
+    'sample_min_per_stratum': 1000,
+    'sample_rate_threshold_ppm': 5000,
+    'sample_confidence_pct': 95,
+}
+
+# Weight of earlier scans in a stratum's prior, per scan
+PRIOR_DECAY = 0.5
+# Strata per sampling job, to keep the search string bounded
+MAX_STRATA_PER_JOB = 200
+
+# Two-sided normal quantiles by confidence level
+Z_SCORES = {80: 1.2816, 90: 1.6449, 95: 1.96, 98: 2.3263, 99: 2.5758}
+
+VOLUME_SEARCH = '| tstats count where ({indexes}) earliest={earliest} latest={latest} by index, sourcetype, host'
+
+SAMPLE_SEARCH = (
+    'search index="{index}" earliest={earliest} latest={latest} ({terms}) '
+    '| `scan_all_pii` '
+    '| stats count as events_scanned, sum(has_pii) as event_count, max(has_*) as has_* '
+    'by index, sourcetype, source, host '
+    '| fields - has_pii'
+)
+
+CLEAN = 'clean'
+DIRTY = 'dirty'
+INCONCLUSIVE = 'inconclusive'
+
+
+def z_score(confidence_pct):
+    return Z_SCORES[min(Z_SCORES, key=lambda level: abs(level - confidence_pct))]
+
+
+def wilson_interval(hits, n, z):
+    """Wilson score interval of a binomial proportion; (0, 1) without observations"""
+    if n <= 0:
+        return 0.0, 1.0
+    p = min(1.0, hits / float(n))
+    denominator = 1.0 + z * z / n
+    center = (p + z * z / (2.0 * n)) / denominator
+    half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _quote(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Stratum(object):
+    """Sample state of one index/sourcetype/host"""
+
+    __slots__ = ('index', 'sourcetype', 'host', 'volume', 'prior_sampled', 'prior_hits', 'scans', 'allocation',
+                 'sampled', 'hits', 'ratio', 'decision', 'sources')
+
+    def __init__(self, index, sourcetype, host, volume=0):
+        self.index = index
+        self.sourcetype = sourcetype
+        self.host = host
+        self.volume = volume
+        self.prior_sampled = 0.0
+        self.prior_hits = 0.0
+        self.scans = 0
+        self.allocation = 0
+        self.sampled = 0
+        self.hits = 0
+        self.ratio = 0
+        self.decision = ''
+        self.sources = {}  # source -> summed stats rows of this scan
+
+    @property
+    def key(self):
+        return self.index, self.sourcetype, self.host
+
+    def prior_rate(self):
+        """Historical hit rate, Laplace-smoothed so a new stratum starts at 0.5"""
+        return (self.prior_hits + 1.0) / (self.prior_sampled + 2.0)
+
+    def exhaustive(self):
+        return self.volume > 0 and self.sampled >= self.volume
+
+    def rate(self):
+        return self.hits / float(self.sampled) if self.sampled else self.prior_rate()
+
+    def interval(self, z):
+        if self.exhaustive():
+            rate = self.rate()
+            return rate, rate
+        return wilson_interval(self.hits, self.sampled, z)
+
+    def decide(self, threshold, z):
+        """Clean or dirty once the interval clears the threshold; inconclusive when out of budget"""
+        low, high = self.interval(z)
+        if high < threshold:
+            self.decision = CLEAN
+        elif low > threshold:
+            self.decision = DIRTY
+        elif self.sampled >= min(self.allocation, self.volume):
+            self.decision = INCONCLUSIVE
+        return self.decision
+
+
+def load_strata(path=STRATA_FILE):
+    """Stored strata by (index, sourcetype, host)"""
+    strata = {}
+    if os.path.exists(path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                stratum = Stratum(row.get('index', ''), row.get('sourcetype', ''), row.get('host', ''))
+                stratum.prior_sampled = float(row.get('prior_sampled') or 0)
+                stratum.prior_hits = float(row.get('prior_hits') or 0)
+                stratum.scans = _to_int(row.get('scans'))
+                strata[stratum.key] = (stratum, row)
+    return strata
+
+
+def save_strata(rows, path=STRATA_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=STRATA_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for key in sorted(rows):
+            writer.writerow(rows[key])
+    os.replace(tmp_path, path)
+
+
+def allocate(strata, budget, min_per_stratum):
+    """
+    Split the sample budget across strata by Neyman allocation
+
+    Every stratum first gets min_per_stratum events (or all of its events,
+    or an equal share if the budget cannot cover that many); the rest goes
+    by volume x sqrt(p(1-p)), capped at each stratum's volume, with the
+    excess over a cap passed on to the others.
+    """
+    strata = [s for s in strata if s.volume > 0]
+    if not strata:
+        return
+    floor = min(min_per_stratum, budget // len(strata))
+    for stratum in strata:
+        stratum.allocation = min(stratum.volume, floor)
+    remaining = budget - sum(s.allocation for s in strata)
+    open_strata = [s for s in strata if s.allocation < s.volume]
+    weights = {}
+    for stratum in open_strata:
+        p = min(max(stratum.prior_rate(), 1e-4), 0.5)
+        weights[stratum.key] = stratum.volume * math.sqrt(p * (1.0 - p))
+
+    while remaining > 0 and open_strata:
+        total = sum(weights[s.key] for s in open_strata)
+        capped = []
+        given = 0
+        for stratum in open_strata:
+            share = int(remaining * weights[stratum.key] / total)
+            room = stratum.volume - stratum.allocation
+            if share >= room:
+                share = room
+                capped.append(stratum)
+            stratum.allocation += share
+            given += share
+        remaining -= given
+        if not capped:
+            break
+        open_strata = [s for s in open_strata if s not in capped]
+
+
+def plan_round(strata, round_no, rounds, earliest, latest):
+    """
+    Sampling jobs for the undecided strata of one round
+
+    Each stratum reads an equal part of what is left of its allocation
+    over the remaining rounds, at the largest power-of-two sample ratio
+    that still yields that many events.
+
+    Returns:
+        list of orchestrator partitions, each with its own search and
+        sample_ratio
+    """
+    groups = {}
+    for stratum in strata:
+        if stratum.decision or stratum.volume <= 0:
+            continue
+        want = max(1, int(math.ceil((stratum.allocation - stratum.sampled) / float(rounds - round_no + 1))))
+        if stratum.volume <= 2 * want or 2 * stratum.allocation >= stratum.volume:
+            stratum.ratio = 1
+        else:
+            stratum.ratio = 2 ** int(math.floor(math.log(stratum.volume / float(want), 2)))
+        groups.setdefault((stratum.index, stratum.ratio), []).append(stratum)
+
+    partitions = []
+    for (index, ratio), members in sorted(groups.items()):
+        members.sort(key=lambda s: s.key)
+        for chunk_start in range(0, len(members), MAX_STRATA_PER_JOB):
+            chunk = members[chunk_start:chunk_start + MAX_STRATA_PER_JOB]
+            terms = ' OR '.join(f'(sourcetype={_quote(s.sourcetype)} host={_quote(s.host)})' for s in chunk)
+            partitions.append({
+                'partition_id': f'{index}@r{round_no}x{ratio}.{chunk_start // MAX_STRATA_PER_JOB}',
+                'order': len(partitions),
+                'index': index,
+                'earliest': earliest,
+                'latest': latest,
+                'search': SAMPLE_SEARCH.format(index=index, earliest=earliest, latest=latest, terms=terms),
+                'dispatch_args': {'sample_ratio': ratio} if ratio > 1 else {},
+                'strata': [s.key for s in chunk],
+            })
+    return partitions
+
+
+class AdaptiveSampler(object):
+    """Runs the volume count and sampling rounds of one sampling scan"""
+
+    def __init__(self, api, settings, strata_path=STRATA_FILE, **orchestrator_args):
+        self.api = api
+        self.settings = settings
+        self.strata_path = strata_path
+        self.orchestrator = ScanOrchestrator(api, max_concurrency=settings['deep_scan_concurrency'],
+                                             max_attempts=settings['deep_scan_max_attempts'],
+                                             partition_timeout=settings['deep_scan_partition_timeout'],
+                                             **orchestrator_args)
+
+    def volumes(self, indexes, earliest, latest):
+        """Event count per (index, sourcetype, host) from one tstats job"""
+        terms = ' OR '.join(f'index={_quote(i)}' for i in sorted(set(indexes)))
+        partition = {'partition_id': 'volume', 'order': 0, 'index': '', 'earliest': earliest, 'latest': latest,
+                     'search': VOLUME_SEARCH.format(indexes=terms, earliest=earliest, latest=latest)}
+        outcome = self.orchestrator.run([partition])
+        if outcome['failed']:
+            raise RuntimeError(f"volume search failed: {partition['message']}")
+        return dict(((r.get('index', ''), r.get('sourcetype', ''), r.get('host', '')), _to_int(r.get('count')))
+                    for r in outcome['results'].get('volume', []))
+
+    def _fold(self, partition, rows, strata):
+        """Add one job's stats rows to its strata; a full scan replaces earlier samples"""
+        seen = {}
+        for row in rows:
+            key = (row.get('index') or partition['index'], row.get('sourcetype', ''), row.get('host', ''))
+            if key in strata:
+                seen.setdefault(key, []).append(row)
+        for key in partition['strata']:
+            stratum = strata[key]
+            if stratum.ratio == 1:
+                stratum.sampled, stratum.hits, stratum.sources = 0, 0, {}
+            for row in seen.get(key, []):
+                events, hits = _to_int(row.get('events_scanned')), _to_int(row.get('event_count'))
+                stratum.sampled += events
+                stratum.hits += hits
+                source = stratum.sources.setdefault(row.get('source', ''), {'events_scanned': 0, 'event_count': 0})
+                source['events_scanned'] += events
+                source['event_count'] += hits
+                for field, value in row.items():
+                    if field.startswith('has_') and field != 'has_pii':
+                        source[field] = max(source.get(field, 0), _to_int(value))
+            if stratum.ratio == 1:
+                # tstats counts drift while data arrives; what a full scan read is the population
+                stratum.volume = stratum.sampled
+
+    def run(self, indexes, earliest, latest):
+        """
+        Allocate, sample and decide every stratum
+
+        Returns:
+            dict with strata (list of Stratum), jobs, rounds_run and failed
+            (partition ids that ran out of attempts)
+        """
+        stored = load_strata(self.strata_path)
+        strata = {}
+        for key, volume in self.volumes(indexes, earliest, latest).items():
+            stratum = Stratum(*key, volume=volume)
+            if key in stored:
+                previous = stored[key][0]
+                stratum.prior_sampled, stratum.prior_hits, stratum.scans = (
+                    previous.prior_sampled, previous.prior_hits, previous.scans)
+            strata[key] = stratum
+
+        settings = self.settings
+        threshold = settings['sample_rate_threshold_ppm'] / 1e6
+        z = z_score(settings['sample_confidence_pct'])
+        rounds = max(1, settings['sample_rounds'])
+        allocate(strata.values(), settings['sample_budget'], settings['sample_min_per_stratum'])
+
+        jobs, failed, rounds_run = 0, [], 0
+        for round_no in range(1, rounds + 1):
+            partitions = plan_round(strata.values(), round_no, rounds, earliest, latest)
+            if not partitions:
+                break
+            rounds_run = round_no
+            outcome = self.orchestrator.run(partitions)
+            jobs += len(partitions)
+            failed.extend(outcome['failed'])
+            for partition in partitions:
+                if partition['partition_id'] in outcome['results']:
+                    self._fold(partition, outcome['results'][partition['partition_id']], strata)
+            for stratum in strata.values():
+                if not stratum.decision and stratum.volume > 0:
+                    if round_no == rounds:
+                        stratum.allocation = stratum.sampled  # out of rounds
+                    stratum.decide(threshold, z)
+
+        for stratum in strata.values():
+            if not stratum.decision:
+                stratum.decision = CLEAN if stratum.volume == 0 else INCONCLUSIVE
+        return {'strata': [strata[key] for key in sorted(strata)], 'jobs': jobs, 'rounds_run': rounds_run,
+                'failed': failed}
+
+
+def estimate(strata, z):
+    """Estimated PII events over all strata, with a conservative interval"""
+    point = low = high = 0.0
+    for stratum in strata:
+        rate_low, rate_high = stratum.interval(z)
+        point += stratum.volume * stratum.rate()
+        low += stratum.volume * rate_low
+        high += stratum.volume * rate_high
+    return int(round(point)), int(math.floor(low)), int(math.ceil(high))
+
+
+def scaled_entries(strata):
+    """Per-source rows with event_count scaled from the sample to the stratum's volume"""
+    entries = []
+    for stratum in strata:
+        scale = stratum.volume / float(stratum.sampled) if stratum.sampled else 1.0
+        for source in sorted(stratum.sources):
+            stats = stratum.sources[source]
+            entry = dict(stats, index=stratum.index, sourcetype=stratum.sourcetype, source=source, host=stratum.host)
+            if stats['event_count'] > 0:
+                entry['event_count'] = max(stats['event_count'], int(round(stats['event_count'] * scale)))
+            entries.append(entry)
+    return entries
+
+
+def run_sample_scan(api, indexes, earliest, latest, settings, initiated_by='admin', findings_path=FINDINGS_FILE,
+                    history_path=HISTORY_FILE, strata_path=STRATA_FILE, **orchestrator_args):
+    """
+    Run and record one sampling scan
+
+    Returns:
+        dict with scan_id, status, events read against the population,
+        the PII event estimate and interval, strata decisions and findings
+    """
+    scan_id = uuid.uuid4().hex[:16]
+    scan_start = int(time.time())
+    outcome = AdaptiveSampler(api, settings, strata_path, **orchestrator_args).run(indexes, earliest, latest)
+    strata = outcome['strata']
+    z = z_score(settings['sample_confidence_pct'])
+    scan_end = int(time.time())
+
+    findings = scan_orchestrator.build_findings(scaled_entries(strata), now=scan_end,
+                                                whitelist=scan_orchestrator.load_whitelist())
+    if findings:
+        # Sampled windows overlap the daily scan's; keep the larger count
+        FindingsStore(findings_path).upsert(findings, now=scan_end, rescan=True)
+
+    stored = load_strata(strata_path)
+    rows = dict((key, row) for key, (_, row) in stored.items())
+    for stratum in strata:
+        low, high = stratum.interval(z)
+        rows[stratum.key] = {
+            'index': stratum.index,
+            'sourcetype': stratum.sourcetype,
+            'host': stratum.host,
+            'scans': stratum.scans + 1,
+            'volume': stratum.volume,
+            'prior_sampled': round(stratum.prior_sampled * PRIOR_DECAY + stratum.sampled, 1),
+            'prior_hits': round(stratum.prior_hits * PRIOR_DECAY + stratum.hits, 1),
+            'sampled_events': stratum.sampled,
+            'hit_events': stratum.hits,
+            'hit_rate': round(stratum.rate(), 6),
+            'hit_rate_low': round(low, 6),
+            'hit_rate_high': round(high, 6),
+            'decision': stratum.decision,
+            'last_scan_id': scan_id,
+            'last_scan_time': scan_end,
+        }
+    save_strata(rows, strata_path)
+
+    sampled = sum(s.sampled for s in strata)
+    population = sum(s.volume for s in strata)
+    point, low, high = estimate(strata, z)
+    decisions = [s.decision for s in strata]
+    status = 'completed' if not outcome['failed'] else 'partial'
+    row = {
+        'scan_id': scan_id,
+        'scan_start_time': scan_start,
+        'scan_end_time': scan_end,
+        'scan_duration': scan_end - scan_start,
+        'indexes_scanned': ','.join(sorted(set(indexes))),
+        'events_processed': sampled,
+        'findings_detected': len(findings),
+        'scan_type': 'sample',
+        'initiated_by': initiated_by,
+        'status': status,
+        'error_message': f"{len(outcome['failed'])} job(s) failed: {', '.join(outcome['failed'])}"
+        if outcome['failed'] else '',
+        'coverage_start': earliest,
+        'coverage_end': latest,
+        'pairs_scanned': len(set((s.index, s.sourcetype) for s in strata)),
+        'population_events': population,
+        'sample_fraction': round(sampled / float(population), 6) if population else 0,
+        'estimated_pii_events': point,
+        'estimated_pii_events_low': low,
+        'estimated_pii_events_high': high,
+        'confidence_level': settings['sample_confidence_pct'],
+        'strata_clean': decisions.count(CLEAN),
+        'strata_dirty': decisions.count(DIRTY),
+        'strata_inconclusive': decisions.count(INCONCLUSIVE),
+    }
+    append_history(row, history_path)
+
+    return dict(row, strata=len(strata), jobs=outcome['jobs'], rounds_run=outcome['rounds_run'])
+
+
+def main():
+    """Main execution"""
+    settings = load_settings(SETTINGS_FILE, dict(scan_orchestrator.DEFAULT_SETTINGS, **DEFAULT_SETTINGS))
+    parser = argparse.ArgumentParser(description='Adaptive sampling PII scan')
+    parser.add_argument('--hours', type=float, default=settings['sample_lookback'] / 3600.0)
+    parser.add_argument('--indexes', help='Comma-separated indexes (default: the pii_scan_indexes macro)')
+    parser.add_argument('--budget', type=int, default=settings['sample_budget'])
+    parser.add_argument('--rounds', type=int, default=settings['sample_rounds'])
+    parser.add_argument('--concurrency', type=int, default=settings['deep_scan_concurrency'])
+    parser.add_argument('--user', default='admin')
+    args = parser.parse_args()
+
+    settings.update({'sample_budget': args.budget, 'sample_rounds': args.rounds,
+                     'deep_scan_concurrency': args.concurrency})
+    indexes = ([i.strip() for i in args.indexes.split(',') if i.strip()] if args.indexes
+               else scan_orchestrator.scan_indexes())
+    if not indexes:
+        print(json.dumps({'success': False, 'message': 'No indexes to scan'}))
+        sys.exit(1)
+
+    latest = int(time.time())
+    earliest = latest - int(args.hours * 3600)
+    summary = run_sample_scan(SplunkJobAPI(scan_orchestrator.get_session_key()), indexes, earliest, latest,
+                              settings, initiated_by=args.user)
+    print(json.dumps(summary, indent=2))
+    sys.exit(0 if summary['status'] == 'completed' else 1)
+
+
+if __name__ == '__main__':
+    main()
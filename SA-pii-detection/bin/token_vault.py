@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+PII Token Vault
+Keyed deterministic tokenisation with an optional reversible vault
+
+Tokens and hashes are HMAC-SHA256 under a secret key, so they cannot be
+brute-forced from a list of candidate SSNs or card numbers without the
+key. The key is 32 random bytes kept in Splunk's encrypted credential
+store (storage/passwords, realm SA-pii-detection, user pii_token_key) and
+read with the caller's session key; separate subkeys are derived for
+tokens and hashes. The same value always gets the same token, so
+tokenised data can still be joined and counted.
+
+Only the search head holds the key. Batch remediation and this script
+create it on first use (a key file from earlier versions,
+local/pii_token.key, is moved into the store); everything else fails
+closed: without a session key, or when the store has no key the caller
+can read, load_key() raises TokenKeyError instead of making a new key
+whose tokens would not match.
+
+With the vault enabled (setting token_vault_enabled), each new token's
+value is stored in local/pii_token_vault.db, an SQLite file on the search
+head, and `token_vault.py detokenize` reverses tokens for users with
+access to it; default/distsearch.conf keeps the vault and the key out of
+the knowledge bundle. A bounded LRU cache (token_cache_size entries) in
+front of the HMAC and the vault serves repeated values; the bulk APIs
+compute the misses in one pass and read or write the vault in one
+transaction per batch. With defer_writes, new tokens are held until
+flush(), so a streaming caller writes them once per chunk.
+
+Usage (session key on stdin, as for the other scripts):
+    python3 token_vault.py tokenize <value> [<value> ...]
+    python3 token_vault.py detokenize <token> [<token> ...]
+    python3 token_vault.py stats
+Pass '-' as the only value or token to read them from stdin, one per line
+after the session key.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+try:
+    import splunk.rest as rest
+except ImportError:
+    pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scan_checkpoint import SETTINGS_FILE, load_settings
+
+APP_NAME = 'SA-pii-detection'
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Key file of earlier versions; moved into storage/passwords on first use
+LEGACY_KEY_FILE = os.path.join(APP_DIR, 'local', 'pii_token.key')
+VAULT_FILE = os.path.join(APP_DIR, 'local', 'pii_token_vault.db')
+
+KEY_REALM = APP_NAME
+KEY_NAME = 'pii_token_key'
+# Splunk capability needed to read storage/passwords
+CAPABILITY = 'list_storage_passwords'
+
+DEFAULT_SETTINGS = {
+    'token_cache_size': 100000,
+    'token_vault_enabled': 1,
+}
+
+TOKEN_PREFIX = 'TOKEN-'
+TOKEN_HEX_LENGTH = 16
+HASH_HEX_LENGTH = 16
+
+# Rows per SELECT ... IN (...) when resolving tokens
+LOOKUP_BATCH = 500
+
+
+class TokenKeyError(RuntimeError):
+    """The tokenisation key is not available to this process"""
+
+
+class PasswordStore(object):
+    """The tokenisation key's entry in storage/passwords"""
+
+    def __init__(self, session_key, app=APP_NAME, realm=KEY_REALM, name=KEY_NAME):
+        if not session_key:
+            raise TokenKeyError('no session key; the tokenisation key is only read on the search head')
+        self.session_key = session_key
+        self.path = f'/servicesNS/nobody/{app}/storage/passwords'
+        self.realm = realm
+        self.name = name
+
+    def get(self):
+        """The stored key as hex, or None when there is none this user can read"""
+        response, content = rest.simpleRequest(self.path, sessionKey=self.session_key, method='GET',
+                                               getargs={'output_mode': 'json', 'count': 0})
+        if response.status == 403:
+            raise TokenKeyError(f'reading the tokenisation key needs the {CAPABILITY} capability')
+        if response.status != 200:
+            raise TokenKeyError(f'GET {self.path} returned {response.status}')
+        for entry in json.loads(content).get('entry', []):
+            credential = entry.get('content', {})
+            if credential.get('realm') == self.realm and credential.get('username') == self.name:
+                return credential.get('clear_password')
+        return None
+
+    def create(self, secret):
+        """Store a new key; a key another process stored first is kept (409)"""
+        response, content = rest.simpleRequest(self.path, sessionKey=self.session_key, method='POST',
+                                               postargs={'output_mode': 'json', 'realm': self.realm,
+                                                         'name': self.name, 'password': secret})
+        if response.status not in (200, 201, 409):
+            raise TokenKeyError(f'POST {self.path} returned {response.status}')
+
+
+def load_key(store, create=False, legacy_path=LEGACY_KEY_FILE):
+    """
+    Read the tokenisation key from storage/passwords
+
+    Args:
+        store: PasswordStore holding the key
+        create: Generate and store the key when there is none (batch
+            remediation and the CLI on the search head); otherwise fail closed
+        legacy_path: Key file of earlier versions, moved into the store when
+            the store has no key yet
+
+    Returns:
+        bytes: The 32-byte key
+
+    Raises:
+        TokenKeyError: The store has no key this process may read, and
+            create is off
+    """
+    secret = store.get()
+    if not secret and create:
+        legacy = None
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                legacy = f.read().strip() or None
+        store.create(legacy or os.urandom(32).hex())
+        # Re-read: another process may have stored its key first
+        secret = store.get()
+        if secret and legacy == secret:
+            os.remove(legacy_path)
+    if not secret:
+        raise TokenKeyError(f'no tokenisation key in storage/passwords ({store.realm}:{store.name}) readable '
+                            f'by this user; reading it needs the {CAPABILITY} capability, and an admin '
+                            f'creates it on the search head with token_vault.py stats')
+    return bytes.fromhex(secret)
+
+
+class LRUCache(object):
+    """Bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class TokenVault(object):
+    """HMAC tokeniser with an LRU cache and an optional SQLite vault"""
+
+    def __init__(self, key, vault_path=None, cache_size=DEFAULT_SETTINGS['token_cache_size'], defer_writes=False):
+        """
+        Args:
+            key: Secret key bytes (see load_key())
+            vault_path: SQLite vault file; None keeps tokens one-way
+            cache_size: Entries in each of the token and value LRU caches
+            defer_writes: Hold new tokens until flush() instead of writing
+                each batch to the vault
+        """
+        self._token_mac = hmac.new(hmac.new(key, b'token', hashlib.sha256).digest(), digestmod=hashlib.sha256)
+        self._hash_mac = hmac.new(hmac.new(key, b'hash', hashlib.sha256).digest(), digestmod=hashlib.sha256)
+        self.vault_path = vault_path
+        self.tokens = LRUCache(cache_size)   # value -> token
+        self.values = LRUCache(cache_size)   # token -> value
+        self._deferred = {} if defer_writes else None
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.vault_path)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS tokens '
+                               '(token TEXT PRIMARY KEY, value TEXT NOT NULL, created INTEGER NOT NULL)')
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _token(self, value):
+        mac = self._token_mac.copy()
+        mac.update(value.encode('utf-8'))
+        return TOKEN_PREFIX + mac.hexdigest()[:TOKEN_HEX_LENGTH].upper()
+
+    def keyed_hash(self, value):
+        """One-way keyed hash of a value (HMAC-SHA256 prefix)"""
+        mac = self._hash_mac.copy()
+        mac.update(value.encode('utf-8'))
+        return mac.hexdigest()[:HASH_HEX_LENGTH]
+
+    def tokenize(self, value):
+        return self.tokenize_many([value])[0]
+
+    def detokenize(self, token):
+        return self.detokenize_many([token])[0]
+
+    def tokenize_many(self, values):
+        """
+        Tokens for a batch of values, in input order
+
+        Cache misses are tokenised in one pass and, with a vault, their
+        mappings written in one transaction.
+        """
+        tokens = []
+        new = {}
+        for value in values:
+            token = self.tokens.get(value)
+            if token is None:
+                token = new.get(value)
+                if token is None:
+                    token = new[value] = self._token(value)
+                    self.tokens.put(value, token)
+                    self.values.put(token, value)
+            tokens.append(token)
+
+        if new and self.vault_path:
+            if self._deferred is not None:
+                self._deferred.update(new)
+            else:
+                self._record(new)
+        return tokens
+
+    def _record(self, new):
+        now = int(time.time())
+        db = self._db()
+        with db:
+            db.executemany('INSERT OR IGNORE INTO tokens (token, value, created) VALUES (?, ?, ?)',
+                           [(token, value, now) for value, token in new.items()])
+
+    def flush(self):
+        """Write the tokens held by defer_writes to the vault in one transaction"""
+        if self._deferred:
+            self._record(self._deferred)
+            self._deferred = {}
+
+    def detokenize_many(self, tokens):
+        """
+        Values for a batch of tokens, in input order; None where the token is not in the vault
+
+        Cache misses are resolved with one query per LOOKUP_BATCH tokens.
+        """
+        found = {}
+        missing = []
+        for token in tokens:
+            if token in found:
+                continue
+            value = self.values.get(token)
+            if value is None:
+                missing.append(token)
+            found[token] = value
+
+        if missing and self.vault_path and os.path.exists(self.vault_path):
+            db = self._db()
+            for i in range(0, len(missing), LOOKUP_BATCH):
+                chunk = missing[i:i + LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                for token, value in db.execute(f'SELECT token, value FROM tokens WHERE token IN ({placeholders})',
+                                               chunk):
+                    found[token] = value
+                    self.values.put(token, value)
+                    self.tokens.put(value, token)
+        return [found[token] for token in tokens]
+
+    def stats(self):
+        vault_tokens = 0
+        if self.vault_path and os.path.exists(self.vault_path):
+            vault_tokens = self._db().execute('SELECT COUNT(*) FROM tokens').fetchone()[0]
+        return {'vault_enabled': bool(self.vault_path), 'vault_tokens': vault_tokens,
+                'cache_entries': len(self.tokens), 'cache_size': self.tokens.max_size,
+                'cache_hits': self.tokens.hits + self.values.hits,
+                'cache_misses': self.tokens.misses + self.values.misses}
+
+
+_default_vault = None
+
+
+def get_vault(session_key=None, create_key=False, settings_path=SETTINGS_FILE, **options):
+    """
+    Process-wide TokenVault configured from pii_settings.csv
+
+    The first call loads the key with session_key (see load_key()); later
+    calls return the same vault.
+
+    Raises:
+        TokenKeyError: On the first call, when the key cannot be read
+    """
+    global _default_vault
+    if _default_vault is None:
+        settings = load_settings(settings_path, DEFAULT_SETTINGS)
+        key = load_key(PasswordStore(session_key), create=create_key)
+        _default_vault = TokenVault(key, vault_path=VAULT_FILE if settings['token_vault_enabled'] else None,
+                                    cache_size=settings['token_cache_size'], **options)
+    return _default_vault
+
+
+def get_session_key():
+    """Get session key from stdin or environment"""
+    session_key = sys.stdin.readline().strip()
+    if not session_key:
+        session_key = os.environ.get('SPLUNK_SESSION_KEY', '')
+    return session_key
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    args = sys.argv[2:]
+    session_key = get_session_key()
+    if args == ['-']:
+        args = [line.rstrip('\n') for line in sys.stdin if line.strip()]
+    try:
+        vault = get_vault(session_key, create_key=True)
+    except TokenKeyError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
+    if command == 'tokenize':
+        print(json.dumps(dict(zip(args, vault.tokenize_many(args))), indent=2))
+    elif command == 'detokenize':
+        print(json.dumps(dict(zip(args, vault.detokenize_many(args))), indent=2))
+    elif command == 'stats':
+        print(json.dumps(vault.stats()))
+    else:
+        print('Usage: token_vault.py [tokenize|detokenize] <value|token> ... | stats', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+PII Whitelist Matcher
+Compiled pii_whitelist.csv shared by the scanner, the deep and sampling scans and flag_finding.py
+
+A whitelist entry either exempts a scope - a PII type in an index,
+sourcetype and field_name, each of which may be '*' or a glob such as
+'aws:*' - or, when it has a pattern, one value of that type within the
+scope (a test card number, a support mailbox). Active entries are compiled
+once:
+
+    scope entries of literals and '*' hash map on (pii_type, index,
+                                      sourcetype, field_name); a lookup
+                                      probes the scope with each field
+                                      either kept or replaced by '*' (at
+                                      most 16 probes)
+    scope entries with globs          trie with one level per scope field;
+                                      a lookup follows the exact child, the
+                                      '*' child and any glob children, so
+                                      its cost depends on the depth, not on
+                                      the number of entries
+    value entries                     hash map on (pii_type, normalised
+                                      value), then the entry's scope globs
+
+Values are compared after normalisation: digits only for the numeric types
+(123-45-6789 and 123456789 are the same SSN), lower case for emails.
+
+Entries with an expires time are also kept in a min-heap on expiry. Every
+check first pops the entries whose time has passed and unlinks them from
+the maps and the trie, so a long-running scan stops honouring them without
+re-reading or rescanning the whitelist. An empty index, sourcetype or
+field_name matches anything, as '*' does.
+
+Usage:
+    python3 whitelist_matcher.py stats
+    python3 whitelist_matcher.py check <pii_type> <index> <sourcetype> [value]
+"""
+
+import csv
+import fnmatch
+import heapq
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+LOOKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lookups')
+WHITELIST_FILE = os.path.join(LOOKUPS_DIR, 'pii_whitelist.csv')
+
+SCOPE_FIELDS = ('pii_type', 'index', 'sourcetype', 'field_name')
+
+# Types whose values are compared on their digits only
+DIGIT_TYPES = ('ssn', 'credit_card', 'phone', 'phone_intl', 'bank_account')
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_value(pii_type, value):
+    """Comparable form of a PII value"""
+    value = (value or '').strip()
+    if pii_type in DIGIT_TYPES:
+        return _NON_DIGITS.sub('', value)
+    if pii_type == 'email':
+        return value.lower()
+    return value
+
+
+def _segment(value):
+    value = (value or '').strip()
+    return value or '*'
+
+
+def _is_glob(segment):
+    """True for a glob other than a bare '*', which the hash maps handle"""
+    return segment != '*' and any(ch in segment for ch in '*?[')
+
+
+def _compile_segment(segment):
+    """Matcher of one scope field of a value entry: '*', an exact string or a compiled glob"""
+    if not _is_glob(segment):
+        return segment
+    return re.compile(fnmatch.translate(segment))
+
+
+def _segment_matches(want, have):
+    if want == '*':
+        return True
+    if have == '*':
+        return False
+    return want == have if isinstance(want, str) else bool(want.match(have))
+
+
+class _Node(object):
+    __slots__ = ('children', 'globs', 'ids')
+
+    def __init__(self):
+        self.children = {}   # exact segment (or '*') -> node
+        self.globs = []      # (compiled glob, segment, node)
+        self.ids = set()     # whitelist_ids ending here
+
+    def child(self, segment):
+        if not _is_glob(segment):
+            return self.children.setdefault(segment, _Node())
+        for _, existing, node in self.globs:
+            if existing == segment:
+                return node
+        node = _Node()
+        self.globs.append((re.compile(fnmatch.translate(segment)), segment, node))
+        return node
+
+    def find(self, segment):
+        if segment == '*':
+            # A caller without this scope field matches entries that do not restrict it
+            return [node for node in (self.children.get('*'),) if node is not None]
+        nodes = [node for node in (self.children.get(segment), self.children.get('*')) if node is not None]
+        nodes.extend(node for regex, _, node in self.globs if regex.match(segment))
+        return nodes
+
+
+class WhitelistMatcher(object):
+    """Active whitelist entries compiled for constant-time checks"""
+
+    def __init__(self, entries=(), now=None, clock=time.time):
+        """
+        Args:
+            entries: Whitelist rows (pii_whitelist.csv layout)
+            now: Epoch seconds; entries already expired (or inactive) are skipped
+            clock: Time source for expiry on each check
+        """
+        self.clock = clock
+        self.entries = {}    # whitelist_id -> (entry, location)
+        self.exact = {}      # (pii_type, index, sourcetype, field_name) -> set of ids
+        self.trie = _Node()
+        self.values = {}     # (pii_type, normalised value) -> set of ids
+        self.scopes = {}     # whitelist_id -> scope segments, for value entries
+        self.expiry = []     # heap of (expires, whitelist_id)
+        # Scope lookup results; events of one index/sourcetype repeat the same scope
+        self._scope_cache = {}
+        now = int(now or clock())
+        for entry in entries:
+            self.add(entry, now)
+
+    @classmethod
+    def load(cls, path=WHITELIST_FILE, now=None, clock=time.time):
+        """Compile the active entries of a whitelist file"""
+        entries = []
+        if os.path.exists(path):
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                entries = list(csv.DictReader(f))
+        return cls(entries, now=now, clock=clock)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry, now=None):
+        """
+        Compile one entry
+
+        Returns:
+            True if the entry is active and was added
+        """
+        now = int(now or self.clock())
+        expires = _to_int(entry.get('expires'))
+        if str(entry.get('is_active', '1')).strip() not in ('1', 'true', 'True') or (expires and expires <= now):
+            return False
+        whitelist_id = entry.get('whitelist_id') or f'entry{len(self.entries)}'
+        if whitelist_id in self.entries:
+            self.remove(whitelist_id)
+
+        segments = tuple(_segment(entry.get(field)) for field in SCOPE_FIELDS)
+        pattern = (entry.get('pattern') or '').strip()
+        if pattern:
+            location = ('value', (segments[0], normalize_value(segments[0], pattern)))
+            self.values.setdefault(location[1], set()).add(whitelist_id)
+            self.scopes[whitelist_id] = [_compile_segment(s) for s in segments[1:]]
+        elif any(_is_glob(s) for s in segments):
+            node = self.trie
+            for segment in segments:
+                node = node.child(segment)
+            node.ids.add(whitelist_id)
+            location = ('trie', segments)
+        else:
+            self.exact.setdefault(segments, set()).add(whitelist_id)
+            location = ('exact', segments)
+
+        self.entries[whitelist_id] = (entry, location)
+        self._scope_cache.clear()
+        if expires:
+            heapq.heappush(self.expiry, (expires, whitelist_id))
+        return True
+
+    def remove(self, whitelist_id):
+        """Unlink one entry from the maps and the trie"""
+        item = self.entries.pop(whitelist_id, None)
+        if item is None:
+            return False
+        self._scope_cache.clear()
+        kind, key = item[1]
+        if kind == 'value':
+            self.values.get(key, set()).discard(whitelist_id)
+            self.scopes.pop(whitelist_id, None)
+        elif kind == 'exact':
+            self.exact.get(key, set()).discard(whitelist_id)
+        else:
+            node = self.trie
+            for segment in key:
+                node = node.child(segment)
+            node.ids.discard(whitelist_id)
+        return True
+
+    def expire(self, now=None):
+        """
+        Drop entries whose expiry has passed
+
+        Returns:
+            list of the whitelist_ids dropped
+        """
+        now = int(now or self.clock())
+        dropped = []
+        while self.expiry and self.expiry[0][0] <= now:
+            expires, whitelist_id = heapq.heappop(self.expiry)
+            item = self.entries.get(whitelist_id)
+            # A re-added entry keeps its own, later heap item
+            if item is not None and _to_int(item[0].get('expires')) == expires:
+                self.remove(whitelist_id)
+                dropped.append(whitelist_id)
+        return dropped
+
+    def _check_expiry(self, now):
+        if self.expiry and self.expiry[0][0] <= (now or self.clock()):
+            self.expire(now)
+
+    def match_scope(self, pii_type, index='*', sourcetype='*', field_name='*', now=None):
+        """
+        Whitelist_id of an entry exempting the PII type in this scope, or None
+
+        A scope field passed as '*' (or empty) only matches entries that do
+        not restrict it.
+        """
+        self._check_expiry(now)
+        segments = (_segment(pii_type), _segment(index), _segment(sourcetype), _segment(field_name))
+        if segments in self._scope_cache:
+            return self._scope_cache[segments]
+        whitelist_id = self._lookup_scope(segments)
+        self._scope_cache[segments] = whitelist_id
+        return whitelist_id
+
+    def _lookup_scope(self, segments):
+        if self.exact:
+            for key in itertools.product(*[(s, '*') if s != '*' else ('*',) for s in segments]):
+                ids = self.exact.get(key)
+                if ids:
+                    return min(ids)
+        if not self.trie.children and not self.trie.globs:
+            return None
+        nodes = [self.trie]
+        for segment in segments:
+            nodes = [found for node in nodes for found in node.find(segment)]
+            if not nodes:
+                return None
+        for node in nodes:
+            if node.ids:
+                return min(node.ids)
+        return None
+
+    def match_value(self, pii_type, value, index='*', sourcetype='*', field_name='*', now=None):
+        """Whitelist_id of a value entry covering this value in this scope, or None"""
+        self._check_expiry(now)
+        if not self.values:
+            return None
+        normalized = normalize_value(pii_type, value)
+        scope = (_segment(index), _segment(sourcetype), _segment(field_name))
+        for key in ((pii_type, normalized), ('*', normalized)):
+            for whitelist_id in sorted(self.values.get(key, ())):
+                if all(_segment_matches(want, have) for want, have in zip(self.scopes[whitelist_id], scope)):
+                    return whitelist_id
+        return None
+
+    def match(self, pii_type, value='', index='*', sourcetype='*', field_name='*', now=None):
+        """Whitelist_id of the scope or value entry covering a match, or None"""
+        return (self.match_scope(pii_type, index, sourcetype, field_name, now)
+                or (value and self.match_value(pii_type, value, index, sourcetype, field_name, now)) or None)
+
+    def stats(self):
+        counts = {'value': 0, 'exact': 0, 'trie': 0}
+        for _, (kind, _) in self.entries.values():
+            counts[kind] += 1
+        return {'active': len(self.entries), 'value_entries': counts['value'], 'exact_scopes': counts['exact'],
+                'wildcard_scopes': counts['trie'],
+                'next_expiry': self.expiry[0][0] if self.expiry else None}
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    matcher = WhitelistMatcher.load()
+    if command == 'stats':
+        print(json.dumps(matcher.stats()))
+    elif command == 'check' and len(sys.argv) >= 5:
+        value = sys.argv[5] if len(sys.argv) > 5 else ''
+        print(json.dumps({'whitelist_id': matcher.match(sys.argv[2], value, sys.argv[3], sys.argv[4])}))
+    else:
+        print('Usage: whitelist_matcher.py [stats | check <pii_type> <index> <sourcetype> [value]]', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+PII Mask Benchmark
+Throughput of the piimask command's masker against the mask_* eval macros
+
+The macro version is what chaining `mask_ssn`, `mask_credit_card`,
+`mask_email` and `mask_phone` over _raw does: one replace() pass per
+type, with none of the scanner's validation. The masker version is
+PIIMasker.mask(), one prefiltered scanner pass that replaces validated
+matches. Both run over the synthetic events of bench_pii_scan.py.
+
+Usage:
+    python3 bench_pii_mask.py [--events 50000] [--pii-ratio 0.1] [--method mask|hash|redact|tokenize]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import mask_pii
+import pii_scanner
+import token_vault
+from bench_pii_scan import make_events, timed
+
+# (pattern, replacement) of the mask_* macros in default/macros.conf
+MACRO_REPLACEMENTS = [
+    (r'(\d{3})-?(\d{2})-?(\d{4})', r'XXX-XX-\3'),
+    (r'(\d{12,15})(\d{4})', r'************\2'),
+    (r'([^@]+)@(.+)', r'****@\2'),
+    (r'(\+?\d{0,3}[-.]?)(\d{3})[-.]?(\d{3})[-.]?(\d{4})', r'***-***-\4'),
+]
+
+
+def macro_version(events, replacements):
+    """One replace() of each event per mask macro"""
+    changed = 0
+    for raw in events:
+        masked = raw
+        for pattern, replacement in replacements:
+            masked = pattern.sub(replacement, masked)
+        changed += 1 if masked != raw else 0
+    return changed
+
+
+def masker_version(events, masker):
+    changed = 0
+    for raw in events:
+        changed += 1 if masker.mask(raw)[1] else 0
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='piimask vs mask_* macro throughput')
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--pii-ratio', type=float, default=0.1)
+    parser.add_argument('--method', choices=sorted(mask_pii.PLACEHOLDERS), default='mask')
+    args = parser.parse_args()
+
+    replacements = [(re.compile(p), r) for p, r in MACRO_REPLACEMENTS]
+    scanner = pii_scanner.PIIScanner(custom_patterns=[])
+    # A throwaway key: the benchmark must not create the app's key file
+    vault = token_vault.TokenVault(os.urandom(32))
+    masker = mask_pii.PIIMasker(args.method, scanner=scanner, vault=vault)
+
+    events = make_events(args.events, args.pii_ratio)
+    macro_changed, macro_sec = timed(macro_version, events, replacements)
+    masker_changed, masker_sec = timed(masker_version, events, masker)
+
+    print(json.dumps({
+        'events': len(events),
+        'method': args.method,
+        'macro': {'seconds': round(macro_sec, 3), 'events_per_sec': int(len(events) / macro_sec),
+                  'events_changed': macro_changed},
+        'piimask': {'seconds': round(masker_sec, 3), 'events_per_sec': int(len(events) / masker_sec),
+                    'events_changed': masker_changed},
+        'speedup': round(macro_sec / masker_sec, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+PII Findings Store Tests
+Stable finding IDs, upsert-merge and migration of findings_store.py
+
+Usage:
+    python3 -m pytest tests/test_findings_store.py
+"""
+
+import csv
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+from findings_store import FINDINGS_FIELDS, FindingsStore, finding_id
+
+
+def detection(pii_type='ssn', source='/var/log/app.log', event_count=5, timestamp=1000, **extra):
+    row = {'index': 'main', 'sourcetype': 'app:log', 'source': source, 'host': 'web01', 'pii_type': pii_type,
+           'event_count': event_count, 'severity': 'critical', 'status': 'detected', 'timestamp': timestamp}
+    row.update(extra)
+    return row
+
+
+class FindingsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'pii_findings.csv')
+        self.store = FindingsStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def rows(self):
+        return self.store.load()[1]
+
+    def test_finding_id_matches_macro(self):
+        # eval finding_id=md5(index."|".sourcetype."|".source."|".host."|".pii_type)
+        expected = hashlib.md5(b'main|app:log|/var/log/app.log|web01|ssn').hexdigest()
+        self.assertEqual(finding_id('main', 'app:log', '/var/log/app.log', 'web01', 'ssn'), expected)
+
+    def test_daily_detections_merge(self):
+        for day in range(30):
+            self.store.upsert([detection(event_count=2, timestamp=1000 + day * 86400,
+                                         first_seen=900 + day * 86400, last_seen=950 + day * 86400),
+                               detection('email', event_count=1, timestamp=1000 + day * 86400)])
+        rows = self.rows()
+        self.assertEqual(len(rows), 2)
+        ssn = rows[0]
+        self.assertEqual(ssn['finding_id'], finding_id('main', 'app:log', '/var/log/app.log', 'web01', 'ssn'))
+        self.assertEqual((ssn['event_count'], ssn['detection_count'], ssn['last_event_count']), ('60', '30', '2'))
+        self.assertEqual((ssn['first_seen'], ssn['last_seen']), ('900', str(950 + 29 * 86400)))
+        self.assertEqual(ssn['timestamp'], str(1000 + 29 * 86400))
+
+    def test_overlapping_deep_scan_does_not_inflate_event_count(self):
+        self.store.upsert([detection(event_count=4, timestamp=1000)])
+        self.store.upsert([detection(event_count=3, timestamp=2000)])
+        # A deep scan over both daily windows sees the same seven events, and one more
+        self.store.upsert([detection(event_count=8, timestamp=3000)], rescan=True)
+        self.store.upsert([detection(event_count=5, timestamp=4000)], rescan=True)
+        row = self.rows()[0]
+        self.assertEqual((row['event_count'], row['detection_count'], row['last_event_count']), ('8', '4', '5'))
+        self.assertEqual(row['timestamp'], '4000')
+
+    def test_review_state_kept(self):
+        self.store.upsert([detection()])
+        fieldnames, rows = self.store.load()
+        rows[0].update({'status': 'false_positive', 'reviewed_by': 'analyst', 'reviewed_time': '1500',
+                        'notes': 'test fixture'})
+        self.store.save(rows, fieldnames)
+
+        outcome = self.store.upsert([detection(timestamp=2000, masked_value='***REDACTED***')])
+        self.assertEqual((outcome['inserted'], outcome['updated']), (0, 1))
+        row = self.rows()[0]
+        self.assertEqual((row['status'], row['reviewed_by'], row['notes']), ('false_positive', 'analyst', 'test fixture'))
+        self.assertEqual(row['masked_value'], '')
+        self.assertEqual(outcome['rows'][0]['status'], 'false_positive')
+
+    def test_new_exposure_inserted(self):
+        self.store.upsert([detection()])
+        outcome = self.store.upsert([detection(source='/var/log/other.log')])
+        self.assertEqual((outcome['inserted'], outcome['total']), (1, 2))
+
+    def test_migrate_folds_legacy_rows(self):
+        legacy = ['finding_id', 'timestamp', 'index', 'sourcetype', 'source', 'host', 'pii_type', 'event_count',
+                  'severity', 'status', 'reviewed_by', 'reviewed_time', 'notes', 'sample_events']
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=legacy, extrasaction='ignore')
+            writer.writeheader()
+            for day, status in enumerate(['detected', 'flagged', 'detected']):
+                writer.writerow(detection(finding_id=f'random{day}', timestamp=1000 + day, event_count=10,
+                                          status=status, reviewed_by='analyst' if status != 'detected' else '',
+                                          reviewed_time='1001' if status != 'detected' else '',
+                                          notes='check owner' if status != 'detected' else ''))
+            writer.writerow(detection('email', finding_id='random9', event_count=3))
+
+        self.assertEqual(self.store.migrate(), {'rows_before': 4, 'rows_after': 2})
+        fieldnames, rows = self.store.load()
+        self.assertEqual(fieldnames, FINDINGS_FIELDS + ['sample_events'])
+        ssn = rows[0]
+        self.assertEqual(ssn['finding_id'], finding_id('main', 'app:log', '/var/log/app.log', 'web01', 'ssn'))
+        self.assertEqual((ssn['status'], ssn['reviewed_by'], ssn['notes']), ('flagged', 'analyst', 'check owner'))
+        self.assertEqual((ssn['event_count'], ssn['detection_count']), ('30', '3'))
+        self.assertEqual((ssn['first_seen'], ssn['last_seen'], ssn['timestamp']), ('1000', '1002', '1002'))
+        self.assertEqual(self.store.stats()['stable_ids'], 2)
+
+
+    def test_concurrent_upserts_keep_every_detection(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=upsert_many, args=(self.path, worker)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+
+        rows = dict((row['pii_type'], row) for row in self.rows())
+        # Every worker saw the shared finding 10 times and added one of its own
+        self.assertEqual(rows['ssn']['detection_count'], '40')
+        self.assertEqual(sorted(rows), ['email0', 'email1', 'email2', 'email3', 'ssn'])
+        self.assertEqual([name for name in os.listdir(self.tmpdir) if name.endswith('.tmp')], [])
+
+    def test_upsert_waits_for_a_review_update(self):
+        self.store.upsert([detection()])
+        with self.store.locked():
+            fieldnames, rows, by_id = self.store.load_index()
+            scan = threading.Thread(target=self.store.upsert, args=([detection(timestamp=2000)],))
+            scan.start()
+            scan.join(0.2)
+            self.assertTrue(scan.is_alive())
+            rows[0]['status'] = 'flagged'
+            self.store.save(rows, fieldnames)
+        scan.join()
+
+        row = self.rows()[0]
+        self.assertEqual((row['status'], row['detection_count']), ('flagged', '2'))
+
+
+def upsert_many(path, worker):
+    store = FindingsStore(path)
+    for run in range(10):
+        store.upsert([detection(timestamp=1000 + run)] + ([detection(f'email{worker}')] if run == 0 else []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+PII Finding Status Tests
+Batch status changes of flag_finding.py against the findings, whitelist and audit lookups
+
+Usage:
+    python3 -m pytest tests/test_flag_finding.py
+"""
+
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import flag_finding
+from findings_store import AUDIT_FIELDS, WHITELIST_FIELDS, FindingsStore, parse_finding_ids
+
+
+def detection(source, pii_type='ssn'):
+    return {'index': 'main', 'sourcetype': 'app:log', 'source': source, 'host': 'web01', 'pii_type': pii_type,
+            'event_count': 3, 'severity': 'critical', 'timestamp': 1000}
+
+
+class FlagFindingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = FindingsStore(os.path.join(self.tmpdir, 'pii_findings.csv'))
+        outcome = self.store.upsert([detection(f'/var/log/app{i}.log') for i in range(200)])
+        self.ids = [row['finding_id'] for row in outcome['rows']]
+        for name, fields in (('pii_whitelist.csv', WHITELIST_FIELDS), ('pii_audit_log.csv', AUDIT_FIELDS)):
+            with open(os.path.join(self.tmpdir, name), 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(fields)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, name):
+        with open(os.path.join(self.tmpdir, name), newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_batch_whitelist_writes_each_file_once(self):
+        real_open, real_replace = open, os.replace
+        writes = []
+
+        def counting_open(path, mode='r', *args, **kwargs):
+            if ('w' in mode or 'a' in mode) and not path.endswith('.lock'):
+                writes.append(os.path.basename(path))
+            return real_open(path, mode, *args, **kwargs)
+
+        def counting_replace(src, dst):
+            writes.append(os.path.basename(dst))
+            return real_replace(src, dst)
+
+        batch = self.ids[:150] + ['missing', self.ids[0]]
+        with mock.patch('builtins.open', counting_open), mock.patch('os.replace', counting_replace):
+            result = flag_finding.update_findings_status(batch, 'whitelisted', 'analyst', 'test data',
+                                                         lookups_path=self.tmpdir)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['updated']), 150)
+        self.assertEqual(result['not_found'], ['missing'])
+        self.assertEqual(sorted(writes), ['pii_audit_log.csv', 'pii_findings.csv', 'pii_whitelist.csv'])
+
+        statuses = dict((row['finding_id'], row['status']) for row in self.store.load()[1])
+        self.assertEqual(sum(1 for status in statuses.values() if status == 'whitelisted'), 150)
+        self.assertEqual(statuses[self.ids[199]], 'detected')
+
+        audit = self.read('pii_audit_log.csv')
+        self.assertEqual([row['finding_id'] for row in audit], self.ids[:150])
+        self.assertEqual(set((row['old_status'], row['new_status']) for row in audit), {('detected', 'whitelisted')})
+        # All 150 findings share one pii_type/index/sourcetype scope: one entry covers them
+        self.assertEqual(result['whitelist_added'], 1)
+        whitelist = self.read('pii_whitelist.csv')
+        self.assertEqual([(row['pii_type'], row['index'], row['sourcetype']) for row in whitelist],
+                         [('ssn', 'main', 'app:log')])
+
+    def test_whitelist_covered_by_wildcard_entry(self):
+        with open(os.path.join(self.tmpdir, 'pii_whitelist.csv'), 'a', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=WHITELIST_FIELDS).writerow(
+                {'whitelist_id': 'wl1', 'pii_type': 'ssn', 'index': '*', 'sourcetype': 'app:*', 'is_active': '1'})
+        result = flag_finding.update_findings_status(self.ids[:3], 'whitelisted', lookups_path=self.tmpdir)
+        self.assertEqual((len(result['updated']), result['whitelist_added']), (3, 0))
+        self.assertEqual(len(self.read('pii_whitelist.csv')), 1)
+        self.assertEqual(len(self.read('pii_audit_log.csv')), 3)
+
+    def test_single_update_keeps_result_shape(self):
+        result = flag_finding.update_finding_status(self.ids[5], 'flagged', 'analyst', 'check owner',
+                                                    lookups_path=self.tmpdir)
+        self.assertEqual((result['success'], result['old_status'], result['new_status']), (True, 'detected', 'flagged'))
+        row = self.store.load_index()[2][self.ids[5]]
+        self.assertEqual(row['flagged_by'], 'analyst')
+        self.assertTrue(row['notes'].endswith('analyst: check owner'))
+        self.assertEqual(self.read('pii_whitelist.csv'), [])
+
+        missing = flag_finding.update_finding_status('missing', 'flagged', lookups_path=self.tmpdir)
+        self.assertEqual(missing, {'success': False, 'message': 'Finding missing not found'})
+        self.assertEqual(len(self.read('pii_audit_log.csv')), 1)
+
+    def test_parse_finding_ids(self):
+        self.assertEqual(parse_finding_ids('a, b,,c'), ['a', 'b', 'c'])
+        self.assertEqual(parse_finding_ids('-', io.StringIO('a\n\nb\n')), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
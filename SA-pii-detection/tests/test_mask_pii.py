@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+PII Masking Tests
+Dispatch tables, search-time masking (piimask) and batch remediation of mask_pii.py
+
+Usage:
+    python3 -m pytest tests/test_mask_pii.py
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import mask_pii
+import token_vault
+from findings_store import AUDIT_FIELDS, FindingsStore
+from pii_scanner import PIIScanner
+
+
+def setUpModule():
+    # Keep hash/tokenize off the app's key file and vault
+    token_vault._default_vault = token_vault.TokenVault(bytes(32))
+
+
+def tearDownModule():
+    token_vault._default_vault = None
+
+
+def detection(source, pii_type, severity):
+    return {'index': 'main', 'sourcetype': 'app:log', 'source': source, 'host': 'web01', 'pii_type': pii_type,
+            'event_count': 3, 'severity': severity, 'timestamp': 1000}
+
+
+class RemediatedValueTest(unittest.TestCase):
+
+    def test_dispatch(self):
+        self.assertEqual(mask_pii.remediated_value('123-45-6789', 'ssn'), 'XXX-XX-6789')
+        self.assertEqual(mask_pii.remediated_value('jane@example.com', 'email'), '****@example.com')
+        self.assertEqual(mask_pii.remediated_value('4111 1111 1111 1111', 'credit_card'), '************1111')
+        self.assertEqual(mask_pii.remediated_value('x', 'passport'), '***MASKED***')
+        self.assertEqual(mask_pii.remediated_value('', 'ssn', 'hash'), '***HASHED***')
+        self.assertEqual(mask_pii.remediated_value('x', 'ssn', 'tokenize'), mask_pii.tokenize_value('x'))
+        self.assertEqual(mask_pii.remediated_value('x', 'ssn', 'shred'), '***REMEDIATED***')
+
+
+class PIIMaskerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scanner = PIIScanner(custom_patterns=[])
+
+    def test_masks_every_match(self):
+        masker = mask_pii.PIIMasker(scanner=self.scanner)
+        text, count = masker.mask('ssn=123-45-6789 card=4111111111111111 mail=jane@example.com from 10.1.2.3')
+        self.assertEqual(text, 'ssn=XXX-XX-6789 card=************1111 mail=****@example.com from ***MASKED***')
+        self.assertEqual(count, 4)
+
+    def test_unvalidated_and_clean_text_unchanged(self):
+        masker = mask_pii.PIIMasker('redact', scanner=self.scanner)
+        clean = 'order 4111111111111112 shipped status=200'
+        self.assertEqual(masker.mask(clean), (clean, 0))
+        self.assertEqual(masker.mask(''), ('', 0))
+
+    def test_methods(self):
+        raw = 'user ssn 123-45-6789'
+        self.assertEqual(mask_pii.PIIMasker('redact', scanner=self.scanner).mask(raw)[0], 'user ssn ***REDACTED***')
+        self.assertEqual(mask_pii.PIIMasker('tokenize', scanner=self.scanner).mask(raw)[0],
+                         'user ssn ' + mask_pii.tokenize_value('123-45-6789'))
+        with self.assertRaises(ValueError):
+            mask_pii.PIIMasker('shred', scanner=self.scanner)
+
+
+class MaskResultsTest(unittest.TestCase):
+    """The piimask command's modes"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scanner = PIIScanner(custom_patterns=[])
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.default_vault = token_vault._default_vault
+
+    def tearDown(self):
+        token_vault._default_vault = self.default_vault
+        shutil.rmtree(self.tmpdir)
+
+    def results(self):
+        return [{'_raw': 'signup jane@example.com ssn=123-45-6789', 'message': ['ok', 'call 555-123-4567']},
+                {'_raw': 'nothing to see', 'message': 'jane@example.com'}]
+
+    def test_mask(self):
+        results = mask_pii.mask_results(self.results(), 'mask', ['_raw', 'message'], scanner=self.scanner)
+        self.assertEqual(results[0]['_raw'], 'signup ****@example.com ssn=XXX-XX-6789')
+        self.assertEqual(results[0]['message'], ['ok', 'call ***-***-4567'])
+        self.assertEqual([r['pii_masked_count'] for r in results], [3, 1])
+        # Only the listed fields
+        self.assertEqual(mask_pii.mask_results(self.results(), scanner=self.scanner)[1]['message'], 'jane@example.com')
+
+    def test_hash(self):
+        results = mask_pii.mask_results(self.results(), 'hash', scanner=self.scanner)
+        self.assertEqual(results[0]['_raw'], 'signup %s ssn=%s' % (mask_pii.hash_value('jane@example.com'),
+                                                                 mask_pii.hash_value('123-45-6789')))
+
+    def test_tokenize_records_the_chunk_in_the_vault(self):
+        path = os.path.join(self.tmpdir, 'vault.db')
+        token_vault._default_vault = token_vault.TokenVault(bytes(32), path, defer_writes=True)
+        results = mask_pii.mask_results(self.results(), 'tokenize', ['_raw', 'message'], scanner=self.scanner)
+        token = token_vault._default_vault.tokenize('jane@example.com')
+        self.assertEqual(results[1]['message'], token)
+        self.assertEqual(token_vault.TokenVault(bytes(32), path).detokenize_many(results[0]['_raw'].split()[1:2]),
+                         ['jane@example.com'])
+        self.assertEqual(token_vault.TokenVault(bytes(32), path).stats()['vault_tokens'], 3)
+
+    def test_hash_and_tokenize_fail_closed_without_a_session(self):
+        token_vault._default_vault = None
+        for method in ('hash', 'tokenize'):
+            with self.assertRaises(token_vault.TokenKeyError):
+                mask_pii.mask_results(self.results(), method, scanner=self.scanner)
+        redacted = mask_pii.mask_results(self.results(), 'redact', scanner=self.scanner)
+        self.assertEqual(redacted[0]['pii_masked_count'], 2)
+
+
+class BatchRemediationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = FindingsStore(os.path.join(self.tmpdir, 'pii_findings.csv'))
+        findings = []
+        for i in range(300):
+            pii_type = ('ssn', 'email', 'phone')[i % 3]
+            findings.append(detection(f'/var/log/app{i}.log', pii_type, 'critical' if i % 2 else 'high'))
+        self.ids = [row['finding_id'] for row in self.store.upsert(findings)['rows']]
+        with open(os.path.join(self.tmpdir, 'pii_audit_log.csv'), 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(AUDIT_FIELDS)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def audit(self):
+        with open(os.path.join(self.tmpdir, 'pii_audit_log.csv'), newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_filter_selects_open_findings(self):
+        fieldnames, rows, by_id = self.store.load_index()
+        by_id[self.ids[3]]['status'] = 'false_positive'
+        self.store.save(rows, fieldnames)
+
+        result = mask_pii.remediate_findings(filters={'pii_type': ['ssn'], 'severity': ['critical']},
+                                             lookups_path=self.tmpdir)
+        # ssn is every third finding and critical every second: 50 of them, one closed
+        self.assertEqual(len(result['remediated']), 49)
+        self.assertEqual(len(self.audit()), 49)
+        rows = self.store.load_index()[2]
+        self.assertEqual(rows[self.ids[9]]['status'], 'remediated')
+        self.assertEqual(rows[self.ids[9]]['masked_value'], '***MASKED***')
+        self.assertEqual(rows[self.ids[3]]['status'], 'false_positive')
+        self.assertEqual(rows[self.ids[0]]['status'], 'detected')
+
+    def test_id_batch_and_single(self):
+        result = mask_pii.remediate_findings(self.ids[:200] + ['missing'], method='redact', lookups_path=self.tmpdir)
+        self.assertEqual((len(result['remediated']), result['not_found']), (200, ['missing']))
+        self.assertEqual(set(r['masked_value'] for r in result['remediated']), {'***REDACTED***'})
+        self.assertEqual(sum(1 for row in self.store.load()[1] if row['status'] == 'remediated'), 200)
+
+        single = mask_pii.remediate_pii(self.ids[250], 'hash', lookups_path=self.tmpdir)
+        self.assertEqual((single['success'], single['masked_value']), (True, '***HASHED***'))
+        self.assertFalse(mask_pii.remediate_pii('missing', lookups_path=self.tmpdir)['success'])
+        self.assertEqual(len(self.audit()), 201)
+
+    def test_parse_filters(self):
+        self.assertEqual(mask_pii.parse_filters(['pii_type=ssn', 'severity=critical,high', 'pii_type=email']),
+                         {'pii_type': ['ssn', 'email'], 'severity': ['critical', 'high']})
+        with self.assertRaises(ValueError):
+            mask_pii.parse_filters(['owner=alice'])
+
+
+if __name__ == '__main__':
+    unittest.main()
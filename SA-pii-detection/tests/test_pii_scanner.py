@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+PII Scanner Tests
+Validation, overlap ranking, run windows and custom patterns of pii_scanner.py
+
+Usage:
+    python3 -m pytest tests/test_pii_scanner.py
+"""
+
+import os
+import re
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'bin'))
+sys.path.insert(0, TESTS_DIR)
+import pii_scanner
+from bench_pii_scan import make_events
+
+MACROS = pii_scanner.read_macros()
+
+
+def scanner(types=None, custom_patterns=()):
+    return pii_scanner.PIIScanner(types, macros=MACROS, custom_patterns=list(custom_patterns))
+
+
+def custom(regex, pii_type='employee_id', validation=''):
+    return {'pattern_id': 'p1', 'pii_type': pii_type, 'regex_pattern': regex, 'validation_regex': validation}
+
+
+class ValidatorTest(unittest.TestCase):
+
+    def test_luhn(self):
+        self.assertTrue(pii_scanner.credit_card_valid('4111 1111 1111 1111'))
+        self.assertFalse(pii_scanner.credit_card_valid('4111111111111112'))
+        self.assertEqual(scanner().scan('card=4111111111111111 card=4111111111111112'), {'credit_card': 1})
+
+    def test_ssn_rules(self):
+        self.assertTrue(pii_scanner.ssn_valid('123-45-6789'))
+        self.assertTrue(pii_scanner.ssn_valid('123456789'))
+        for ssn in ('000-12-3456', '666-12-3456', '912-34-5678', '123-00-4567', '123-45-0000',
+                    '078-05-1120', '123-456789'):
+            self.assertFalse(pii_scanner.ssn_valid(ssn), ssn)
+        self.assertEqual(scanner(['ssn']).scan('a=000-12-3456 b=666-12-3456 c=912-34-5678 '
+                                               'd=123-00-4567 e=123-45-0000 f=123-45-6789'), {'ssn': 1})
+
+
+class RankingTest(unittest.TestCase):
+
+    def test_custom_pattern_beats_builtins(self):
+        found = scanner(custom_patterns=[custom(r'\b\d{3}-\d{2}-\d{4}\b')]).scan('id 123-45-6789')
+        self.assertEqual(found, {'employee_id': 1})
+
+    def test_specific_types_beat_phone_and_numbers(self):
+        everything = scanner('all')
+        self.assertEqual(everything.scan('MRN: 5551234567'), {'mrn': 1})
+        self.assertEqual(scanner().scan('MRN: 5551234567'), {'phone': 1})
+        # Passport also matches the drivers_license and its digits the phone_intl pattern
+        self.assertEqual(everything.scan('passport AB1234567'), {'passport': 1})
+
+    def test_failed_validation_falls_back_to_lower_types(self):
+        # 16 digits failing Luhn are still a bank account number
+        self.assertEqual(scanner('all').scan('acct 4111111111111112'), {'bank_account': 1})
+        self.assertEqual(scanner().scan('acct 4111111111111112'), {})
+
+    def test_matches_in_text_order(self):
+        text = 'ssn 123-45-6789 mail jane@example.com ip 10.1.2.3'
+        self.assertEqual([(t, text[s:e]) for t, s, e in scanner().finditer(text)],
+                         [('ssn', '123-45-6789'), ('email', 'jane@example.com'), ('ip', '10.1.2.3')])
+
+
+class RunWindowTest(unittest.TestCase):
+
+    def test_matches_at_run_boundaries(self):
+        ssn = scanner(['ssn'])
+        self.assertEqual(ssn.scan('123-45-6789'), {'ssn': 1})
+        self.assertEqual(ssn.scan('ssn=123-45-6789.'), {'ssn': 1})
+        # The word characters around the run still break \b
+        self.assertEqual(ssn.scan('x123-45-6789'), {})
+        self.assertEqual(ssn.scan('123-45-6789x'), {})
+
+    def test_several_types_in_one_run(self):
+        self.assertEqual(scanner().scan('123-45-6789/4111111111111111'), {'ssn': 1, 'credit_card': 1})
+
+
+class CustomPatternTest(unittest.TestCase):
+
+    def test_literal_prefix(self):
+        self.assertEqual(pii_scanner._literal_prefix(r'EMP-\d{6}'), 'EMP-')
+        self.assertEqual(pii_scanner._literal_prefix(r'\bEMP\-\d+'), 'EMP-')
+        self.assertEqual(pii_scanner._literal_prefix(r'ABC?\d'), 'AB')
+        self.assertEqual(pii_scanner._literal_prefix(r'\d{3}X'), '')
+
+    def test_prefiltered_custom_pattern(self):
+        scan = scanner(custom_patterns=[custom(r'EMP-\d{6}')])
+        self.assertIsNotNone(scan.prefilter.search('EMP-123456'))
+        self.assertIsNone(scan.prefilter.search('no identifiers here'))
+        self.assertEqual(scan.scan('badge EMP-123456'), {'employee_id': 1})
+
+    def test_pattern_without_prefix_disables_the_prefilter(self):
+        scan = scanner(custom_patterns=[custom(r'\b\d{3}X\b')])
+        self.assertIsNone(scan.prefilter)
+        self.assertEqual(scan.scan('code 123X'), {'employee_id': 1})
+
+    def test_unembeddable_pattern_is_scanned_separately(self):
+        self.assertTrue(pii_scanner._embeddable(r'EMP-\d+'))
+        self.assertFalse(pii_scanner._embeddable(r'(?P<id>\d+)'))
+        self.assertFalse(pii_scanner._embeddable(r'(\w)\1-\d{4}'))
+        self.assertFalse(pii_scanner._embeddable(r'(?i)emp-\d+'))
+        scan = scanner(custom_patterns=[custom(r'\b(\w)\1-\d{4}\b')])
+        self.assertEqual(scan.separate, ['custom_0'])
+        self.assertEqual(scan.scan('ids aa-1234 ab-1234 jane@example.com'), {'employee_id': 1, 'email': 1})
+
+    def test_validation_regex(self):
+        scan = scanner(custom_patterns=[custom(r'EMP-\d{6}', validation=r'^EMP-9')])
+        self.assertEqual(scan.scan('EMP-123456 EMP-912345'), {'employee_id': 1})
+
+
+class RegexTableParityTest(unittest.TestCase):
+
+    def test_flags_match_the_regex_per_type_macros(self):
+        """scan_all_pii_regex flags on the benchmark samples, less card numbers failing Luhn"""
+        patterns = dict((t, re.compile(MACROS[m])) for t, m in pii_scanner.BUILTIN_TYPES
+                        if t in pii_scanner.DEFAULT_TYPES)
+        scan = scanner()
+        for event in make_events(2000, 0.5):
+            expected = dict((t, 1 if p.search(event) else 0) for t, p in patterns.items())
+            card = patterns['credit_card'].search(event)
+            if card and not pii_scanner.luhn_valid(card.group()):
+                expected['credit_card'] = 0
+            flags = scan.flags(event)
+            self.assertEqual(dict((t, flags[f'has_{t}']) for t in patterns), expected, event)
+
+
+if __name__ == '__main__':
+    unittest.main()
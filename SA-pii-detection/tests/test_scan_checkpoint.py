@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+PII Scan Checkpoint Tests
+Index-time windows, search bounds and cursor commits of scan_checkpoint.py
+
+Usage:
+    python3 -m pytest tests/test_scan_checkpoint.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+from scan_checkpoint import DEFAULT_SETTINGS, PENDING_EXPIRY_SEC, ScanCheckpoints, search_bounds, subsearch_row
+
+NOW = 1700000000
+SETTLE = DEFAULT_SETTINGS['scan_settle_seconds']
+
+
+def pair_stats(events=10, max_indextime=NOW, max_index_delay=30, **pairs):
+    stats = {('main', 'app:log'): {'events': events, 'max_indextime': max_indextime,
+                                   'max_index_delay': max_index_delay}}
+    stats.update(pairs)
+    return stats
+
+
+class ScanCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoints = ScanCheckpoints('daily', os.path.join(self.tmpdir, 'pii_scan_checkpoints.json'),
+                                           dict(DEFAULT_SETTINGS),
+                                           os.path.join(self.tmpdir, 'pii_scan_history.csv'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_first_window_starts_at_the_initial_lookback(self):
+        window = self.checkpoints.open_window(now=NOW)
+        self.assertEqual(window['window_start'], NOW - DEFAULT_SETTINGS['scan_initial_lookback'])
+        self.assertEqual(window['window_end'], NOW - SETTLE)
+        self.assertEqual(window['earliest'], window['window_start'] - DEFAULT_SETTINGS['scan_max_event_delay'])
+        self.assertEqual(search_bounds(window),
+                         f"earliest={window['earliest']} latest={NOW + 86400} _index_latest={NOW - SETTLE} "
+                         f"_index_earliest={window['window_start']}")
+
+    def test_commit_moves_the_next_window_on(self):
+        first = self.checkpoints.open_window(now=NOW)
+        row = self.checkpoints.commit(first['scan_id'], pair_stats(), findings=3, now=NOW + 60)
+        self.assertEqual((row['scan_id'], row['events_processed'], row['findings_detected']),
+                         (first['scan_id'], 10, 3))
+        self.assertEqual(row['coverage_end'], first['window_end'])
+
+        second = self.checkpoints.open_window(now=NOW + 3600)
+        self.assertEqual(second['window_start'], first['window_end'])
+        self.assertEqual(second['window_end'], NOW + 3600 - SETTLE)
+        self.assertEqual(self.checkpoints.pairs()[0]['cursor'], first['window_end'])
+
+    def test_window_is_capped_at_the_max_window(self):
+        self.checkpoints.commit(self.checkpoints.open_window(now=NOW)['scan_id'], pair_stats(), now=NOW)
+        window = self.checkpoints.open_window(now=NOW + 10 * 86400)
+        self.assertEqual(window['window_end'] - window['window_start'], DEFAULT_SETTINGS['scan_max_window'])
+
+    def test_failed_run_rescans_its_window(self):
+        first = self.checkpoints.open_window(now=NOW)
+        retry = self.checkpoints.open_window(now=NOW + 3600)
+        self.assertEqual(retry['window_start'], first['window_start'])
+
+    def test_pairs_ahead_of_the_window_get_their_own_bounds(self):
+        self.checkpoints.commit(self.checkpoints.open_window(now=NOW)['scan_id'], pair_stats(), now=NOW)
+        scan = self.checkpoints.load()
+        scan['pairs']['main|app:log']['cursor'] = NOW + 600
+        scan['watermark'] = NOW - 600
+        self.checkpoints._save(scan)
+
+        window = self.checkpoints.open_window(now=NOW + 3600)
+        self.assertEqual(window['window_start'], NOW - 600)
+        self.assertEqual(window['pairs_ahead'], [('main', 'app:log', NOW + 600)])
+        bounds = search_bounds(window)
+        self.assertIn('(index="main" sourcetype="app:log" _index_earliest=%d) OR ' % (NOW + 600), bounds)
+        self.assertIn('(NOT (index="main" sourcetype="app:log") _index_earliest=%d)' % (NOW - 600), bounds)
+
+    def test_staged_run_is_not_committed(self):
+        first = self.checkpoints.open_window(now=NOW)
+        self.checkpoints.commit(first['scan_id'], pair_stats(), now=NOW)
+        # Stats staged, but the findings were never stored
+        second = self.checkpoints.open_window(now=NOW + 3600)
+        self.checkpoints.stage(second['scan_id'], pair_stats(events=4))
+
+        retry = self.checkpoints.open_window(now=NOW + 7200)
+        self.assertEqual(retry['window_start'], second['window_start'])
+        self.assertEqual(self.checkpoints.pairs()[0]['cursor'], first['window_end'])
+
+    def test_commit_adds_staged_stats(self):
+        window = self.checkpoints.open_window(now=NOW)
+        self.checkpoints.stage(window['scan_id'], pair_stats(events=4, max_indextime=NOW - 500))
+        self.checkpoints.stage(window['scan_id'], pair_stats(events=6, max_index_delay=90))
+        row = self.checkpoints.commit(window['scan_id'], findings=2, now=NOW)
+        self.assertEqual((row['events_processed'], row['max_index_delay_sec'], row['pairs_scanned']), (10, 90, 1))
+        pair = self.checkpoints.pairs()[0]
+        self.assertEqual((pair['events_last_run'], pair['last_indextime']), (10, NOW))
+        self.assertEqual(self.checkpoints.load()['pending'], {})
+
+    def test_overlapping_runs_commit_their_own_windows(self):
+        scheduled = self.checkpoints.open_window(now=NOW)
+        manual = self.checkpoints.open_window(now=NOW)
+        self.assertNotEqual(scheduled['latest'], manual['latest'])
+        self.assertEqual(self.checkpoints.find_window(scheduled['latest']), scheduled['scan_id'])
+        self.assertEqual(self.checkpoints.find_window('%d.000' % manual['latest']), manual['scan_id'])
+        self.assertIsNone(self.checkpoints.find_window())
+
+        row = self.checkpoints.commit(manual['scan_id'], pair_stats(), now=NOW + 60)
+        self.assertEqual(row['scan_id'], manual['scan_id'])
+        # The scheduled run's window is still open, and the only one left
+        self.assertEqual(self.checkpoints.find_window(), scheduled['scan_id'])
+        self.assertEqual(self.checkpoints.commit(scheduled['scan_id'], now=NOW + 120)['scan_id'],
+                         scheduled['scan_id'])
+        with self.assertRaises(ValueError):
+            self.checkpoints.commit(scheduled['scan_id'], now=NOW + 180)
+
+    def test_stale_pending_windows_expire(self):
+        old = self.checkpoints.open_window(now=NOW)
+        self.checkpoints.open_window(now=NOW + PENDING_EXPIRY_SEC + 1)
+        self.assertNotIn(old['scan_id'], self.checkpoints.load()['pending'])
+
+    def test_legacy_pending_window_is_keyed_by_scan_id(self):
+        self.checkpoints._save({'watermark': 0, 'pairs': {},
+                                'pending': {'scan_id': 'abc', 'window_start': NOW - 100, 'window_end': NOW,
+                                            'started': NOW}})
+        self.assertEqual(self.checkpoints.find_window(), 'abc')
+        self.assertEqual(self.checkpoints.commit('abc', pair_stats(), now=NOW)['coverage_end'], NOW)
+
+    def test_subsearch_row_is_only_the_search(self):
+        window = self.checkpoints.open_window(now=NOW)
+        row = subsearch_row(window)
+        self.assertEqual(list(row), ['search'])
+        self.assertEqual(row['search'], search_bounds(window))
+        self.assertEqual(self.checkpoints.find_window(window['latest']), window['scan_id'])
+
+    def test_bounds_quote_pair_values(self):
+        window = {'earliest': 0, 'latest': 1, 'window_start': 2, 'window_end': 3,
+                  'pairs_ahead': [('main', 'say "hi"', 5)]}
+        self.assertIn(r'sourcetype="say \"hi\""', search_bounds(window))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+PII Deep Scan Orchestrator Tests
+Partitioning, concurrency budget, retries and merge of scan_orchestrator.py against a stubbed job API
+
+Jobs run on a simulated clock: the orchestrator's sleep() advances it, so
+wall-clock assertions are exact and the tests run instantly.
+
+Usage:
+    python3 -m pytest tests/test_scan_orchestrator.py
+    python3 -m unittest discover -s tests
+"""
+
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import findings_store
+import scan_orchestrator
+from scan_orchestrator import DONE, FAILED, RUNNING, ScanOrchestrator, merge_results, plan_partitions
+from whitelist_matcher import WhitelistMatcher
+
+DAY = 86400
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StubJobAPI(object):
+    """
+    Job API whose jobs finish duration seconds after dispatch
+
+    failures maps a partition index to the number of attempts that fail
+    (mode 'failed': the job reports failure; 'dispatch': dispatch raises;
+    'hang': the job never finishes).
+    """
+
+    def __init__(self, clock, duration=60.0, rows=None, failures=None, mode='failed'):
+        self.clock = clock
+        self.duration = duration
+        self.rows = rows or (lambda index, earliest, latest: [])
+        self.failures = dict(failures or {})
+        self.mode = mode
+        self.jobs = {}
+        self.dispatched = []
+        self.cancelled = []
+        self.max_in_flight = 0
+
+    def _key(self, search):
+        return search.split('"')[1], int(search.split('earliest=')[1].split()[0])
+
+    def in_flight(self):
+        return sum(1 for job in self.jobs.values() if job['state'] == RUNNING)
+
+    def dispatch(self, search, earliest, latest):
+        key = self._key(search)
+        self.dispatched.append(key)
+        failing = self.failures.get(key, 0) > 0
+        if failing:
+            self.failures[key] -= 1
+            if self.mode == 'dispatch':
+                raise RuntimeError('splunkd unavailable')
+        sid = f'sid{len(self.dispatched)}'
+        self.jobs[sid] = {'key': key, 'latest': latest, 'start': self.clock(), 'state': RUNNING,
+                          'fail': failing and self.mode == 'failed', 'hang': failing and self.mode == 'hang'}
+        self.max_in_flight = max(self.max_in_flight, self.in_flight())
+        return sid
+
+    def status(self, sid):
+        job = self.jobs[sid]
+        if job['state'] == RUNNING and not job['hang'] and self.clock() >= job['start'] + self.duration:
+            job['state'] = FAILED if job['fail'] else DONE
+        return job['state'], 'Search auto-canceled' if job['state'] == FAILED else ''
+
+    def results(self, sid):
+        job = self.jobs[sid]
+        index, earliest = job['key']
+        return self.rows(index, earliest, job['latest'])
+
+    def cancel(self, sid):
+        self.jobs[sid]['state'] = FAILED
+        self.cancelled.append(sid)
+
+
+def stats_rows(index, earliest, latest):
+    """One source per day with PII on even days, as the partition search's stats would return"""
+    rows = []
+    day = earliest // DAY
+    rows.append({'index': index, 'sourcetype': 'app:log', 'source': '/var/log/app.log', 'host': 'web01',
+                 'events_scanned': '100', 'event_count': '2' if day % 2 == 0 else '0',
+                 'first_seen': str(earliest + 10), 'last_seen': str(latest - 10),
+                 'has_email': '1' if day % 2 == 0 else '0', 'has_ssn': '1' if day == 4 else '0'})
+    rows.append({'index': index, 'sourcetype': 'app:log', 'source': f'/var/log/day{day}.log', 'host': 'web01',
+                 'events_scanned': '5', 'event_count': '0', 'first_seen': str(earliest), 'last_seen': str(earliest),
+                 'has_email': '0', 'has_ssn': '0'})
+    return rows
+
+
+def make_orchestrator(api, clock, **kwargs):
+    kwargs.setdefault('poll_interval', 1.0)
+    kwargs.setdefault('retry_delay', 10.0)
+    return ScanOrchestrator(api, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class PlanPartitionsTest(unittest.TestCase):
+
+    def test_slices_cover_range_without_overlap(self):
+        partitions = plan_partitions(['web', 'main', 'web'], 0, 30 * DAY + 3600, DAY)
+        self.assertEqual(len(partitions), 2 * 31)
+        self.assertEqual([p['order'] for p in partitions], list(range(62)))
+        main = [p for p in partitions if p['index'] == 'main']
+        self.assertEqual(main[0]['earliest'], 0)
+        self.assertEqual(main[-1]['latest'], 30 * DAY + 3600)
+        for before, after in zip(main, main[1:]):
+            self.assertEqual(before['latest'], after['earliest'])
+        self.assertEqual(partitions[0]['partition_id'], 'main@0')
+
+    def test_empty_range(self):
+        self.assertEqual(plan_partitions(['main'], 100, 100, DAY), [])
+
+    def test_scan_indexes_from_macro(self):
+        macros = {'pii_scan_indexes': '(index=main OR index="web" OR index=app)'}
+        self.assertEqual(scan_orchestrator.scan_indexes(macros), ['main', 'web', 'app'])
+
+
+class ScanOrchestratorTest(unittest.TestCase):
+
+    def run_scan(self, concurrency, partitions=None, **api_args):
+        clock = FakeClock()
+        api = StubJobAPI(clock, **api_args)
+        partitions = partitions or plan_partitions(['main', 'web'], 0, 30 * DAY, DAY)
+        outcome = make_orchestrator(api, clock, max_concurrency=concurrency).run(partitions)
+        return api, outcome
+
+    def test_wall_clock_scales_with_concurrency(self):
+        timings = {}
+        for concurrency in (1, 4, 12):
+            api, outcome = self.run_scan(concurrency)
+            self.assertEqual(outcome['failed'], [])
+            self.assertEqual(len(outcome['results']), 60)
+            self.assertLessEqual(api.max_in_flight, concurrency)
+            self.assertEqual(api.max_in_flight, concurrency)
+            timings[concurrency] = outcome['wall_clock_sec']
+        # 60 partitions of 60s: 60, 15 and 5 rounds
+        self.assertEqual(timings[1], 60 * 60)
+        self.assertEqual(timings[4], 15 * 60)
+        self.assertEqual(timings[12], 5 * 60)
+
+    def test_dispatches_in_plan_order(self):
+        partitions = plan_partitions(['main', 'web'], 0, 3 * DAY, DAY)
+        api, outcome = self.run_scan(2, partitions)
+        self.assertEqual(api.dispatched, [('main', 0), ('main', DAY), ('main', 2 * DAY),
+                                          ('web', 0), ('web', DAY), ('web', 2 * DAY)])
+
+    def test_failed_partition_is_retried(self):
+        api, outcome = self.run_scan(4, failures={('web', 3 * DAY): 2})
+        self.assertEqual(outcome['failed'], [])
+        retried = [p for p in outcome['partitions'] if p['attempts'] > 1]
+        self.assertEqual([(p['partition_id'], p['attempts'], p['state']) for p in retried],
+                         [(f'web@{3 * DAY}', 3, DONE)])
+        self.assertEqual(api.dispatched.count(('web', 3 * DAY)), 3)
+
+    def test_dispatch_errors_are_retried(self):
+        api, outcome = self.run_scan(4, failures={('main', 0): 1}, mode='dispatch')
+        self.assertEqual(outcome['failed'], [])
+        self.assertEqual(outcome['partitions'][0]['attempts'], 2)
+
+    def test_partition_fails_after_max_attempts(self):
+        api, outcome = self.run_scan(4, failures={('main', DAY): 5})
+        self.assertEqual(outcome['failed'], [f'main@{DAY}'])
+        failed = outcome['partitions'][1]
+        self.assertEqual((failed['state'], failed['attempts']), (FAILED, 3))
+        self.assertEqual(failed['message'], 'Search auto-canceled')
+        self.assertEqual(len(outcome['results']), 59)
+
+    def test_hung_partition_is_cancelled_and_retried(self):
+        clock = FakeClock()
+        api = StubJobAPI(clock, failures={('main', 0): 1}, mode='hang')
+        partitions = plan_partitions(['main'], 0, 2 * DAY, DAY)
+        outcome = make_orchestrator(api, clock, max_concurrency=2, partition_timeout=300).run(partitions)
+        self.assertEqual(outcome['failed'], [])
+        self.assertEqual(api.cancelled, ['sid1'])
+        self.assertEqual(partitions[0]['attempts'], 2)
+
+    def test_budget_held_while_retrying(self):
+        api, outcome = self.run_scan(3, failures={('main', 0): 2, ('web', 0): 2})
+        self.assertLessEqual(api.max_in_flight, 3)
+        self.assertEqual(outcome['failed'], [])
+
+
+class MergeResultsTest(unittest.TestCase):
+
+    def run_merge(self, completion_seed):
+        clock = FakeClock()
+        api = StubJobAPI(clock, rows=stats_rows)
+        partitions = plan_partitions(['main', 'web'], 0, 10 * DAY, DAY)
+        outcome = make_orchestrator(api, clock, max_concurrency=5).run(partitions)
+        # Reorder the finished results as if jobs had completed in another order
+        items = list(outcome['results'].items())
+        random.Random(completion_seed).shuffle(items)
+        return merge_results(partitions, dict(items))
+
+    def test_merge_is_deterministic(self):
+        merged = self.run_merge(1)
+        self.assertEqual(merged, self.run_merge(2))
+        self.assertEqual(merged, sorted(merged, key=lambda e: (e['index'], e['sourcetype'], e['source'], e['host'])))
+
+    def test_merge_sums_across_slices(self):
+        merged = self.run_merge(3)
+        app_log = [e for e in merged if e['index'] == 'main' and e['source'] == '/var/log/app.log'][0]
+        self.assertEqual(app_log['events_scanned'], 1000)
+        self.assertEqual(app_log['event_count'], 10)
+        self.assertEqual(app_log['first_seen'], 10)
+        self.assertEqual(app_log['last_seen'], 10 * DAY - 10)
+        self.assertEqual((app_log['has_email'], app_log['has_ssn']), (1, 1))
+        # One row per day-specific source, and both indexes
+        self.assertEqual(len(merged), 2 * (1 + 10))
+
+    def test_build_findings(self):
+        merged = self.run_merge(4)
+        whitelist = WhitelistMatcher([{'whitelist_id': 'wl1', 'pii_type': 'ssn', 'index': 'web', 'sourcetype': 'app:*'}],
+                                     now=1000)
+        findings = scan_orchestrator.build_findings(merged, now=1000, whitelist=whitelist)
+        self.assertEqual([(f['index'], f['pii_type'], f['severity'], f['event_count']) for f in findings],
+                         [('main', 'email', 'medium', 10), ('main', 'ssn', 'critical', 10),
+                          ('web', 'email', 'medium', 10)])
+        self.assertTrue(all(f['status'] == 'detected' for f in findings))
+
+
+class RunDeepScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.findings = os.path.join(self.tmpdir, 'pii_findings.csv')
+        self.history = os.path.join(self.tmpdir, 'pii_scan_history.csv')
+        with open(self.findings, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(findings_store.FINDINGS_FIELDS)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_deep_scan(self, **api_args):
+        clock = FakeClock()
+        api = StubJobAPI(clock, rows=stats_rows, **api_args)
+        settings = dict(scan_orchestrator.DEFAULT_SETTINGS, deep_scan_concurrency=4)
+        summary = scan_orchestrator.run_deep_scan(
+            api, ['main'], 0, 6 * DAY, settings, initiated_by='tester', findings_path=self.findings,
+            history_path=self.history, clock=clock, sleep=clock.sleep, poll_interval=1.0, retry_delay=10.0)
+        with open(self.history, newline='', encoding='utf-8') as f:
+            history = list(csv.DictReader(f))
+        with open(self.findings, newline='', encoding='utf-8') as f:
+            findings = list(csv.DictReader(f))
+        return summary, history, findings
+
+    def test_records_findings_and_history(self):
+        summary, history, findings = self.run_deep_scan()
+        self.assertEqual(summary['status'], 'completed')
+        self.assertEqual(summary['partitions'], 6)
+        self.assertEqual(summary['wall_clock_sec'], 120.0)
+        self.assertEqual(sorted(f['pii_type'] for f in findings), ['email', 'ssn'])
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]['scan_type'], 'deep')
+        self.assertEqual(history[0]['status'], 'completed')
+        self.assertEqual(history[0]['events_processed'], str(6 * 105))
+        self.assertEqual(history[0]['coverage_end'], str(6 * DAY))
+
+    def test_partial_scan(self):
+        summary, history, findings = self.run_deep_scan(failures={('main', 4 * DAY): 3})
+        self.assertEqual(summary['status'], 'partial')
+        self.assertEqual(summary['partitions_failed'], [f'main@{4 * DAY}'])
+        self.assertIn(f'main@{4 * DAY}', history[0]['error_message'])
+        # The ssn finding only came from the failed day
+        self.assertEqual([f['pii_type'] for f in findings], ['email'])
+
+    def test_dry_run_plans_only(self):
+        settings = dict(scan_orchestrator.DEFAULT_SETTINGS)
+        summary = scan_orchestrator.run_deep_scan(None, ['main', 'web'], 0, 30 * DAY, settings, dry_run=True,
+                                                  findings_path=self.findings, history_path=self.history)
+        self.assertEqual(summary['partitions'], 60)
+        self.assertFalse(os.path.exists(self.history))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+PII Sampling Scan Tests
+Allocation, early stopping and recorded intervals of scan_sampler.py against a simulated population
+
+The stub job API answers the tstats volume search from a fixed population
+of strata and the sampling searches by drawing volume / sample_ratio
+events per stratum with that stratum's true PII rate.
+
+Usage:
+    python3 -m pytest tests/test_scan_sampler.py
+"""
+
+import csv
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import findings_store
+import scan_orchestrator
+import scan_sampler
+from scan_orchestrator import DONE
+from scan_sampler import CLEAN, DIRTY, Stratum, allocate, wilson_interval
+
+TERM = re.compile(r'sourcetype="([^"]*)" host="([^"]*)"')
+
+
+class PopulationJobAPI(object):
+    """Job API over a population {(index, sourcetype, host): (volume, pii_rate)}; jobs finish at once"""
+
+    def __init__(self, population, seed=11):
+        self.population = population
+        self.rng = random.Random(seed)
+        self.jobs = {}
+        self.events_read = 0
+        self.sample_ratios = []
+
+    def dispatch(self, search, earliest, latest, sample_ratio=1):
+        sid = f'sid{len(self.jobs)}'
+        if search.startswith('| tstats'):
+            rows = [{'index': k[0], 'sourcetype': k[1], 'host': k[2], 'count': str(v[0])}
+                    for k, v in sorted(self.population.items())]
+        else:
+            index = re.search(r'index="([^"]*)"', search).group(1)
+            self.sample_ratios.append(sample_ratio)
+            rows = []
+            for sourcetype, host in TERM.findall(search):
+                volume, rate = self.population[(index, sourcetype, host)]
+                read = volume // sample_ratio
+                hits = sum(1 for _ in range(read) if self.rng.random() < rate)
+                self.events_read += read
+                rows.append({'index': index, 'sourcetype': sourcetype, 'source': f'/var/log/{sourcetype}.log',
+                             'host': host, 'events_scanned': str(read), 'event_count': str(hits),
+                             'has_email': '1' if hits else '0', 'has_ssn': '0'})
+        self.jobs[sid] = rows
+        return sid
+
+    def status(self, sid):
+        return DONE, ''
+
+    def results(self, sid):
+        return self.jobs[sid]
+
+    def cancel(self, sid):
+        pass
+
+
+def settings(**overrides):
+    values = dict(scan_orchestrator.DEFAULT_SETTINGS, **scan_sampler.DEFAULT_SETTINGS)
+    values.update(overrides)
+    return values
+
+
+class WilsonIntervalTest(unittest.TestCase):
+
+    def test_zero_hits(self):
+        low, high = wilson_interval(0, 1000, 1.96)
+        self.assertEqual(low, 0.0)
+        self.assertAlmostEqual(high, 1.96 ** 2 / (1000 + 1.96 ** 2), places=6)
+
+    def test_contains_estimate(self):
+        low, high = wilson_interval(50, 1000, 1.96)
+        self.assertLess(low, 0.05)
+        self.assertGreater(high, 0.05)
+        self.assertEqual(wilson_interval(0, 0, 1.96), (0.0, 1.0))
+
+
+class AllocateTest(unittest.TestCase):
+
+    def test_budget_floors_and_caps(self):
+        known_clean = Stratum('main', 'clean', 'h1', volume=1000000)
+        known_clean.prior_sampled, known_clean.prior_hits = 20000, 0
+        new = Stratum('main', 'new', 'h2', volume=1000000)
+        tiny = Stratum('main', 'tiny', 'h3', volume=300)
+        strata = [known_clean, new, tiny]
+        allocate(strata, 20000, 1000)
+        self.assertEqual(tiny.allocation, 300)
+        self.assertGreaterEqual(known_clean.allocation, 1000)
+        self.assertGreater(new.allocation, 5 * known_clean.allocation)
+        self.assertLessEqual(sum(s.allocation for s in strata), 20000)
+
+    def test_budget_below_floors(self):
+        strata = [Stratum('main', f'st{i}', 'h', volume=50000) for i in range(10)]
+        allocate(strata, 5000, 1000)
+        self.assertEqual(set(s.allocation for s in strata), {500})
+
+
+class SampleScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = dict((name, os.path.join(self.tmpdir, f'{name}.csv')) for name in ('findings', 'history', 'strata'))
+        with open(self.paths['findings'], 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(findings_store.FINDINGS_FIELDS)
+        self.population = {}
+        for i in range(120):
+            self.population[('main', f'app{i}', f'web{i % 7}')] = (50000, 0.0)
+        for i in range(6):
+            self.population[('web', f'signup{i}', 'web01')] = (40000, 0.05)
+        self.population[('web', 'export', 'batch01')] = (400, 0.02)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_scan(self, api, **overrides):
+        return scan_sampler.run_sample_scan(
+            api, ['main', 'web'], 0, 86400, settings(sample_budget=250000, **overrides),
+            findings_path=self.paths['findings'], history_path=self.paths['history'],
+            strata_path=self.paths['strata'], poll_interval=0.0)
+
+    def read(self, name):
+        with open(self.paths[name], newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_reads_fraction_and_finds_dirty_strata(self):
+        api = PopulationJobAPI(self.population)
+        summary = self.run_scan(api)
+        population = sum(v[0] for v in self.population.values())
+        self.assertEqual(summary['population_events'], population)
+        self.assertEqual(summary['events_processed'], api.events_read)
+        self.assertLess(api.events_read, 0.05 * population)
+        self.assertEqual(summary['status'], 'completed')
+
+        strata = dict(((r['index'], r['sourcetype'], r['host']), r) for r in self.read('strata'))
+        dirty = [k for k, v in self.population.items() if v[1] > 0]
+        self.assertEqual(sorted(k for k, r in strata.items() if r['decision'] == DIRTY), sorted(dirty))
+        self.assertEqual(sum(1 for r in strata.values() if r['decision'] == CLEAN), 120)
+        # The small stratum is scanned in full
+        self.assertEqual(strata[('web', 'export', 'batch01')]['sampled_events'], '400')
+
+        findings = self.read('findings')
+        self.assertEqual(sorted((f['index'], f['sourcetype']) for f in findings),
+                         sorted((k[0], k[1]) for k in dirty))
+
+    def test_decided_strata_stop_early(self):
+        api = PopulationJobAPI(self.population)
+        summary = self.run_scan(api)
+        # Every stratum is decided after the first of three rounds, well inside the budget
+        self.assertEqual(summary['rounds_run'], 1)
+        self.assertLess(summary['events_processed'], 250000 / 2)
+
+    def test_undecided_strata_sample_further(self):
+        self.population[('main', 'rare', 'db01')] = (200000, 0.004)
+        api = PopulationJobAPI(self.population)
+        summary = self.run_scan(api)
+        self.assertGreater(summary['rounds_run'], 1)
+        strata = dict(((r['index'], r['sourcetype'], r['host']), r) for r in self.read('strata'))
+        self.assertGreater(int(strata[('main', 'rare', 'db01')]['sampled_events']),
+                           int(strata[('main', 'app0', 'web0')]['sampled_events']))
+
+    def test_history_interval_covers_truth(self):
+        api = PopulationJobAPI(self.population)
+        self.run_scan(api)
+        row = self.read('history')[0]
+        truth = sum(volume * rate for volume, rate in self.population.values())
+        self.assertEqual(row['scan_type'], 'sample')
+        self.assertEqual(row['confidence_level'], '95')
+        self.assertLessEqual(int(row['estimated_pii_events_low']), truth)
+        self.assertGreaterEqual(int(row['estimated_pii_events_high']), truth)
+        self.assertEqual((row['strata_clean'], row['strata_dirty'], row['strata_inconclusive']), ('120', '7', '0'))
+        self.assertLess(float(row['sample_fraction']), 0.05)
+
+    def test_priors_carry_to_next_scan(self):
+        self.run_scan(PopulationJobAPI(self.population))
+        stored = scan_sampler.load_strata(self.paths['strata'])
+        clean = stored[('main', 'app0', 'web0')][0]
+        dirty = stored[('web', 'signup0', 'web01')][0]
+        self.assertLess(clean.prior_rate(), 0.002)
+        self.assertGreater(dirty.prior_rate(), 0.02)
+
+        api = PopulationJobAPI(self.population, seed=12)
+        summary = self.run_scan(api)
+        self.assertEqual(summary['strata_dirty'], 7)
+        self.assertEqual(len(self.read('history')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
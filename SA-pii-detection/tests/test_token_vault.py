@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+PII Token Vault Tests
+Keyed tokens, LRU cache and reversible vault of token_vault.py
+
+Usage:
+    python3 -m pytest tests/test_token_vault.py
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+from token_vault import LRUCache, PasswordStore, TokenKeyError, TokenVault, load_key
+
+KEY = bytes(range(32))
+
+
+class FakePasswordStore(object):
+    """storage/passwords entry kept in memory"""
+
+    realm, name = 'SA-pii-detection', 'pii_token_key'
+
+    def __init__(self, secret=None):
+        self.secret = secret
+        self.creates = 0
+
+    def get(self):
+        return self.secret
+
+    def create(self, secret):
+        self.creates += 1
+        if self.secret is None:
+            self.secret = secret
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(len(cache), 2)
+
+
+class TokenVaultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'vault.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_keyed_and_deterministic(self):
+        vault = TokenVault(KEY)
+        token = vault.tokenize('123-45-6789')
+        self.assertRegex(token, r'^TOKEN-[0-9A-F]{16}$')
+        self.assertEqual(TokenVault(KEY).tokenize('123-45-6789'), token)
+        self.assertNotEqual(TokenVault(b'other key').tokenize('123-45-6789'), token)
+        # Not the unkeyed digests an attacker could precompute
+        self.assertNotIn(hashlib.md5(b'123-45-6789').hexdigest()[:12].upper(), token)
+        self.assertNotEqual(vault.keyed_hash('123-45-6789'), hashlib.sha256(b'123-45-6789').hexdigest()[:16])
+
+    def test_bulk_round_trip_through_vault(self):
+        values = [f'4111-0000-0000-{i:04d}' for i in range(2000)]
+        tokens = TokenVault(KEY, self.path, cache_size=100).tokenize_many(values + values[:10])
+        self.assertEqual(len(set(tokens)), 2000)
+        self.assertEqual(tokens[2000:], tokens[:10])
+
+        # A new process with a cold cache resolves them from the vault
+        vault = TokenVault(KEY, self.path, cache_size=100)
+        self.assertEqual(vault.detokenize_many(tokens[:2000] + ['TOKEN-UNKNOWN']), values + [None])
+        self.assertEqual(vault.stats()['vault_tokens'], 2000)
+
+    def test_one_way_without_vault(self):
+        vault = TokenVault(KEY, cache_size=0)
+        token = vault.tokenize('jane@example.com')
+        self.assertIsNone(vault.detokenize(token))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_deferred_tokens_are_written_on_flush(self):
+        vault = TokenVault(KEY, self.path, defer_writes=True)
+        token = vault.tokenize('123-45-6789')
+        self.assertIsNone(TokenVault(KEY, self.path).detokenize(token))
+        vault.flush()
+        self.assertEqual(TokenVault(KEY, self.path).detokenize(token), '123-45-6789')
+
+
+class LoadKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.legacy_path = os.path.join(self.tmpdir, 'pii_token.key')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_key_generated_once(self):
+        store = FakePasswordStore()
+        key = load_key(store, create=True, legacy_path=self.legacy_path)
+        self.assertEqual(len(key), 32)
+        self.assertEqual(load_key(store, create=True, legacy_path=self.legacy_path), key)
+        self.assertEqual(store.creates, 1)
+
+    def test_fails_closed_without_a_key(self):
+        store = FakePasswordStore()
+        with self.assertRaisesRegex(TokenKeyError, 'list_storage_passwords'):
+            load_key(store, legacy_path=self.legacy_path)
+        self.assertEqual(store.creates, 0)
+        with self.assertRaises(TokenKeyError):
+            PasswordStore('')
+
+    def test_legacy_key_file_moves_into_the_store(self):
+        with open(self.legacy_path, 'w') as f:
+            f.write(KEY.hex())
+        store = FakePasswordStore()
+        self.assertEqual(load_key(store, create=True, legacy_path=self.legacy_path), KEY)
+        self.assertEqual(store.secret, KEY.hex())
+        self.assertFalse(os.path.exists(self.legacy_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
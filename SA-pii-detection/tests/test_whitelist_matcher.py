@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+PII Whitelist Matcher Tests
+Scope maps, wildcard trie, value patterns and expiry index of whitelist_matcher.py
+
+Usage:
+    python3 -m pytest tests/test_whitelist_matcher.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+from pii_scanner import PIIScanner
+from whitelist_matcher import WhitelistMatcher
+
+
+def entry(whitelist_id, pii_type, index='*', sourcetype='*', field_name='*', pattern='', expires='', is_active='1'):
+    return {'whitelist_id': whitelist_id, 'pattern': pattern, 'pii_type': pii_type, 'index': index,
+            'sourcetype': sourcetype, 'field_name': field_name, 'expires': expires, 'is_active': is_active}
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class WhitelistMatcherTest(unittest.TestCase):
+
+    def test_scope_entries(self):
+        matcher = WhitelistMatcher([
+            entry('exact', 'ssn', 'web', 'app:log', ''),
+            entry('glob', 'email', 'main', 'aws:*'),
+            entry('any_index', 'ip', '*', 'firewall'),
+            entry('inactive', 'phone', is_active='0'),
+        ], now=1000)
+        self.assertEqual(matcher.stats()['exact_scopes'], 2)
+        self.assertEqual(matcher.stats()['wildcard_scopes'], 1)
+        self.assertEqual(matcher.match_scope('ssn', 'web', 'app:log', '_raw'), 'exact')
+        self.assertIsNone(matcher.match_scope('ssn', 'web', 'app:access'))
+        self.assertEqual(matcher.match_scope('email', 'main', 'aws:cloudtrail'), 'glob')
+        self.assertIsNone(matcher.match_scope('email', 'web', 'aws:cloudtrail'))
+        self.assertEqual(matcher.match_scope('ip', 'security', 'firewall'), 'any_index')
+        self.assertIsNone(matcher.match_scope('phone', 'main', 'app:log'))
+
+    def test_field_restricted_entry_needs_field(self):
+        matcher = WhitelistMatcher([entry('field', 'email', field_name='support_contact')], now=1000)
+        self.assertEqual(matcher.match_scope('email', 'main', 'app:log', 'support_contact'), 'field')
+        self.assertIsNone(matcher.match_scope('email', 'main', 'app:log', '_raw'))
+        self.assertIsNone(matcher.match_scope('email', 'main', 'app:log'))
+
+    def test_value_entries_normalised(self):
+        matcher = WhitelistMatcher([
+            entry('ssn', 'ssn', pattern='555-12-3456'),
+            entry('mail', 'email', index='web', pattern='Test@Example.com'),
+        ], now=1000)
+        self.assertEqual(matcher.match('ssn', '555123456', 'main', 'app:log'), 'ssn')
+        self.assertIsNone(matcher.match('ssn', '555-12-3457', 'main', 'app:log'))
+        self.assertEqual(matcher.match('email', 'test@example.com', 'web', 'app:log'), 'mail')
+        self.assertIsNone(matcher.match('email', 'test@example.com', 'main', 'app:log'))
+        # A value entry never exempts the whole type
+        self.assertIsNone(matcher.match_scope('ssn', 'main', 'app:log'))
+
+    def test_expiry_index(self):
+        clock = Clock(1000)
+        matcher = WhitelistMatcher([
+            entry('soon', 'ssn', 'web', 'app:log', expires='1500'),
+            entry('later', 'email', 'web', 'aws:*', expires='3000'),
+            entry('gone', 'phone', expires='900'),
+            entry('forever', 'ip'),
+        ], clock=clock)
+        self.assertEqual(len(matcher), 3)
+        self.assertEqual(matcher.match_scope('ssn', 'web', 'app:log'), 'soon')
+        clock.now = 2000
+        self.assertIsNone(matcher.match_scope('ssn', 'web', 'app:log'))
+        self.assertEqual(matcher.match_scope('email', 'web', 'aws:s3'), 'later')
+        self.assertEqual(matcher.expire(3000), ['later'])
+        self.assertIsNone(matcher.match_scope('email', 'web', 'aws:s3'))
+        self.assertEqual(matcher.match_scope('ip', 'web', 'aws:s3'), 'forever')
+        self.assertEqual(matcher.stats()['next_expiry'], None)
+
+    def test_scanner_drops_whitelisted_matches(self):
+        matcher = WhitelistMatcher([
+            entry('ssn', 'ssn', pattern='555-12-3456'),
+            entry('web_email', 'email', index='web'),
+        ], now=1000)
+        scanner = PIIScanner(custom_patterns=[], whitelist=matcher)
+        raw = 'ssn=555-12-3456 ssn=123-45-6789 mail=jane@example.com'
+        self.assertEqual(scanner.scan(raw, ('main', 'app:log', '_raw')), {'ssn': 1, 'email': 1})
+        self.assertEqual(scanner.scan(raw, ('web', 'app:log', '_raw')), {'ssn': 1})
+        self.assertEqual(PIIScanner(custom_patterns=[]).scan(raw), {'ssn': 2, 'email': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()